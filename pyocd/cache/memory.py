@@ -20,7 +20,7 @@ import logging
 
 from ..utility import conversion
 from .metrics import CacheMetrics
-from ..core.exceptions import TransferFaultError
+from ..core.exceptions import (TransferError, TransferFaultError)
 
 LOG = logging.getLogger(__name__)
 
@@ -37,28 +37,108 @@ class MemoryCache(object):
     memory region, or a TransferFaultError will be raised. However, if an access is outside of all regions,
     the access is passed to the underlying context unmodified. When an access is within a region, that
     region's cacheability flag is honoured.
+
+    Cached data is stored as non-overlapping intervals. Intervals that touch or overlap are merged when
+    data is inserted, so the number of intervals stays small no matter how the cache was filled.
+
+    In write-back mode, writes to cacheable RAM regions made while the core is halted only update the
+    cache, and the written address ranges are recorded as dirty. The dirty ranges are written to the
+    target by flush(), which the owner of the cache must call before the core is resumed, stepped, or
+    reset. If the run token is found to have changed while dirty data is held, it is written back
+    before the cache is invalidated.
+
+    Buffered writes are only visible to accesses made through the cache. Memory accesses that bypass
+    it, such as those made directly on the core or target object, by another core, or by flash
+    programming, see the target's old contents until flush() is called.
     """
 
-    def __init__(self, context, core):
+    def __init__(self, context, core, write_back=False):
         self._context = context
         self._core = core
+        self._write_back = write_back
         self._run_token = -1
         self._reset_cache()
 
+    @property
+    def is_write_back(self):
+        """@brief Whether write-back mode is enabled."""
+        return self._write_back
+
+    @property
+    def is_dirty(self):
+        """@brief Whether there are any buffered writes that have not been flushed."""
+        return len(self._dirty) > 0
+
     def _reset_cache(self):
         self._cache = IntervalTree()
+        self._dirty = IntervalTree()
         self._metrics = CacheMetrics()
 
     def _check_cache(self):
-        """@brief Invalidates the cache if appropriate."""
+        """@brief Invalidates the cache if appropriate.
+        @return Whether the core is running.
+        """
         if self._core.is_running():
             LOG.debug("core is running; invalidating cache")
+            self._write_dirty("core is running")
             self._reset_cache()
+            return True
         elif self._run_token != self._core.run_token:
             self._dump_metrics()
             LOG.debug("out of date run token; invalidating cache")
+            self._write_dirty("out of date run token")
             self._reset_cache()
             self._run_token = self._core.run_token
+        return False
+
+    def _write_dirty(self, reason):
+        """@brief Write back dirty data that was not flushed before the core ran."""
+        if self.is_dirty:
+            LOG.warning("memory cache: writing back %d dirty ranges after the fact (%s)",
+                    len(self._dirty), reason)
+            self.flush()
+
+    @staticmethod
+    def _insert_interval(tree, begin, end, data=None):
+        """@brief Add an interval to a tree, merging it with any intervals it touches or overlaps.
+
+        @param tree The IntervalTree to modify.
+        @param begin Start address of the new interval.
+        @param end End address of the new interval, exclusive.
+        @param data Optional bytearray of data for the new interval. If not None, the data of
+            merged intervals is combined, with _data_ taking precedence where they overlap. If None,
+            the tree is assumed to contain only intervals without data.
+        @return The resulting merged Interval object.
+        """
+        neighbours = tree.overlap(begin - 1, end + 1)
+
+        # Fast path: the new interval is entirely within an existing interval, so update in place.
+        if len(neighbours) == 1:
+            iv = next(iter(neighbours))
+            if iv.begin <= begin and iv.end >= end:
+                if data is not None:
+                    offset = begin - iv.begin
+                    iv.data[offset:offset + len(data)] = data
+                return iv
+
+        if not neighbours:
+            iv = Interval(begin, end, data)
+            tree.add(iv)
+            return iv
+
+        new_begin = min(begin, min(iv.begin for iv in neighbours))
+        new_end = max(end, max(iv.end for iv in neighbours))
+        new_data = None
+        if data is not None:
+            new_data = bytearray(new_end - new_begin)
+            for iv in neighbours:
+                new_data[iv.begin - new_begin:iv.end - new_begin] = iv.data
+            new_data[begin - new_begin:end - new_begin] = data
+        for iv in neighbours:
+            tree.remove(iv)
+        merged = Interval(new_begin, new_end, new_data)
+        tree.add(merged)
+        return merged
 
     def _get_ranges(self, addr, count):
         """@brief Splits a memory address range into cached and uncached subranges.
@@ -96,7 +176,7 @@ class MemoryCache(object):
         for uncachedIv in uncached:
             data = self._context.read_memory_block8(uncachedIv.begin, uncachedIv.end - uncachedIv.begin)
             iv = Interval(uncachedIv.begin, uncachedIv.end, bytearray(data))
-            self._cache.add(iv) # TODO merge contiguous cached intervals
+            self._insert_interval(self._cache, iv.begin, iv.end, iv.data)
             uncachedData.append(iv)
         return uncachedData
 
@@ -184,45 +264,30 @@ class MemoryCache(object):
 
         return result
 
-    def _update_contiguous(self, cached, addr, value):
-        size = len(value)
-        end = addr + size
-        leadBegin = addr
-        leadData = bytearray()
-        trailData = bytearray()
-        trailEnd = end
-
-        if cached[0].begin < addr and cached[0].end > addr:
-            offset = addr - cached[0].begin
-            leadData = cached[0].data[:offset]
-            leadBegin = cached[0].begin
-        if cached[-1].begin < end and cached[-1].end > end:
-            offset = end - cached[-1].begin
-            trailData = cached[-1].data[offset:]
-            trailEnd = cached[-1].end
-
-        self._cache.remove_overlap(addr, end)
-
-        data = leadData + value + trailData
-        self._cache.addi(leadBegin, trailEnd, data)
-
-    def _check_regions(self, addr, count):
-        """@return A bool indicating whether the given address range is fully contained within
-              one known memory region, and that region is cacheable.
+    def _get_region(self, addr, count):
+        """@return The memory region that fully contains the given address range, or None if the
+              range is outside of all known regions.
         @exception TransferFaultError Raised if the access is not entirely contained within a single region.
         """
         regions = self._core.memory_map.get_intersecting_regions(addr, length=count)
 
         # If no regions matched, then allow an uncached operation.
         if len(regions) == 0:
-            return False
+            return None
 
         # Raise if not fully contained within one region.
         if len(regions) > 1 or not regions[0].contains_range(addr, length=count):
             raise TransferFaultError("individual memory accesses must not cross memory region boundaries")
 
-        # Otherwise return whether the region is cacheable.
-        return regions[0].is_cacheable
+        return regions[0]
+
+    def _check_regions(self, addr, count):
+        """@return A bool indicating whether the given address range is fully contained within
+              one known memory region, and that region is cacheable.
+        @exception TransferFaultError Raised if the access is not entirely contained within a single region.
+        """
+        region = self._get_region(addr, count)
+        return region is not None and region.is_cacheable
 
     def read_memory(self, addr, transfer_size=32, now=True):
         # TODO use more optimal underlying read_memory calls
@@ -271,38 +336,72 @@ class MemoryCache(object):
         if len(value) <= 0:
             return
 
-        self._check_cache()
+        is_running = self._check_cache()
 
         # Validate memory regions.
-        cacheable = self._check_regions(addr, len(value))
+        region = self._get_region(addr, len(value))
+        cacheable = region is not None and region.is_cacheable
+        size = len(value)
+        end = addr + size
+
+        # Buffer the write if possible.
+        if self._write_back and cacheable and region.is_ram and not is_running:
+            self._metrics.writes += size
+            self._insert_interval(self._cache, addr, end, bytearray(value))
+            self._insert_interval(self._dirty, addr, end)
+            return
 
         # Write to the target first, so if it fails we don't update the cache.
         result = self._context.write_memory_block8(addr, value)
 
         if cacheable:
-            size = len(value)
-            end = addr + size
-            cached = sorted(self._cache.overlap(addr, end), key=lambda x:x.begin)
             self._metrics.writes += size
-
-            if len(cached):
-                # Write data is entirely within a single cached interval.
-                if addr >= cached[0].begin and end <= cached[0].end:
-                    beginOffset = addr - cached[0].begin
-                    endOffset = beginOffset + size
-                    cached[0].data[beginOffset:endOffset] = value
-
-                else:
-                    self._update_contiguous(cached, addr, bytearray(value))
-            else:
-                # No cached data in this range, so just add the entire interval.
-                self._cache.addi(addr, end, bytearray(value))
+            self._insert_interval(self._cache, addr, end, bytearray(value))
 
         return result
 
     def write_memory_block32(self, addr, data):
         return self.write_memory_block8(addr, conversion.u32le_list_to_byte_list(data))
 
+    def flush(self):
+        """@brief Write all dirty ranges to the target.
+
+        Each dirty range is widened to word alignment when the cache holds the surrounding bytes,
+        so it can be written with a single write_memory_block32(). If a write fails, the whole cache
+        is invalidated before the exception is passed on, since the target's memory contents are
+        then unknown.
+        """
+        if not self._dirty:
+            return
+
+        dirty = sorted(self._dirty, key=lambda x: x.begin)
+        self._dirty = IntervalTree()
+        LOG.debug("memory cache: flushing %d dirty ranges (%d bytes)", len(dirty),
+                sum(iv.end - iv.begin for iv in dirty))
+
+        try:
+            for dirty_iv in dirty:
+                cached_iv = next(iter(self._cache.overlap(dirty_iv.begin, dirty_iv.end)))
+                assert cached_iv.begin <= dirty_iv.begin and cached_iv.end >= dirty_iv.end
+
+                begin = dirty_iv.begin
+                end = dirty_iv.end
+                aligned_begin = begin & ~3
+                aligned_end = (end + 3) & ~3
+                if aligned_begin >= cached_iv.begin and aligned_end <= cached_iv.end:
+                    begin = aligned_begin
+                    end = aligned_end
+
+                data = cached_iv.data[begin - cached_iv.begin:end - cached_iv.begin]
+                if (begin & 3) == 0 and (end & 3) == 0:
+                    self._context.write_memory_block32(begin, conversion.byte_list_to_u32le_list(data))
+                else:
+                    self._context.write_memory_block8(begin, data)
+        except TransferError:
+            self._reset_cache()
+            raise
+
     def invalidate(self):
+        self.flush()
         self._reset_cache()
 
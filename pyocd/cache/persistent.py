@@ -0,0 +1,120 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import tempfile
+from typing import (Any, Dict, Optional, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from ..core.session import Session
+
+LOG = logging.getLogger(__name__)
+
+## @brief Default location of persistent caches if the cache.persistent_dir option is not set.
+DEFAULT_PERSISTENT_CACHE_DIR = os.path.join("~", ".pyocd", "cache")
+
+def get_persistent_cache_dir(session: "Session") -> Path:
+    """@brief Return the directory in which persistent caches are stored."""
+    path = session.options.get('cache.persistent_dir') or DEFAULT_PERSISTENT_CACHE_DIR
+    return Path(path).expanduser()
+
+def get_target_cache_key(session: "Session") -> Optional[str]:
+    """@brief Return a string uniquely identifying the connected board.
+
+    The key is formed from the probe's unique ID and the target type. None is returned if either
+    is unavailable, in which case persistent caches should not be used.
+    """
+    probe = session.probe
+    target_type = session.options.get('target_override')
+    if not target_type and session.target is not None:
+        target_type = session.target.part_number
+    if probe is None or not probe.unique_id or not target_type:
+        return None
+    return f"{probe.unique_id}_{target_type}"
+
+def cache_file_name(key: str) -> str:
+    """@brief Convert a cache key into a safe file name."""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', key) + ".json"
+
+class PersistentCacheFile:
+    """@brief A JSON file holding one persistent cache.
+
+    Files are replaced atomically when saved, so a concurrent reader sees either the old or new
+    contents. A file that is missing, unreadable, or has a different format version is treated
+    as empty.
+    """
+
+    def __init__(self, path: Path, version: int) -> None:
+        """@brief Constructor.
+        @param self
+        @param path Path of the cache file.
+        @param version Format version of the cache contents. Files with another version are ignored.
+        """
+        self._path = path
+        self._version = version
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def load(self) -> Dict[str, Any]:
+        """@brief Read the cache contents.
+        @return Dict of cached data, or an empty dict.
+        """
+        try:
+            with self._path.open('r') as f:
+                contents = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            LOG.debug("ignoring unreadable cache file %s: %s", self._path, err)
+            return {}
+        if not isinstance(contents, dict) or contents.get('version') != self._version:
+            return {}
+        data = contents.get('data')
+        return data if isinstance(data, dict) else {}
+
+    def save(self, data: Dict[str, Any]) -> None:
+        """@brief Replace the cache contents.
+
+        Errors writing the file are logged and otherwise ignored, since the cache is only an
+        optimisation.
+        """
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self._path.parent, prefix=self._path.name, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'version': self._version, 'data': data}, f)
+                os.replace(temp_path, self._path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError as err:
+            LOG.warning("failed to write cache file %s: %s", self._path, err)
+
+    def delete(self) -> None:
+        """@brief Remove the cache file if it exists."""
+        try:
+            self._path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            LOG.warning("failed to remove cache file %s: %s", self._path, err)
@@ -24,6 +24,7 @@ from typing import (IO, Optional, Sequence, TYPE_CHECKING, Union)
 
 from ..core.helpers import ConnectHelper
 from ..core import (exceptions, session)
+from ..core.target import Target
 from ..probe.shared_probe_proxy import SharedDebugProbeProxy
 from ..utility.cmdline import convert_session_options
 from ..commands.repl import (PyocdRepl, ToolExitException)
@@ -31,6 +32,7 @@ from ..commands.execution_context import CommandExecutionContext
 
 if TYPE_CHECKING:
     import argparse
+    from ..utility.notification import Notification
 
 LOG = logging.getLogger(__name__)
 
@@ -115,6 +117,11 @@ class PyOCDCommander:
                         colorama.Fore.CYAN + f"[{status}]" +
                         colorama.Style.RESET_ALL + f": {self.session.board.unique_id}")
 
+                # Report halts, lockups, and resets of running cores as the state monitor sees
+                # them, instead of leaving the user to poll with the status command.
+                self.session.subscribe(self._state_changed_handler, Target.Event.STATE_CHANGED)
+                self.session.state_monitor
+
                 # Run the REPL interface.
                 console = PyocdRepl(self.context)
                 console.run()
@@ -137,6 +144,17 @@ class PyOCDCommander:
 
         return self.exit_code
 
+    def _state_changed_handler(self, notification: "Notification") -> None:
+        """@brief Print a message when a core's state changes while the REPL is running."""
+        state = notification.data
+        if state in (Target.State.RUNNING, Target.State.SLEEPING):
+            return
+        self.context.writei("\nCore %d %s", notification.source.core_number, {
+                Target.State.HALTED: "halted",
+                Target.State.LOCKUP: "entered lockup",
+                Target.State.RESET: "is being held in reset",
+                }.get(state, "state is " + state.name.capitalize()))
+
     def _commands_require_connect(self) -> bool:
         """@brief Determine whether a connection is needed to run commands."""
         for args in self.cmds:
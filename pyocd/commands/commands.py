@@ -26,7 +26,7 @@ from natsort import natsorted
 import textwrap
 from time import sleep
 from shutil import get_terminal_size
-from typing import TYPE_CHECKING
+from typing import (List, Tuple, TYPE_CHECKING)
 
 from .. import coresight
 from ..core.helpers import ConnectHelper
@@ -46,6 +46,7 @@ from ..utility.hex import (
     )
 from ..utility.progress import print_progress
 from ..utility.columns import ColumnFormatter
+from ..utility.memory_scan import (MemoryPattern, compare_memory, find_pattern_mismatch, search_memory)
 from ..utility.mask import (
     msb,
     bfx,
@@ -727,36 +728,14 @@ class CompareCommand(CommandBase):
         else:
             length = self.length
 
-        # Divide into 32 kB chunks.
-        CHUNK_SIZE = 32 * 1024
-        chunk_count = (length + CHUNK_SIZE - 1) // CHUNK_SIZE
-
-        addr = self.addr
-        end_addr = addr + length
-        offset = 0
-        mismatch = False
-
-        for chunk in range(chunk_count):
-            # Get this chunk's size.
-            chunk_size = min(end_addr - addr, CHUNK_SIZE)
-            self.context.writei("Comparing %d bytes @ 0x%08x", chunk_size, addr)
-
-            data = bytearray(self.context.selected_ap.read_memory_block8(addr, chunk_size))
+        self.context.writei("Comparing %d bytes @ 0x%08x", length, self.addr)
+        offset = compare_memory(self.context.selected_ap, self.addr, bytes(file_data[:length]))
 
-            for i in range(chunk_size):
-                if data[i] != file_data[offset+i]:
-                    mismatch = True
-                    self.context.writei("Mismatched byte at 0x%08x (offset 0x%x): 0x%02x (memory) != 0x%02x (file)",
-                        addr + i, offset + i, data[i], file_data[offset+i])
-                    break
-
-            if mismatch:
-                break
-
-            offset += chunk_size
-            addr += chunk_size
-
-        if not mismatch:
+        if offset is not None:
+            data = self.context.selected_ap.read8(self.addr + offset)
+            self.context.writei("Mismatched byte at 0x%08x (offset 0x%x): 0x%02x (memory) != 0x%02x (file)",
+                self.addr + offset, offset, data, file_data[offset])
+        else:
             self.context.writei("All %d bytes match.", length)
 
         if flash_init_required:
@@ -844,56 +823,99 @@ class FindCommand(CommandBase):
             'group': 'standard',
             'category': 'memory',
             'nargs': '*',
-            'usage': "[-n] ADDR LEN BYTE+",
+            'usage': "[-n] [-a] ADDR LEN BYTE+ [| BYTE+ ...]",
             'help': "Search for a value in memory within the given address range.",
             'extra_help': "A pattern of any number of bytes can be searched for. Each BYTE "
-                           "parameter must be an 8-bit value. If the -n argument is passed, "
-                           "the search is negated and looks for the first set of bytes that "
-                           "does not match the provided values.",
+                           "parameter must be an 8-bit value. A BYTE may be written as VALUE/MASK "
+                           "to only compare the bits set in MASK, or as '*' to match any value. "
+                           "Several patterns can be searched for at once by separating them "
+                           "with '|'. By default only the first match is reported; pass -a to "
+                           "report all matches. If the -n argument is passed, the search is "
+                           "negated and looks for the first set of bytes that does not match "
+                           "the provided values, repeated from ADDR.",
             }
 
+    def _convert_pattern_byte(self, arg: str) -> Tuple[int, int]:
+        if arg == '*':
+            return 0, 0
+        if '/' in arg:
+            value, mask = arg.split('/', 1)
+            return self._convert_value(value), self._convert_value(mask)
+        return self._convert_value(arg), 0xff
+
     def parse(self, args):
+        self.negate = False
+        self.find_all = False
+        while args and args[0] in ('-n', '-a'):
+            if args.pop(0) == '-n':
+                self.negate = True
+            else:
+                self.find_all = True
         if len(args) < 3:
             raise exceptions.CommandError("missing argument")
-        if args[0] == '-n':
-            self.negate = True
-            args.pop(0)
-        else:
-            self.negate = False
         self.addr = self._convert_value(args[0])
         self.length = self._convert_value(args[1])
-        self.pattern = bytearray()
-        for p in args[2:]:
-            self.pattern += bytearray([self._convert_value(p)])
-        self.pattern_str = " ".join("%02x" % p for p in self.pattern)
-
-    def execute(self):
-        # Divide into 32 kB chunks.
-        CHUNK_SIZE = 32 * 1024
-        chunk_count = (self.length + CHUNK_SIZE - 1) // CHUNK_SIZE
-
-        addr = self.addr
-        end_addr = addr + self.length
-        self.context.writei("Searching 0x%08x-0x%08x for pattern [%s]", addr, end_addr - 1, self.pattern_str)
 
-        match = False
-        for chunk in range(chunk_count):
-            # Get this chunk's size.
-            chunk_size = min(end_addr - addr, CHUNK_SIZE)
-            self.context.writei("Read %d bytes @ 0x%08x", chunk_size, addr)
+        pattern_args: List[List[str]] = [[]]
+        for arg in args[2:]:
+            if arg == '|':
+                pattern_args.append([])
+            else:
+                pattern_args[-1].append(arg)
+
+        self.patterns: List[MemoryPattern] = []
+        for byte_args in pattern_args:
+            if not byte_args:
+                raise exceptions.CommandError("empty pattern")
+            data = bytearray()
+            mask = bytearray()
+            for arg in byte_args:
+                value, value_mask = self._convert_pattern_byte(arg)
+                if not (0 <= value <= 0xff and 0 <= value_mask <= 0xff):
+                    raise exceptions.CommandError("pattern byte '%s' is not an 8-bit value" % arg)
+                data.append(value)
+                mask.append(value_mask)
+            self.patterns.append(MemoryPattern(bytes(data), bytes(mask)))
+        if self.negate and len(self.patterns) > 1:
+            raise exceptions.CommandError("only one pattern is allowed for a negated search")
+
+        self.pattern_strs = ["[%s]" % self._pattern_str(p) for p in self.patterns]
+
+    @staticmethod
+    def _pattern_str(pattern: MemoryPattern) -> str:
+        if pattern.mask is None:
+            return " ".join("%02x" % p for p in pattern.data)
+        return " ".join((("%02x/%02x" % (p, m)) if m else "*") for p, m in zip(pattern.data, pattern.mask))
 
-            data = bytearray(self.context.selected_ap.read_memory_block8(addr, chunk_size))
+    def execute(self):
+        end_addr = self.addr + self.length
+        self.context.writei("Searching 0x%08x-0x%08x for pattern %s", self.addr, end_addr - 1,
+                " | ".join(self.pattern_strs))
+
+        if self.negate:
+            mismatch_addr = find_pattern_mismatch(self.context.selected_ap, self.addr, self.length,
+                    self.patterns[0])
+            if mismatch_addr is not None:
+                self.context.writei("Found pattern mismatch at address 0x%08x", mismatch_addr)
+            else:
+                self.context.writei("All bytes in range 0x%08x-0x%08x match pattern", self.addr, end_addr - 1)
+            return
 
-            offset = data.find(self.pattern)
-            if (offset != -1) ^ self.negate:
-                match = True
-                self.context.writei("Found pattern at address 0x%08x", addr + offset)
+        match_count = 0
+        for match in search_memory(self.context.selected_ap, self.addr, self.length, self.patterns):
+            match_count += 1
+            if len(self.patterns) > 1:
+                self.context.writei("Found pattern %s at address 0x%08x", self.pattern_strs[match.index],
+                        match.address)
+            else:
+                self.context.writei("Found pattern at address 0x%08x", match.address)
+            if not self.find_all:
                 break
 
-            addr += chunk_size - len(self.pattern)
-
-        if not match:
+        if match_count == 0:
             self.context.writei("Failed to find pattern in range 0x%08x-0x%08x", self.addr, end_addr - 1)
+        elif self.find_all:
+            self.context.writei("Found %d matches", match_count)
 
 class EraseCommand(CommandBase):
     INFO = {
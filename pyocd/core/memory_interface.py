@@ -15,10 +15,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import (Callable, Sequence, Union, cast, overload)
+from typing import (Callable, Iterator, Sequence, Union, cast, overload)
 from typing_extensions import Literal
 
-from ..utility import conversion
+from ..utility import (conversion, memory_scan)
 
 class MemoryInterface:
     """@brief Interface for memory access."""
@@ -59,6 +59,31 @@ class MemoryInterface:
         """@brief Read an aligned block of 32-bit words."""
         raise NotImplementedError()
 
+    def read_memory_block32_deferred(self, addr: int, size: int) -> Callable[[], Sequence[int]]:
+        """@brief Start reading an aligned block of 32-bit words.
+
+        Returns a callable that returns the words when invoked. Memory interfaces that can queue
+        the read with the probe override this method, so that other work can be done while the
+        transfer is in flight. The default implementation performs the read immediately.
+        """
+        data = self.read_memory_block32(addr, size)
+        return lambda: data
+
+    def search_memory(self, addr: int, length: int, patterns: memory_scan.PatternsType) \
+            -> Iterator[memory_scan.MemoryMatch]:
+        """@brief Search a memory range for one or more byte patterns.
+
+        See pyocd.utility.memory_scan.search_memory() for details.
+
+        @param self
+        @param addr Start address of the range to search.
+        @param length Length of the range in bytes.
+        @param patterns A pattern or sequence of patterns. Each pattern is either a bytes object or a
+            MemoryPattern, which may have a mask.
+        @return Iterator of MemoryMatch tuples in address order.
+        """
+        return memory_scan.search_memory(self, addr, length, patterns)
+
     def write64(self, addr: int, value: int) -> None:
         """@brief Shorthand to write a 64-bit word."""
         self.write_memory(addr, value, 64)
@@ -35,10 +35,21 @@ BUILTIN_OPTIONS = [
         "Prevents raising an error if no cores were found after CoreSight discovery."),
     OptionInfo('auto_unlock', bool, True,
         "Whether to unlock secured target by erasing."),
+    OptionInfo('cache.coresight_discovery', bool, False,
+        "Save the results of CoreSight discovery and reuse them in later sessions with the same board, "
+        "after checking them against the target. Default is disabled."),
+    OptionInfo('cache.debug_sequences', bool, False,
+        "Save CMSIS-Pack debug sequences compiled to Python in a persistent cache, so they don't have to be "
+        "compiled again in later sessions. Default is disabled."),
     OptionInfo('cache.enable_memory', bool, True,
         "Enable the memory read cache. Default is enabled."),
     OptionInfo('cache.enable_register', bool, True,
         "Enable the core register cache. Default is enabled."),
+    OptionInfo('cache.memory_write_back', bool, False,
+        "Buffer writes to cacheable RAM in the memory cache while the core is halted, and write them to "
+        "the target in bulk before the core is resumed, stepped, or reset. Default is disabled."),
+    OptionInfo('cache.persistent_dir', str, None,
+        "Directory in which persistent caches are stored. Default is ~/.pyocd/cache."),
     OptionInfo('cache.read_code_from_elf', bool, True,
         "Controls whether reads of code sections will be taken from an attached ELF file instead of the "
         "target memory."),
@@ -72,6 +83,9 @@ BUILTIN_OPTIONS = [
     OptionInfo('fast_program', bool, False,
         "Setting this option to True will use CRC checks of existing flash sector contents to "
         "determine whether pages need to be programmed."),
+    OptionInfo('flash.fingerprint_cache', bool, False,
+        "Record the CRCs of programmed flash pages in a persistent cache, and use them to skip "
+        "verifying unchanged pages the next time the same board is programmed."),
     OptionInfo('flash.timeout.init', float, 5.0,
         "Flash algorithm init and uninit timeout in seconds."),
     OptionInfo('flash.timeout.analyzer', float, 30.0,
@@ -131,6 +145,15 @@ BUILTIN_OPTIONS = [
         "Set to 0 to disable the core accessibility test. Default is 2.0 s."),
     OptionInfo('resume_on_disconnect', bool, True,
         "Whether to run target on disconnect."),
+    OptionInfo('rtt.max_bandwidth', int, 0,
+        "Maximum average probe bandwidth in bytes per second used for polling RTT channels. The poll interval "
+        "is lengthened as needed to stay within the budget, up to rtt.max_latency. Default is 0, for no limit."),
+    OptionInfo('rtt.max_latency', float, 0.1,
+        "Longest interval in seconds between polls of RTT channels. The poll interval backs off towards this "
+        "value while the up channels are empty. Default is 0.1 s (100 ms)."),
+    OptionInfo('rtt.min_poll_interval', float, 0.001,
+        "Shortest interval in seconds between polls of RTT channels. The poll interval shrinks towards this "
+        "value when up channels are filling. Default is 0.001 s (1 ms)."),
     OptionInfo('scan_all_aps', bool, False,
         "Controls whether all 256 ADIv5 AP addresses will be probed. Default is False."),
     OptionInfo('serve_local_only', bool, True,
@@ -140,6 +163,12 @@ BUILTIN_OPTIONS = [
         "If set to True, the flash loader will attempt to not program pages whose contents are not "
         "going to change by scanning target flash memory. A value of False will force all pages to "
         "be erased and programmed. Default is True."),
+    OptionInfo('state_monitor.max_poll_interval', float, 0.01,
+        "Longest interval in seconds between polls of running cores by the target state monitor. The poll "
+        "interval backs off towards this value while no core changes state. Default is 0.01 s (10 ms)."),
+    OptionInfo('state_monitor.min_poll_interval', float, 0.001,
+        "Interval in seconds between polls of running cores by the target state monitor right after a core "
+        "is resumed. Default is 0.001 s (1 ms)."),
     OptionInfo('target_override', str, None,
         "Name of target to use instead of default."),
     OptionInfo('test_binary', str, None,
@@ -178,8 +207,20 @@ BUILTIN_OPTIONS = [
         "Whether to use GDB syscalls for semihosting file access operations."),
     OptionInfo('semihost.commandline', str, "",
         "Program command line string, used for the SYS_GET_CMDLINE semihosting request."),
+    OptionInfo('semihost.console_buffer_size', int, 0,
+        "Size in bytes of the buffer for semihosting console output. Buffered output is written on "
+        "a newline, when the buffer is full, after the semihost.console_flush_interval time, or when "
+        "the target halts for another reason. 0 disables buffering."),
+    OptionInfo('semihost.console_flush_interval', float, 0.1,
+        "Maximum time in seconds that semihosting console output is held in the buffer."),
+    OptionInfo('semihost.statistics', bool, False,
+        "Record the time spent handling semihosting requests and log a summary when the gdbserver "
+        "stops."),
     OptionInfo('step_into_interrupt', bool, False,
         "Enable interrupts when performing step operations."),
+    OptionInfo('swv_capture_file', str, None,
+        "Path of a file to which raw SWO data is recorded while SWV is enabled. The capture can be "
+        "replayed with pyocd.trace.capture. No default."),
     OptionInfo('swv_clock', int, 1000000,
         "Frequency in Hertz of the SWO baud rate. Default is 1 MHz."),
     OptionInfo('swv_system_clock', int, None,
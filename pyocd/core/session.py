@@ -37,6 +37,7 @@ if TYPE_CHECKING:
     from ..probe.tcp_probe_server import DebugProbeServer
     from ..gdbserver.gdbserver import GDBServer
     from ..board.board import Board
+    from ..debug.state_monitor import TargetStateMonitor
 
 LOG = logging.getLogger(__name__)
 
@@ -161,6 +162,7 @@ class Session(Notifier):
         self._options = OptionsManager()
         self._gdbservers: Dict[int, "GDBServer"] = {}
         self._probeserver: Optional["DebugProbeServer"] = None
+        self._state_monitor: Optional["TargetStateMonitor"] = None
         self._context_state = SimpleNamespace()
 
         # Set this session on the probe, if we were given a probe.
@@ -381,6 +383,18 @@ class Session(Notifier):
         """@brief Setter for the `probeserver` property."""
         self._probeserver = server
 
+    @property
+    def state_monitor(self) -> "TargetStateMonitor":
+        """@brief The @ref pyocd.debug.state_monitor.TargetStateMonitor "TargetStateMonitor" for this session.
+
+        The monitor is created and started on first access.
+        """
+        if self._state_monitor is None:
+            from ..debug.state_monitor import TargetStateMonitor
+            self._state_monitor = TargetStateMonitor(self)
+            self._state_monitor.start()
+        return self._state_monitor
+
     @property
     def log_tracebacks(self) -> bool:
         """@brief Quick access to debug.traceback option since it is widely used."""
@@ -553,6 +567,10 @@ class Session(Notifier):
         assert (self._probe is not None) and (self._board is not None)
 
         LOG.debug("uninit session %s", self)
+        if self._state_monitor is not None:
+            self._state_monitor.stop()
+            self._state_monitor = None
+
         if self._inited:
             try:
                 self._board.uninit()
@@ -144,6 +144,7 @@ class SoCTarget(TargetGraphNode):
                 core,
                 enable_memory=self.session.options['cache.enable_memory'],
                 enable_register=self.session.options['cache.enable_register'],
+                memory_write_back=self.session.options['cache.memory_write_back'],
                 )
         core.set_target_context(ctx)
         self.cores[core.core_number] = core
@@ -241,6 +242,9 @@ class SoCTarget(TargetGraphNode):
     def read_memory_block32(self, addr: int, size: int) -> Sequence[int]:
         return self.selected_core_or_raise.read_memory_block32(addr, size)
 
+    def read_memory_block32_deferred(self, addr: int, size: int) -> Callable[[], Sequence[int]]:
+        return self.selected_core_or_raise.read_memory_block32_deferred(addr, size)
+
     def read_core_register(self, id: "CoreRegisterNameOrNumberType") -> "CoreRegisterValueType":
         return self.selected_core_or_raise.read_core_register(id)
 
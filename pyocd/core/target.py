@@ -155,6 +155,10 @@ class Target(MemoryInterface, DelegateHavingMixIn):
         PRE_FLASH_PROGRAM = 9
         ## Sent after target flash has been reprogrammed.
         POST_FLASH_PROGRAM = 10
+        ## Sent by the target state monitor when it sees a running core change state.
+        #
+        # Associated data is the new Target.State.
+        STATE_CHANGED = 11
 
     class RunType(Enum):
         """Run type for run notifications.
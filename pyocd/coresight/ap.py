@@ -1150,7 +1150,8 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
             raise
         TRACE.debug("_write_block32:%06d }", num)
 
-    def _read_block32_page(self, addr: int, size: int) -> Sequence[int]:
+    def _read_block32_page(self, addr: int, size: int, now: bool = True) \
+            -> Union[Sequence[int], Callable[[], Sequence[int]]]:
         """@brief Read a single transaction's worth of aligned words.
 
         The transaction must not cross the MEM-AP's auto-increment boundary.
@@ -1164,19 +1165,34 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         # put address in TAR
         self.write_reg(self._reg_offset + MEM_AP_CSW, self._csw | CSW_SIZE32)
         self.write_reg(self._reg_offset + MEM_AP_TAR, addr)
-        try:
-            resp = self.dp.read_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, size)
-        except exceptions.TransferFaultError as error:
-            # Annotate error with target address.
+
+        def handle_error(error: Exception) -> None:
             self._handle_error(error, num)
-            error.fault_address = addr
-            error.fault_length = size * 4
-            raise
+            if isinstance(error, exceptions.TransferFaultError):
+                # Annotate error with target address.
+                error.fault_address = addr
+                error.fault_length = size * 4
+
+        try:
+            result_cb = self.dp.read_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, size,
+                    now=False)
         except exceptions.Error as error:
-            self._handle_error(error, num)
+            handle_error(error)
             raise
-        TRACE.debug("_read_block32:%06d }", num)
-        return resp
+
+        def read_block32_cb() -> Sequence[int]:
+            try:
+                resp = result_cb()
+            except exceptions.Error as error:
+                handle_error(error)
+                raise
+            TRACE.debug("_read_block32:%06d }", num)
+            return resp
+
+        if now:
+            return read_block32_cb()
+        else:
+            return read_block32_cb
 
     @locked
     def _write_memory_block32(self, addr: int, data: Sequence[int]) -> None:
@@ -1194,23 +1210,117 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
             addr += n
         return
 
-    @locked
+    @overload
     def _read_memory_block32(self, addr: int, size: int) -> Sequence[int]:
+        ...
+
+    @overload
+    def _read_memory_block32(self, addr: int, size: int, now: Literal[True] = True) -> Sequence[int]:
+        ...
+
+    @overload
+    def _read_memory_block32(self, addr: int, size: int, now: Literal[False]) -> Callable[[], Sequence[int]]:
+        ...
+
+    @overload
+    def _read_memory_block32(self, addr: int, size: int, now: bool) \
+            -> Union[Sequence[int], Callable[[], Sequence[int]]]:
+        ...
+
+    @locked
+    def _read_memory_block32(self, addr: int, size: int, now: bool = True) \
+            -> Union[Sequence[int], Callable[[], Sequence[int]]]:
         """@brief Read a block of aligned words in memory.
 
-        @return A list of word values.
+        If _now_ is False, the reads are queued and a callable is returned that produces the
+        result. This allows the reads of several blocks to be sent to the probe together.
+
+        @return A list of word values, or a callable returning the list.
         """
         assert (addr & 0x3) == 0
         addr &= self._address_mask
-        resp = []
+        page_cbs = []
         while size > 0:
             n = self.auto_increment_page_size - (addr & (self.auto_increment_page_size - 1))
             if size*4 < n:
                 n = (size*4) & 0xfffffffc
-            resp += self._read_block32_page(addr, n//4)
+            page_cbs.append(self._read_block32_page(addr, n//4, now=False))
             size -= n//4
             addr += n
-        return resp
+
+        def read_memory_block32_cb() -> Sequence[int]:
+            resp = []
+            for page_cb in page_cbs:
+                resp += page_cb()
+            return resp
+
+        if now:
+            return read_memory_block32_cb()
+        else:
+            return read_memory_block32_cb
+
+    def read_memory_block32_deferred(self, addr: int, size: int) -> Callable[[], Sequence[int]]:
+        """@brief Queue the reads of a block of aligned words and return a callable for the result."""
+        return self.read_memory_block32(addr, size, now=False)
+
+    @locked
+    def read_memory_repeat32(self, addr: int, count: int, now: bool = True) \
+            -> Union[Sequence[int], Callable[[], Sequence[int]]]:
+        """@brief Read the same word address repeatedly.
+
+        This is intended for registers that return a new value on every read, such as DWT_PCSR.
+        Address auto-increment is disabled in CSW and TAR is written once, so the _count_ reads
+        are a single repeated DRW read. A CMSIS-DAP probe performs these with DAP_TransferBlock
+        commands that fill each packet with reads. If the probe provides an accelerated memory
+        interface, individual deferred reads are used instead.
+
+        If _now_ is False, the reads are queued and a callable is returned that produces the
+        result.
+
+        @return A list of _count_ word values, or a callable returning the list.
+        """
+        assert (addr & 0x3) == 0
+        addr &= self._address_mask
+
+        if self._accelerated_memory_interface is not None:
+            read_cbs = [self._accelerated_read_memory(addr, 32, now=False) for _ in range(count)]
+            def read_accelerated_cb() -> Sequence[int]:
+                return [cb() for cb in read_cbs] # type:ignore
+            return read_accelerated_cb() if now else read_accelerated_cb
+
+        num = self.dp.next_access_number
+        TRACE.debug("read_repeat32:%06d (ap=0x%x; addr=0x%08x, count=%d) {",
+            num, self.address.nominal_address, addr, count)
+
+        def handle_error(error: Exception) -> None:
+            self._handle_error(error, num)
+            if isinstance(error, exceptions.TransferFaultError):
+                # Annotate error with target address.
+                error.fault_address = addr
+                error.fault_length = 4
+
+        try:
+            self.write_reg(self._reg_offset + MEM_AP_CSW, (self._csw & ~CSW_ADDRINC) | CSW_NADDRINC | CSW_SIZE32)
+            self.write_reg(self._reg_offset + MEM_AP_TAR, addr)
+            result_cb = self.dp.read_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, count,
+                    now=False)
+        except exceptions.Error as error:
+            handle_error(error)
+            raise
+
+        def read_repeat32_cb() -> Sequence[int]:
+            try:
+                resp = result_cb()
+            except exceptions.Error as error:
+                handle_error(error)
+                raise
+            TRACE.debug("read_repeat32:%06d }", num)
+            return resp
+
+        if now:
+            return read_repeat32_cb()
+        else:
+            return read_repeat32_cb
 
     @locked
     def _accelerated_write_memory(self, addr: int, data: int, transfer_size: int=32) -> None:
@@ -1244,14 +1354,19 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
                 csw=self._csw)
 
     @locked
-    def _accelerated_read_memory_block32(self, addr: int, size: int) -> Sequence[int]:
+    def _accelerated_read_memory_block32(self, addr: int, size: int, now: bool = True) \
+            -> Union[Sequence[int], Callable[[], Sequence[int]]]:
         """@brief Read a memory block using the probe's accelerated memory interface.
 
         The current CSW value is passed to the accelerted interface, primarily for STLink.
+
+        Accelerated interfaces don't support deferred block reads, so if _now_ is False the read
+        is still performed immediately and a callable returning the result is provided.
         """
         assert self._accelerated_memory_interface is not None
-        return self._accelerated_memory_interface.read_memory_block32(addr, size,
+        result = self._accelerated_memory_interface.read_memory_block32(addr, size,
                 csw=self._csw)
+        return result if now else (lambda: result)
 
     @locked
     def _accelerated_write_memory_block8(self, addr: int, data: Sequence[int]) -> None:
@@ -564,6 +564,16 @@ class CortexM(CoreTarget, CoreSightCoreComponent): # lgtm[py/multiple-calls-to-i
         data = self.ap.read_memory_block32(addr, size)
         return self.bp_manager.filter_memory_aligned_32(addr, size, data)
 
+    def read_memory_block32_deferred(self, addr: int, size: int) -> Callable[[], Sequence[int]]:
+        """@brief Start reading an aligned block of 32-bit words.
+        @return A callable returning the words.
+        """
+        result = self.ap.read_memory_block32_deferred(addr, size)
+
+        def read_memory_block32_cb() -> Sequence[int]:
+            return self.bp_manager.filter_memory_aligned_32(addr, size, result())
+        return read_memory_block32_cb
+
     def halt(self) -> None:
         """@brief Halt the core
         """
@@ -1107,6 +1117,56 @@ class CortexM(CoreTarget, CoreSightCoreComponent): # lgtm[py/multiple-calls-to-i
         self.flush()
         self.session.notify(Target.Event.POST_RUN, self, Target.RunType.RESUME)
 
+    def write_core_registers_raw_and_resume(self, reg_list, data_list):
+        """@brief Write core registers and resume execution with a single flush.
+
+        This is for agents that handle a request from a halted core, such as semihosting, where the
+        round trips of a register write followed by resume() would dominate. The core must already be
+        halted, as its state is not read first. The register writes, the debug cause clear, and the
+        DHCSR write that resumes the core are queued together and sent with one flush. S_REGRDY is
+        checked afterwards, so a failed register write is reported when the core is already running.
+
+        Only registers that can be written directly are supported; no PSR or CFBP subregisters and no
+        double precision float registers. If a subclass overrides resume(), the registers are written
+        normally and its resume() is called instead.
+
+        @exception @ref pyocd.core.exceptions.CoreRegisterAccessError "CoreRegisterAccessError" Failed to
+            write one or more registers.
+        """
+        if type(self).resume is not CortexM.resume:
+            self.write_core_registers_raw(reg_list, data_list)
+            self.resume()
+            return
+
+        assert len(reg_list) == len(data_list)
+        reg_list = [CortexMCoreRegisterInfo.register_name_to_index(reg) for reg in reg_list]
+        self.check_reg_list(reg_list)
+        for reg in reg_list:
+            info = CortexMCoreRegisterInfo.get(reg)
+            assert not (info.is_double_float_register or info.is_cfbp_subregister or info.is_psr_subregister)
+
+        LOG.debug("resuming core %d", self.core_number)
+        self.session.notify(Target.Event.PRE_RUN, self, Target.RunType.RESUME)
+
+        dhcsr_cb_list = []
+        for reg, data in zip(reg_list, data_list):
+            self.write_memory(CortexM.DCRDR, data & 0xffffffff)
+            self.write_memory(CortexM.DCRSR, reg | CortexM.DCRSR_REGWnR)
+            dhcsr_cb_list.append(self.read32(CortexM.DHCSR, now=False))
+
+        self._run_token += 1
+        self.clear_debug_cause_bits()
+        self.write_memory(CortexM.DHCSR, CortexM.DBGKEY | CortexM.C_DEBUGEN)
+        self.flush()
+        self.session.notify(Target.Event.POST_RUN, self, Target.RunType.RESUME)
+
+        fail_list = [reg for reg, dhcsr_cb in zip(reg_list, dhcsr_cb_list)
+                if (dhcsr_cb() & CortexM.S_REGRDY) == 0]
+        if fail_list:
+            raise exceptions.CoreRegisterAccessError("failed to write register{0} {1}".format(
+                    "s" if (len(fail_list) > 1) else "",
+                    ", ".join(CortexMCoreRegisterInfo.get(r).name for r in fail_list)))
+
     def find_breakpoint(self, addr):
         return self.bp_manager.find_breakpoint(addr)
 
@@ -33,6 +33,7 @@ from ..utility.timeout import Timeout
 
 if TYPE_CHECKING:
     from .ap import (APAddressBase, AccessPort)
+    from .discovery_cache import CoreSightDiscoveryCache
     from ..core.session import Session
     from ..utility.notification import Notification
 
@@ -313,6 +314,7 @@ class DebugPort(DelegateHavingMixIn):
         self.valid_aps: Optional[List["APAddressBase"]] = None
         self.dpidr = DPIDR(0, 0, 0, 0, 0)
         self.aps: Dict["APAddressBase", "AccessPort"] = {}
+        self.discovery_cache: Optional["CoreSightDiscoveryCache"] = None
         self._access_number: int = 0
         self._cached_dp_select: Optional[int] = None
         self._protocol: Optional[DebugProbe.Protocol] = None
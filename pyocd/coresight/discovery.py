@@ -17,8 +17,9 @@
 import logging
 
 from ..core import exceptions
-from .ap import (APv1Address, APv2Address, AccessPort)
+from .ap import (APSEL_SHIFT, AP_IDR, APv1Address, APv2Address, AccessPort)
 from .dap import (ADIVersion, APAccessMemoryInterface)
+from .discovery_cache import CoreSightDiscoveryCache
 from .rom_table import (CoreSightComponentID, ROMTable)
 from . import (cortex_m, cortex_m_v8m)
 from ..utility.sequencer import CallSequence
@@ -79,15 +80,20 @@ class ADIv5Discovery(CoreSightDiscovery):
     Component discovery for ADIv5 proceeds as follows. Each of the steps is labeled with the name
     of the init task for that step.
 
-    1. `find_aps`: Perform an AP scan. Probe each AP at APSEL=0..255. By default the scan stops on
+    1. `load_cache`: If the `cache.coresight_discovery` option is enabled, load the discovery cache
+        for the connected board and attach it to the DP.
+    2. `find_aps`: Perform an AP scan. Probe each AP at APSEL=0..255. By default the scan stops on
         the first invalid APSEL, as determined by testing the IDR value (0 is invalid). This can be
-        overridden by a session option.
-    2. `create_aps`: Create all APs and add them to the DP.
-    3. `find_components`: For each AP, read the associated ROM table(s) and identify CoreSight
-        components.
-    4. `create_cores`: Create any discovered core (CPU) components. The cores are created first to
+        overridden by a session option. If the discovery cache has an AP list whose IDRs match the
+        target, the scan is skipped.
+    3. `create_aps`: Create all APs and add them to the DP.
+    4. `find_components`: For each AP, read the associated ROM table(s) and identify CoreSight
+        components. ROM table and component ID reads are served from the discovery cache once the
+        AP's root ROM table has been verified against it.
+    5. `create_cores`: Create any discovered core (CPU) components. The cores are created first to
         ensure that other components have a core to which they may be connected.
-    5. `create_components`: Create remaining discovered components.
+    6. `create_components`: Create remaining discovered components.
+    7. `save_cache`: Write the discovery cache if anything was read from the target.
     """
 
     ## APSEL is 8-bit, thus there are a maximum of 256 APs.
@@ -95,13 +101,26 @@ class ADIv5Discovery(CoreSightDiscovery):
 
     def discover(self):
         return CallSequence(
+            ('load_cache',          self._load_cache),
             ('find_aps',            self._find_aps),
             ('create_aps',          self._create_aps),
             ('find_components',     self._find_components),
             ('create_cores',        self._create_cores),
             ('create_components',   self._create_components),
+            ('save_cache',          self._save_cache),
             )
 
+    def _load_cache(self):
+        """@brief Init task to attach the discovery cache to the DP, if enabled."""
+        self.dp.discovery_cache = CoreSightDiscoveryCache.for_dp(self.dp)
+
+    def _save_cache(self):
+        """@brief Init task to record the discovered APs and write the discovery cache."""
+        cache = self.dp.discovery_cache
+        if cache is not None:
+            cache.set_aps(list(self.dp.aps.values()))
+            cache.save()
+
     def _find_aps(self):
         """@brief Find valid APs using the ADIv5 method.
 
@@ -109,6 +128,10 @@ class ADIv5Discovery(CoreSightDiscovery):
         0 for the AP's IDR twice in succession. If the `scan_all_aps` session option is set to True,
         then the scan will instead probe every APSEL from 0-255.
 
+        The IDRs are read in batches using deferred reads. Each batch extends only to the earliest
+        APSEL at which the scan could stop, so exactly the same APs are accessed as when probing
+        one at a time.
+
         If there is already a list of valid APs defined for the @ref pyocd.coresight.dap.DebugPort
         DebugPort (the `valid_aps` attribute), then scanning is not performed. This is to allow a
         predetermined list of valid APSELs to be used in place of a scan. A few MCUs will lock up
@@ -120,27 +143,69 @@ class ADIv5Discovery(CoreSightDiscovery):
         if self.dp.valid_aps is not None:
             return
 
+        # Use the cached AP list if all the cached APs are still present.
+        cache = self.dp.discovery_cache
+        if cache is not None:
+            cached_aps = cache.validate_aps(self.dp)
+            if cached_aps is not None:
+                LOG.debug("Using cached AP list")
+                self.dp.valid_aps = cached_aps
+                return
+
+        scan_all = self.session.options.get('scan_all_aps')
+        max_invalid_count = self.session.options.get('adi.v5.max_invalid_ap_count')
         ap_list = []
         apsel = 0
         invalid_count = 0
-        while apsel < self.MAX_APSEL:
-            try:
-                isValid = AccessPort.probe(self.dp, apsel)
-                if isValid:
-                    ap_list.append(apsel)
+        done = False
+        while not done and apsel < self.MAX_APSEL:
+            # Every APSEL up to the earliest point at which the scan could stop will be probed, so
+            # read the IDRs for all of them at once.
+            if scan_all:
+                batch_count = self.MAX_APSEL - apsel
+            else:
+                batch_count = max(1, max_invalid_count - invalid_count)
+            apsels = range(apsel, min(apsel + batch_count, self.MAX_APSEL))
+
+            for ap_num, is_valid in self._probe_aps(apsels):
+                if is_valid:
+                    ap_list.append(ap_num)
                     invalid_count = 0
-                elif not self.session.options.get('scan_all_aps'):
+                elif (is_valid is not None) and not scan_all:
                     invalid_count += 1
-                    if invalid_count == self.session.options.get('adi.v5.max_invalid_ap_count'):
+                    if invalid_count == max_invalid_count:
+                        done = True
                         break
-            except exceptions.Error as e:
-                LOG.error("Error probing AP#%d: %s", apsel, e,
-                    exc_info=self.session.log_tracebacks)
-            apsel += 1
+            apsel += len(apsels)
 
         # Update the AP list once we know it's complete.
         self.dp.valid_aps = ap_list
 
+    def _probe_aps(self, apsels):
+        """@brief Probe a range of APSELs using pipelined reads.
+
+        The IDR reads for all APSELs are queued before any result is examined. If one of the reads
+        fails, the remaining APSELs are probed individually.
+
+        @return List of (apsel, is_valid) tuples. _is_valid_ is None for APSELs that couldn't be
+            probed.
+        """
+        results = []
+        try:
+            reads = [(apsel, self.dp.read_ap((apsel << APSEL_SHIFT) | AP_IDR, now=False)) for apsel in apsels]
+            for apsel, read_cb in reads:
+                results.append((apsel, read_cb() != 0))
+        except exceptions.Error as e:
+            LOG.debug("Error during pipelined AP scan: %s", e)
+            for apsel in apsels[len(results):]:
+                try:
+                    results.append((apsel, AccessPort.probe(self.dp, apsel)))
+                except exceptions.Error as e:
+                    LOG.error("Error probing AP#%d: %s", apsel, e,
+                        exc_info=self.session.log_tracebacks)
+                    results.append((apsel, None))
+        return results
+
     def _create_aps(self):
         """@brief Init task that returns a call sequence to create APs.
 
@@ -171,10 +236,26 @@ class ADIv5Discovery(CoreSightDiscovery):
         seq = CallSequence()
         for ap in [x for x in self.dp.aps.values() if x.has_rom_table]:
             seq.append(
-                ('init_ap.{}'.format(ap.address.apsel), ap.find_components)
+                ('init_ap.{}'.format(ap.address.apsel), lambda ap=ap: self._find_ap_components(ap))
                 )
         return seq
 
+    def _find_ap_components(self, ap):
+        """@brief Init task to verify the discovery cache against an AP's ROM table and find its components.
+
+        The cache only serves reads through APs that were validated here, so a disabled AP is never
+        given cached components.
+        """
+        cache = self.dp.discovery_cache
+        if cache is not None and cache.is_valid and ap.is_enabled:
+            try:
+                cache.validate_rom_table(ap)
+            except exceptions.Error as e:
+                LOG.debug("Error validating cached ROM table for %s: %s", ap.short_description, e,
+                    exc_info=self.session.log_tracebacks)
+                cache.invalidate()
+        ap.find_components()
+
 class ADIv6Discovery(CoreSightDiscovery):
     """@brief Component discovery process for ADIv6.
 
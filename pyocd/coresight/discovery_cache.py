@@ -0,0 +1,220 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import (Dict, List, Optional, Sequence, Set, TYPE_CHECKING)
+
+from ..core import exceptions
+from .dap import DP_TARGETID
+from ..cache.persistent import (
+    PersistentCacheFile,
+    cache_file_name,
+    get_persistent_cache_dir,
+    get_target_cache_key,
+)
+
+if TYPE_CHECKING:
+    from .ap import (AccessPort, APAddressBase)
+    from .dap import DebugPort
+
+LOG = logging.getLogger(__name__)
+
+class CoreSightDiscoveryCache:
+    """@brief Persistent record of the CoreSight topology of a board.
+
+    The cache holds the IDR and ROM table base of each AP found by the AP scan, plus the result of
+    every block read made while walking ROM tables and reading component ID registers. One cache
+    file is kept per board, identified by the probe's unique ID, the target type, and the DP's
+    DPIDR and TARGETID. Contents written by a different pyOCD version are ignored.
+
+    The cached topology is validated against the target before it is used. The AP IDRs are read
+    and compared in one batch of deferred reads instead of an AP scan, and for each AP with a ROM
+    table, the AP's BASE register and the root ROM table's ID registers are compared. On any
+    mismatch the cache is discarded and discovery proceeds over the wire as usual, refilling the
+    cache. Cached reads are only served for APs whose root ROM table was validated, so reads through
+    an AP that could not be checked, for instance because it is disabled, go to the target.
+
+    Only the reads used to identify components are cached. Power domain requests and component
+    initialisation still access the target.
+    """
+
+    ## Version of the cache file contents.
+    VERSION = 1
+
+    def __init__(self, file: PersistentCacheFile, version: str) -> None:
+        """@brief Constructor.
+        @param self
+        @param file The cache file.
+        @param version pyOCD version string. Cached data from other versions is ignored.
+        """
+        self._file = file
+        self._version = version
+        self._aps: Dict[str, Dict[str, int]] = {}
+        self._blocks: Dict[str, List[int]] = {}
+        self._validated_aps: Set[str] = set()
+        self._is_dirty = False
+        self._is_valid = False
+
+        data = file.load()
+        if data.get('pyocd_version') == version:
+            aps = data.get('aps')
+            blocks = data.get('blocks')
+            if isinstance(aps, dict) and isinstance(blocks, dict) \
+                    and all(isinstance(ap_data, dict) for ap_data in aps.values()):
+                self._aps = aps
+                self._blocks = blocks
+                self._is_valid = bool(aps)
+
+    @classmethod
+    def for_dp(cls, dp: "DebugPort") -> Optional["CoreSightDiscoveryCache"]:
+        """@brief Get the discovery cache for the board connected through a DP.
+        @return A CoreSightDiscoveryCache instance, or None if the `cache.coresight_discovery`
+            option is disabled or the board can't be uniquely identified.
+        """
+        session = dp.session
+        if not session.options.get('cache.coresight_discovery'):
+            return None
+        key = get_target_cache_key(session)
+        if key is None:
+            LOG.debug("CoreSight discovery cache disabled: board has no unique ID")
+            return None
+
+        targetid = 0
+        if dp.dpidr.version >= 2:
+            try:
+                targetid = dp.read_dp(DP_TARGETID)
+            except exceptions.TransferError:
+                LOG.debug("failed to read TARGETID", exc_info=session.log_tracebacks)
+        key = f"{key}_{dp.dpidr.idr:08x}_{targetid:08x}"
+
+        from .. import __version__
+        path = get_persistent_cache_dir(session) / "coresight" / cache_file_name(key)
+        return cls(PersistentCacheFile(path, cls.VERSION), __version__)
+
+    @property
+    def is_valid(self) -> bool:
+        """@brief Whether the cache holds a topology that has not failed validation."""
+        return self._is_valid
+
+    @staticmethod
+    def _ap_key(ap_address: "APAddressBase") -> str:
+        return f"{ap_address.nominal_address:#x}"
+
+    @classmethod
+    def _block_key(cls, ap: "AccessPort", addr: int, count: int) -> str:
+        return f"{cls._ap_key(ap.address)}:{addr:#x}:{count}"
+
+    def invalidate(self) -> None:
+        """@brief Discard the cached topology.
+
+        Cached reads are no longer used. Reads made from now on are recorded so the cache can be
+        rebuilt.
+        """
+        if self._is_valid:
+            LOG.info("CoreSight discovery cache is out of date; rediscovering")
+        self._is_valid = False
+        self._aps = {}
+        self._blocks = {}
+        self._validated_aps = set()
+        self._is_dirty = True
+
+    def validate_aps(self, dp: "DebugPort") -> Optional[List[int]]:
+        """@brief Check the cached AP list against the target.
+
+        The IDR of every cached AP is read with deferred reads, so a pipelining probe needs only a
+        single round trip.
+
+        @return List of valid APSELs if the cached APs match, otherwise None. The cache is
+            invalidated on a mismatch.
+        """
+        if not self._is_valid:
+            return None
+        from .ap import (APSEL_SHIFT, AP_IDR)
+        try:
+            apsels = sorted(int(key, 16) for key in self._aps)
+            reads = [(apsel, dp.read_ap((apsel << APSEL_SHIFT) | AP_IDR, now=False)) for apsel in apsels]
+            for apsel, read_cb in reads:
+                if read_cb() != self._aps[f"{apsel:#x}"].get('idr'):
+                    LOG.debug("AP#%d IDR differs from cached value", apsel)
+                    self.invalidate()
+                    return None
+        except (exceptions.TransferError, ValueError) as err:
+            LOG.debug("failed to validate cached APs: %s", err)
+            self.invalidate()
+            return None
+        return apsels
+
+    def set_aps(self, aps: Sequence["AccessPort"]) -> None:
+        """@brief Record the IDRs and ROM table base addresses of discovered APs."""
+        aps_data = {self._ap_key(ap.address): {'idr': ap.idr, 'rom_addr': ap.rom_addr} for ap in aps}
+        if aps_data != self._aps:
+            self._aps = aps_data
+            self._is_dirty = True
+
+    def validate_rom_table(self, ap: "AccessPort") -> bool:
+        """@brief Check an AP's root ROM table against the cache.
+
+        The AP's BASE register was read when the AP was created. The root ROM table's ID registers
+        are read from the target and compared with the cached values.
+
+        Cached reads through the AP are only used after it has been validated.
+
+        @return Whether the cache is still valid. The cache is invalidated on a mismatch.
+        """
+        if not self._is_valid:
+            return False
+        from .rom_table import CoreSightComponentID
+        addr = ap.rom_addr + CoreSightComponentID.IDR_READ_START
+        count = CoreSightComponentID.IDR_READ_COUNT
+        cached_ap = self._aps.get(self._ap_key(ap.address), {})
+        cached_ids = self._blocks.get(self._block_key(ap, addr, count))
+        try:
+            ok = (cached_ap.get('rom_addr') == ap.rom_addr) and (cached_ids is not None) \
+                    and (list(ap.read_memory_block32(addr, count)) == cached_ids)
+        except exceptions.TransferError:
+            ok = False
+        if ok:
+            self._validated_aps.add(self._ap_key(ap.address))
+        else:
+            LOG.debug("%s ROM table differs from cached value", ap.short_description)
+            self.invalidate()
+        return ok
+
+    def lookup_block32(self, ap: "AccessPort", addr: int, count: int) -> Optional[Sequence[int]]:
+        """@brief Return the cached result of a block read through an AP.
+        @return List of words, or None if the cache is not valid, the AP's ROM table has not been
+            validated, or the cache has no entry for the read.
+        """
+        if not (self._is_valid and (self._ap_key(ap.address) in self._validated_aps)):
+            return None
+        return self._blocks.get(self._block_key(ap, addr, count))
+
+    def record_block32(self, ap: "AccessPort", addr: int, count: int, data: Sequence[int]) -> None:
+        """@brief Record the result of a block read made from the target."""
+        self._blocks[self._block_key(ap, addr, count)] = list(data)
+        self._is_dirty = True
+
+    def save(self) -> None:
+        """@brief Write the cache file if anything changed."""
+        if not self._is_dirty:
+            return
+        self._file.save({
+            'pyocd_version': self._version,
+            'aps': self._aps,
+            'blocks': self._blocks,
+            })
+        self._is_dirty = False
+        self._is_valid = bool(self._aps)
@@ -192,6 +192,52 @@ class DWT(CoreSightComponent):
     def cycle_count(self, value):
         self.ap.write32(self.address + self.DWT_CYCCNT, value)
 
+    ## Cycles per POSTCNT tick, indexed by the DWT_CTRL.CYCTAP value.
+    PC_SAMPLE_TAP_CYCLES = (64, 1024)
+
+    def enable_pc_sampling(self, interval, exception_trace=False):
+        """@brief Start periodic PC sample packet generation.
+
+        The sample interval is set by the CYCTAP and POSTPRESET fields of DWT_CTRL, so only
+        multiples of 64 cycles from 64 to 1024, and multiples of 1024 cycles up to 16384, are
+        available. The closest supported interval is used. The cycle counter is enabled, as it
+        drives the sampling. The ITM must have DWT packet forwarding enabled for the packets to
+        reach the trace output.
+
+        @param self
+        @param interval Requested sample interval in processor cycles.
+        @param exception_trace Whether to also enable exception trace packets.
+        @return The actual sample interval in cycles.
+        """
+        if self.dwt_configured is False:
+            self.init()
+
+        cyctap = 0 if (interval <= 16 * self.PC_SAMPLE_TAP_CYCLES[0]) else 1
+        tap_cycles = self.PC_SAMPLE_TAP_CYCLES[cyctap]
+        reload = min(15, max(0, round(interval / tap_cycles) - 1))
+
+        # The POST counter fields must only be changed while PC sampling is disabled.
+        ctrl = self.ap.read32(self.address + self.DWT_CTRL)
+        ctrl &= ~(self.DWT_CTRL_PCSAMPLENA_MASK | self.DWT_CTRL_EXCTRCENA_MASK | self.DWT_CTRL_CYCTAP_MASK
+                | self.DWT_CTRL_POSTINIT_MASK | self.DWT_CTRL_POSTRESET_MASK)
+        ctrl |= ((reload << self.DWT_CTRL_POSTINIT_SHIFT)
+                | (reload << self.DWT_CTRL_POSTRESET_SHIFT)
+                | (self.DWT_CTRL_CYCTAP_MASK if cyctap else 0)
+                | self.DWT_CTRL_CYCCNTENA_MASK)
+        self.ap.write32(self.address + self.DWT_CTRL, ctrl)
+
+        ctrl |= self.DWT_CTRL_PCSAMPLENA_MASK
+        if exception_trace:
+            ctrl |= self.DWT_CTRL_EXCTRCENA_MASK
+        self.ap.write32(self.address + self.DWT_CTRL, ctrl)
+        return (reload + 1) * tap_cycles
+
+    def disable_pc_sampling(self):
+        """@brief Stop periodic PC sample and exception trace packet generation."""
+        ctrl = self.ap.read32(self.address + self.DWT_CTRL)
+        ctrl &= ~(self.DWT_CTRL_PCSAMPLENA_MASK | self.DWT_CTRL_EXCTRCENA_MASK)
+        self.ap.write32(self.address + self.DWT_CTRL, ctrl)
+
 class DWTv2(DWT):
     """@brief Data Watchpoint and Trace version 2.x
 
@@ -17,9 +17,11 @@
 # limitations under the License.
 
 import logging
+from itertools import takewhile
 from time import sleep
 
 from ..core import exceptions
+from .ap import MEM_AP
 from .component import CoreSightComponent
 from .gpr import GPR
 from .component_ids import (COMPONENT_MAP, VENDOR_NAMES_MAP)
@@ -29,6 +31,34 @@ from ..utility.timeout import Timeout
 
 LOG = logging.getLogger(__name__)
 
+def _read_id_block32(ap, addr, count, now=True):
+    """@brief Block read used for discovery.
+
+    Reads go through the DP's discovery cache if there is one. If _now_ is False, a callable
+    returning the data is returned. The read is only actually deferred if the memory interface is
+    a MEM-AP; other memory interfaces are read immediately.
+    """
+    cache = getattr(getattr(ap, 'dp', None), 'discovery_cache', None)
+    if cache is not None:
+        data = cache.lookup_block32(ap, addr, count)
+        if data is not None:
+            return data if now else (lambda: data)
+
+    if now or not isinstance(ap, MEM_AP):
+        data = ap.read_memory_block32(addr, count)
+        if cache is not None:
+            cache.record_block32(ap, addr, count, data)
+        return data if now else (lambda: data)
+
+    result_cb = ap.read_memory_block32(addr, count, now=False)
+
+    def read_id_block32_cb():
+        data = result_cb()
+        if cache is not None:
+            cache.record_block32(ap, addr, count, data)
+        return data
+    return read_id_block32_cb
+
 class CoreSightComponentID(object):
     """@brief Reads and parses CoreSight architectural component ID registers.
 
@@ -117,11 +147,55 @@ class CoreSightComponentID(object):
         self.product_name = None
         self.factory = None
         self.valid = False
+        self._prefetched_regs = None
+        self._prefetched_coresight_regs = None
+
+    @classmethod
+    def prefetch_id_registers(cls, cmpids):
+        """@brief Read the ID registers of several components using pipelined reads.
+
+        The ID register block reads for all the components are queued before any result is
+        examined, followed by the DEVARCH/DEVID block reads for those that are CoreSight class. A
+        probe that supports deferred transfers thus needs only two round trips for the whole list.
+        The values are used by read_id_registers().
+
+        If a read fails, the remaining components are left to read their own ID registers, so the
+        error is reported as usual when read_id_registers() is called.
+        """
+        try:
+            reads = [(c, _read_id_block32(c.ap, c.top_address + cls.IDR_READ_START, cls.IDR_READ_COUNT, now=False))
+                        for c in cmpids]
+            for cmpid, read_cb in reads:
+                cmpid._prefetched_regs = read_cb()
+
+            reads = [(c, _read_id_block32(c.ap, c.top_address + cls.CORESIGHT_IDR_READ_START,
+                            cls.CORESIGHT_IDR_READ_COUNT, now=False))
+                        for c in cmpids
+                        if cls._get_component_class(c._prefetched_regs) == cls.CORESIGHT_CLASS]
+            for cmpid, read_cb in reads:
+                cmpid._prefetched_coresight_regs = read_cb()
+        except exceptions.TransferError as err:
+            LOG.debug("Error prefetching component ID registers: %s", err)
+
+    @classmethod
+    def _get_component_class(cls, regs):
+        """@brief Return the component class from ID registers, or None if CIDR is invalid."""
+        cidr = cls._extract_id_register_value(regs, cls.CIDR0_OFFSET)
+        if (cidr & cls.CIDR_PREAMBLE_MASK) != cls.CIDR_PREAMBLE_VALUE:
+            return None
+        return (cidr & cls.CIDR_COMPONENT_CLASS_MASK) >> cls.CIDR_COMPONENT_CLASS_SHIFT
 
     def read_id_registers(self):
-        """@brief Read Component ID, Peripheral ID, and DEVID/DEVARCH registers."""
+        """@brief Read Component ID, Peripheral ID, and DEVID/DEVARCH registers.
+
+        Registers read previously by prefetch_id_registers() are used if available.
+        """
+        regs, self._prefetched_regs = self._prefetched_regs, None
+        coresight_regs, self._prefetched_coresight_regs = self._prefetched_coresight_regs, None
+
         # Read registers as a single block read for performance reasons.
-        regs = self.ap.read_memory_block32(self.top_address + self.IDR_READ_START, self.IDR_READ_COUNT)
+        if regs is None:
+            regs = _read_id_block32(self.ap, self.top_address + self.IDR_READ_START, self.IDR_READ_COUNT)
         self.cidr = self._extract_id_register_value(regs, self.CIDR0_OFFSET)
         self.pidr = (self._extract_id_register_value(regs, self.PIDR4_OFFSET) << 32) \
                     | self._extract_id_register_value(regs, self.PIDR0_OFFSET)
@@ -147,8 +221,9 @@ class CoreSightComponentID(object):
             # Class 0x1 ROM table.
             self.is_rom_table = True
         elif self.component_class == self.CORESIGHT_CLASS:
-             coresight_regs = self.ap.read_memory_block32(
-                 self.top_address + self.CORESIGHT_IDR_READ_START, self.CORESIGHT_IDR_READ_COUNT)
+             if coresight_regs is None:
+                 coresight_regs = _read_id_block32(self.ap,
+                     self.top_address + self.CORESIGHT_IDR_READ_START, self.CORESIGHT_IDR_READ_COUNT)
 
             # For CoreSight-class components, extract additional fields.
              self.devarch = coresight_regs[self.DEVARCH_OFFSET]
@@ -182,7 +257,8 @@ class CoreSightComponentID(object):
 
         self.valid = True
 
-    def _extract_id_register_value(self, regs, offset):
+    @staticmethod
+    def _extract_id_register_value(regs, offset):
         result = 0
         for i in range(4):
             value = regs[offset + i]
@@ -269,6 +345,7 @@ class ROMTable(CoreSightComponent):
             parent_table.add_child(self)
         self._depth = (self.parent.depth + 1) if self.parent else 0
         self._components = []
+        self._prefetched_components = {}
         self.name = 'ROM'
         self.gpr = None
 
@@ -310,6 +387,43 @@ class ROMTable(CoreSightComponent):
     def _read_table(self):
         raise NotImplementedError()
 
+    def _get_component_address(self, entry):
+        """@brief Compute the base address of the component referenced by a table entry."""
+        raise NotImplementedError()
+
+    def _can_prefetch_entry(self, entry):
+        """@brief Whether the referenced component's ID registers can be read ahead of time.
+
+        The entry must be present and must not have a power domain ID, since the power domain may
+        have to be enabled before the component can be accessed.
+        """
+        raise NotImplementedError()
+
+    def _prefetch_components(self, entries):
+        """@brief Read the ID registers of all components referenced by a batch of table entries.
+
+        The reads are pipelined by CoreSightComponentID.prefetch_id_registers(). The resulting
+        component ID objects are used by _handle_table_entry().
+
+        @param self
+        @param entries Sequence of table entries. Must not contain the end of table marker or any
+            entries following it.
+        """
+        cmpids = [CoreSightComponentID(self, self.ap, self._get_component_address(entry))
+                    for entry in entries
+                    if self._can_prefetch_entry(entry)]
+        if len(cmpids) > 1:
+            CoreSightComponentID.prefetch_id_registers(cmpids)
+        self._prefetched_components = {c.top_address: c for c in cmpids}
+
+    def _get_component_id(self, address, powerid):
+        """@brief Return the component ID object for a component, with ID registers read."""
+        cmpid = self._prefetched_components.pop(address, None)
+        if cmpid is None:
+            cmpid = CoreSightComponentID(self, self.ap, address, powerid)
+        cmpid.read_id_registers()
+        return cmpid
+
     def for_each(self, action, filter=None):
         """@brief Apply an action to every component defined in the ROM table and child tables.
 
@@ -373,9 +487,12 @@ class Class1ROMTable(ROMTable):
         while not foundEnd and entriesRead < self.ROM_TABLE_MAX_ENTRIES:
             # Read several entries at a time for performance.
             readCount = min(self.ROM_TABLE_MAX_ENTRIES - entriesRead, self.ROM_TABLE_ENTRY_READ_COUNT)
-            entries = self.ap.read_memory_block32(entryAddress, readCount)
+            entries = _read_id_block32(self.ap, entryAddress, readCount)
             entriesRead += readCount
 
+            # Read the ID registers of the components in this batch of entries together.
+            self._prefetch_components(list(takewhile(lambda e: e != 0, entries)))
+
             for entry in entries:
                 # Zero entry indicates the end of the table.
                 if entry == 0:
@@ -391,6 +508,21 @@ class Class1ROMTable(ROMTable):
                 entryAddress += 4
                 entryNumber += 1
 
+    def _get_component_address(self, entry):
+        offset = entry & self.ROM_TABLE_ADDR_OFFSET_MASK
+        if (entry & self.ROM_TABLE_ADDR_OFFSET_NEG_MASK) != 0:
+            offset = ~bit_invert(offset)
+        address = self.address + offset
+        # Handle address going negative, since python doesn't have unsigned ints.
+        if address < 0:
+            address = 0x100000000 + address
+        return address
+
+    def _can_prefetch_entry(self, entry):
+        return ((entry & self.ROM_TABLE_ENTRY_PRESENT_MASK) != 0
+                and (entry & self.ROM_TABLE_32BIT_FORMAT_MASK) != 0
+                and (entry & self.ROM_TABLE_POWERIDVALID_MASK) == 0)
+
     def _power_component(self, number, powerid, entry):
         if self.gpr is None:
             LOG.warning("ROM table entry #%d specifies power ID #%d, but no power requestor "
@@ -417,13 +549,7 @@ class Class1ROMTable(ROMTable):
             return
 
         # Get the component's top 4k address.
-        offset = entry & self.ROM_TABLE_ADDR_OFFSET_MASK
-        if (entry & self.ROM_TABLE_ADDR_OFFSET_NEG_MASK) != 0:
-            offset = ~bit_invert(offset)
-        address = self.address + offset
-        # Handle address going negative, since python doesn't have unsigned ints.
-        if address < 0:
-            address = 0x100000000 + address
+        address = self._get_component_address(entry)
 
         # Check power ID.
         if (entry & self.ROM_TABLE_POWERIDVALID_MASK) != 0:
@@ -436,8 +562,7 @@ class Class1ROMTable(ROMTable):
             powerid = None
 
         # Create component instance.
-        cmpid = CoreSightComponentID(self, self.ap, address, powerid)
-        cmpid.read_id_registers()
+        cmpid = self._get_component_id(address, powerid)
 
         # Is this component a power requestor?
         if cmpid.factory == GPR.factory:
@@ -560,13 +685,18 @@ class Class9ROMTable(ROMTable):
         while not foundEnd and entriesRead < actualMaxEntries:
             # Read several entries at a time for performance.
             readCount = min(actualMaxEntries - entriesRead, entryReadCount)
-            entries = self.ap.read_memory_block32(entryAddress, readCount)
+            entries = _read_id_block32(self.ap, entryAddress, readCount)
             entriesRead += readCount
 
             # For 64-bit entries, combine pairs of 32-bit values into single 64-bit value.
             if self._width == 64:
                 entries = [(lo | (hi << 32)) for lo, hi in pairwise(entries)]
 
+            # Read the ID registers of the components in this batch of entries together.
+            self._prefetch_components(list(takewhile(
+                lambda e: (e & self.ROM_TABLE_ENTRY_PRESENT_MASK) != self.ROM_TABLE_ENTRY_NOT_PRESENT_FINAL,
+                entries)))
+
             for entry in entries:
                 present = entry & self.ROM_TABLE_ENTRY_PRESENT_MASK
 
@@ -587,6 +717,20 @@ class Class9ROMTable(ROMTable):
                 entryAddress += 4 * entrySizeMultiplier
                 entryNumber += 1
 
+    def _get_component_address(self, entry):
+        offset = entry & self.ROM_TABLE_ADDR_OFFSET_MASK[self._width]
+        if (entry & self.ROM_TABLE_ADDR_OFFSET_NEG_MASK[self._width]) != 0:
+            offset = ~bit_invert(offset, width=self._width)
+        address = self.address + offset
+        # Handle address going negative, since python doesn't have unsigned ints.
+        if address < 0:
+            address = (1 << self._width) + address
+        return address
+
+    def _can_prefetch_entry(self, entry):
+        return ((entry & self.ROM_TABLE_ENTRY_PRESENT_MASK) == self.ROM_TABLE_ENTRY_PRESENT
+                and (entry & self.ROM_TABLE_ENTRY_POWERIDVALID_MASK) == 0)
+
     def _power_component(self, number, powerid, entry):
         """@brief Enable power to a component defined by a ROM table entry."""
         if not self._has_prr:
@@ -610,13 +754,7 @@ class Class9ROMTable(ROMTable):
     def _handle_table_entry(self, entry, number):
         """@brief Parse one ROM table entry."""
         # Get the component's top 4k address.
-        offset = entry & self.ROM_TABLE_ADDR_OFFSET_MASK[self._width]
-        if (entry & self.ROM_TABLE_ADDR_OFFSET_NEG_MASK[self._width]) != 0:
-            offset = ~bit_invert(offset, width=self._width)
-        address = self.address + offset
-        # Handle address going negative, since python doesn't have unsigned ints.
-        if address < 0:
-            address = (1 << self._width) + address
+        address = self._get_component_address(entry)
 
         # Check power ID.
         if (entry & self.ROM_TABLE_ENTRY_POWERIDVALID_MASK) != 0:
@@ -629,8 +767,7 @@ class Class9ROMTable(ROMTable):
             powerid = None
 
         # Create component instance.
-        cmpid = CoreSightComponentID(self, self.ap, address, powerid)
-        cmpid.read_id_registers()
+        cmpid = self._get_component_id(address, powerid)
 
         # Is this component a power requestor?
         if cmpid.factory == GPR.factory:
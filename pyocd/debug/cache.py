@@ -18,16 +18,33 @@
 from .context import DebugContext
 from ..cache.memory import MemoryCache
 from ..cache.register import RegisterCache
+from ..core.target import Target
 
 class CachingDebugContext(DebugContext):
-    """@brief Debug context combining register and memory caches."""
+    """@brief Debug context combining register and memory caches.
 
-    def __init__(self, parent, enable_memory: bool = True, enable_register: bool = True) -> None:
+    If the memory cache is in write-back mode, the context subscribes to the session's PRE_RUN,
+    PRE_RESET, PRE_DISCONNECT and PRE_FLASH_PROGRAM notifications and flushes buffered memory writes
+    to the target when any of them are sent. Other memory accesses that do not go through this
+    context will not see buffered writes, so call flush() before making them.
+    """
+
+    def __init__(self, parent, enable_memory: bool = True, enable_register: bool = True,
+            memory_write_back: bool = False) -> None:
         super().__init__(parent)
         self._enable_memory = enable_memory
         self._enable_register = enable_register
         self._regcache = RegisterCache(parent, self.core) if enable_register else parent
-        self._memcache = MemoryCache(parent, self.core) if enable_memory else parent
+        self._memcache = MemoryCache(parent, self.core, write_back=memory_write_back) \
+                if enable_memory else parent
+
+        if enable_memory and memory_write_back:
+            self.session.subscribe(self._flush_handler,
+                    (Target.Event.PRE_RUN, Target.Event.PRE_RESET, Target.Event.PRE_DISCONNECT,
+                    Target.Event.PRE_FLASH_PROGRAM))
+
+    def _flush_handler(self, notification):
+        self._memcache.flush()
 
     def write_memory(self, addr, value, transfer_size=32):
         return self._memcache.write_memory(addr, value, transfer_size)
@@ -53,6 +70,11 @@ class CachingDebugContext(DebugContext):
     def write_core_registers_raw(self, reg_list, data_list):
         return self._regcache.write_core_registers_raw(reg_list, data_list)
 
+    def flush(self):
+        if self._enable_memory:
+            self._memcache.flush()
+        super().flush()
+
     def invalidate(self):
         if self._enable_register:
             self._regcache.invalidate()
@@ -225,6 +225,11 @@ class ELFBinaryFile(object):
         """
         return self._unused
 
+    @property
+    def has_symbol_table(self) -> bool:
+        """@brief Whether the ELF file has a symbol table, which stripped files lack."""
+        return self._elf.get_section_by_name('.symtab') is not None
+
     @property
     def symbol_decoder(self):
         if self._symbol_decoder is None:
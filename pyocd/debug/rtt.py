@@ -20,13 +20,21 @@
 
 from abc import ABC, abstractmethod
 from ctypes import Structure, c_char, c_int32, c_uint32, sizeof
+import logging
 import struct
-from typing import Optional, Sequence
+from time import monotonic
+from typing import (Callable, Dict, Iterable, List, Optional, Sequence, TYPE_CHECKING)
+
+from elftools.common.exceptions import ELFError
 
 from ..core.memory_map import MemoryMap, MemoryRegion, MemoryType
 from ..core.soc_target import SoCTarget
 from ..core import exceptions
 
+if TYPE_CHECKING:
+    from ..core.session import Session
+
+LOG = logging.getLogger(__name__)
 
 class SEGGER_RTT_BUFFER_UP(Structure):
     """@brief `SEGGER RTT Ring Buffer` target to host."""
@@ -116,6 +124,24 @@ class RTTControlBlock(ABC):
         """
         pass
 
+    def poll_all(self, channels: Optional[Iterable[int]] = None) -> List[bytes]:
+        """@brief Read all available data from multiple up channels.
+
+        The default implementation simply calls read() on each channel. Subclasses may override
+        to read the channels more efficiently.
+
+        @param channels Optional iterable of up channel indices to read. If not provided, all up
+            channels are read.
+        @return List with an element for each up channel. Elements for channels that were not
+            read are empty.
+        """
+        result: List[bytes] = [b''] * len(self.up_channels)
+        if channels is None:
+            channels = range(len(self.up_channels))
+        for i in channels:
+            result[i] = self.up_channels[i].read()
+        return result
+
     @classmethod
     def from_target(cls, target: SoCTarget, address: int = None,
                     size: int = None, control_block_id: bytes = b'SEGGER RTT'):
@@ -190,63 +216,122 @@ class GenericRTTUpChannel(RTTUpChannel):
         self.size = descriptor.SizeOfBuffer
 
     @property
-    def bytes_available(self) -> int:
-        """@brief Number of bytes available to be read from up channel. """
+    def is_populated(self) -> bool:
+        """@brief Whether the channel's buffer descriptor has been filled in by the target.
+
+        If the descriptor was not yet populated, it is read again.
+        """
         if (self.size == 0) or (self._buffer_address == 0):
-            # descriptor is not yet populated
             self._read_descriptor()
             if (self.size == 0) or (self._buffer_address == 0):
-                # descriptor is still not populated
-                return 0
+                return False
+        return True
 
-        # Get offsets
-        write_off, read_off = self.target.read_memory_block32(self._offsets_addr, 2)
+    @property
+    def rd_off_addr(self) -> int:
+        """@brief Address of the RdOff field of the buffer descriptor."""
+        return self._offsets_addr + 4
 
+    def _get_bytes_available(self, write_off: int, read_off: int) -> int:
         if (write_off >= self.size) or (read_off >= self.size):
             raise exceptions.RTTError("Invalid up buffer")
-        elif write_off == self.read_off:
-            return 0
-        elif write_off > read_off:
+        elif write_off >= read_off:
             return write_off - read_off
         else:
             return (self.size - read_off) + write_off
 
-    def read(self) -> bytes:
-        """@brief Read all available data from RTT channel. """
-        if (self.size == 0) or (self._buffer_address == 0):
+    @property
+    def bytes_available(self) -> int:
+        """@brief Number of bytes available to be read from up channel. """
+        if not self.is_populated:
             # descriptor is not yet populated
-            self._read_descriptor()
-            if (self.size == 0) or (self._buffer_address == 0):
-                # descriptor is still not populated
-                return b''
+            return 0
 
         # Get offsets
         write_off, read_off = self._target.read_memory_block32(self._offsets_addr, 2)
+        return self._get_bytes_available(write_off, read_off)
+
+    def _start_read_range(self, addr: int, size: int) -> Callable[[], bytes]:
+        """@brief Start reading bytes from the ring buffer.
+
+        The range is widened to word alignment and queued as a deferred block read of words. If
+        widening would read outside of the ring buffer, because the buffer itself is not word
+        aligned, the bytes are read immediately with read_memory_block8() instead.
 
+        @return A callable returning the data.
+        """
+        start = addr & ~0x3
+        end = (addr + size + 3) & ~0x3
+        if (start < self._buffer_address) or (end > self._buffer_address + self.size):
+            data = bytes(self._target.read_memory_block8(addr, size))
+            return lambda: data
+
+        result = self._target.read_memory_block32_deferred(start, (end - start) // 4)
+        offset = addr - start
+
+        def read_range_cb() -> bytes:
+            words = result()
+            return struct.pack(f"<{len(words)}I", *words)[offset:offset + size]
+        return read_range_cb
+
+    def start_read_data(self, write_off: int, read_off: int) -> Callable[[], bytes]:
+        """@brief Start reading the data between the given offsets without updating RdOff.
+
+        The reads are queued with the probe where possible, so the reads of several channels can
+        be completed together.
+
+        @param write_off Value of the WrOff field of the buffer descriptor.
+        @param read_off Value of the RdOff field of the buffer descriptor.
+        @return A callable returning the data from the ring buffer, which is empty if the offsets
+            are equal.
+        @exception RTTError Either offset is outside of the buffer.
+        """
         if (write_off >= self.size) or (read_off >= self.size):
             raise exceptions.RTTError("Invalid up buffer")
         elif write_off == read_off:
             # empty
-            return b''
+            return lambda: b''
         elif write_off > read_off:
             """
             |oooooo|xxxxxxxxxxxx|oooooo|
             0    rdOff        WrOff    SizeOfBuffer
             """
-            data = self._target.read_memory_block8(self._buffer_address + read_off,
-                                                   write_off - read_off)
+            return self._start_read_range(self._buffer_address + read_off, write_off - read_off)
         else:
             """
             |xxxxxx|oooooooooooo|xxxxxx|
             0    WrOff        RdOff    SizeOfBuffer
             """
-            data = self._target.read_memory_block8(self._buffer_address + read_off,
-                                                   self.size - read_off)
-            data += self._target.read_memory_block8(self._buffer_address, write_off)
+            tail_cb = self._start_read_range(self._buffer_address + read_off, self.size - read_off)
+            if not write_off:
+                return tail_cb
+            head_cb = self._start_read_range(self._buffer_address, write_off)
+            return lambda: tail_cb() + head_cb()
+
+    def read_data(self, write_off: int, read_off: int) -> bytes:
+        """@brief Read the data between the given offsets without updating RdOff.
+
+        @param write_off Value of the WrOff field of the buffer descriptor.
+        @param read_off Value of the RdOff field of the buffer descriptor.
+        @return Data from the ring buffer. Empty if the offsets are equal.
+        @exception RTTError Either offset is outside of the buffer.
+        """
+        return self.start_read_data(write_off, read_off)()
+
+    def read(self) -> bytes:
+        """@brief Read all available data from RTT channel. """
+        if not self.is_populated:
+            # descriptor is not yet populated
+            return b''
+
+        # Get offsets
+        write_off, read_off = self._target.read_memory_block32(self._offsets_addr, 2)
+        data = self.read_data(write_off, read_off)
 
         # Update read offset
-        self._target.write32(self._offsets_addr + 4, write_off)
-        return bytes(data)
+        if data:
+            self._target.write32(self.rd_off_addr, write_off)
+        return data
 
 
 class GenericRTTDownChannel(RTTDownChannel):
@@ -312,7 +397,7 @@ class GenericRTTDownChannel(RTTDownChannel):
 
         if (write_off >= self.size) or (read_off >= self.size):
             raise exceptions.RTTError("Invalid down buffer")
-        elif write_off == self.read_off:
+        elif write_off == read_off:
             return self.size
         elif write_off > read_off:
             return (self.size - write_off) + (read_off - 1)
@@ -385,9 +470,13 @@ class GenericRTTControlBlock(RTTControlBlock):
               require any support from interface.
     """
 
+    ## Name of the control block variable in the SEGGER RTT sources.
+    CONTROL_BLOCK_SYMBOL = "_SEGGER_RTT"
+
     target: SoCTarget
     _cb_search_address: int
     _cb_search_size_words: int
+    _cb_search_is_default: bool
     _control_block_id: Sequence[int]
 
     def __init__(self, target: SoCTarget, address: int = None,
@@ -410,10 +499,12 @@ class GenericRTTControlBlock(RTTControlBlock):
             ram_region: MemoryRegion = memory_map.get_default_region_of_type(MemoryType.RAM)
 
             self._cb_search_address = ram_region.start
+            self._cb_search_is_default = True
             if size is None:
                 size = ram_region.length
         else:
             self._cb_search_address = address
+            self._cb_search_is_default = False
 
         if size is None:
             # Address was specified, but size was not. Assume that the control
@@ -425,38 +516,80 @@ class GenericRTTControlBlock(RTTControlBlock):
         extra_id_bytes = SEGGER_RTT_CB.acID.size - len(control_block_id)
         control_block_bytes = control_block_id + b'\0' * extra_id_bytes
         self._control_block_id = struct.unpack("<IIII", control_block_bytes)
+        self._up_base = 0
 
-    def _find_control_block(self) -> Optional[int]:
+    @property
+    def _address_cache(self) -> Dict[bytes, int]:
+        """@brief Session-wide map of control block ID to the address it was last found at."""
+        state = self.target.session.context_state
+        if not hasattr(state, 'rtt_control_block_addresses'):
+            state.rtt_control_block_addresses = {}
+        return state.rtt_control_block_addresses
+
+    def _get_elf_control_block_address(self) -> Optional[int]:
+        """@brief Look up the address of the control block variable in the target's ELF file."""
+        elf = self.target.elf
+        if (elf is None) or not elf.has_symbol_table:
+            return None
+        try:
+            symbol = elf.symbol_decoder.get_symbol_for_name(self.CONTROL_BLOCK_SYMBOL)
+        except (RuntimeError, ELFError) as err:
+            LOG.debug("RTT: failed to look up %s in ELF: %s", self.CONTROL_BLOCK_SYMBOL, err)
+            return None
+        return symbol.address if (symbol is not None) else None
+
+    def _is_valid_candidate(self, addr: int) -> bool:
+        """@brief Check whether a possible control block address holds the control block ID.
+
+        Unless the default search range is being used, the address must also be within the range
+        that was requested.
+        """
+        if addr & 0x3:
+            return False
+        if not self._cb_search_is_default:
+            start = self._cb_search_address & ~0x3
+            if not (start <= addr < start + max(self._cb_search_size_words * 4, 4)):
+                return False
+        try:
+            data = self.target.read_memory_block32(addr, len(self._control_block_id))
+        except exceptions.TransferError:
+            return False
+        return tuple(data) == tuple(self._control_block_id)
+
+    def _search_control_block(self, id_bytes: bytes) -> Optional[int]:
         addr: int = self._cb_search_address & ~0x3
-        search_size: int  = self._cb_search_size_words
-        if search_size < len(self._control_block_id):
-            search_size = len(self._control_block_id)
+        search_size = max(self._cb_search_size_words * 4, len(id_bytes))
 
-        id_len = len(self._control_block_id)
-        offset: int = 0
+        # The control block is word aligned, so skip any unaligned matches.
+        for match in self.target.search_memory(addr, search_size, id_bytes):
+            if (match.address & 0x3) == 0:
+                return match.address
+        return None
 
-        while search_size:
-            read_size = min(search_size, 32)
-            data = self.target.read_memory_block32(addr, read_size)
+    def _find_control_block(self) -> Optional[int]:
+        """@brief Locate the control block.
 
-            if not data:
-                break
+        The address the control block was last found at in this session and the address of the
+        `_SEGGER_RTT` symbol in the target's ELF file are tried first, each with a single read of
+        the control block ID. Only if neither holds the ID is the search range scanned.
+        """
+        id_bytes = struct.pack("<IIII", *self._control_block_id)
+        cache = self._address_cache
 
-            for word in data:
-                if word == self._control_block_id[offset]:
-                    offset += 1
-                    if offset == id_len:
-                        break
-                else:
-                    num_skip_words = (offset + 1)
-                    addr += (num_skip_words * 4)
-                    search_size -= num_skip_words
-                    offset = 0
+        addr = cache.get(id_bytes)
+        if addr is not None and self._is_valid_candidate(addr):
+            LOG.debug("RTT: using control block at previous address 0x%08x", addr)
+            return addr
 
-            if offset == id_len:
-                break
+        addr = self._get_elf_control_block_address()
+        if addr is not None and self._is_valid_candidate(addr):
+            LOG.debug("RTT: using control block at %s symbol address 0x%08x", self.CONTROL_BLOCK_SYMBOL, addr)
+        else:
+            addr = self._search_control_block(id_bytes)
 
-        return addr if offset == id_len else None
+        if addr is not None:
+            cache[id_bytes] = addr
+        return addr
 
     def start(self):
         """@brief Find the RTT control block on the target.
@@ -477,6 +610,7 @@ class GenericRTTControlBlock(RTTControlBlock):
 
         # Setup up channels
         up_base = cb_addr + sizeof(SEGGER_RTT_CB)
+        self._up_base = up_base
         for i in range(num_up_buffs):
             addr = up_base + (i * sizeof(SEGGER_RTT_BUFFER_UP))
             self.up_channels.append(GenericRTTUpChannel(self.target, addr))
@@ -486,3 +620,163 @@ class GenericRTTControlBlock(RTTControlBlock):
         for i in range(num_down_buffs):
             addr = down_base + (i * sizeof(SEGGER_RTT_BUFFER_DOWN))
             self.down_channels.append(GenericRTTDownChannel(self.target, addr))
+
+    def poll_all(self, channels: Optional[Iterable[int]] = None) -> List[bytes]:
+        """@brief Read all available data from multiple up channels.
+
+        The WrOff and RdOff fields of the selected channels are fetched with a single block read
+        covering the up buffer descriptors. The data reads of all non-empty channels are then
+        queued before any of their results are collected, so they complete in one flush. Finally
+        the RdOff updates for all channels are written together and flushed at once, so the
+        transfers are combined into as few probe transactions as possible.
+
+        @param channels Optional iterable of up channel indices to read. If not provided, all up
+            channels are read.
+        @return List with an element for each up channel. Elements for channels that were not
+            read are empty.
+        """
+        result: List[bytes] = [b''] * len(self.up_channels)
+        if channels is None:
+            channels = range(len(self.up_channels))
+        channels = sorted(channels)
+        if not channels:
+            return result
+
+        # Read the descriptors spanning all the selected channels.
+        desc_words = sizeof(SEGGER_RTT_BUFFER_UP) // 4
+        first = channels[0]
+        count = channels[-1] - first + 1
+        words = self.target.read_memory_block32(self._up_base + first * sizeof(SEGGER_RTT_BUFFER_UP),
+                count * desc_words)
+
+        # Start the data reads of all channels before collecting any results.
+        pending = []
+        for i in channels:
+            chan = self.up_channels[i]
+            assert isinstance(chan, GenericRTTUpChannel)
+            if not chan.is_populated:
+                continue
+            base = (i - first) * desc_words
+            descriptor = SEGGER_RTT_BUFFER_UP(*words[base:base + desc_words])
+            read_cb = chan.start_read_data(descriptor.WrOff, descriptor.RdOff)
+            pending.append((i, chan, descriptor.WrOff, read_cb))
+
+        rd_off_updates = []
+        for i, chan, write_off, read_cb in pending:
+            data = read_cb()
+            if data:
+                result[i] = data
+                rd_off_updates.append((chan.rd_off_addr, write_off))
+
+        # Update read offsets.
+        if rd_off_updates:
+            for addr, write_off in rd_off_updates:
+                self.target.write32(addr, write_off)
+            self.target.flush()
+
+        return result
+
+
+class RTTPollScheduler:
+    """@brief Adaptive scheduler for RTT polling.
+
+    Decides how long to wait between polls of the RTT up channels. After each poll, update() is
+    passed the data that was read. The fill ratio of the fullest channel, that is the amount of data
+    read divided by the size of its ring buffer, is used to adjust the interval:
+
+    - If no data was read, the interval is doubled, up to the maximum latency.
+    - If the fill ratio reached #HIGH_WATER_RATIO, the buffer is at risk of overflowing, so the
+      interval drops straight to the minimum poll interval.
+    - Otherwise the interval is scaled so the fill ratio of the next poll should be near
+      #TARGET_FILL_RATIO, but never below the minimum poll interval.
+
+    Optionally, the probe bandwidth spent on polling can be limited. The bytes transferred by each
+    poll are estimated from the descriptor and data sizes, and the interval is lengthened if needed
+    so the average stays within the budget. The maximum latency takes precedence over the bandwidth
+    budget.
+    """
+
+    ## Fill ratio of the fullest up buffer that the scheduler tries to maintain.
+    TARGET_FILL_RATIO = 0.25
+
+    ## Fill ratio at or above which polling immediately switches to the minimum interval.
+    HIGH_WATER_RATIO = 0.75
+
+    ## Estimated number of bytes of probe traffic per polled channel, not including data.
+    CHANNEL_OVERHEAD = sizeof(SEGGER_RTT_BUFFER_UP) + 4
+
+    def __init__(self, min_interval: float = 0.001, max_latency: float = 0.1,
+            max_bandwidth: int = 0) -> None:
+        """@brief Constructor.
+        @param self
+        @param min_interval Shortest interval in seconds between polls.
+        @param max_latency Longest interval in seconds between polls.
+        @param max_bandwidth Maximum average bytes per second of probe traffic to spend on polling.
+            0 means unlimited.
+        """
+        self._min_interval = min_interval
+        self._max_latency = max(max_latency, min_interval)
+        self._max_bandwidth = max_bandwidth
+        self._interval = min_interval
+        self._next_poll = 0.0
+
+    @classmethod
+    def from_session(cls, session: "Session") -> "RTTPollScheduler":
+        """@brief Create a scheduler configured from session options."""
+        return cls(min_interval=session.options.get('rtt.min_poll_interval'),
+                max_latency=session.options.get('rtt.max_latency'),
+                max_bandwidth=session.options.get('rtt.max_bandwidth'))
+
+    @property
+    def interval(self) -> float:
+        """@brief Current interval in seconds between polls."""
+        return self._interval
+
+    @property
+    def time_until_poll(self) -> float:
+        """@brief Seconds until the next poll is due. Zero if a poll is due now."""
+        return max(0.0, self._next_poll - monotonic())
+
+    @property
+    def is_poll_due(self) -> bool:
+        """@brief Whether the next poll is due."""
+        return monotonic() >= self._next_poll
+
+    def reset(self) -> None:
+        """@brief Return to the minimum interval and make a poll due immediately.
+
+        Call this when activity is expected, for instance after the target is resumed or the host
+        sends data on a down channel.
+        """
+        self._interval = self._min_interval
+        self._next_poll = 0.0
+
+    def update(self, channels: Sequence[RTTUpChannel], data: Sequence[bytes]) -> float:
+        """@brief Adjust the poll interval based on the results of a poll.
+
+        @param self
+        @param channels The up channels that were polled.
+        @param data Sequence of data read from each channel, in the same order as _channels_.
+            Empty elements are taken to mean that the channel was empty, or not polled.
+        @return The new poll interval in seconds.
+        """
+        fill = 0.0
+        traffic = 0
+        for chan, chan_data in zip(channels, data):
+            traffic += self.CHANNEL_OVERHEAD + len(chan_data)
+            if chan_data and chan.size:
+                fill = max(fill, len(chan_data) / chan.size)
+
+        if fill == 0.0:
+            interval = self._interval * 2
+        elif fill >= self.HIGH_WATER_RATIO:
+            interval = self._min_interval
+        else:
+            interval = self._interval * self.TARGET_FILL_RATIO / fill
+
+        if self._max_bandwidth:
+            interval = max(interval, traffic / self._max_bandwidth)
+
+        self._interval = min(self._max_latency, max(self._min_interval, interval))
+        self._next_poll = monotonic() + self._interval
+        return self._interval
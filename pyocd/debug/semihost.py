@@ -25,11 +25,13 @@ import time
 import datetime
 import pathlib
 from enum import (Enum, IntEnum)
-from typing import (IO, TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union, cast, overload)
+from typing import (IO, TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple, Union, cast, overload)
 from typing_extensions import Literal
 
 from ..coresight.cortex_m import CortexM
 from ..core import (exceptions, session)
+from ..core.target import Target
+from ..utility.notification import Notification
 
 if TYPE_CHECKING:
     from .context import DebugContext
@@ -84,6 +86,15 @@ STDERR_FD = 2
 # @see SemihostAgent::get_data()
 MAX_STRING_LENGTH = 2048
 
+## Size of the first read of a null-terminated string in a region of the memory map.
+#
+# Each further read of the same string is twice the size of the previous one. Reads never extend past
+# the end of the region containing the string.
+STRING_READ_SIZE = 128
+
+## Size of reads of a null-terminated string at an address not in the memory map.
+UNMAPPED_STRING_READ_SIZE = 32
+
 ## Enumsused for the file ID to indicate a special file was opened.
 class SpecialFile(Enum):
     # ":semihosting-features"
@@ -166,6 +177,16 @@ class SemihostIOHandler:
     def write(self, fd: int, ptr: int, length: int) -> int:
         raise NotImplementedError()
 
+    def write_data(self, fd: int, data: bytes) -> int:
+        """@brief Write data already read from the target.
+
+        Used by BufferedConsoleIOHandler to write buffered console output. Handlers that can't
+        write host data, such as those that pass requests to gdb, don't implement this method.
+
+        @return 0 on success, or the number of bytes not written.
+        """
+        raise NotImplementedError()
+
     def read(self, fd: int, ptr: int, length: int) -> int:
         raise NotImplementedError()
 
@@ -267,7 +288,12 @@ class InternalSemihostIOHandler(SemihostIOHandler):
             return length
 
         assert self.agent
-        data = self.agent.get_data(ptr, length)
+        return self.write_data(fd, self.agent.get_data(ptr, length))
+
+    def write_data(self, fd, data):
+        if not self._is_valid_fd(fd):
+            return len(data)
+
         f = self.open_files[fd]
         try:
             if 'b' in f.mode:
@@ -360,7 +386,9 @@ class ConsoleIOHandler(SemihostIOHandler):
 
     def write(self, fd, ptr, length):
         assert self.agent
-        data = self.agent.get_data(ptr, length)
+        return self.write_data(fd, self.agent.get_data(ptr, length))
+
+    def write_data(self, fd, data):
         self._stdout_file.write(data)
         return 0
 
@@ -386,6 +414,201 @@ class ConsoleIOHandler(SemihostIOHandler):
         else:
             return -1
 
+class BufferedConsoleIOHandler(SemihostIOHandler):
+    """@brief Console I/O handler that buffers output written by the target.
+
+    Output from SYS_WRITEC, SYS_WRITE0, and SYS_WRITE requests for stdout and stderr is kept on the
+    host instead of being written to the wrapped console handler straight away. Buffered output is
+    written when a newline is written, when the buffer reaches its size limit, when the flush
+    interval has passed since the oldest buffered byte was written, or when flush() is called. The
+    agent calls flush() when the target halts for a reason other than a semihosting request.
+
+    Output for stdout and stderr is written in the order the target wrote it. Buffered output is
+    written before each console read, so prompts appear before input is requested.
+
+    The wrapped handler must implement SemihostIOHandler.write_data(). Write errors are logged when
+    the output is flushed rather than returned to the target.
+
+    cleanup() only takes effect once. It cleans up the wrapped handler too, unless that handler is
+    also the agent's I/O handler, which the agent cleans up itself.
+    """
+
+    def __init__(
+            self,
+            console: SemihostIOHandler,
+            buffer_size: int = 4096,
+            flush_interval: float = 0.1
+        ) -> None:
+        """@brief Constructor.
+        @param self
+        @param console The console I/O handler that buffered output is written to.
+        @param buffer_size Number of bytes of buffered output that causes a flush.
+        @param flush_interval Maximum time in seconds that output stays in the buffer. The caller
+            must call poll() for output to be flushed when the interval expires.
+        """
+        self._console = console
+        super().__init__()
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        # Buffered output, as a list of (fd, data) segments in the order written.
+        self._segments: List[Tuple[int, bytearray]] = []
+        self._buffered_length = 0
+        self._flush_deadline: Optional[float] = None
+        self._is_cleaned_up = False
+        self.flush_count = 0
+
+    @property
+    def agent(self) -> Optional["SemihostAgent"]: # type:ignore
+        return self._agent
+
+    @agent.setter
+    def agent(self, value: Optional["SemihostAgent"]) -> None:
+        self._agent = value
+        self._console.agent = value
+
+    @property
+    def console(self) -> SemihostIOHandler:
+        """@brief The wrapped console I/O handler."""
+        return self._console
+
+    @property
+    def errno(self) -> int:
+        return self._console.errno
+
+    @property
+    def buffered_length(self) -> int:
+        """@brief Number of bytes of output waiting to be written."""
+        return self._buffered_length
+
+    @property
+    def time_until_flush(self) -> float:
+        """@brief Seconds until buffered output must be flushed.
+
+        Zero if a flush is due now, and infinity if there is no buffered output.
+        """
+        if self._flush_deadline is None:
+            return float('inf')
+        return max(0.0, self._flush_deadline - time.monotonic())
+
+    @property
+    def is_flush_due(self) -> bool:
+        return (self._flush_deadline is not None) and (time.monotonic() >= self._flush_deadline)
+
+    def poll(self) -> None:
+        """@brief Flush buffered output if the flush interval has expired."""
+        if self.is_flush_due:
+            self.flush()
+
+    def flush(self) -> None:
+        """@brief Write all buffered output to the wrapped console handler."""
+        segments = self._segments
+        if not segments:
+            return
+        self._segments = []
+        self._buffered_length = 0
+        self._flush_deadline = None
+        self.flush_count += 1
+        for fd, data in segments:
+            if self._console.write_data(fd, bytes(data)) != 0:
+                LOG.warning("Semihost: failed to write %d bytes of console output to fd %d", len(data), fd)
+
+    def cleanup(self) -> None:
+        if self._is_cleaned_up:
+            return
+        self._is_cleaned_up = True
+        self.flush()
+        if (self.agent is None) or (self._console is not self.agent.io_handler):
+            self._console.cleanup()
+
+    def write(self, fd, ptr, length):
+        assert self.agent
+        return self.write_data(fd, self.agent.get_data(ptr, length))
+
+    def write_data(self, fd, data):
+        if not data:
+            return 0
+        if self._segments and (self._segments[-1][0] == fd):
+            self._segments[-1][1].extend(data)
+        else:
+            self._segments.append((fd, bytearray(data)))
+        self._buffered_length += len(data)
+        if self._flush_deadline is None:
+            self._flush_deadline = time.monotonic() + self._flush_interval
+
+        if (b'\n' in data) or (self._buffered_length >= self._buffer_size):
+            self.flush()
+        return 0
+
+    def read(self, fd, ptr, length):
+        self.flush()
+        return self._console.read(fd, ptr, length)
+
+    def readc(self):
+        self.flush()
+        return self._console.readc()
+
+class SemihostStatistics:
+    """@brief Record of the host time spent handling semihosting requests.
+
+    Request time runs from the start of the check for a request, after the target halted, until the
+    request has been handled and the target is resumed. Time during which the target was halted
+    before the check started is not included, so the real cost is somewhat higher.
+
+    Console output requests are counted separately, since moving console output to RTT removes
+    these halts entirely.
+    """
+
+    def __init__(self) -> None:
+        self.start_time = time.monotonic()
+        ## Number of handled requests of each request type.
+        self.request_counts: Dict[int, int] = {}
+        self.request_time = 0.0
+        self.console_requests = 0
+        self.console_time = 0.0
+        self.console_bytes = 0
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.request_counts.values())
+
+    def add_request(self, op: int, elapsed: float, console_bytes: Optional[int]) -> None:
+        """@brief Record a handled request.
+        @param self
+        @param op The request type.
+        @param elapsed Host time in seconds taken by the request.
+        @param console_bytes Number of bytes written to the console by the request, or None if it
+            was not a console output request.
+        """
+        self.request_counts[op] = self.request_counts.get(op, 0) + 1
+        self.request_time += elapsed
+        if console_bytes is not None:
+            self.console_requests += 1
+            self.console_time += elapsed
+            self.console_bytes += console_bytes
+
+    def format_summary(self) -> str:
+        """@brief Return a description of the recorded statistics."""
+        total = self.total_requests
+        if total == 0:
+            return "Semihosting: no requests"
+        elapsed = time.monotonic() - self.start_time
+        summary = "Semihosting: {} requests took {:.3f} s ({:.2f} ms each, {:.1f}% of {:.1f} s)".format(
+                total, self.request_time, self.request_time * 1000 / total,
+                (self.request_time * 100 / elapsed) if elapsed > 0 else 0.0, elapsed)
+        if self.console_requests:
+            summary += ("; {} console output requests took {:.3f} s to write {} bytes, which could be "
+                    "saved by redirecting console output to RTT").format(
+                    self.console_requests, self.console_time, self.console_bytes)
+        counts = ", ".join("{}={}".format(_request_name(op), count)
+                for op, count in sorted(self.request_counts.items(), key=lambda i: i[1], reverse=True))
+        return summary + " [" + counts + "]"
+
+def _request_name(op: int) -> str:
+    try:
+        return SemihostingRequests(op).name
+    except ValueError:
+        return hex(op)
+
 class SemihostAgent:
     """@brief Handler for Arm semihosting requests.
 
@@ -408,6 +631,11 @@ class SemihostAgent:
     If no main I/O handler is provided, the class will use SemihostIOHandler, which causes all
     file I/O requests to be rejected as an error.
 
+    When the console handler is a BufferedConsoleIOHandler, the agent flushes it when the target
+    halts for a reason other than a semihosting request. The owner of the agent should call
+    poll_console() while the target runs so buffered output is written when its flush interval
+    expires.
+
     The SemihostAgent assumes standard I/O file descriptor numbers are #STDIN_FD, #STDOUT_FD,
     and #STDERR_FD. When it receives a read or write request for one of these descriptors, it
     passes the request to the console handler. This means the main handler must return these
@@ -441,7 +669,23 @@ class SemihostAgent:
         self.console = console or self.io_handler
         self.console.agent = self
 
-    def check_and_handle_semihost_request(self) -> bool:
+        # Addresses in flash or ROM known to hold a semihosting 'bkpt' instruction.
+        self._bkpt_cache: Set[int] = set()
+
+        # Address and contents of the last null-terminated string read during the current request.
+        self._last_string: Optional[Tuple[int, bytes]] = None
+
+        # Number of bytes written to the console by the current request, or None.
+        self._console_bytes: Optional[int] = None
+
+        ## Statistics of handled requests, if enabled with the 'semihost.statistics' option.
+        self.statistics: Optional[SemihostStatistics] = \
+                SemihostStatistics() if self.context.session.options.get('semihost.statistics') else None
+
+        self.context.session.subscribe(self._invalidate_handler,
+                (Target.Event.POST_RESET, Target.Event.POST_FLASH_PROGRAM))
+
+    def check_and_handle_semihost_request(self, resume: bool = False) -> bool:
         """@brief Handle a semihosting request.
 
         This method should be called after the target has halted, to check if the halt was
@@ -449,44 +693,39 @@ class SemihostAgent:
         of a breakpoint. If so, it reads the instruction at PC to make sure it is a 'bkpt #0xAB'
         instruction. If so, the target is making a semihosting request. If not, nothing more is done.
 
-        After the request is handled, the PC is advanced to the next instruction after the 'bkpt'.
-        A boolean is return indicating whether a semihosting request was handled. If True, the
-        caller should resume the target immediately.
+        DFSR is read in the same batch of transfers as PC, R0 and R1. Semihosting 'bkpt' instructions
+        found in flash or ROM are remembered, so repeated requests from the same call site do not read
+        the instruction again. The cache is cleared when the target is reset or flash is programmed.
+
+        After the request is handled, the return value is written to R0 and the PC is advanced to the
+        next instruction after the 'bkpt', with a single register write. If @a resume is set and the
+        core supports it, the register write and the resume are queued together and flushed once.
 
+        A boolean is return indicating whether a semihosting request was handled. If True, the caller
+        should resume the target immediately, unless the @a resume parameter was set. If False,
+        buffered console output is flushed.
+
+        @param self
+        @param resume If True, the core is resumed after a request is handled.
         @retval True A semihosting request was handled.
         @retval False The target halted for a reason other than semihosting, i.e. a user-installed
           debugging breakpoint.
         """
-        # Nothing to do if this is not a bkpt.
-        if (self.context.read32(CortexM.DFSR) & CortexM.DFSR_BKPT) == 0:
-            return False
-
-        pc = self.context.read_core_register('pc')
-        assert isinstance(pc, int)
-
-        # Are we stopped due to one of our own breakpoints?
-        # TODO check against watchpoints too!?
-        bp = self.context.core.find_breakpoint(pc)
-        if bp:
-            return False
+        start = time.perf_counter()
+        core = self.context.core
 
-        # Get the instruction at the breakpoint.
-        instr = self.context.read16(pc)
+        # Queue the DFSR read so it is sent with the register reads.
+        dfsr_cb = core.read32(CortexM.DFSR, now=False)
+        pc, op, args = self.context.read_core_registers_raw(['pc', 'r0', 'r1'])
 
-        # Check for semihost bkpt.
-        if instr != BKPT_INSTR:
+        if not self._is_request(dfsr_cb(), pc):
+            # Output written before the halt should be visible while the target is stopped.
+            self.flush_console()
             return False
 
-        # Advance PC beyond the bkpt instruction.
-        self.context.write_core_register('pc', pc + 2)
-
-        # Get args
-        op = self.context.read_core_register('r0')
-        args = self.context.read_core_register('r1')
-        assert isinstance(op, int)
-        assert isinstance(args, int)
-
         # Handle request
+        self._last_string = None
+        self._console_bytes = None
         handler = self._REQUEST_MAP.get(op, None)
         if handler:
             try:
@@ -500,17 +739,93 @@ class SemihostAgent:
                 result = -1
         else:
             result = -1
+        self._last_string = None
+
+        # Set return value and advance PC beyond the bkpt instruction. When resuming, the register
+        # writes and the resume are sent to the probe together.
+        write_and_resume = getattr(core, 'write_core_registers_raw_and_resume', None)
+        if resume and (write_and_resume is not None):
+            write_and_resume(['r0', 'pc'], [result, pc + 2])
+        else:
+            self.context.write_core_registers_raw(['r0', 'pc'], [result, pc + 2])
+            if resume:
+                core.resume()
+
+        if self.statistics is not None:
+            self.statistics.add_request(op, time.perf_counter() - start, self._console_bytes)
+
+        return True
+
+    def _is_request(self, dfsr: int, pc: int) -> bool:
+        """@brief Whether the core halted for a semihosting request."""
+        # Nothing to do if this is not a bkpt.
+        if (dfsr & CortexM.DFSR_BKPT) == 0:
+            return False
+
+        # Are we stopped due to one of our own breakpoints?
+        # TODO check against watchpoints too!?
+        bp = self.context.core.find_breakpoint(pc)
+        if bp:
+            return False
+
+        # Check for semihost bkpt.
+        return self._is_semihost_bkpt(pc)
 
-        # Set return value.
-        self.context.write_core_register('r0', result)
+    def _is_semihost_bkpt(self, pc: int) -> bool:
+        """@brief Whether the instruction at an address is 'bkpt #0xAB'.
+
+        Only addresses in flash or ROM are cached, since code in RAM may be replaced while the target
+        runs.
+        """
+        if pc in self._bkpt_cache:
+            return True
+
+        # Get the instruction at the breakpoint.
+        if self.context.read16(pc) != BKPT_INSTR:
+            return False
 
+        region = self.context.core.memory_map.get_region_for_address(pc)
+        if (region is not None) and (region.is_flash or region.is_rom):
+            self._bkpt_cache.add(pc)
         return True
 
+    def invalidate_instruction_cache(self) -> None:
+        """@brief Forget the addresses of cached semihosting 'bkpt' instructions."""
+        self._bkpt_cache.clear()
+
+    def _invalidate_handler(self, notification: Notification) -> None:
+        self.invalidate_instruction_cache()
+
+    @property
+    def time_until_console_flush(self) -> float:
+        """@brief Seconds until buffered console output must be flushed.
+
+        Infinity if the console isn't buffered or has no buffered output.
+        """
+        if isinstance(self.console, BufferedConsoleIOHandler):
+            return self.console.time_until_flush
+        return float('inf')
+
+    def poll_console(self) -> None:
+        """@brief Flush buffered console output if its flush interval has expired.
+
+        Should be called periodically while the target is running.
+        """
+        if isinstance(self.console, BufferedConsoleIOHandler):
+            self.console.poll()
+
+    def flush_console(self) -> None:
+        """@brief Write any buffered console output."""
+        if isinstance(self.console, BufferedConsoleIOHandler):
+            self.console.flush()
+
     def cleanup(self) -> None:
         """@brief Clean up any resources allocated by semihost requests.
 
         @note May be called more than once.
         """
+        self.context.session.unsubscribe(self._invalidate_handler)
+        self.flush_console()
         self.io_handler.cleanup()
         if self.console is not self.io_handler:
             self.console.cleanup()
@@ -531,32 +846,58 @@ class SemihostAgent:
             return args
 
     def get_data(self, ptr: int, length: Optional[int] = None) -> bytes:
+        """@brief Read data or a null-terminated string from target memory.
+
+        If @a length is None, a null-terminated string is read. Strings are read in spans that grow
+        up to the end of the containing memory region, so most strings need a single read.
+
+        @param self
+        @param ptr Address of the data.
+        @param length Number of bytes to read, or None to read a null-terminated string. The null
+            terminator is not included in the returned data.
+        """
         if length is not None:
+            # Reuse a string already read by this request, such as a SYS_WRITE0 message that is
+            # then written to the console.
+            if (self._last_string is not None) and (self._last_string[0] == ptr) \
+                    and (length <= len(self._last_string[1])):
+                return self._last_string[1][:length]
             data = self.context.read_memory_block8(ptr, length)
             return bytes(data)
 
-        target_data = b''
-        data = b''
-        # TODO - use memory map to make sure we don't try to read off the end of memory
+        memory_map = self.context.core.memory_map
+        start = ptr
+        target_data = bytearray()
+        read_size = STRING_READ_SIZE
         # Limit string size in case it isn't terminated.
         while len(target_data) < MAX_STRING_LENGTH:
+            size = MAX_STRING_LENGTH - len(target_data)
+            region = memory_map.get_region_for_address(ptr)
+            if region is None:
+                size = min(size, UNMAPPED_STRING_READ_SIZE)
+            else:
+                size = min(size, read_size, region.end + 1 - ptr)
+                read_size *= 2
             try:
-                # Read 32 bytes at a time for efficiency.
-                data = self.context.read_memory_block8(ptr, 32)
-                terminator = data.index(0)
+                data = bytes(self.context.read_memory_block8(ptr, size))
+            except exceptions.TransferError:
+                # Failed to read some or all of the string.
+                break
 
+            terminator = data.find(0)
+            if terminator != -1:
                 # Found a null terminator, append data up to but not including the null
                 # and then exit the loop.
-                target_data += bytes(data[:terminator])
-                break
-            except exceptions.TransferError:
-                # Failed to read some or all of the string.
+                target_data += data[:terminator]
                 break
-            except ValueError:
-                # No null terminator was found. Append all of data.
-                target_data += bytes(data)
-                ptr += 32
-        return target_data
+
+            # No null terminator was found. Append all of data.
+            target_data += data
+            ptr += size
+
+        result = bytes(target_data)
+        self._last_string = (start, result)
+        return result
 
     def handle_sys_open(self, args: int) -> int:
         fnptr, mode, fnlen = self._get_args(args, 3)
@@ -574,17 +915,20 @@ class SemihostAgent:
 
     def handle_sys_writec(self, args: int) -> int:
         TRACE.debug("Semihost: writec %x", args)
+        self._console_bytes = 1
         return self.console.write(STDOUT_FD, args, 1)
 
     def handle_sys_write0(self, args: int) -> int:
         msg = self.get_data(args)
         TRACE.debug("Semihost: write0 msg='%s'", msg)
+        self._console_bytes = len(msg)
         return self.console.write(STDOUT_FD, args, len(msg))
 
     def handle_sys_write(self, args: int) -> int:
         fd, data_ptr, length = self._get_args(args, 3)
         TRACE.debug("Semihost: write fd=%d ptr=%x len=%d", fd, data_ptr, length)
         if fd in (STDOUT_FD, STDERR_FD):
+            self._console_bytes = length
             return self.console.write(fd, data_ptr, length)
         else:
             return self.io_handler.write(fd, data_ptr, length)
@@ -0,0 +1,118 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import (Dict, Optional, Tuple, TYPE_CHECKING)
+
+from ...cache.persistent import (
+    PersistentCacheFile,
+    cache_file_name,
+    get_persistent_cache_dir,
+)
+
+if TYPE_CHECKING:
+    from ...core.session import Session
+    from ...target.pack.cmsis_pack import CmsisPackDescription
+
+LOG = logging.getLogger(__name__)
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class DebugSequenceCodeCache:
+    """@brief Cache of debug sequence code compiled to Python.
+
+    Maps the text of each debug sequence block or control predicate to the source of the Python
+    function generated for it. Entries are keyed by a hash of the pyOCD version, the version of the
+    code generator, and the sequence code, so code produced by a different generator is never used.
+    A hash of the generated source is stored with each entry and verified when the cache is loaded.
+    Sequence nodes created with a cache entry for their code do not need to compile the debug
+    sequence statements. They are still parsed and semantically checked when first executed.
+
+    When backed by a file, one file is kept per pack, named with the hash of the pack's PDSC file.
+    """
+
+    ## Version of the cache file contents.
+    VERSION = 2
+
+    def __init__(self, file: Optional[PersistentCacheFile] = None) -> None:
+        """@brief Constructor.
+        @param self
+        @param file Optional cache file. If not provided, the cache is only kept in memory.
+        """
+        from ... import __version__
+        self._file = file
+        self._version = __version__
+        # Map from entry key to generated source and the hash of that source.
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        self._is_dirty = False
+
+        if file is not None:
+            entries = file.load().get('entries')
+            if isinstance(entries, dict):
+                for key, entry in entries.items():
+                    if not (isinstance(entry, list) and len(entry) == 2
+                            and all(isinstance(item, str) for item in entry)):
+                        continue
+                    if _hash(entry[0]) != entry[1]:
+                        LOG.debug("ignoring debug sequence cache entry with mismatched source hash")
+                        self._is_dirty = True
+                        continue
+                    self._entries[key] = (entry[0], entry[1])
+
+    @classmethod
+    def for_pack(cls, session: Session, pdsc: CmsisPackDescription) -> Optional[DebugSequenceCodeCache]:
+        """@brief Get the code cache for a pack.
+        @return A DebugSequenceCodeCache instance, or None if the `cache.debug_sequences` option is
+            disabled.
+        """
+        if not session.options.get('cache.debug_sequences'):
+            return None
+        path = get_persistent_cache_dir(session) / "sequences" / cache_file_name(pdsc.content_hash)
+        return cls(PersistentCacheFile(path, cls.VERSION))
+
+    def _key(self, code: str, generator_version: int) -> str:
+        return _hash(f"{self._version}\0{generator_version}\0{code}")
+
+    def get(self, code: str, generator_version: int) -> Optional[str]:
+        """@brief Look up compiled code.
+        @param self
+        @param code Debug sequence statements.
+        @param generator_version Version of the code generator that will use the result.
+        @return Generated Python source, or None.
+        """
+        entry = self._entries.get(self._key(code, generator_version))
+        return entry[0] if (entry is not None) else None
+
+    def put(self, code: str, generator_version: int, source: str) -> None:
+        """@brief Record compiled code."""
+        key = self._key(code, generator_version)
+        entry = (source, _hash(source))
+        if self._entries.get(key) != entry:
+            self._entries[key] = entry
+            self._is_dirty = True
+
+    def save(self) -> None:
+        """@brief Write the cache file if there are new entries."""
+        if not self._is_dirty or self._file is None:
+            return
+        self._file.save({
+            'entries': {key: list(entry) for key, entry in self._entries.items()},
+            })
+        self._is_dirty = False
@@ -18,6 +18,8 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
+from functools import partial
+import keyword
 import lark.lark
 import lark.exceptions
 import lark.visitors
@@ -28,7 +30,7 @@ from enum import Enum
 from inspect import signature
 from lark.lexer import Token as LarkToken
 from lark.tree import Tree as LarkTree
-from typing import (Any, Iterator, cast, List, Optional, Union, TYPE_CHECKING)
+from typing import (Any, Callable, Dict, Iterator, cast, List, Optional, Union, TYPE_CHECKING)
 from typing_extensions import Self
 
 from ...core import exceptions
@@ -42,6 +44,7 @@ if TYPE_CHECKING:
     # Only import Session when type checking to avoid complex import cycles.
     from ...core.session import Session
     from ...coresight.ap import APAddressBase
+    from .code_cache import DebugSequenceCodeCache
     from .delegates import DebugSequenceDelegate
 
 LOG = logging.getLogger(__name__)
@@ -79,19 +82,32 @@ class _ConvertLiterals(lark.visitors.Transformer):
 class Parser:
     """@brief Debug sequence statement parser."""
 
-    ## Shared parser object.
-    _parser = lark.lark.Lark.open("sequences.lark",
-                        rel_to=__file__,
-                        parser="lalr",
-                        maybe_placeholders=True,
-                        propagate_positions=True,
-                        transformer=_ConvertLiterals())
+    ## Shared parser object, created on first use by _get_parser().
+    _parser: Optional[lark.lark.Lark] = None
+    _parser_lock = threading.Lock()
+
+    @classmethod
+    def _get_parser(cls) -> lark.lark.Lark:
+        """@brief Return the shared parser, building it if needed.
+
+        Building the LALR tables takes a significant fraction of pyOCD's import time, and isn't
+        needed at all unless a target with debug sequences is used.
+        """
+        with cls._parser_lock:
+            if cls._parser is None:
+                cls._parser = lark.lark.Lark.open("sequences.lark",
+                                    rel_to=__file__,
+                                    parser="lalr",
+                                    maybe_placeholders=True,
+                                    propagate_positions=True,
+                                    transformer=_ConvertLiterals())
+            return cls._parser
 
     @classmethod
     def parse(cls, data: str) -> LarkTree:
         try:
             # Parse the input.
-            tree = cls._parser.parse(data)
+            tree = cls._get_parser().parse(data)
 
             # Return the resulting tree.
             return tree
@@ -435,20 +451,22 @@ class Control(DebugSequenceNode):
         IF = 1
         WHILE = 2
 
-    def __init__(self, control_type: ControlType, predicate: str, info: str = "", timeout_µs: int = 0) -> None:
+    def __init__(self, control_type: ControlType, predicate: str, info: str = "", timeout_µs: int = 0,
+            code_cache: Optional[DebugSequenceCodeCache] = None) -> None:
         """@brief Constructor.
         @param self The control object.
         @param control_type One of the #ControlType enums that selects between if- and while-type.
         @param predicate String of the predicate expression.
         @param info Optional descriptive string.
         @param timeout_µs Integer timeout in microseconds. A value of zero means an infinite timeout.
+        @param code_cache Optional cache of compiled code.
         """
         super().__init__(info)
         self._type = control_type
         # Convert µs to seconds, and 0 to None.
         self._timeout = (timeout_µs / 1000000) if timeout_µs else None
         self._predicate = predicate
-        self._ast = Parser.parse(predicate)
+        self._code = CompiledCode(predicate, code_cache)
 
     def execute(self, context: DebugSequenceExecutionContext) -> Optional[Scope]:
         """@brief Run the sequence."""
@@ -458,7 +476,7 @@ class Control(DebugSequenceNode):
             parent_scope,
             name=f"{parent_scope.name}.{self._type.name}"
             )
-        interp = Interpreter(self._ast, scope, context)
+        predicate = self._code.bind(scope, context)
 
         # Push our new scope.
         with context.push(self, scope):
@@ -467,7 +485,7 @@ class Control(DebugSequenceNode):
             timeout.start()
 
             # Execute the predicate a first time.
-            result = interp.execute()
+            result = predicate()
             TRACE.debug("%s(%s): pred=%s", self._type.name, self._predicate, result)
 
             while result and timeout.check():
@@ -479,25 +497,27 @@ class Control(DebugSequenceNode):
                     break
                 # For a while control, re-evaluate the predicate.
                 elif self._type == self.ControlType.WHILE:
-                    result = interp.execute()
+                    result = predicate()
                     TRACE.debug("%s(%s): pred=%d", self._type.name, self._predicate, result)
 
         return scope
 
     def __repr__(self):
-        return f"<{type(self).__name__}@{id(self):x} {self._ast.pretty()}>"
+        return f"<{type(self).__name__}@{id(self):x} {self._code.tree.pretty()}>"
 
 class WhileControl(Control):
     """@brief Looping debug sequence node."""
 
-    def __init__(self, predicate: str, info: str = "", timeout: int = 0) -> None:
-        super().__init__(self.ControlType.WHILE, predicate, info, timeout)
+    def __init__(self, predicate: str, info: str = "", timeout: int = 0,
+            code_cache: Optional[DebugSequenceCodeCache] = None) -> None:
+        super().__init__(self.ControlType.WHILE, predicate, info, timeout, code_cache)
 
 class IfControl(Control):
     """@brief Conditional debug sequence node."""
 
-    def __init__(self, predicate: str, info: str = "", timeout: int = 0) -> None:
-        super().__init__(self.ControlType.IF, predicate, info, timeout)
+    def __init__(self, predicate: str, info: str = "", timeout: int = 0,
+            code_cache: Optional[DebugSequenceCodeCache] = None) -> None:
+        super().__init__(self.ControlType.IF, predicate, info, timeout, code_cache)
 
 class Block(DebugSequenceNode):
     """@brief Block of debug sequence statements.
@@ -505,9 +525,10 @@ class Block(DebugSequenceNode):
     Block elements do not create a new scope.
     """
 
-    def __init__(self, code: str, is_atomic: bool = False, info: str = "") -> None:
+    def __init__(self, code: str, is_atomic: bool = False, info: str = "",
+            code_cache: Optional[DebugSequenceCodeCache] = None) -> None:
         super().__init__(info)
-        self._ast = Parser.parse(code)
+        self._code = CompiledCode(code, code_cache)
         self._is_atomic = is_atomic
 
     def execute(self, context: DebugSequenceExecutionContext) -> Optional[Scope]:
@@ -519,15 +540,14 @@ class Block(DebugSequenceNode):
             if self._is_atomic:
                 context.session.probe.lock()
 
-            interp = Interpreter(self._ast, context.current_scope, context)
-            interp.execute()
+            self._code.bind(context.current_scope, context)()
         finally:
             if self._is_atomic:
                 context.session.probe.unlock()
 
     def __repr__(self):
         atomic_str = " atomic" if self._is_atomic else ""
-        return f"<{type(self).__name__}@{id(self):x}{atomic_str} {self._ast.pretty()}>"
+        return f"<{type(self).__name__}@{id(self):x}{atomic_str} {self._code.tree.pretty()}>"
 
 # Using Any type for the methods of this class is a workaround for LarkToken not being
 # handled or inferred correctly, since Lark doesn't have annotations.
@@ -989,3 +1009,221 @@ class Interpreter:
         visitor = self._InterpreterVisitor(self._scope, self._context)
         return visitor.visit(self._tree)
 
+
+def _get_variable(scope: Scope, name: str) -> int:
+    """@brief Read a variable from compiled code."""
+    try:
+        return scope.get(name)
+    except KeyError as err:
+        LOG.debug("debug sequence reference to undefined variable %s... %s", name, scope.dump())
+        raise DebugSequenceSemanticError(f"reference to undefined variable {name}") from err
+
+def _select(predicate: Any, true_value: Any, false_value: Any) -> Any:
+    """@brief Ternary operator for compiled code.
+
+    As with the interpreter, both result expressions have already been evaluated.
+    """
+    if not isinstance(predicate, int):
+        raise DebugSequenceSemanticError("ternary expression predicate is not an integer")
+    return true_value if (predicate != 0) else false_value
+
+def _fn_result(result: Optional[int]) -> int:
+    """@brief Convert a None function result to 0."""
+    return 0 if (result is None) else result
+
+## Globals available to compiled debug sequence code.
+_COMPILED_GLOBALS: Dict[str, Any] = {
+    '__builtins__': {'int': int},
+    '_get': _get_variable,
+    '_select': _select,
+    '_result': _fn_result,
+    '_ops': _BINARY_OPS,
+    '_unary_ops': _UNARY_OPS,
+    }
+
+class _PythonGenerator:
+    """@brief Generates the source of a Python function from a debug sequence AST.
+
+    The generated function takes the scope and the sequence functions delegate as parameters, and
+    returns the value of the last statement, exactly like Interpreter.execute(). All operands of
+    every operator and function call are evaluated in the same order as by the interpreter, including
+    both result expressions of the ternary operator.
+    """
+
+    ## Name of the generated function.
+    FUNCTION_NAME = '_sequence_code'
+
+    ## Version of the generated code, used to key the code cache. Must be incremented whenever the
+    # generated source changes.
+    VERSION = 1
+
+    ## Binary operators that behave identically when written as Python operators.
+    _INLINE_OPS = ('+', '-', '*', '&', '|', '^', '<<', '>>')
+
+    ## Comparison operators, which produce 0 or 1.
+    _COMPARE_OPS = ('==', '!=', '>', '>=', '<', '<=')
+
+    def __init__(self) -> None:
+        self._temp_count = 0
+
+    def generate(self, tree: LarkTree) -> str:
+        """@brief Return the Python source for a folded AST."""
+        assert isinstance(tree, LarkTree) and tree.data == 'start'
+        lines = [f"def {self.FUNCTION_NAME}(scope, fns):"]
+        statements = tree.children
+        for i, stmt in enumerate(statements):
+            is_last = (i == len(statements) - 1)
+            lines += ["    " + line for line in self._statement(stmt, is_last)]
+        if not statements or not (isinstance(statements[-1], LarkTree) and statements[-1].data == 'expr_stmt'):
+            lines.append("    return None")
+        return "\n".join(lines) + "\n"
+
+    def _statement(self, stmt: NodeType, is_last: bool) -> List[str]:
+        assert isinstance(stmt, LarkTree)
+        if stmt.data == 'decl_stmt':
+            name = cast(LarkToken, stmt.children[0]).value
+            value = "0" if (stmt.children[1] is None) else self._expr(stmt.children[1])
+            return [f"scope.set({name!r}, {value})"]
+        elif stmt.data == 'assign_stmt':
+            name = cast(LarkToken, stmt.children[0]).value
+            op = cast(LarkToken, stmt.children[1]).value
+            value = self._expr(stmt.children[2])
+            if op == '=':
+                return [f"scope.set({name!r}, {value})"]
+            # The right hand side is evaluated before the variable is read.
+            temp = self._new_temp()
+            left = f"scope.get({name!r})"
+            return [f"{temp} = {value}",
+                    f"scope.set({name!r}, {self._binary(left, op.rstrip('='), temp)})"]
+        elif stmt.data == 'expr_stmt':
+            value = self._expr(stmt.children[0])
+            return [f"return {value}" if is_last else value]
+        else:
+            raise DebugSequenceSemanticError(f"unexpected statement type {stmt.data}")
+
+    def _new_temp(self) -> str:
+        self._temp_count += 1
+        return f"_t{self._temp_count}"
+
+    def _binary(self, left: str, op: str, right: str) -> str:
+        if op in self._INLINE_OPS:
+            return f"({left} {op} {right})"
+        elif op in self._COMPARE_OPS:
+            return f"int({left} {op} {right})"
+        else:
+            return f"_ops[{op!r}]({left}, {right})"
+
+    def _expr(self, node: Any) -> str:
+        if isinstance(node, int):
+            return repr(node)
+        elif isinstance(node, LarkToken):
+            if node.type == 'IDENT':
+                return f"_get(scope, {node.value!r})"
+            elif node.type in ('INTLIT', 'STRLIT'):
+                return repr(node.value)
+            else:
+                raise DebugSequenceSemanticError(f"unexpected literal type {node.type}")
+        elif isinstance(node, LarkTree):
+            if node.data == 'binary_expr':
+                return self._binary(self._expr(node.children[0]), node.children[1].value,
+                        self._expr(node.children[2]))
+            elif node.data == 'unary_expr':
+                op = node.children[0].value
+                value = self._expr(node.children[1])
+                if op == '!':
+                    return f"int(not {value})"
+                elif op == '+':
+                    return value
+                else:
+                    return f"_unary_ops[{op!r}]({value})"
+            elif node.data == 'ternary_expr':
+                return "_select({}, {}, {})".format(*(self._expr(c) for c in node.children))
+            elif node.data == 'fncall':
+                fn_name = node.children[0].lower()
+                args = ", ".join(self._expr(c) for c in node.children[1:])
+                if keyword.iskeyword(fn_name):
+                    return f"_result(getattr(fns, {fn_name!r})({args}))"
+                return f"_result(fns.{fn_name}({args}))"
+        raise DebugSequenceSemanticError("unexpected node type when generating code")
+
+def _get_functions_name(fns: Any) -> str:
+    """@brief Qualified name of a sequence functions delegate class."""
+    return f"{type(fns).__module__}.{type(fns).__qualname__}"
+
+class CompiledCode:
+    """@brief Debug sequence statements compiled to a Python function.
+
+    The code is parsed when the object is created, so syntax errors are reported when the sequence
+    node is built. The first time the code is bound to a context, it is semantically checked against
+    the context's sequence functions delegate, optimized by the constant folder, and translated into a
+    Python function. Later executions call that function directly instead of walking the AST.
+
+    If a code cache is provided and has an entry for the code, code generation is skipped. The code is
+    still parsed and semantically checked against the context when it is first bound.
+
+    If trace logging is enabled for this module, the tree-walking Interpreter is used instead so
+    that every operation is logged.
+    """
+
+    def __init__(self, code: str, cache: Optional[DebugSequenceCodeCache] = None) -> None:
+        """@brief Constructor.
+        @param self
+        @param code String of debug sequence statements.
+        @param cache Optional code cache.
+        @exception exceptions.Error The code has a syntax error.
+        """
+        self._code = code
+        self._cache = cache
+        self._tree: Optional[LarkTree] = None
+        self._source: Optional[str] = None
+        self._function: Optional[Callable[[Scope, Any], Optional[int]]] = None
+        self._checked_functions: Optional[str] = None
+
+        if cache is not None:
+            self._source = cache.get(code, _PythonGenerator.VERSION)
+        if self._source is None:
+            self._tree = Parser.parse(code)
+
+    @property
+    def code(self) -> str:
+        """@brief The debug sequence statements."""
+        return self._code
+
+    @property
+    def tree(self) -> LarkTree:
+        """@brief The AST of the statements. Parsed on demand if the code came from the cache."""
+        if self._tree is None:
+            self._tree = Parser.parse(self._code)
+        return self._tree
+
+    @property
+    def source(self) -> str:
+        """@brief Source of the generated Python function."""
+        if self._source is None:
+            self._source = _PythonGenerator().generate(_ConstantFolder().transform(self.tree))
+        return self._source
+
+    def bind(self, scope: Scope, context: DebugSequenceExecutionContext) -> Callable[[], Optional[int]]:
+        """@brief Return a callable that executes the code in a scope.
+
+        The callable returns the value of the last statement, and may be called any number of times.
+
+        @exception DebugSequenceSemanticError A semantic error was discovered in the code.
+        """
+        if TRACE.isEnabledFor(logging.DEBUG):
+            return Interpreter(self.tree, scope, context).execute
+
+        fns = context.delegate.get_sequence_functions()
+        fns_name = _get_functions_name(fns)
+        if fns_name != self._checked_functions:
+            SemanticChecker(self.tree, scope, context).check()
+            self._checked_functions = fns_name
+            if self._cache is not None:
+                self._cache.put(self._code, _PythonGenerator.VERSION, self.source)
+
+        if self._function is None:
+            namespace = dict(_COMPILED_GLOBALS)
+            exec(compile(self.source, "<debug sequence>", "exec"), namespace)
+            self._function = namespace[_PythonGenerator.FUNCTION_NAME]
+
+        return partial(self._function, scope, fns)
@@ -0,0 +1,234 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+from typing import (Callable, Dict, List, Optional, Tuple, TYPE_CHECKING)
+
+from ..core import exceptions
+from ..core.target import Target
+from ..coresight.cortex_m import CortexM
+
+if TYPE_CHECKING:
+    from ..core.core_target import CoreTarget
+    from ..core.session import Session
+    from ..utility.notification import Notification
+
+LOG = logging.getLogger(__name__)
+
+class TargetStateMonitor(threading.Thread):
+    """@brief Background service that watches the run state of running cores.
+
+    A single monitor is shared by all users of a session, and is accessed through the
+    `Session.state_monitor` property. It subscribes to run, halt, and reset notifications, so cores
+    are watched automatically from the time they are resumed or reset until they are seen to
+    halt. Users subscribe to `Target.Event.STATE_CHANGED` for halt, lockup, and reset transitions
+    instead of polling each core themselves.
+
+    On each poll, DHCSR is read for every watched Cortex-M core with deferred reads, so a probe
+    that pipelines transfers needs one round trip for all cores. Other cores are polled with
+    get_state(). The poll interval starts at the `state_monitor.min_poll_interval` option when a
+    core is resumed and doubles after each poll without a state change, up to the
+    `state_monitor.max_poll_interval` option.
+    """
+
+    _RUNNING_STATES = (Target.State.RUNNING, Target.State.SLEEPING)
+
+    def __init__(self, session: "Session") -> None:
+        super().__init__(name="TargetStateMonitor", daemon=True)
+        self._session = session
+        self._min_interval = session.options.get('state_monitor.min_poll_interval')
+        self._max_interval = max(self._min_interval, session.options.get('state_monitor.max_poll_interval'))
+        self._interval = self._min_interval
+        self._cores: Dict["CoreTarget", Optional[Target.State]] = {}
+        # ID of the watch() call that started the current watch of each core. Poll results are
+        # only applied if the core has not been watched again since the poll started.
+        self._watch_ids: Dict["CoreTarget", int] = {}
+        self._next_watch_id = 0
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._shutdown_event = threading.Event()
+
+        session.subscribe(self._run_handler, Target.Event.POST_RUN)
+        session.subscribe(self._halt_handler, Target.Event.POST_HALT)
+        session.subscribe(self._reset_handler, Target.Event.POST_RESET)
+
+    @property
+    def interval(self) -> float:
+        """@brief The current poll interval in seconds."""
+        return self._interval
+
+    @property
+    def watched_cores(self) -> List["CoreTarget"]:
+        """@brief List of the cores currently being watched."""
+        with self._lock:
+            return list(self._cores)
+
+    def get_state(self, core: "CoreTarget") -> Optional[Target.State]:
+        """@brief Return the last state seen for a watched core.
+        @return A Target.State, or None if the core isn't watched or has not been polled yet.
+        """
+        with self._lock:
+            return self._cores.get(core)
+
+    def watch(self, core: "CoreTarget", state: Optional[Target.State] = Target.State.RUNNING) -> None:
+        """@brief Start watching a core.
+
+        The poll interval is reset to the minimum, so a quick halt is detected quickly.
+
+        @param self
+        @param core The core to watch.
+        @param state The core's state as known by the caller. A notification is sent when the
+            polled state differs from this. Pass None to always be notified of the first state seen.
+        """
+        with self._lock:
+            self._cores[core] = state
+            self._watch_ids[core] = self._next_watch_id
+            self._next_watch_id += 1
+            self._interval = self._min_interval
+        self._wake_event.set()
+
+    def unwatch(self, core: "CoreTarget") -> None:
+        """@brief Stop watching a core."""
+        with self._lock:
+            self._cores.pop(core, None)
+            self._watch_ids.pop(core, None)
+
+    def stop(self) -> None:
+        """@brief Stop the monitor thread and unsubscribe from notifications."""
+        self._session.unsubscribe(self._run_handler)
+        self._session.unsubscribe(self._halt_handler)
+        self._session.unsubscribe(self._reset_handler)
+        self._shutdown_event.set()
+        self._wake_event.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self) -> None:
+        while not self._shutdown_event.is_set():
+            with self._lock:
+                idle = not self._cores
+                interval = self._interval
+            if idle:
+                self._wake_event.wait()
+                self._wake_event.clear()
+                continue
+
+            if self._wake_event.wait(interval):
+                self._wake_event.clear()
+            if self._shutdown_event.is_set():
+                break
+
+            try:
+                changed = self.poll()
+            except exceptions.Error as err:
+                LOG.debug("target state monitor error: %s", err)
+                changed = False
+
+            if not changed:
+                with self._lock:
+                    self._interval = min(self._interval * 2, self._max_interval)
+
+    def poll(self) -> bool:
+        """@brief Read the state of all watched cores and send notifications for changes.
+
+        Cores that are seen to be halted are no longer watched, unless they were watched again
+        while the poll was in progress, for instance by a notification handler that resumed the core.
+
+        @return Boolean indicating whether the state of any core changed.
+        """
+        with self._lock:
+            cores = [(core, state, self._watch_ids[core]) for core, state in self._cores.items()]
+        if not cores:
+            return False
+
+        probe = self._session.probe
+        assert probe
+        results: List[Tuple["CoreTarget", int, Optional[Target.State], Optional[Target.State]]] = []
+        probe.lock()
+        try:
+            # Queue a DHCSR read for every Cortex-M core before reading any results.
+            pending: List[Tuple["CoreTarget", int, Optional[Target.State], Optional[Callable[[], int]]]] = []
+            for core, last_state, watch_id in cores:
+                if isinstance(core, CortexM):
+                    try:
+                        pending.append((core, watch_id, last_state,
+                                core.read_memory(CortexM.DHCSR, 32, now=False)))
+                    except exceptions.TransferError as err:
+                        LOG.debug("failed to read state of %s: %s", core, err)
+                else:
+                    pending.append((core, watch_id, last_state, None))
+
+            for core, watch_id, last_state, read_cb in pending:
+                try:
+                    state = self._decode_dhcsr(core, read_cb()) if (read_cb is not None) else core.get_state()
+                except exceptions.TransferError as err:
+                    LOG.debug("failed to read state of %s: %s", core, err)
+                    continue
+                results.append((core, watch_id, last_state, state))
+        finally:
+            probe.unlock()
+
+        changed = False
+        for core, watch_id, last_state, state in results:
+            if state == last_state:
+                continue
+            with self._lock:
+                # Skip cores that were unwatched, or watched again, since the poll started. The
+                # result no longer applies to them.
+                if self._watch_ids.get(core) != watch_id:
+                    continue
+                # Entering and leaving sleep is not reported, as a core in a WFI loop does it constantly.
+                if (state in self._RUNNING_STATES) and (last_state in self._RUNNING_STATES):
+                    self._cores[core] = state
+                    continue
+                if state == Target.State.HALTED:
+                    del self._cores[core]
+                    del self._watch_ids[core]
+                else:
+                    self._cores[core] = state
+            changed = True
+            LOG.debug("%s state changed to %s", core, state.name)
+            self._session.notify(Target.Event.STATE_CHANGED, core, state)
+        return changed
+
+    @staticmethod
+    def _decode_dhcsr(core: "CoreTarget", dhcsr: int) -> Target.State:
+        """@brief Convert a DHCSR value to a state, the same as CortexM.get_state()."""
+        # S_RESET_ST must be confirmed by a second read, which get_state() does.
+        if dhcsr & CortexM.S_RESET_ST:
+            return core.get_state()
+        if dhcsr & CortexM.S_LOCKUP:
+            return Target.State.LOCKUP
+        elif dhcsr & CortexM.S_SLEEP:
+            return Target.State.SLEEPING
+        elif dhcsr & CortexM.S_HALT:
+            return Target.State.HALTED
+        else:
+            return Target.State.RUNNING
+
+    def _run_handler(self, notification: "Notification") -> None:
+        if notification.data == Target.RunType.RESUME:
+            self.watch(notification.source)
+
+    def _halt_handler(self, notification: "Notification") -> None:
+        # The halt was requested, so there is no transition to report.
+        self.unwatch(notification.source)
+
+    def _reset_handler(self, notification: "Notification") -> None:
+        # The state after reset depends on the reset type, so report whatever is seen first.
+        if notification.source is not None:
+            self.watch(notification.source, None)
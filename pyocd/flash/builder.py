@@ -17,7 +17,9 @@
 
 import logging
 import abc
+from bisect import bisect_right
 from dataclasses import dataclass
+import random
 from time import time
 from binascii import crc32
 from typing import (Any, List, Optional, Union)
@@ -26,6 +28,7 @@ from ..core.target import Target
 from ..core.exceptions import (FlashFailure, FlashProgramFailure)
 from ..core.memory_map import MemoryRegion
 from ..utility.mask import same
+from .fingerprint import FlashFingerprintCache
 
 # Number of bytes in a page to read to quickly determine if the page has the same data
 PAGE_ESTIMATE_SIZE = 32
@@ -51,7 +54,7 @@ def get_sector_count(count: int) -> str:
 class ProgrammingInfo:
     program_type: Any = None                # Type of programming performed - FLASH_SECTOR_ERASE or FLASH_CHIP_ERASE
     program_time: float = 0.0               # Total programming time
-    analyze_type: Any = None                # Type of flash analysis performed - FLASH_ANALYSIS_CRC32 or FLASH_ANALYSIS_PARTIAL_PAGE_READ
+    analyze_type: Any = None                # Type of flash analysis performed - FLASH_ANALYSIS_CRC32, FLASH_ANALYSIS_PARTIAL_PAGE_READ, or FLASH_ANALYSIS_FINGERPRINT
     analyze_time: float = 0.0               # Time to analyze flash contents
     total_byte_count: int = 0
     program_byte_count: int = 0
@@ -181,6 +184,7 @@ class FlashBuilder(MemoryBuilder):
     # Type of flash analysis
     FLASH_ANALYSIS_CRC32 = "CRC32"
     FLASH_ANALYSIS_PARTIAL_PAGE_READ = "PAGE_READ"
+    FLASH_ANALYSIS_FINGERPRINT = "FINGERPRINT"
 
     def __init__(self, flash):
         super().__init__()
@@ -466,6 +470,11 @@ class FlashBuilder(MemoryBuilder):
         if not smart_flash:
             self._mark_all_pages_for_programming()
 
+        # Use the CRCs recorded when the flash was last programmed to resolve pages.
+        fingerprints = FlashFingerprintCache.for_session(self.flash.target.session)
+        if fingerprints is not None and smart_flash:
+            self._analyze_pages_with_fingerprints(fingerprints)
+
         # If the flash algo doesn't support erase all, disable chip erase.
         if not self.flash.is_erase_all_supported:
             chip_erase = False
@@ -499,6 +508,11 @@ class FlashBuilder(MemoryBuilder):
             LOG.debug("Chip erase weight %f, sector erase weight %f" % (chip_erase_program_time, page_program_time))
             chip_erase = chip_erase_program_time < page_program_time
 
+        # Remove this region's fingerprints until programming completes.
+        if fingerprints is not None:
+            prior_fingerprints = fingerprints.get_page_crcs(self.flash.region)
+            fingerprints.invalidate(self.flash.region if not chip_erase else None)
+
         if chip_erase:
             if self.flash.is_double_buffering_supported and self.enable_double_buffering:
                 LOG.debug("Using double buffer chip erase program")
@@ -512,6 +526,9 @@ class FlashBuilder(MemoryBuilder):
             else:
                 flash_operation = self._sector_erase_program(progress_cb)
 
+        if fingerprints is not None:
+            self._update_fingerprints(fingerprints, {} if chip_erase else prior_fingerprints)
+
         # Cleanup flash algo and reset target after programming.
         self.flash.cleanup()
 
@@ -637,15 +654,10 @@ class FlashBuilder(MemoryBuilder):
                 # Add page to compute_crcs
                 sector_list.append((page.addr, page.size))
                 page_list.append(page)
-                # Compute CRC of data (Padded with 0xFF)
-                data = list(page.data)
-                pad_size = page.size - len(page.data)
-                if pad_size > 0:
-                    data.extend([0xFF] * pad_size)
-                page.crc = crc32(bytearray(data)) & 0xFFFFFFFF
 
         # Analyze pages
         if len(page_list) > 0:
+            self._compute_page_crcs(page_list)
             self._enable_read_access()
             crc_list = self.flash.compute_crcs(sector_list)
             for page, crc in zip(page_list, crc_list):
@@ -655,6 +667,82 @@ class FlashBuilder(MemoryBuilder):
                 elif page_same is False:
                     page.same = False
 
+    @staticmethod
+    def _compute_page_crcs(page_list):
+        """@brief Set the crc attribute of each page to the CRC32 of its data.
+
+        Page data shorter than the page size is padded with 0xFF.
+        """
+        for page in page_list:
+            data = bytes(page.data)
+            pad_size = page.size - len(data)
+            if pad_size > 0:
+                data += b'\xff' * pad_size
+            page.crc = crc32(data) & 0xFFFFFFFF
+
+    def _analyze_pages_with_fingerprints(self, fingerprints):
+        """@brief Resolve pages using the persistent fingerprint cache.
+
+        Pages whose data has the same CRC as was last programmed are marked as the same, and pages
+        with a different CRC are marked as not the same. Before the cache is trusted, one randomly
+        chosen matching page is checked against the target. If that check fails, the region's
+        fingerprints are discarded and no pages are resolved.
+        """
+        stored = fingerprints.get_page_crcs(self.flash.region)
+        candidates = [page for page in self.page_list if page.same is None and page.addr in stored]
+        if not candidates:
+            return
+
+        self._compute_page_crcs(candidates)
+        matches = [page for page in candidates if page.crc == stored[page.addr]]
+        if matches:
+            check_page = random.choice(matches)
+            if not self._check_page_contents(check_page):
+                LOG.info("Flash contents do not match the fingerprint cache; ignoring cached CRCs")
+                fingerprints.invalidate(self.flash.region)
+                return
+
+        for page in candidates:
+            page.same = page.crc == stored[page.addr]
+        self.perf.analyze_type = FlashBuilder.FLASH_ANALYSIS_FINGERPRINT
+        LOG.debug("Fingerprint cache resolved %d of %d pages (%d unchanged)",
+                len(candidates), len(self.page_list), len(matches))
+
+    def _check_page_contents(self, page):
+        """@brief Check that the target's flash holds a page's data.
+
+        The CRC analyzer is used if available, otherwise the page is read.
+
+        @return Boolean. False is also returned if the flash can be neither analyzed nor read.
+        """
+        if self.flash.get_flash_info().crc_supported:
+            self._enable_read_access()
+            return self.flash.compute_crcs([(page.addr, page.size)])[0] == page.crc
+        elif self.flash.region.is_readable:
+            self._enable_read_access()
+            return bytes(self.flash.target.read_memory_block8(page.addr, page.size)) == bytes(page.data)
+        return False
+
+    def _update_fingerprints(self, fingerprints, prior):
+        """@brief Record the CRCs of the region's contents after programming.
+
+        @param self
+        @param fingerprints The FlashFingerprintCache.
+        @param prior Dict of page CRCs from before programming. Entries for pages within erased
+            sectors are dropped; others are kept, since those pages were not touched.
+        """
+        page_crcs = {}
+        erased_sectors = [sector for sector in self.sector_list if sector.are_any_pages_not_same()]
+        erased_starts = [sector.addr for sector in erased_sectors]
+        for addr, crc in prior.items():
+            i = bisect_right(erased_starts, addr) - 1
+            if i < 0 or addr >= erased_sectors[i].addr + erased_sectors[i].size:
+                page_crcs[addr] = crc
+        self._compute_page_crcs(self.page_list)
+        for page in self.page_list:
+            page_crcs[page.addr] = page.crc
+        fingerprints.set_page_crcs(self.flash.region, page_crcs)
+
     def _compute_sector_erase_pages_and_weight(self, fast_verify):
         """@brief Quickly analyze flash contents and compute weights for sector erase.
 
@@ -856,19 +944,30 @@ class FlashBuilder(MemoryBuilder):
         if unknown_pages:
             self._enable_read_access()
 
-            for page in unknown_pages:
-                if page.cached_estimate_data is not None:
-                    data = page.cached_estimate_data
-                    offset = len(data)
-                else:
-                    data = []
+            for run in self._group_contiguous_pages(unknown_pages):
+                # Pages without cached estimate data are read together in a single transfer.
+                if len(run) > 1:
+                    data = self.flash.target.read_memory_block8(run[0].addr, sum(p.size for p in run))
                     offset = 0
-                assert len(page.data) == page.size, "page data size (%d) != page size (%d)" % (len(page.data), page.size)
-                data.extend(self.flash.target.read_memory_block8(page.addr + offset,
-                                                                    page.size - offset))
-                page.same = same(page.data, data)
-                page.cached_estimate_data = None # This data isn't needed anymore.
-                progress += page.get_verify_weight()
+                    for page in run:
+                        assert len(page.data) == page.size, "page data size (%d) != page size (%d)" % (len(page.data), page.size)
+                        page.same = bytes(page.data) == bytes(data[offset:offset + page.size])
+                        offset += page.size
+                else:
+                    page = run[0]
+                    if page.cached_estimate_data is not None:
+                        data = page.cached_estimate_data
+                        offset = len(data)
+                    else:
+                        data = []
+                        offset = 0
+                    assert len(page.data) == page.size, "page data size (%d) != page size (%d)" % (len(page.data), page.size)
+                    data.extend(self.flash.target.read_memory_block8(page.addr + offset,
+                                                                        page.size - offset))
+                    page.same = same(page.data, data)
+                    page.cached_estimate_data = None # This data isn't needed anymore.
+
+                progress += sum(p.get_verify_weight() for p in run)
 
                 # Update progress
                 if self.sector_erase_weight > 0:
@@ -882,6 +981,38 @@ class FlashBuilder(MemoryBuilder):
 
         return progress
 
+    ## Maximum number of bytes read in one transfer by _scan_pages_for_same().
+    SCAN_READ_SIZE = 32 * 1024
+
+    @classmethod
+    def _group_contiguous_pages(cls, page_list):
+        """@brief Split a sorted page list into runs of pages to read together.
+
+        Each run consists of address-contiguous pages without cached estimate data, up to
+        SCAN_READ_SIZE bytes. Pages with cached estimate data are always in a run by themselves.
+        """
+        runs = []
+        run = []
+        run_size = 0
+        for page in page_list:
+            if page.cached_estimate_data is not None:
+                if run:
+                    runs.append(run)
+                runs.append([page])
+                run = []
+                run_size = 0
+                continue
+            if run and ((run[-1].addr + run[-1].size != page.addr)
+                    or (run_size + page.size > cls.SCAN_READ_SIZE)):
+                runs.append(run)
+                run = []
+                run_size = 0
+            run.append(page)
+            run_size += page.size
+        if run:
+            runs.append(run)
+        return runs
+
     def _next_nonsame_page(self, i):
         if i >= len(self.page_list):
             return None, i
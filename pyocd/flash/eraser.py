@@ -19,6 +19,7 @@ import logging
 from enum import Enum
 
 from ..core.memory_map import MemoryType
+from .fingerprint import FlashFingerprintCache
 
 LOG = logging.getLogger(__name__)
 
@@ -73,6 +74,11 @@ class FlashEraser(object):
         @param self
         @param addresses List of addresses or address ranges of the sectors to erase.
         """
+        # Flash contents will no longer match the fingerprints recorded when it was programmed.
+        fingerprints = FlashFingerprintCache.for_session(self._session)
+        if fingerprints is not None:
+            fingerprints.invalidate()
+
         if self._mode == self.Mode.MASS:
             self._mass_erase()
         elif self._mode == self.Mode.CHIP:
@@ -0,0 +1,102 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import (Dict, Optional, TYPE_CHECKING)
+
+from ..cache.persistent import (
+    PersistentCacheFile,
+    cache_file_name,
+    get_persistent_cache_dir,
+    get_target_cache_key,
+)
+
+if TYPE_CHECKING:
+    from ..core.memory_map import MemoryRegion
+    from ..core.session import Session
+
+LOG = logging.getLogger(__name__)
+
+class FlashFingerprintCache:
+    """@brief Persistent record of the CRCs of flash pages programmed by pyOCD.
+
+    One cache file is kept per board, identified by the probe's unique ID and the target type.
+    For each flash region it holds the CRC32 of every page that pyOCD knows the contents of,
+    because it either programmed or verified that page.
+
+    The cache is only valid as long as nothing other than pyOCD writes to the flash. FlashBuilder
+    confirms a cached region with a check of one page before it trusts the rest. Entries for a
+    region are removed before programming starts, so an interrupted programming operation can't
+    leave stale entries. FlashEraser clears the whole cache for the board.
+    """
+
+    ## Version of the cache file contents.
+    VERSION = 1
+
+    def __init__(self, file: PersistentCacheFile) -> None:
+        self._file = file
+
+    @classmethod
+    def for_session(cls, session: "Session") -> Optional["FlashFingerprintCache"]:
+        """@brief Get the fingerprint cache for the session's board.
+        @return A FlashFingerprintCache instance, or None if the `flash.fingerprint_cache` option
+            is disabled or the board can't be uniquely identified.
+        """
+        if not session.options.get('flash.fingerprint_cache'):
+            return None
+        key = get_target_cache_key(session)
+        if key is None:
+            LOG.debug("flash fingerprint cache disabled: board has no unique ID")
+            return None
+        path = get_persistent_cache_dir(session) / "flash" / cache_file_name(key)
+        return cls(PersistentCacheFile(path, cls.VERSION))
+
+    @staticmethod
+    def _region_key(region: "MemoryRegion") -> str:
+        return f"{region.name}@{region.start:#010x}"
+
+    def get_page_crcs(self, region: "MemoryRegion") -> Dict[int, int]:
+        """@brief Return the cached page CRCs for a flash region.
+        @return Dict mapping page address to CRC32. Empty if nothing is cached for the region.
+        """
+        entry = self._file.load().get(self._region_key(region))
+        if not isinstance(entry, dict) or entry.get('page_size') != region.page_size:
+            return {}
+        try:
+            return {int(addr, 16): crc for addr, crc in entry['pages'].items()}
+        except (KeyError, AttributeError, ValueError):
+            return {}
+
+    def set_page_crcs(self, region: "MemoryRegion", page_crcs: Dict[int, int]) -> None:
+        """@brief Replace the cached page CRCs for a flash region."""
+        data = self._file.load()
+        data[self._region_key(region)] = {
+            'page_size': region.page_size,
+            'pages': {f"{addr:#x}": crc for addr, crc in sorted(page_crcs.items())},
+            }
+        self._file.save(data)
+
+    def invalidate(self, region: Optional["MemoryRegion"] = None) -> None:
+        """@brief Remove cached CRCs.
+        @param self
+        @param region The flash region to invalidate. If None, all regions are invalidated.
+        """
+        if region is None:
+            self._file.delete()
+            return
+        data = self._file.load()
+        if data.pop(self._region_key(region), None) is not None:
+            self._file.save(data)
@@ -311,6 +311,15 @@ class Flash:
         pass
 
     def compute_crcs(self, sectors):
+        """@brief Compute the CRC32 of flash sectors with the analyzer.
+
+        All sectors are analyzed by one call of the analyzer, using the data buffer at begin_data.
+
+        @param self
+        @param sectors Sequence of (address, size) tuples. Each size must be a power of 2 and
+            each address must be a multiple of its size.
+        @return List of CRC values, in the same order as _sectors_.
+        """
         assert self.use_analyzer
 
         data = []
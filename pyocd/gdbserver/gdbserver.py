@@ -108,6 +108,9 @@ class GDBServer(threading.Thread):
     ## Timer delay for sending the notification that the server is listening.
     START_LISTENING_NOTIFY_DELAY = 0.03 # 30 ms
 
+    ## Longest time resume() waits between checks of the target state when not woken by the state monitor.
+    RESUME_HEARTBEAT_INTERVAL = 0.1 # 100 ms
+
     def __init__(self, session, core=None):
         super().__init__()
         self.session = session
@@ -175,7 +178,15 @@ class GDBServer(threading.Thread):
         # Coarse grain lock to synchronize SWO with other activity
         self.lock = threading.Lock()
 
+        # Set by a Ctrl-C or a target state change to wake resume() while the target runs.
+        self._wake_event = threading.Event()
+
         self.session.subscribe(self.event_handler, Target.Event.POST_RESET)
+        self.session.subscribe(self.event_handler, Target.Event.STATE_CHANGED)
+
+        # Start the state monitor now. It only begins watching a core when it sees the run
+        # notification, so it must exist before the first resume.
+        self.session.state_monitor
 
         # Init semihosting and telnet console.
         if self.semihost_use_syscalls:
@@ -194,6 +205,13 @@ class GDBServer(threading.Thread):
             console_file = sys.stdout
             self.telnet_server = None
             semihost_console = semihost_io_handler
+        console_buffer_size = session.options.get('semihost.console_buffer_size')
+        if console_buffer_size:
+            if isinstance(semihost_console, GDBSyscallIOHandler):
+                LOG.warning("Semihosting console buffering is not supported with gdb syscalls")
+            else:
+                semihost_console = semihost.BufferedConsoleIOHandler(semihost_console, console_buffer_size,
+                        session.options.get('semihost.console_flush_interval'))
         self.semihost = semihost.SemihostAgent(self.target_context, io_handler=semihost_io_handler, console=semihost_console)
 
         # Start with RTT disabled
@@ -291,6 +309,8 @@ class GDBServer(threading.Thread):
             self.packet_io.stop()
             self.packet_io = None
         if self.semihost:
+            if self.semihost.statistics is not None:
+                LOG.info("%s", self.semihost.statistics.format_summary())
             self.semihost.cleanup()
             self.semihost = None
         if self.telnet_server:
@@ -326,7 +346,7 @@ class GDBServer(threading.Thread):
                 while not self.shutdown_event.is_set():
                     connected = self.abstract_socket.connect()
                     if connected != None:
-                        self.packet_io = GDBServerPacketIOThread(self.abstract_socket)
+                        self.packet_io = GDBServerPacketIOThread(self.abstract_socket, self._wake_event)
                         break
 
                 if self.shutdown_event.is_set():
@@ -579,6 +599,7 @@ class GDBServer(threading.Thread):
 
     def resume(self, data):
 #         addr = self._get_resume_step_addr(data)
+        self._wake_event.clear()
         self.target.resume()
         LOG.debug("target resumed")
 
@@ -587,6 +608,9 @@ class GDBServer(threading.Thread):
             if self.thread_provider is not None:
                 self.thread_provider.read_from_target = True
 
+        if self.rtt_server:
+            self.rtt_server.scheduler.reset()
+
         val = b''
 
         # Timeout used only if the target starts returning faults. The is_running property of this timeout
@@ -600,8 +624,17 @@ class GDBServer(threading.Thread):
 
             self.lock.release()
 
-            # Wait for a ctrl-c to be received.
-            if self.packet_io.interrupt_event.wait(0.01):
+            # Wait for a ctrl-c to be received or the state monitor to report that the target state
+            # changed. Wake up early if an RTT poll or semihosting console flush is due, and
+            # periodically in case a notification was missed.
+            wait_time = self.RESUME_HEARTBEAT_INTERVAL
+            if self.rtt_server:
+                wait_time = min(wait_time, self.rtt_server.scheduler.time_until_poll)
+            if self.semihost:
+                wait_time = min(wait_time, self.semihost.time_until_console_flush)
+            self._wake_event.wait(wait_time)
+            self._wake_event.clear()
+            if self.packet_io.interrupt_event.is_set():
                 self.lock.acquire()
                 LOG.debug("receive CTRL-C")
                 self.packet_io.interrupt_event.clear()
@@ -624,9 +657,12 @@ class GDBServer(threading.Thread):
             try:
                 state = self.target.get_state()
 
-                if self.rtt_server:
+                if self.rtt_server and self.rtt_server.scheduler.is_poll_due:
                     self.rtt_server.poll()
 
+                if self.semihost:
+                    self.semihost.poll_console()
+
                 # If we were able to successfully read the target state after previously receiving a fault,
                 # then clear the timeout.
                 if fault_retry_timeout.is_running:
@@ -636,10 +672,9 @@ class GDBServer(threading.Thread):
                 if state == Target.State.HALTED:
                     # Handle semihosting
                     if self.enable_semihosting:
-                        was_semihost = self.semihost.check_and_handle_semihost_request()
+                        was_semihost = self.semihost.check_and_handle_semihost_request(resume=True)
 
                         if was_semihost:
-                            self.target.resume()
                             continue
 
                     pc = self.target_context.read_core_register('pc')
@@ -669,6 +704,10 @@ class GDBServer(threading.Thread):
             LOG.error("Timed out while attempting to reestablish control over target.")
             val = ('S%02x' % signals.SIGSEGV).encode()
 
+        # Make sure output written before an interrupt is visible while the target is halted.
+        if self.semihost:
+            self.semihost.flush_console()
+
         return self.create_rsp_packet(val)
 
     def step(self, data, start=0, end=0):
@@ -1242,7 +1281,10 @@ class GDBServer(threading.Thread):
             return None
 
     def event_handler(self, notification):
-        if notification.event == Target.Event.POST_RESET:
+        if notification.event == Target.Event.STATE_CHANGED:
+            # Wake resume() to check the target state.
+            self._wake_event.set()
+        elif notification.event == Target.Event.POST_RESET:
             # Invalidate threads list if flash is reprogrammed.
             LOG.debug("Received POST_RESET event")
             self.first_run_after_reset_or_flash = True
@@ -44,18 +44,22 @@ class GDBServerPacketIOThread(threading.Thread):
     handles verifying checksums, acking, and receiving Ctrl-C interrupts. There is a queue
     for received packets. The interface to this queue is the receive() method. The send()
     method writes outgoing packets to the socket immediately.
+
+    If a _wake_event_ is passed to the constructor, it is set along with `interrupt_event` when
+    a Ctrl-C is received. This lets the owner wait on a single event for several conditions.
     """
 
     ## 100 ms timeout for socket and receive queue reads.
     RECEIVE_TIMEOUT = 0.1
 
-    def __init__(self, abstract_socket):
+    def __init__(self, abstract_socket, wake_event=None):
         super().__init__()
         self.name = "gdb-packet-thread-port%d" % abstract_socket.port
         self._abstract_socket = abstract_socket
         self._receive_queue = queue.Queue()
         self._shutdown_event = threading.Event()
         self.interrupt_event = threading.Event()
+        self._wake_event = wake_event
         self.send_acks = True
         self._clear_send_acks = False
         self._buffer = b''
@@ -182,6 +186,8 @@ class GDBServerPacketIOThread(threading.Thread):
             # Check for a ctrl-c.
             if len(self._buffer) and self._buffer[0:1] == CTRL_C:
                 self.interrupt_event.set()
+                if self._wake_event is not None:
+                    self._wake_event.set()
                 self._buffer = self._buffer[1:]
 
             try:
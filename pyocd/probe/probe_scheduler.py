@@ -0,0 +1,239 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from contextlib import contextmanager
+import logging
+import threading
+from time import monotonic
+from typing import (Any, Deque, Dict, Iterator, List, Optional)
+
+from ..coresight.dap import (DP_SELECT, DPADDR_MASK, DP_SELECT1)
+
+LOG = logging.getLogger(__name__)
+
+## @brief Probe-level address of the DP register that is SELECT1 when SELECT.DPBANKSEL is 5.
+_DP_BANKED_REG = DP_SELECT1 & DPADDR_MASK
+
+## @brief DPBANKSEL value that selects SELECT1.
+_SELECT1_DPBANKSEL = 5
+
+## @brief Mask for the SELECT.DPBANKSEL field.
+_SELECT_DPBANKSEL_MASK = 0xf
+
+class ProbeClient:
+    """@brief Scheduling state and metrics for one client of a shared probe."""
+
+    def __init__(self, client_id: int, name: str) -> None:
+        self.client_id = client_id
+        self.name = name
+
+        ## Last values the client wrote to DP SELECT and SELECT1, or None if never written.
+        self.select: Optional[int] = None
+        self.select1: Optional[int] = None
+
+        ## Number of requests received but not yet completed.
+        self.queue_depth = 0
+
+        self.requests = 0
+        self.transactions = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+                "id": self.client_id,
+                "name": self.name,
+                "queue_depth": self.queue_depth,
+                "requests": self.requests,
+                "transactions": self.transactions,
+                "bytes_received": self.bytes_received,
+                "bytes_sent": self.bytes_sent,
+                "busy_time": self.busy_time,
+                "wait_time": self.wait_time,
+            }
+
+class ProbeScheduler:
+    """@brief Arbitrates access to a probe shared by the clients of a probe server.
+
+    Each client performs its requests in transactions. Only one transaction runs at a time. Clients
+    waiting to run a transaction are served in the order they started waiting, and a client can
+    only wait for one transaction at a time, so clients with requests pending get turns in
+    round-robin order. A client that sends a large burst of requests therefore cannot keep the
+    others waiting for more than one transaction.
+
+    A client holding the probe lock, from the `lock` request, has exclusive use of the probe. Only
+    its transactions run until it unlocks the probe or disconnects.
+
+    Each client expects the DP SELECT register to hold the value it last wrote. When a transaction
+    starts, the scheduler rewrites SELECT, and SELECT1 for ADIv6, if another client has changed
+    them since.
+    """
+
+    def __init__(self, probe: Any) -> None:
+        """@brief Constructor.
+        @param self
+        @param probe The shared probe, normally a SharedDebugProbeProxy.
+        """
+        self._probe = probe
+        self._cond = threading.Condition()
+        self._clients: Dict[int, ProbeClient] = {}
+        self._next_client_id = 0
+        self._waiting: Deque[ProbeClient] = deque()
+        self._active: Optional[ProbeClient] = None
+        self._lock_owner: Optional[ProbeClient] = None
+        self._lock_count = 0
+
+        # Values of SELECT and SELECT1 currently in the DP, as far as is known.
+        self._select: Optional[int] = None
+        self._select1: Optional[int] = None
+
+        self._start_time = monotonic()
+        self._busy_time = 0.0
+        self._transactions = 0
+
+    @property
+    def clients(self) -> List[ProbeClient]:
+        with self._cond:
+            return list(self._clients.values())
+
+    def add_client(self, name: str) -> ProbeClient:
+        """@brief Register a new client."""
+        with self._cond:
+            client = ProbeClient(self._next_client_id, name)
+            self._next_client_id += 1
+            self._clients[client.client_id] = client
+            return client
+
+    def remove_client(self, client: ProbeClient) -> None:
+        """@brief Unregister a client that has disconnected.
+
+        If the client still holds the probe lock, it is released. This must be called from the
+        thread that handled the client's requests, because that thread owns the probe lock.
+        """
+        with self._cond:
+            if self._lock_owner is client:
+                LOG.debug("releasing probe lock held by disconnected client %s", client.name)
+                for _ in range(self._lock_count):
+                    self._probe.unlock()
+                self._lock_owner = None
+                self._lock_count = 0
+            if client in self._waiting:
+                self._waiting.remove(client)
+            self._clients.pop(client.client_id, None)
+            self._cond.notify_all()
+
+    def _next_client(self) -> Optional[ProbeClient]:
+        if self._lock_owner is not None:
+            return self._lock_owner if (self._lock_owner in self._waiting) else None
+        return self._waiting[0] if self._waiting else None
+
+    @contextmanager
+    def transaction(self, client: ProbeClient, request_count: int = 1) -> Iterator[None]:
+        """@brief Context manager that waits for the client's turn to use the probe.
+        @param self
+        @param client The client performing the transaction.
+        @param request_count Number of requests in the transaction, used for the queue depth metric.
+        """
+        wait_start = monotonic()
+        with self._cond:
+            client.queue_depth += request_count
+            self._waiting.append(client)
+            while (self._active is not None) or (self._next_client() is not client):
+                self._cond.wait()
+            self._waiting.remove(client)
+            self._active = client
+        start = monotonic()
+        client.wait_time += start - wait_start
+        try:
+            self._restore_select(client)
+            yield
+        finally:
+            elapsed = monotonic() - start
+            with self._cond:
+                client.busy_time += elapsed
+                client.transactions += 1
+                client.requests += request_count
+                client.queue_depth -= request_count
+                self._busy_time += elapsed
+                self._transactions += 1
+                self._active = None
+                self._cond.notify_all()
+
+    def _restore_select(self, client: ProbeClient) -> None:
+        """@brief Rewrite SELECT and SELECT1 if they don't hold the values the client last wrote."""
+        if (client.select1 is not None) and (client.select1 != self._select1):
+            select = (client.select or 0) & ~_SELECT_DPBANKSEL_MASK
+            self._probe.write_dp(DP_SELECT, select | _SELECT1_DPBANKSEL)
+            self._probe.write_dp(_DP_BANKED_REG, client.select1)
+            self._select = None
+            self._select1 = client.select1
+        if (client.select is not None) and (client.select != self._select):
+            self._probe.write_dp(DP_SELECT, client.select)
+            self._select = client.select
+
+    def dp_written(self, client: ProbeClient, addr: int, value: int) -> None:
+        """@brief Record a DP register write made by a client during its transaction."""
+        if addr == DP_SELECT:
+            client.select = value
+            self._select = value
+        elif (addr == _DP_BANKED_REG) and (client.select is not None) \
+                and ((client.select & _SELECT_DPBANKSEL_MASK) == _SELECT1_DPBANKSEL):
+            client.select1 = value
+            self._select1 = value
+
+    def lock(self, client: ProbeClient) -> None:
+        """@brief Lock the probe for exclusive use by a client.
+
+        Must be called during one of the client's transactions, so no other client can hold the lock.
+        """
+        assert self._active is client
+        self._probe.lock()
+        with self._cond:
+            self._lock_owner = client
+            self._lock_count += 1
+
+    def unlock(self, client: ProbeClient) -> None:
+        """@brief Release one level of the probe lock held by a client."""
+        with self._cond:
+            if self._lock_owner is not client:
+                return
+            self._probe.unlock()
+            self._lock_count -= 1
+            if self._lock_count == 0:
+                self._lock_owner = None
+                self._cond.notify_all()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """@brief Return a dict of scheduler and per-client metrics.
+
+        The `utilization` value is the fraction of time since the server started that a
+        transaction was running on the probe.
+        """
+        with self._cond:
+            uptime = monotonic() - self._start_time
+            return {
+                    "uptime": uptime,
+                    "busy_time": self._busy_time,
+                    "utilization": (self._busy_time / uptime) if uptime > 0 else 0.0,
+                    "transactions": self._transactions,
+                    "waiting_clients": len(self._waiting),
+                    "queue_depth": sum(c.queue_depth for c in self._clients.values()),
+                    "lock_owner": self._lock_owner.client_id if (self._lock_owner is not None) else None,
+                    "clients": [c.get_metrics() for c in self._clients.values()],
+                }
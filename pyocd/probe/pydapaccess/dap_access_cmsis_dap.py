@@ -19,7 +19,9 @@
 import re
 import logging
 import collections
+import struct
 import threading
+from functools import lru_cache
 from typing import (Any, Dict, Optional, Tuple, Union)
 
 from .dap_settings import DAPSettings
@@ -65,6 +67,19 @@ LOG = logging.getLogger(__name__)
 TRACE = LOG.getChild("trace")
 TRACE.setLevel(logging.CRITICAL)
 
+# Header of a DAP_TransferBlock request: command, DAP index, transfer count, transfer request.
+_TRANSFER_BLOCK_REQUEST_HEADER = struct.Struct('<BBHB')
+
+@lru_cache(maxsize=None)
+def _u32le_struct(count: int) -> struct.Struct:
+    """@brief Return a cached Struct that packs or unpacks _count_ little endian 32-bit words."""
+    return struct.Struct('<%dI' % count)
+
+@lru_cache(maxsize=None)
+def _request_u32le_struct(count: int) -> struct.Struct:
+    """@brief Return a cached Struct for _count_ pairs of a request byte followed by a 32-bit word."""
+    return struct.Struct('<' + 'BI' * count)
+
 def _get_interfaces():
     """@brief Get the connected USB devices"""
     # Get CMSIS-DAPv1 interfaces.
@@ -100,6 +115,10 @@ class _Transfer(object):
 
     The transfer class contains a logical register read or a block
     of reads to the same register.
+
+    Response data is decoded straight out of the USB response packets. If a transfer's data is
+    split across more than one packet, the pieces are copied into a result buffer owned by the
+    transfer, and a cursor tracks how much of the buffer has been filled.
     """
 
     def __init__(self, daplink, dap_index, transfer_count,
@@ -118,6 +137,8 @@ class _Transfer(object):
         self._size_bytes = 0
         if transfer_request & READ:
             self._size_bytes = transfer_count * 4
+        self._buffer: Optional[bytearray] = None
+        self._received = 0
         self._result = None
         self._error = None
 
@@ -126,6 +147,42 @@ class _Transfer(object):
         """
         return self._size_bytes
 
+    def get_remaining_size(self):
+        """@brief Get the number of response bytes this transfer still needs.
+        """
+        return self._size_bytes - self._received
+
+    def add_response_data(self, data, offset):
+        """@brief Consume response data from a packet.
+
+        As many bytes as are available in _data_ starting from _offset_, up to the number of
+        bytes still required by this transfer, are consumed. If all of the transfer's data is
+        present, the result words are decoded directly from _data_ without copying. Otherwise the
+        data is accumulated in the transfer's result buffer until the final piece arrives.
+
+        @param self
+        @param data A memoryview of response data.
+        @param offset Index into _data_ of the first byte to consume.
+        @return Number of bytes consumed from _data_.
+        """
+        needed = self._size_bytes - self._received
+        available = len(data) - offset
+        if self._received == 0 and available >= needed:
+            self._received = needed
+            self._decode_result(data, offset)
+            return needed
+
+        if self._buffer is None:
+            self._buffer = bytearray(self._size_bytes)
+        count = min(available, needed)
+        end = self._received + count
+        self._buffer[self._received:end] = data[offset:offset + count]
+        self._received = end
+        if end == self._size_bytes:
+            self._decode_result(self._buffer, 0)
+            self._buffer = None
+        return count
+
     def add_response(self, data):
         """@brief Add data read from the remote device to this object.
 
@@ -133,12 +190,11 @@ class _Transfer(object):
         that get_data_size returns.
         """
         assert len(data) == self._size_bytes
-        result = []
-        for i in range(0, self._size_bytes, 4):
-            word = ((data[0 + i] << 0) | (data[1 + i] << 8) |
-                    (data[2 + i] << 16) | (data[3 + i] << 24))
-            result.append(word)
-        self._result = result
+        self._received = 0
+        self.add_response_data(memoryview(data), 0)
+
+    def _decode_result(self, data, offset):
+        self._result = list(_u32le_struct(self.transfer_count).unpack_from(data, offset))
 
     def add_error(self, error):
         """@brief Attach an exception to this transfer rather than data.
@@ -149,7 +205,7 @@ class _Transfer(object):
     def get_result(self):
         """@brief Get the result of this transfer.
         """
-        while self._result is None:
+        while self._result is None and self._error is None:
             if len(self.daplink._commands_to_read) > 0:
                 self.daplink._read_packet()
             else:
@@ -312,33 +368,27 @@ class _Command(object):
 
         The data returned by this function is a bytearray in
         the format that of a DAP_Transfer CMSIS-DAP command.
+
+        Each read or write added to the command is encoded with a single bulk operation.
         """
         assert self.get_empty() is False
         buf = bytearray(self._size)
         transfer_count = self._read_count + self._write_count
-        pos = 0
-        buf[pos] = Command.DAP_TRANSFER
-        pos += 1
-        buf[pos] = self._dap_index
-        pos += 1
-        buf[pos] = transfer_count
-        pos += 1
+        buf[0] = Command.DAP_TRANSFER
+        buf[1] = self._dap_index
+        buf[2] = transfer_count
+        pos = 3
         for count, request, write_list in self._data:
             assert write_list is None or len(write_list) <= count
-            write_pos = 0
-            for _ in range(count):
-                buf[pos] = request
-                pos += 1
-                if not request & READ:
-                    buf[pos] = (write_list[write_pos] >> (8 * 0)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 1)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 2)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 3)) & 0xff
-                    pos += 1
-                    write_pos += 1
+            if request & READ:
+                buf[pos:pos + count] = bytes((request,)) * count
+                pos += count
+            else:
+                packer = _request_u32le_struct(count)
+                values = [request, 0] * count
+                values[1::2] = write_list[:count]
+                packer.pack_into(buf, pos, *values)
+                pos += packer.size
         return buf[:pos]
 
     def _check_response(self, response):
@@ -398,38 +448,24 @@ class _Command(object):
 
         The data returned by this function is a bytearray in
         the format that of a DAP_TransferBlock CMSIS-DAP command.
+
+        Write data is packed into the buffer with a single bulk operation per added transfer.
         """
         assert self.get_empty() is False
         buf = bytearray(self._size)
         transfer_count = self._read_count + self._write_count
         assert not (self._read_count != 0 and self._write_count != 0)
         assert self._block_request is not None
-        pos = 0
-        buf[pos] = Command.DAP_TRANSFER_BLOCK
-        pos += 1
-        buf[pos] = self._dap_index
-        pos += 1
-        buf[pos] = transfer_count & 0xff
-        pos += 1
-        buf[pos] = (transfer_count >> 8) & 0xff
-        pos += 1
-        buf[pos] = self._block_request
-        pos += 1
-        for count, request, write_list in self._data:
-            assert write_list is None or len(write_list) <= count
-            assert request == self._block_request
-            write_pos = 0
-            if not request & READ:
-                for _ in range(count):
-                    buf[pos] = (write_list[write_pos] >> (8 * 0)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 1)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 2)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 3)) & 0xff
-                    pos += 1
-                    write_pos += 1
+        _TRANSFER_BLOCK_REQUEST_HEADER.pack_into(buf, 0, Command.DAP_TRANSFER_BLOCK, self._dap_index,
+                transfer_count, self._block_request)
+        pos = _TRANSFER_BLOCK_REQUEST_HEADER.size
+        if not self._block_request & READ:
+            for count, request, write_list in self._data:
+                assert write_list is None or len(write_list) <= count
+                assert request == self._block_request
+                packer = _u32le_struct(count)
+                packer.pack_into(buf, pos, *write_list[:count])
+                pos += packer.size
         return buf[:pos]
 
     def _decode_transfer_block_data(self, data):
@@ -449,7 +485,7 @@ class _Command(object):
         # Check for count mismatch after checking for DAP_TRANSFER_FAULT
         # This allows TransferFaultError or TransferTimeoutError to get
         # thrown instead of TransferFaultError
-        transfer_count = data[1] | (data[2] << 8)
+        transfer_count = int.from_bytes(data[1:3], 'little')
         if transfer_count != self._read_count + self._write_count:
             raise DAPAccessIntf.TransferError()
 
@@ -480,6 +516,101 @@ class _Command(object):
             data = self._decode_transfer_data(data)
         return data
 
+class _ReferenceTransfer(_Transfer):
+    """@brief _Transfer that decodes result words one byte at a time.
+
+    This is the reference implementation that the bulk decoding of _Transfer must match. It is
+    selected by setting DAPAccessCMSISDAP's `_transfer_class` attribute.
+    """
+
+    def _decode_result(self, data, offset):
+        result = []
+        for i in range(offset, offset + self._size_bytes, 4):
+            word = ((data[0 + i] << 0) | (data[1 + i] << 8) |
+                    (data[2 + i] << 16) | (data[3 + i] << 24))
+            result.append(word)
+        self._result = result
+
+class _ReferenceCommand(_Command):
+    """@brief _Command that encodes transfer packets one byte at a time.
+
+    This is the reference implementation that the bulk encoding of _Command must match. It is
+    selected by setting DAPAccessCMSISDAP's `_command_class` attribute.
+    """
+
+    def _encode_transfer_data(self):
+        """@brief Encode this command into a byte array that can be sent
+
+        The data returned by this function is a bytearray in
+        the format that of a DAP_Transfer CMSIS-DAP command.
+        """
+        assert self.get_empty() is False
+        buf = bytearray(self._size)
+        transfer_count = self._read_count + self._write_count
+        pos = 0
+        buf[pos] = Command.DAP_TRANSFER
+        pos += 1
+        buf[pos] = self._dap_index
+        pos += 1
+        buf[pos] = transfer_count
+        pos += 1
+        for count, request, write_list in self._data:
+            assert write_list is None or len(write_list) <= count
+            write_pos = 0
+            for _ in range(count):
+                buf[pos] = request
+                pos += 1
+                if not request & READ:
+                    buf[pos] = (write_list[write_pos] >> (8 * 0)) & 0xff
+                    pos += 1
+                    buf[pos] = (write_list[write_pos] >> (8 * 1)) & 0xff
+                    pos += 1
+                    buf[pos] = (write_list[write_pos] >> (8 * 2)) & 0xff
+                    pos += 1
+                    buf[pos] = (write_list[write_pos] >> (8 * 3)) & 0xff
+                    pos += 1
+                    write_pos += 1
+        return buf[:pos]
+
+    def _encode_transfer_block_data(self):
+        """@brief Encode this command into a byte array that can be sent
+
+        The data returned by this function is a bytearray in
+        the format that of a DAP_TransferBlock CMSIS-DAP command.
+        """
+        assert self.get_empty() is False
+        buf = bytearray(self._size)
+        transfer_count = self._read_count + self._write_count
+        assert not (self._read_count != 0 and self._write_count != 0)
+        assert self._block_request is not None
+        pos = 0
+        buf[pos] = Command.DAP_TRANSFER_BLOCK
+        pos += 1
+        buf[pos] = self._dap_index
+        pos += 1
+        buf[pos] = transfer_count & 0xff
+        pos += 1
+        buf[pos] = (transfer_count >> 8) & 0xff
+        pos += 1
+        buf[pos] = self._block_request
+        pos += 1
+        for count, request, write_list in self._data:
+            assert write_list is None or len(write_list) <= count
+            assert request == self._block_request
+            write_pos = 0
+            if not request & READ:
+                for _ in range(count):
+                    buf[pos] = (write_list[write_pos] >> (8 * 0)) & 0xff
+                    pos += 1
+                    buf[pos] = (write_list[write_pos] >> (8 * 1)) & 0xff
+                    pos += 1
+                    buf[pos] = (write_list[write_pos] >> (8 * 2)) & 0xff
+                    pos += 1
+                    buf[pos] = (write_list[write_pos] >> (8 * 3)) & 0xff
+                    pos += 1
+                    write_pos += 1
+        return buf[:pos]
+
 class DAPAccessCMSISDAP(DAPAccessIntf):
     """@brief An implementation of the DAPAccessIntf layer for DAPLink boards
 
@@ -488,6 +619,11 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
     prior to using methods of that object. Otherwise the command responses may be processed out of order.
     """
 
+    ## Classes used to build transfer packets and decode their responses. These can be changed to
+    # _ReferenceCommand and _ReferenceTransfer to use the unoptimized byte-wise encoding.
+    _command_class = _Command
+    _transfer_class = _Transfer
+
     # ------------------------------------------- #
     #          Static Functions
     # ------------------------------------------- #
@@ -583,10 +719,9 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         self._frequency = 1000000  # 1MHz default clock
         self._dap_port = None
         self._transfer_list = collections.deque()
-        self._crnt_cmd = _Command(0)
+        self._crnt_cmd = self._command_class(0)
         self._packet_size = None
         self._commands_to_read = collections.deque()
-        self._command_response_buf = bytearray()
         self._swo_status = None
         self._cmsis_dap_version: VersionTuple = CMSISDAPVersion.V1_0_0
         self._fw_version: Optional[str] = None
@@ -815,7 +950,7 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         self.flush()
         self._interface.close()
         self._is_open = False
-        self._crnt_cmd = _Command(0)
+        self._crnt_cmd = self._command_class(0)
 
     def get_unique_id(self):
         return self._unique_id
@@ -1133,12 +1268,9 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         self._transfer_list.clear()
         # The current packet - this can contain multiple
         # different transfers
-        self._crnt_cmd = _Command(self._packet_size)
+        self._crnt_cmd = self._command_class(self._packet_size)
         # Packets that have been sent but not read
         self._commands_to_read.clear()
-        # Buffer for data returned for completed commands.
-        # This data will be added to transfers
-        self._command_response_buf = bytearray()
 
     @locked
     def _read_packet(self):
@@ -1153,37 +1285,28 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         TRACE.debug("[cmd:%d] _read_packet: reading", cmd.uid)
         try:
             raw_data = self._interface.read()
-            raw_data = bytearray(raw_data)
-            decoded_data = cmd.decode_data(raw_data)
+            try:
+                raw_view = memoryview(raw_data)
+            except TypeError:
+                # Some backends return a list of ints rather than a buffer object.
+                raw_view = memoryview(bytes(raw_data))
+            decoded_data = cmd.decode_data(raw_view)
         except Exception as exception:
             TRACE.debug("[cmd:%d] _read_packet: got exception %r; aborting all transfers!", cmd.uid, exception)
             self._abort_all_transfers(exception)
             raise
 
-        decoded_data = bytearray(decoded_data)
-        self._command_response_buf.extend(decoded_data)
-
-        # Attach data to transfers
+        # Attach data to transfers. The response data is copied straight from the packet into each
+        # transfer's result buffer; a transfer whose data continues in the next packet simply stays
+        # at the head of the transfer list with its buffer partially filled.
         pos = 0
-        while True:
-            size_left = len(self._command_response_buf) - pos
-            if size_left == 0:
-                # If size left is 0 then the transfer list might
-                # be empty, so don't try to access element 0
-                break
-            transfer = self._transfer_list[0]
-            size = transfer.get_data_size()
-            if size > size_left:
-                break
-
-            self._transfer_list.popleft()
-            data = self._command_response_buf[pos:pos + size]
-            pos += size
-            transfer.add_response(data)
-
-        # Remove used data from _command_response_buf
-        if pos > 0:
-            self._command_response_buf = self._command_response_buf[pos:]
+        size = len(decoded_data)
+        transfer_list = self._transfer_list
+        while pos < size:
+            transfer = transfer_list[0]
+            pos += transfer.add_response_data(decoded_data, pos)
+            if transfer.get_remaining_size() == 0:
+                transfer_list.popleft()
 
     @locked
     def _send_packet(self):
@@ -1211,7 +1334,7 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
             self._abort_all_transfers(exception)
             raise
         self._commands_to_read.append(cmd)
-        self._crnt_cmd = _Command(self._packet_size)
+        self._crnt_cmd = self._command_class(self._packet_size)
 
     @locked
     def _write(self, dap_index, transfer_count,
@@ -1226,7 +1349,7 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         # Create transfer and add to transfer list
         transfer = None
         if transfer_request & READ:
-            transfer = _Transfer(self, dap_index, transfer_count,
+            transfer = self._transfer_class(self, dap_index, transfer_count,
                                  transfer_request, transfer_data)
             self._transfer_list.append(transfer)
 
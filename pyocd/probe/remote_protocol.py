@@ -0,0 +1,169 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""@brief Definitions shared by the client and server of version 2 of the remote probe protocol.
+
+Version 2 is selected with the JSON `hello` request of version 1. Once the server has replied, all
+further messages in both directions are binary frames. See docs/remote_probe_protocol.md for a
+description of the protocol.
+"""
+
+from enum import IntEnum
+import struct
+from typing import (List, Sequence, Tuple)
+
+## @brief Protocol version using newline-delimited JSON requests and responses.
+PROTOCOL_VERSION_JSON = 1
+
+## @brief Protocol version using binary frames and pipelined requests.
+PROTOCOL_VERSION_BINARY = 2
+
+class Op(IntEnum):
+    """@brief Binary protocol operation codes."""
+    ## Any version 1 request, with the request name and arguments encoded as a JSON object.
+    JSON = 0
+    READ_DP = 1
+    WRITE_DP = 2
+    READ_AP = 3
+    WRITE_AP = 4
+    READ_AP_MULTIPLE = 5
+    WRITE_AP_MULTIPLE = 6
+    READ_MEM = 7
+    WRITE_MEM = 8
+    READ_BLOCK32 = 9
+    WRITE_BLOCK32 = 10
+    READ_BLOCK8 = 11
+    WRITE_BLOCK8 = 12
+    FLUSH = 13
+    SWO_READ = 14
+    ## A sequence of other operations performed in order, with a single response.
+    BATCH = 15
+
+## @brief Length of the frame body that follows.
+FRAME_HEADER = struct.Struct('<I')
+
+## @brief Request ID and operation code at the start of a request frame body.
+REQUEST_HEADER = struct.Struct('<IB')
+
+## @brief Request ID and status code at the start of a response frame body.
+RESPONSE_HEADER = struct.Struct('<IB')
+
+## @brief Index of the failed operation at the start of the body of an error response. The error
+# message follows as UTF-8.
+ERROR_INDEX = struct.Struct('<I')
+
+## @brief Number of operations at the start of a batch request or response.
+BATCH_COUNT = struct.Struct('<I')
+
+## @brief Operation code and argument length preceding each operation of a batch request.
+BATCH_OP_HEADER = struct.Struct('<BI')
+
+## @brief Result length preceding each result of a batch response.
+BATCH_RESULT_HEADER = struct.Struct('<I')
+
+U32 = struct.Struct('<I')
+U32x2 = struct.Struct('<II')
+U32x3 = struct.Struct('<III')
+## Handle, address and transfer size of a memory read.
+READ_MEM_ARGS = struct.Struct('<IIB')
+## Handle, address, value and transfer size of a memory write.
+WRITE_MEM_ARGS = struct.Struct('<IIIB')
+
+## @brief Largest frame body accepted, to catch corrupt streams.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+def pack_words(values: Sequence[int]) -> bytes:
+    """@brief Pack a sequence of 32-bit words into little-endian bytes."""
+    return struct.pack('<%dI' % len(values), *values)
+
+def unpack_words(data: bytes) -> List[int]:
+    """@brief Unpack little-endian bytes into a list of 32-bit words."""
+    return list(struct.unpack('<%dI' % (len(data) // 4), data))
+
+def encode_frame(body: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(body)) + body
+
+def encode_request(request_id: int, op: int, args: bytes = b'') -> bytes:
+    return encode_frame(REQUEST_HEADER.pack(request_id, op) + args)
+
+def encode_response(request_id: int, status: int, payload: bytes = b'') -> bytes:
+    return encode_frame(RESPONSE_HEADER.pack(request_id, status) + payload)
+
+def encode_batch(ops: Sequence[Tuple[int, bytes]]) -> bytes:
+    """@brief Build the arguments of a batch request from a sequence of (op, args) pairs."""
+    parts = [BATCH_COUNT.pack(len(ops))]
+    for op, args in ops:
+        parts.append(BATCH_OP_HEADER.pack(op, len(args)))
+        parts.append(args)
+    return b''.join(parts)
+
+def decode_batch(data: bytes) -> List[Tuple[int, bytes]]:
+    """@brief Split the arguments of a batch request into (op, args) pairs."""
+    count, = BATCH_COUNT.unpack_from(data)
+    offset = BATCH_COUNT.size
+    ops = []
+    for _ in range(count):
+        op, length = BATCH_OP_HEADER.unpack_from(data, offset)
+        offset += BATCH_OP_HEADER.size
+        ops.append((op, data[offset:offset + length]))
+        offset += length
+    return ops
+
+def encode_batch_results(results: Sequence[bytes]) -> bytes:
+    parts = [BATCH_COUNT.pack(len(results))]
+    for result in results:
+        parts.append(BATCH_RESULT_HEADER.pack(len(result)))
+        parts.append(result)
+    return b''.join(parts)
+
+def decode_batch_results(data: bytes) -> List[bytes]:
+    count, = BATCH_COUNT.unpack_from(data)
+    offset = BATCH_COUNT.size
+    results = []
+    for _ in range(count):
+        length, = BATCH_RESULT_HEADER.unpack_from(data, offset)
+        offset += BATCH_RESULT_HEADER.size
+        results.append(data[offset:offset + length])
+        offset += length
+    return results
+
+class FrameDecoder:
+    """@brief Splits a byte stream into frame bodies.
+
+    Data can be fed in pieces of any size. Incomplete frames are kept until the rest arrives.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """@brief Add received data and return the bodies of all frames completed by it.
+        @exception ValueError A frame header has an invalid length.
+        """
+        buf = self._buffer
+        buf += data
+        frames = []
+        offset = 0
+        while len(buf) - offset >= FRAME_HEADER.size:
+            length, = FRAME_HEADER.unpack_from(buf, offset)
+            if length > MAX_FRAME_SIZE:
+                raise ValueError("remote probe protocol frame too large (%d bytes)" % length)
+            end = offset + FRAME_HEADER.size + length
+            if end > len(buf):
+                break
+            frames.append(bytes(buf[offset + FRAME_HEADER.size:end]))
+            offset = end
+        del buf[:offset]
+        return frames
@@ -15,12 +15,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import logging
 import json
 import threading
-from typing import (Any, Optional, Tuple)
+from typing import (Any, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple)
+import weakref
 
 from .debug_probe import DebugProbe
+from . import remote_protocol as rp
 from ..core import exceptions
 from ..core.memory_interface import MemoryInterface
 from ..core.plugin import Plugin
@@ -56,11 +59,36 @@ class TCPClientProbe(DebugProbe):
         ["result": <value>]
     }
     ````
+
+    If the server supports it, version 2 of the protocol is selected when the connection is opened.
+    Requests are then sent as binary frames and many requests may be outstanding at once. DAP and
+    memory writes are queued locally and sent to the server as a single batch request when any other
+    request is made, such as a read or flush, or when the queue reaches a size limit. Reads with
+    `now=False` return a callback that waits for the response only when called. If such a callback
+    is discarded without being called, its response is dropped when it arrives. An error from a
+    write is raised by the next read or flush, as with a local probe.
     """
 
     DEFAULT_PORT = 5555
 
-    PROTOCOL_VERSION = 1
+    ## Highest protocol version requested from the server.
+    PROTOCOL_VERSION = rp.PROTOCOL_VERSION_BINARY
+
+    ## Maximum number of binary requests sent before responses are read from the socket.
+    MAX_IN_FLIGHT = 128
+
+    ## Maximum total size of the request frames sent and the response frames expected before
+    # responses are read from the socket. This is kept below typical socket buffer sizes.
+    MAX_IN_FLIGHT_BYTES = 32 * 1024
+
+    ## Queued writes are sent once this many are queued.
+    WRITE_QUEUE_MAX_OPS = 1024
+
+    ## Queued writes are sent once their arguments total this many bytes.
+    WRITE_QUEUE_MAX_BYTES = 64 * 1024
+
+    ## Write operations that access memory, for which a fault address can be determined.
+    _MEMORY_WRITE_OPS = (rp.Op.WRITE_MEM, rp.Op.WRITE_BLOCK32, rp.Op.WRITE_BLOCK8)
 
     class StatusCode:
         """@brief Constants for errors reported from the server."""
@@ -111,6 +139,24 @@ class TCPClientProbe(DebugProbe):
         self._request_id = 0
         self._lock_count = 0
         self._lock_count_lock = threading.RLock()
+        self._protocol_version = rp.PROTOCOL_VERSION_JSON
+
+        # Binary protocol state.
+        self._in_flight = 0
+        self._in_flight_bytes = 0
+        # Map from request ID to the bytes counted in flight for the request.
+        self._request_sizes: Dict[int, int] = {}
+        self._responses: Dict[int, Tuple[int, bytes]] = {}
+        # IDs of deferred reads whose callback was discarded without being called. Only appended to
+        # by finalizers, which may run in any thread.
+        self._abandoned_reads: Deque[int] = collections.deque()
+        # IDs of abandoned reads whose response has not yet arrived.
+        self._discarded_responses: Set[int] = set()
+        self._write_queue: List[Tuple[int, bytes]] = []
+        self._write_queue_bytes = 0
+        # Map from request ID to the write operations sent in that request.
+        self._unchecked_writes: Dict[int, Sequence[Tuple[int, bytes]]] = {}
+        self._deferred_error: Optional[BaseException] = None
 
     @property
     def vendor_name(self):
@@ -140,11 +186,16 @@ class TCPClientProbe(DebugProbe):
     def capabilities(self):
         return self._read_property('capabilities')
 
+    @property
+    def protocol_version(self) -> int:
+        """@brief Version of the remote probe protocol in use."""
+        return self._protocol_version
+
     @property
     def request_id(self):
         """@brief Generate a new request ID."""
         rid = self._request_id
-        self._request_id += 1
+        self._request_id = (self._request_id + 1) & 0xffffffff
         return rid
 
     def _perform_request_without_raise(self, request: str, *args: Any) -> Tuple[Any, Optional[BaseException]]:
@@ -154,6 +205,9 @@ class TCPClientProbe(DebugProbe):
         exception object. The latter is only non-None if the request failed and a non-zero status code was
         returned.
         """
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            return self._perform_json_request_v2(request, *args)
+
         # Protect requests with the local lock.
         with self._lock:
             rq = {
@@ -196,6 +250,194 @@ class TCPClientProbe(DebugProbe):
 
             return result, exc
 
+    def _perform_json_request_v2(self, request: str, *args: Any) -> Tuple[Any, Optional[BaseException]]:
+        """@brief Execute a version 1 style request with the binary protocol.
+
+        Queued writes are sent before the request. An error from an earlier write is raised,
+        rather than returned, in preference to an error from the request.
+        """
+        rq: Dict[str, Any] = {"request": request}
+        if len(args):
+            rq["arguments"] = args
+        formatted_request = json.dumps(rq)
+        TRACE.debug("Request: %s", formatted_request)
+        with self._lock:
+            rid = self._send_request_v2(rp.Op.JSON, formatted_request.encode('utf-8'))
+            payload, exc = self._receive_response_v2(rid, request)
+        self._raise_deferred_error_v2()
+        result = json.loads(payload) if (exc is None) else None
+        return result, exc
+
+    def _send_request_v2(self, op: int, args: bytes = b'', response_size: int = 0) -> int:
+        """@brief Send a binary request without waiting for the response.
+
+        Any queued writes are sent first, so requests are performed in the order they were made.
+
+        @param self
+        @param op Operation code.
+        @param args Encoded arguments.
+        @param response_size Expected size of the response payload.
+        @return The request ID.
+        """
+        with self._lock:
+            self._send_write_queue_v2()
+            return self._send_frame_v2(op, args, response_size)
+
+    def _send_frame_v2(self, op: int, args: bytes, response_size: int = 0) -> int:
+        """@brief Send a request frame.
+
+        Both the number of requests whose responses have not been read from the socket, and the
+        total size of those requests and their expected responses are limited, so neither end can
+        block forever on a full socket buffer. A request larger than the size limit is only sent
+        once all other responses have been read.
+
+        @return The request ID.
+        """
+        with self._lock:
+            rid = self.request_id
+            frame = rp.encode_request(rid, op, args)
+            size = len(frame) + rp.FRAME_HEADER.size + rp.RESPONSE_HEADER.size + response_size
+            if self._in_flight >= self.MAX_IN_FLIGHT:
+                while self._in_flight > self.MAX_IN_FLIGHT // 2:
+                    self._read_response_frame_v2()
+            while (self._in_flight > 0) and (self._in_flight_bytes + size > self.MAX_IN_FLIGHT_BYTES):
+                self._read_response_frame_v2()
+            TRACE.debug("Request: id=%d op=%d args=%s", rid, op, args.hex())
+            self._socket.write(frame)
+            self._in_flight += 1
+            self._in_flight_bytes += size
+            self._request_sizes[rid] = size
+            return rid
+
+    def _post_write_v2(self, op: int, args: bytes) -> None:
+        """@brief Queue a write operation whose result is checked later."""
+        with self._lock:
+            self._write_queue.append((op, args))
+            self._write_queue_bytes += len(args)
+            if ((len(self._write_queue) >= self.WRITE_QUEUE_MAX_OPS)
+                    or (self._write_queue_bytes >= self.WRITE_QUEUE_MAX_BYTES)):
+                self._send_write_queue_v2()
+
+    def _send_write_queue_v2(self) -> None:
+        """@brief Send all queued writes in one request."""
+        with self._lock:
+            ops = self._write_queue
+            if not ops:
+                return
+            self._write_queue = []
+            self._write_queue_bytes = 0
+            if len(ops) == 1:
+                rid = self._send_frame_v2(*ops[0])
+            else:
+                rid = self._send_frame_v2(rp.Op.BATCH, rp.encode_batch(ops))
+            self._unchecked_writes[rid] = ops
+
+    def _read_response_frame_v2(self) -> None:
+        """@brief Read one response frame from the socket and store or check it."""
+        length, = rp.FRAME_HEADER.unpack(self._socket.read_exactly(rp.FRAME_HEADER.size))
+        body = self._socket.read_exactly(length)
+        rid, status = rp.RESPONSE_HEADER.unpack_from(body)
+        payload = body[rp.RESPONSE_HEADER.size:]
+        TRACE.debug("Response: id=%d status=%d payload=%s", rid, status, payload.hex())
+        self._in_flight -= 1
+        self._in_flight_bytes -= self._request_sizes.pop(rid, 0)
+        self._drop_abandoned_reads_v2()
+        if rid in self._unchecked_writes:
+            ops = self._unchecked_writes.pop(rid)
+            if status != 0 and self._deferred_error is None:
+                self._deferred_error = self._create_write_error_v2(status, payload, ops)
+        elif rid in self._discarded_responses:
+            self._discarded_responses.remove(rid)
+        else:
+            self._responses[rid] = (status, payload)
+
+    def _drop_abandoned_reads_v2(self) -> None:
+        """@brief Drop the responses to deferred reads whose callback was discarded."""
+        while self._abandoned_reads:
+            rid = self._abandoned_reads.popleft()
+            if self._responses.pop(rid, None) is None:
+                self._discarded_responses.add(rid)
+
+    def _create_error_v2(self, status: int, payload: bytes, request: str) -> BaseException:
+        index, = rp.ERROR_INDEX.unpack_from(payload)
+        error = payload[rp.ERROR_INDEX.size:].decode('utf-8', 'replace')
+        LOG.debug("error received from server for command %s (status code %i, op index %i): %s",
+                request, status, index, error)
+        return self.STATUS_CODE_CLASS_MAP.get(status, exceptions.ProbeError)(
+                "error received from server for command %s (status code %i): %s"
+                % (request, status, error))
+
+    def _create_write_error_v2(self, status: int, payload: bytes,
+            ops: Sequence[Tuple[int, bytes]]) -> BaseException:
+        """@brief Create the exception for a failed request of queued writes.
+
+        The exception identifies the failed write. For memory writes, the fault address and length
+        of a TransferFaultError are filled in if the server did not report them.
+        """
+        index, = rp.ERROR_INDEX.unpack_from(payload)
+        if index >= len(ops):
+            return self._create_error_v2(status, payload, "write")
+        op, args = ops[index]
+        name = rp.Op(op).name.lower()
+        if len(ops) > 1:
+            name += " (write %i of %i in batch)" % (index + 1, len(ops))
+        exc = self._create_error_v2(status, payload, name)
+        if isinstance(exc, exceptions.TransferFaultError) and (op in self._MEMORY_WRITE_OPS):
+            _, addr = rp.U32x2.unpack_from(args)
+            exc.fault_address = addr
+            if op == rp.Op.WRITE_MEM:
+                exc.fault_length = rp.WRITE_MEM_ARGS.unpack(args)[3] // 8
+            else:
+                exc.fault_length = len(args) - rp.U32x2.size
+        return exc
+
+    def _receive_response_v2(self, rid: int, request: str) -> Tuple[bytes, Optional[BaseException]]:
+        """@brief Wait for the response to a binary request.
+        @return 2-tuple of the response payload and an optional exception.
+        """
+        with self._lock:
+            while rid not in self._responses:
+                self._read_response_frame_v2()
+            status, payload = self._responses.pop(rid)
+        if status != 0:
+            return b'', self._create_error_v2(status, payload, request)
+        return payload, None
+
+    def _raise_deferred_error_v2(self) -> None:
+        """@brief Raise the first error returned for a write since the last check."""
+        exc = self._deferred_error
+        if exc is not None:
+            self._deferred_error = None
+            raise exc
+
+    def _read_v2(self, op: int, args: bytes, decoder: Callable[[bytes], Any], request: str,
+            now: bool = True, response_size: int = 4) -> Any:
+        """@brief Send a binary read request and return its result or a callback for the result.
+
+        An error from an earlier write is raised in preference to an error from the read. If the
+        callback returned when _now_ is False is discarded without being called, the response is
+        dropped.
+        """
+        rid = self._send_request_v2(op, args, response_size)
+
+        def read_cb():
+            payload, exc = self._receive_response_v2(rid, request)
+            # Raise any exception here so the traceback includes the actual caller.
+            self._raise_deferred_error_v2()
+            if exc is not None:
+                raise exc
+            return decoder(payload)
+
+        if now:
+            return read_cb()
+
+        def deferred_read_cb():
+            finalizer.detach()
+            return read_cb()
+
+        finalizer = weakref.finalize(deferred_read_cb, self._abandoned_reads.append, rid)
+        return deferred_read_cb
+
     def _perform_request(self, request: str, *args: Any) -> Any:
         """@brief Perform the request and immediately raise any errors."""
         result, exc = self._perform_request_without_raise(request, *args)
@@ -222,12 +464,34 @@ class TCPClientProbe(DebugProbe):
             self._socket.connect()
             self._is_open = True
             self._socket.set_timeout(0.1)
-
-        # Send hello message.
-        self._perform_request('hello', self.PROTOCOL_VERSION)
+            self._negotiate_protocol_version()
 
         self._perform_request('open')
 
+    def _negotiate_protocol_version(self):
+        """@brief Send the hello message, falling back to version 1 for older servers."""
+        self._protocol_version = rp.PROTOCOL_VERSION_JSON
+        self._in_flight = 0
+        self._in_flight_bytes = 0
+        self._request_sizes.clear()
+        self._responses.clear()
+        self._abandoned_reads.clear()
+        self._discarded_responses.clear()
+        self._write_queue = []
+        self._write_queue_bytes = 0
+        self._unchecked_writes.clear()
+        self._deferred_error = None
+        try:
+            self._perform_request('hello', self.PROTOCOL_VERSION)
+        except exceptions.ProbeDisconnected:
+            raise
+        except exceptions.Error as err:
+            LOG.debug("server does not support protocol version %i (%s); using version %i",
+                    self.PROTOCOL_VERSION, err, rp.PROTOCOL_VERSION_JSON)
+            self._perform_request('hello', rp.PROTOCOL_VERSION_JSON)
+        else:
+            self._protocol_version = self.PROTOCOL_VERSION
+
     def close(self):
         if self._is_open:
             self._perform_request('close')
@@ -275,6 +539,14 @@ class TCPClientProbe(DebugProbe):
     def reset(self):
         self._perform_request('reset')
 
+    def get_server_metrics(self) -> Dict[str, Any]:
+        """@brief Return the probe server's scheduling metrics.
+
+        The result is the dict returned by the server's
+        @ref pyocd.probe.probe_scheduler.ProbeScheduler.get_metrics() "ProbeScheduler.get_metrics()".
+        """
+        return self._perform_request('server_metrics')
+
     def assert_reset(self, asserted):
         self._perform_request('assert_reset', asserted)
 
@@ -282,7 +554,10 @@ class TCPClientProbe(DebugProbe):
         return self._perform_request('is_reset_asserted')
 
     def flush(self):
-        self._perform_request('flush')
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            self._read_v2(rp.Op.FLUSH, b'', lambda payload: None, 'flush')
+        else:
+            self._perform_request('flush')
 
     ##@}
 
@@ -290,6 +565,9 @@ class TCPClientProbe(DebugProbe):
     ##@{
 
     def read_dp(self, addr, now=True):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            return self._read_v2(rp.Op.READ_DP, rp.U32.pack(addr), _decode_u32, 'read_dp', now)
+
         result, exc = self._perform_request_without_raise('read_dp', addr)
 
         def read_dp_cb():
@@ -301,9 +579,15 @@ class TCPClientProbe(DebugProbe):
         return read_dp_cb() if now else read_dp_cb
 
     def write_dp(self, addr, data):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            self._post_write_v2(rp.Op.WRITE_DP, rp.U32x2.pack(addr, data))
+            return
         self._perform_request('write_dp', addr, data)
 
     def read_ap(self, addr, now=True):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            return self._read_v2(rp.Op.READ_AP, rp.U32.pack(addr), _decode_u32, 'read_ap', now)
+
         result, exc = self._perform_request_without_raise('read_ap', addr)
 
         def read_ap_cb():
@@ -315,9 +599,16 @@ class TCPClientProbe(DebugProbe):
         return read_ap_cb() if now else read_ap_cb
 
     def write_ap(self, addr, data):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            self._post_write_v2(rp.Op.WRITE_AP, rp.U32x2.pack(addr, data))
+            return
         self._perform_request('write_ap', addr, data)
 
     def read_ap_multiple(self, addr, count=1, now=True):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            return self._read_v2(rp.Op.READ_AP_MULTIPLE, rp.U32x2.pack(addr, count), rp.unpack_words,
+                    'read_ap_multiple', now, response_size=4 * count)
+
         results, exc = self._perform_request_without_raise('read_ap_multiple', addr, count)
 
         def read_ap_multiple_cb():
@@ -329,6 +620,9 @@ class TCPClientProbe(DebugProbe):
         return read_ap_multiple_cb() if now else read_ap_multiple_cb
 
     def write_ap_multiple(self, addr, values):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            self._post_write_v2(rp.Op.WRITE_AP_MULTIPLE, rp.U32.pack(addr) + rp.pack_words(values))
+            return
         self._perform_request('write_ap_multiple', addr, values)
 
     def get_memory_interface_for_ap(self, ap_address):
@@ -353,10 +647,15 @@ class TCPClientProbe(DebugProbe):
         self._perform_request('swo_stop')
 
     def swo_read(self):
+        if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+            return self._read_v2(rp.Op.SWO_READ, b'', bytearray, 'swo_read')
         return self._perform_request('swo_read')
 
     ##@}
 
+def _decode_u32(payload: bytes) -> int:
+    return rp.U32.unpack(payload)[0]
+
 class RemoteMemoryInterface(MemoryInterface):
     """@brief Local proxy for a remote memory interface."""
 
@@ -364,12 +663,24 @@ class RemoteMemoryInterface(MemoryInterface):
         self._remote_probe = remote_probe
         self._handle = handle
 
+    @property
+    def _is_binary(self):
+        return self._remote_probe.protocol_version == rp.PROTOCOL_VERSION_BINARY
+
     def write_memory(self, addr, data, transfer_size=32, **attrs):
         assert transfer_size in (8, 16, 32)
+        if self._is_binary:
+            self._remote_probe._post_write_v2(rp.Op.WRITE_MEM,
+                    rp.WRITE_MEM_ARGS.pack(self._handle, addr, data, transfer_size))
+            return
         self._remote_probe._perform_request('write_mem', self._handle, addr, data, transfer_size)
 
     def read_memory(self, addr, transfer_size=32, now=True, **attrs):
         assert transfer_size in (8, 16, 32)
+        if self._is_binary:
+            return self._remote_probe._read_v2(rp.Op.READ_MEM,
+                    rp.READ_MEM_ARGS.pack(self._handle, addr, transfer_size), _decode_u32, 'read_mem', now)
+
         result, exc = self._remote_probe._perform_request_without_raise('read_mem', self._handle, addr, transfer_size)
 
         def read_callback():
@@ -380,15 +691,29 @@ class RemoteMemoryInterface(MemoryInterface):
         return read_callback() if now else read_callback
 
     def write_memory_block32(self, addr, data, **attrs):
+        if self._is_binary:
+            self._remote_probe._post_write_v2(rp.Op.WRITE_BLOCK32,
+                    rp.U32x2.pack(self._handle, addr) + rp.pack_words(data))
+            return
         self._remote_probe._perform_request('write_block32', self._handle, addr, data)
 
     def read_memory_block32(self, addr, size, **attrs):
+        if self._is_binary:
+            return self._remote_probe._read_v2(rp.Op.READ_BLOCK32, rp.U32x3.pack(self._handle, addr, size),
+                    rp.unpack_words, 'read_block32', response_size=4 * size)
         return self._remote_probe._perform_request('read_block32', self._handle, addr, size)
 
     def write_memory_block8(self, addr, data, **attrs):
+        if self._is_binary:
+            self._remote_probe._post_write_v2(rp.Op.WRITE_BLOCK8,
+                    rp.U32x2.pack(self._handle, addr) + bytes(data))
+            return
         self._remote_probe._perform_request('write_block8', self._handle, addr, data)
 
     def read_memory_block8(self, addr, size, **attrs):
+        if self._is_binary:
+            return self._remote_probe._read_v2(rp.Op.READ_BLOCK8, rp.U32x3.pack(self._handle, addr, size),
+                    list, 'read_block8', response_size=size)
         return self._remote_probe._perform_request('read_block8', self._handle, addr, size)
 
 class TCPClientProbePlugin(Plugin):
@@ -21,9 +21,11 @@ import json
 import socket
 from socketserver import (ThreadingTCPServer, StreamRequestHandler)
 from time import sleep
-from typing import (Callable, Dict, Optional, TYPE_CHECKING, Tuple, cast)
+from typing import (Callable, Dict, List, Optional, TYPE_CHECKING, Tuple, Union, cast)
 
 from .shared_probe_proxy import SharedDebugProbeProxy
+from .probe_scheduler import ProbeScheduler
+from . import remote_protocol as rp
 from ..core import exceptions
 from .debug_probe import DebugProbe
 from ..coresight.ap import (APVersion, APv1Address, APv2Address)
@@ -125,6 +127,11 @@ class DebugProbeServer(threading.Thread):
         """@brief Whether the server thread is running."""
         return self._is_running
 
+    @property
+    def scheduler(self) -> ProbeScheduler:
+        """@brief The scheduler that arbitrates between the server's clients."""
+        return self._server.scheduler
+
     @property
     def port(self) -> int:
         """@brief The server's port.
@@ -136,13 +143,14 @@ class DebugProbeServer(threading.Thread):
 
     def run(self) -> None:
         """@brief The server thread implementation."""
-        self._did_start = True
-        self._is_running = True
-
-        # Read back the actual port if 0 was specified.
+        # Read back the actual port if 0 was specified. This is done before signalling that the
+        # thread has started so the port is valid when start() returns.
         if self._port == 0:
             self._port = self._server.socket.getsockname()[1]
 
+        self._did_start = True
+        self._is_running = True
+
         LOG.info("Serving debug probe %s (%s) on port %i",
                 self._probe.description, self._probe.unique_id, self._port)
         self._server.serve_forever()
@@ -157,6 +165,7 @@ class TCPProbeServer(ThreadingTCPServer):
     def __init__(self, server_address: Tuple[str, int], session: "Session", probe: DebugProbe):
         self._session = session
         self._probe = probe
+        self._scheduler = ProbeScheduler(probe)
         super().__init__(server_address, DebugProbeRequestHandler,
             bind_and_activate=False)
 
@@ -168,6 +177,10 @@ class TCPProbeServer(ThreadingTCPServer):
     def probe(self) -> DebugProbe:
         return self._probe
 
+    @property
+    def scheduler(self) -> ProbeScheduler:
+        return self._scheduler
+
     def handle_error(self, request, client_address):
         LOG.error("Error while handling client request (client address %s):", client_address,
             exc_info=self._session.log_tracebacks)
@@ -198,7 +211,25 @@ class DebugProbeRequestHandler(StreamRequestHandler):
     """
 
     ## Current version of the remote probe protocol.
-    PROTOCOL_VERSION = 1
+    PROTOCOL_VERSION = rp.PROTOCOL_VERSION_BINARY
+
+    ## Protocol versions a client may request with 'hello'.
+    SUPPORTED_PROTOCOL_VERSIONS = (rp.PROTOCOL_VERSION_JSON, rp.PROTOCOL_VERSION_BINARY)
+
+    ## Maximum number of binary requests performed in one transaction.
+    MAX_PENDING_RESPONSES = 256
+
+    ## Binary operations that may leave writes queued in the probe.
+    _WRITE_OPS = (
+            rp.Op.JSON,
+            rp.Op.WRITE_DP,
+            rp.Op.WRITE_AP,
+            rp.Op.WRITE_AP_MULTIPLE,
+            rp.Op.WRITE_MEM,
+            rp.Op.WRITE_BLOCK32,
+            rp.Op.WRITE_BLOCK8,
+            rp.Op.BATCH,
+        )
 
     class StatusCode:
         """@brief Constants for errors reported from the server."""
@@ -221,6 +252,10 @@ class DebugProbeRequestHandler(StreamRequestHandler):
         self._session = cast(TCPProbeServer, self.server).session
         self._probe = cast(TCPProbeServer, self.server).probe
 
+        # Register with the scheduler that shares the probe between clients.
+        self._scheduler = cast(TCPProbeServer, self.server).scheduler
+        self._client = self._scheduler.add_client("%s:%i" % (self._client_domain, self.client_address[1]))
+
         LOG.info("Client %s (port %i) connected to probe %s",
                 self._client_domain, self.client_address[1], self._probe.unique_id)
 
@@ -229,6 +264,9 @@ class DebugProbeRequestHandler(StreamRequestHandler):
         if self._probe.session is None:
             self._probe.session = self._session
 
+        # Protocol version selected by the client's 'hello' request.
+        self._protocol_version: int = rp.PROTOCOL_VERSION_JSON
+
         # Dict to store handles for AP memory interfaces.
         self._next_ap_memif_handle: int = 0
         self._ap_memif_handles: Dict[int, "MemoryInterface"] = {}
@@ -240,8 +278,8 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                 'readprop':             (self._request__read_property,      1   ),
                 'open':                 (self._probe.open,                  0   ), # 'open'
                 'close':                (self._probe.close,                 0   ), # 'close'
-                'lock':                 (self._probe.lock,                  0   ), # 'lock'
-                'unlock':               (self._probe.unlock,                0   ), # 'unlock'
+                'lock':                 (self._request__lock,               0   ), # 'lock'
+                'unlock':               (self._request__unlock,             0   ), # 'unlock'
                 'connect':              (self._request__connect,            1   ), # 'connect', protocol:str
                 'disconnect':           (self._probe.disconnect,            0   ), # 'disconnect'
                 'swj_sequence':         (self._probe.swj_sequence,          2   ), # 'swj_sequence', length:int, bits:int
@@ -253,7 +291,7 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                 'is_reset_asserted':    (self._probe.is_reset_asserted,     0   ), # 'is_reset_asserted'
                 'flush':                (self._probe.flush,                 0   ), # 'flush'
                 'read_dp':              (self._probe.read_dp,               1   ), # 'read_dp', addr:int -> int
-                'write_dp':             (self._probe.write_dp,              2   ), # 'write_dp', addr:int, data:int
+                'write_dp':             (self._request__write_dp,           2   ), # 'write_dp', addr:int, data:int
                 'read_ap':              (self._probe.read_ap,               1   ), # 'read_ap', addr:int -> int
                 'write_ap':             (self._probe.write_ap,              2   ), # 'write_ap', addr:int, data:int
                 'read_ap_multiple':     (self._probe.read_ap_multiple,      2   ), # 'read_ap_multiple', addr:int, count:int -> List[int]
@@ -268,6 +306,27 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                 'write_block32':        (self._request__write_block32,      3   ), # 'write_block32', handle:int, addr:int, data:List[int]
                 'read_block8':          (self._request__read_block8,        3   ), # 'read_block8', handle:int, addr:int, word_count:int -> List[int]
                 'write_block8':         (self._request__write_block8,       3   ), # 'write_block8', handle:int, addr:int, data:List[int]
+                'server_metrics':       (self._scheduler.get_metrics,       0   ), # 'server_metrics' -> Dict
+            }
+
+        # Binary protocol operation handlers. Each takes the argument bytes and returns a callable
+        # that produces the result bytes, so reads can be left pending in the probe.
+        self._BINARY_HANDLERS: Dict[int, Callable[[bytes], Callable[[], bytes]]] = {
+                rp.Op.JSON:                 self._binary__json,
+                rp.Op.READ_DP:              self._binary__read_dp,
+                rp.Op.WRITE_DP:             self._binary__write_dp,
+                rp.Op.READ_AP:              self._binary__read_ap,
+                rp.Op.WRITE_AP:             self._binary__write_ap,
+                rp.Op.READ_AP_MULTIPLE:     self._binary__read_ap_multiple,
+                rp.Op.WRITE_AP_MULTIPLE:    self._binary__write_ap_multiple,
+                rp.Op.READ_MEM:             self._binary__read_mem,
+                rp.Op.WRITE_MEM:            self._binary__write_mem,
+                rp.Op.READ_BLOCK32:         self._binary__read_block32,
+                rp.Op.WRITE_BLOCK32:        self._binary__write_block32,
+                rp.Op.READ_BLOCK8:          self._binary__read_block8,
+                rp.Op.WRITE_BLOCK8:         self._binary__write_block8,
+                rp.Op.FLUSH:                self._binary__flush,
+                rp.Op.SWO_READ:             self._binary__swo_read,
             }
 
         # Let superclass do its thing.
@@ -279,9 +338,12 @@ class DebugProbeRequestHandler(StreamRequestHandler):
 
         # Flush the probe and ignore any lingering errors.
         try:
-            self._probe.flush()
+            with self._scheduler.transaction(self._client):
+                self._flush_probe()
         except exceptions.Error as err:
             LOG.debug("exception while flushing probe on disconnect: %s", err)
+        finally:
+            self._scheduler.remove_client(self._client)
 
         super().finish()
 
@@ -295,6 +357,7 @@ class DebugProbeRequestHandler(StreamRequestHandler):
         TRACE.debug("response: %s", response)
         response_encoded = response.encode('utf-8')
         self.wfile.write(response_encoded + b"\n")
+        self._client.bytes_sent += len(response_encoded) + 1
 
     def _send_response(self, result):
         response_dict = {
@@ -307,6 +370,15 @@ class DebugProbeRequestHandler(StreamRequestHandler):
         TRACE.debug("response: %s", response)
         response_encoded = response.encode('utf-8')
         self.wfile.write(response_encoded + b"\n")
+        self._client.bytes_sent += len(response_encoded) + 1
+
+    def _flush_probe(self) -> None:
+        """@brief Flush the probe at the end of a transaction.
+
+        This ensures that errors from queued writes are reported to the client that made them.
+        """
+        if self._probe.is_open:
+            self._probe.flush()
 
     def handle(self):
         # Process requests until the connection is closed.
@@ -323,6 +395,7 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                 if len(request) == 0:
                     LOG.debug("empty request, closing connection")
                     return
+                self._client.bytes_received += len(request)
 
                 try:
                     request_dict = json.loads(request)
@@ -356,10 +429,16 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                     continue
                 handler, arg_count = self._REQUEST_HANDLERS[request_type]
                 self._check_args(request_args, arg_count)
-                result = handler(*request_args)
+                with self._scheduler.transaction(self._client):
+                    result = handler(*request_args)
+                    self._flush_probe()
 
                 # Send a success response.
                 self._send_response(result)
+
+                # All further messages use binary frames once version 2 has been selected.
+                if self._protocol_version == rp.PROTOCOL_VERSION_BINARY:
+                    break
             # Catch all exceptions so that an error response can be returned, to not leave the client hanging.
             except Exception as err:
                 # Only send an error response if we received an request.
@@ -377,6 +456,239 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                 if not isinstance(err, exceptions.Error):
                     raise
 
+        self._handle_binary()
+
+    def _handle_binary(self):
+        """@brief Process binary protocol requests until the connection is closed.
+
+        All complete frames that have arrived are processed in one transaction, up to a limit,
+        before any responses are sent. Reads are started on the probe without waiting for their
+        results, so a burst of pipelined requests from the client becomes a burst of queued probe
+        transfers. Responses are sent in request order after the transaction ends.
+        """
+        decoder = rp.FrameDecoder()
+        while True:
+            data = self.rfile.read1(65536)
+            if not data:
+                LOG.debug("connection closed by client")
+                return
+            self._client.bytes_received += len(data)
+
+            frames = decoder.feed(data)
+            for offset in range(0, len(frames), self.MAX_PENDING_RESPONSES):
+                group = frames[offset:offset + self.MAX_PENDING_RESPONSES]
+                with self._scheduler.transaction(self._client, len(group)):
+                    responses, fatal_error = self._complete_binary_requests(
+                            [self._start_binary_request(body) for body in group])
+                self.wfile.write(responses)
+                self._client.bytes_sent += len(responses)
+                # Reraise non-pyocd errors once the responses have been sent.
+                if fatal_error is not None:
+                    raise fatal_error
+
+    def _start_binary_request(self, body: bytes) -> Tuple[int, int, Union[Callable[[], bytes], Exception]]:
+        """@brief Begin performing a binary request.
+        @return Tuple of the request ID, operation, and either a callable producing the result or
+            the exception raised while starting the request.
+        """
+        if len(body) < rp.REQUEST_HEADER.size:
+            raise exceptions.ProbeError("malformed remote probe request frame")
+        request_id, op = rp.REQUEST_HEADER.unpack_from(body)
+        args = body[rp.REQUEST_HEADER.size:]
+        TRACE.debug("request: id=%d op=%d args=%s", request_id, op, args.hex())
+        try:
+            if op == rp.Op.BATCH:
+                return request_id, op, self._start_batch(args)
+            elif op in self._BINARY_HANDLERS:
+                return request_id, op, self._BINARY_HANDLERS[op](args)
+            else:
+                raise exceptions.Error("unknown request operation %d" % op)
+        except Exception as err:
+            return request_id, op, err
+
+    def _start_batch(self, args: bytes) -> Callable[[], bytes]:
+        """@brief Begin performing the operations of a batch request in order.
+
+        If an operation fails to start, the following operations are not performed. The result
+        callable raises a _BatchError with the index of the first operation that failed.
+        """
+        result_cbs: List[Callable[[], bytes]] = []
+        start_error: Optional[Exception] = None
+        for op, op_args in rp.decode_batch(args):
+            try:
+                if op not in self._BINARY_HANDLERS:
+                    raise exceptions.Error("unknown request operation %d in batch" % op)
+                result_cbs.append(self._BINARY_HANDLERS[op](op_args))
+            except Exception as err:
+                start_error = err
+                break
+
+        def batch_cb() -> bytes:
+            results = []
+            for index, result_cb in enumerate(result_cbs):
+                try:
+                    results.append(result_cb())
+                except Exception as err:
+                    # Complete the remaining started operations so their results don't linger.
+                    for remaining_cb in result_cbs[index + 1:]:
+                        try:
+                            remaining_cb()
+                        except Exception:
+                            pass
+                    raise _BatchError(index, err) from err
+            if start_error is not None:
+                raise _BatchError(len(result_cbs), start_error) from start_error
+            return rp.encode_batch_results(results)
+        return batch_cb
+
+    def _complete_binary_requests(self, pending: List[Tuple[int, int, Union[Callable[[], bytes], Exception]]]) \
+            -> Tuple[bytes, Optional[Exception]]:
+        """@brief Complete the pending requests and encode their responses.
+
+        The probe is flushed after the requests complete, so no transfers are left queued for
+        another client's transaction. An error from the flush is reported as the result of the last
+        write request.
+
+        @return 2-tuple of the encoded responses and the first non-pyocd exception raised, if any.
+        """
+        results: List[Tuple[int, int, int, Union[bytes, Exception]]] = []
+        for request_id, op, result in pending:
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                results.append((request_id, op, 0, result()))
+            except _BatchError as batch_err:
+                results.append((request_id, op, batch_err.index, batch_err.error))
+            except Exception as err:
+                results.append((request_id, op, 0, err))
+
+        try:
+            self._flush_probe()
+        except exceptions.Error as err:
+            self._attach_flush_error(results, err)
+
+        responses = []
+        fatal_error = None
+        for request_id, op, index, result in results:
+            if not isinstance(result, Exception):
+                responses.append(rp.encode_response(request_id, 0, result))
+                continue
+            LOG.error("Error processing binary request operation %d (ID %i, op index %i, client %s, probe %s): %s",
+                    op, request_id, index, self._client_domain, self._probe.unique_id, result,
+                    exc_info=self._session.log_tracebacks)
+            responses.append(rp.encode_response(request_id, self._get_exception_status_code(result),
+                    rp.ERROR_INDEX.pack(index) + str(result).encode('utf-8')))
+            if not isinstance(result, exceptions.Error) and fatal_error is None:
+                fatal_error = result
+        return b''.join(responses), fatal_error
+
+    def _attach_flush_error(self, results: List[Tuple[int, int, int, Union[bytes, Exception]]],
+            err: Exception) -> None:
+        """@brief Replace the result of the last successful write request with an error."""
+        candidates = [i for i, (_, op, _, result) in enumerate(results)
+                if not isinstance(result, Exception)]
+        writes = [i for i in candidates if results[i][1] in self._WRITE_OPS]
+        if writes:
+            i = writes[-1]
+        elif candidates:
+            i = candidates[-1]
+        else:
+            LOG.error("Error flushing probe (client %s, probe %s): %s",
+                    self._client_domain, self._probe.unique_id, err)
+            return
+        request_id, op, _, result = results[i]
+        index = 0
+        if op == rp.Op.BATCH:
+            assert isinstance(result, bytes)
+            index = rp.BATCH_COUNT.unpack_from(result)[0] - 1
+        results[i] = (request_id, op, index, err)
+
+    def _get_memif(self, handle: int) -> "MemoryInterface":
+        if handle not in self._ap_memif_handles:
+            raise exceptions.Error("invalid handle received from remote memory access")
+        return self._ap_memif_handles[handle]
+
+    @staticmethod
+    def _empty_result() -> bytes:
+        return b''
+
+    def _binary__json(self, args: bytes) -> Callable[[], bytes]:
+        request_dict = json.loads(args)
+        request_type = request_dict.get('request')
+        if request_type not in self._REQUEST_HANDLERS:
+            raise exceptions.Error("unknown request type")
+        request_args = request_dict.get('arguments', [])
+        handler, arg_count = self._REQUEST_HANDLERS[request_type]
+        self._check_args(request_args, arg_count)
+        encoded_result = json.dumps(handler(*request_args)).encode('utf-8')
+        return lambda: encoded_result
+
+    def _binary__read_dp(self, args: bytes) -> Callable[[], bytes]:
+        addr, = rp.U32.unpack(args)
+        result_cb = self._probe.read_dp(addr, now=False)
+        return lambda: rp.U32.pack(result_cb())
+
+    def _binary__write_dp(self, args: bytes) -> Callable[[], bytes]:
+        self._request__write_dp(*rp.U32x2.unpack(args))
+        return self._empty_result
+
+    def _binary__read_ap(self, args: bytes) -> Callable[[], bytes]:
+        addr, = rp.U32.unpack(args)
+        result_cb = self._probe.read_ap(addr, now=False)
+        return lambda: rp.U32.pack(result_cb())
+
+    def _binary__write_ap(self, args: bytes) -> Callable[[], bytes]:
+        self._probe.write_ap(*rp.U32x2.unpack(args))
+        return self._empty_result
+
+    def _binary__read_ap_multiple(self, args: bytes) -> Callable[[], bytes]:
+        addr, count = rp.U32x2.unpack(args)
+        result_cb = self._probe.read_ap_multiple(addr, count, now=False)
+        return lambda: rp.pack_words(result_cb())
+
+    def _binary__write_ap_multiple(self, args: bytes) -> Callable[[], bytes]:
+        addr, = rp.U32.unpack_from(args)
+        self._probe.write_ap_multiple(addr, rp.unpack_words(args[rp.U32.size:]))
+        return self._empty_result
+
+    def _binary__read_mem(self, args: bytes) -> Callable[[], bytes]:
+        handle, addr, xfer_size = rp.READ_MEM_ARGS.unpack(args)
+        result_cb = self._get_memif(handle).read_memory(addr, xfer_size, now=False)
+        return lambda: rp.U32.pack(result_cb())
+
+    def _binary__write_mem(self, args: bytes) -> Callable[[], bytes]:
+        handle, addr, value, xfer_size = rp.WRITE_MEM_ARGS.unpack(args)
+        self._get_memif(handle).write_memory(addr, value, xfer_size)
+        return self._empty_result
+
+    def _binary__read_block32(self, args: bytes) -> Callable[[], bytes]:
+        handle, addr, word_count = rp.U32x3.unpack(args)
+        data = rp.pack_words(self._get_memif(handle).read_memory_block32(addr, word_count))
+        return lambda: data
+
+    def _binary__write_block32(self, args: bytes) -> Callable[[], bytes]:
+        handle, addr = rp.U32x2.unpack_from(args)
+        self._get_memif(handle).write_memory_block32(addr, rp.unpack_words(args[rp.U32x2.size:]))
+        return self._empty_result
+
+    def _binary__read_block8(self, args: bytes) -> Callable[[], bytes]:
+        handle, addr, byte_count = rp.U32x3.unpack(args)
+        data = bytes(self._get_memif(handle).read_memory_block8(addr, byte_count))
+        return lambda: data
+
+    def _binary__write_block8(self, args: bytes) -> Callable[[], bytes]:
+        handle, addr = rp.U32x2.unpack_from(args)
+        self._get_memif(handle).write_memory_block8(addr, list(args[rp.U32x2.size:]))
+        return self._empty_result
+
+    def _binary__flush(self, args: bytes) -> Callable[[], bytes]:
+        self._probe.flush()
+        return self._empty_result
+
+    def _binary__swo_read(self, args: bytes) -> Callable[[], bytes]:
+        data = bytes(self._probe.swo_read())
+        return lambda: data
+
     def _get_exception_status_code(self, err):
         """@brief Convert an exception class into a status code."""
         # Must test the exception class in order of specific to general.
@@ -398,10 +710,25 @@ class DebugProbeRequestHandler(StreamRequestHandler):
             raise exceptions.Error("malformed request; invalid number of arguments")
 
     def _request__hello(self, version):
-        # 'hello', protocol-version:int
-        if version != self.PROTOCOL_VERSION:
-            raise exceptions.Error("client requested unsupported protocol version %i (expected %i)" %
-                    (version, self.PROTOCOL_VERSION))
+        # 'hello', protocol-version:int -> int
+        if version not in self.SUPPORTED_PROTOCOL_VERSIONS:
+            raise exceptions.Error("client requested unsupported protocol version %i (expected %s)" %
+                    (version, " or ".join(str(v) for v in self.SUPPORTED_PROTOCOL_VERSIONS)))
+        self._protocol_version = version
+        return version
+
+    def _request__lock(self):
+        # 'lock'
+        self._scheduler.lock(self._client)
+
+    def _request__unlock(self):
+        # 'unlock'
+        self._scheduler.unlock(self._client)
+
+    def _request__write_dp(self, addr, data):
+        # 'write_dp', addr:int, data:int
+        self._probe.write_dp(addr, data)
+        self._scheduler.dp_written(self._client, addr, data)
 
     def _request__read_property(self, name):
         # 'readprop', name:str
@@ -490,3 +817,11 @@ class DebugProbeRequestHandler(StreamRequestHandler):
             'wire_protocol':                lambda value: value.name if (value is not None) else None,
         }
 
+
+class _BatchError(Exception):
+    """@brief Wraps the error raised by an operation of a binary batch request with its index."""
+
+    def __init__(self, index: int, error: Exception) -> None:
+        super().__init__(str(error))
+        self.index = index
+        self.error = error
@@ -16,51 +16,283 @@
 # limitations under the License.
 
 import logging
+import struct
+from typing import (Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING)
 
 from .provider import TargetThread
 from ..core import exceptions
 
+if TYPE_CHECKING:
+    from ..core.memory_interface import MemoryInterface
+
 LOG = logging.getLogger(__name__)
 
 ## Mask on EXC_RETURN indicating whether space for FP registers is allocated
 # on the frame. The bit is 0 if the frame is extended.
 EXC_RETURN_EXT_FRAME_MASK = (1 << 4)
 
+def decode_c_string(data: Sequence[int]) -> Tuple[str, bool]:
+    """@brief Decode a null-terminated C string from a buffer.
+
+    Non-ASCII characters are replaced with '?'. If there is a run of more than 4 invalid characters,
+    the string is terminated early.
+
+    @return Tuple of the decoded string and a boolean indicating whether the end of the string was
+        found within _data_.
+    """
+    s = ""
+    badCount = 0
+    for c in data:
+        if c == 0:
+            return s, True
+        elif c > 127:
+            badCount += 1
+            if badCount > 4:
+                return s, True
+            s += '?'
+        else:
+            s += chr(c)
+            badCount = 0
+    return s, False
+
 def read_c_string(context, ptr):
     """@brief Reads a null-terminated C string from the target."""
     if ptr == 0:
         return ""
 
+    data = []
     s = ""
-    done = False
-    count = 0
-    badCount = 0
     try:
-        while not done and count < 256:
-            data = context.read_memory_block8(ptr, 16)
+        while len(data) < 256:
+            data += context.read_memory_block8(ptr, 16)
             ptr += 16
-            count += 16
-
-            for c in data:
-                if c == 0:
-                    done = True
-                    break
-                elif c > 127:
-                    # Replace non-ASCII characters. If there is a run of invalid characters longer
-                    # than 4, then terminate the string early.
-                    badCount += 1
-                    if badCount > 4:
-                        done = True
-                        break
-                    s += '?'
-                else:
-                    s += chr(c)
-                    badCount = 0
+            s, done = decode_c_string(data)
+            if done:
+                break
     except exceptions.TransferError:
         LOG.debug("TransferError while trying to read 16 bytes at 0x%08x", ptr)
 
     return s
 
+class TargetMemorySnapshot:
+    """@brief Host copy of selected target memory ranges.
+
+    Thread providers use a snapshot to read the kernel data they need in a few large block reads,
+    then decode it on the host instead of making many small dependent reads.
+
+    Ranges are queued with add_range() and read by fetch(), which merges ranges that are near each
+    other into one read. Reads of addresses outside the fetched ranges go to the target. The block
+    read on such a miss covers _miss_before_ bytes below the address through _miss_after_ bytes
+    above it, so that, for instance, a whole structure is fetched when a pointer to one of its
+    fields is first followed. Misses are added to the snapshot.
+
+    A snapshot is only valid while the target remains halted.
+    """
+
+    ## Largest gap between two queued ranges that are merged into one read.
+    MERGE_GAP = 512
+
+    def __init__(self, context: "MemoryInterface", miss_before: int = 0, miss_after: int = 4) -> None:
+        self._context = context
+        self._miss_before = miss_before
+        self._miss_after = max(4, miss_after)
+        self._pending: List[Tuple[int, int]] = []
+        self._blocks: List[Tuple[int, int, bytes]] = []
+        self._last_block: Optional[Tuple[int, int, bytes]] = None
+        self.read_count = 0
+
+    def add_range(self, addr: int, size: int) -> None:
+        """@brief Queue a range to be read by the next fetch()."""
+        if size > 0:
+            self._pending.append((addr, addr + size))
+
+    def fetch(self) -> None:
+        """@brief Read all queued ranges from the target.
+
+        Ranges separated by no more than MERGE_GAP bytes are read together. If reading a merged range
+        fails, its component ranges are read individually and any that fail are skipped.
+        """
+        pending = sorted(self._pending)
+        self._pending = []
+        merged: List[Tuple[int, int, List[Tuple[int, int]]]] = []
+        for start, end in pending:
+            if merged and start <= merged[-1][1] + self.MERGE_GAP:
+                m_start, m_end, parts = merged[-1]
+                parts.append((start, end))
+                merged[-1] = (m_start, max(m_end, end), parts)
+            else:
+                merged.append((start, end, [(start, end)]))
+
+        for start, end, parts in merged:
+            try:
+                self._read_block(start, end - start)
+            except exceptions.TransferError:
+                if len(parts) == 1:
+                    LOG.debug("TransferError while reading snapshot range 0x%08x-0x%08x", start, end - 1)
+                    continue
+                for p_start, p_end in parts:
+                    try:
+                        self._read_block(p_start, p_end - p_start)
+                    except exceptions.TransferError:
+                        LOG.debug("TransferError while reading snapshot range 0x%08x-0x%08x", p_start, p_end - 1)
+
+    def _read_block(self, addr: int, size: int) -> None:
+        self.read_count += 1
+        data = bytes(self._context.read_memory_block8(addr, size))
+        self._blocks.append((addr, addr + len(data), data))
+
+    def _find(self, addr: int, size: int) -> Optional[Tuple[int, int, bytes]]:
+        end = addr + size
+        block = self._last_block
+        if (block is not None) and (block[0] <= addr) and (end <= block[1]):
+            return block
+        for block in self._blocks:
+            if (block[0] <= addr) and (end <= block[1]):
+                self._last_block = block
+                return block
+        return None
+
+    def contains(self, addr: int, size: int = 4) -> bool:
+        """@brief Whether the given range has been read into the snapshot."""
+        return self._find(addr, size) is not None
+
+    def read_memory_block8(self, addr: int, size: int) -> List[int]:
+        """@brief Read bytes from the snapshot, reading exactly the range from the target on a miss."""
+        block = self._find(addr, size)
+        if block is None:
+            self._read_block(addr, size)
+            block = self._blocks[-1]
+        offset = addr - block[0]
+        return list(block[2][offset:offset + size])
+
+    def read32(self, addr: int) -> int:
+        """@brief Read a 32-bit word from the snapshot, reading a block around it from the target on a miss."""
+        block = self._find(addr, 4)
+        if block is None:
+            try:
+                self._read_block(addr - self._miss_before, self._miss_before + self._miss_after)
+            except exceptions.TransferError:
+                # The window around the address may not all be readable, so try just the word.
+                self._read_block(addr, 4)
+            block = self._blocks[-1]
+        return struct.unpack_from('<I', block[2], addr - block[0])[0]
+
+def stacked_frame_size(offsets: Dict[int, int]) -> int:
+    """@brief Size in bytes of the stacked frame described by a register offset table."""
+    return max(offsets.values()) + 4
+
+class StackedFrame:
+    """@brief Words of a thread's stacked register frame read in one block.
+
+    Reads of addresses outside the frame are passed through to the context.
+    """
+
+    def __init__(self, context: "MemoryInterface", base: int, words: Sequence[int]) -> None:
+        self._context = context
+        self._base = base
+        self._words = words
+
+    @property
+    def base(self) -> int:
+        return self._base
+
+    @property
+    def size(self) -> int:
+        return len(self._words) * 4
+
+    def read32(self, addr: int) -> int:
+        offset = addr - self._base
+        if (0 <= offset < len(self._words) * 4) and ((offset & 3) == 0):
+            return self._words[offset >> 2]
+        return self._context.read32(addr)
+
+class ThreadStackCache:
+    """@brief Per-thread cache of stacked register frames.
+
+    A thread context owns one of these. Frames are read with a single read_memory_block32 and kept
+    until the core's run token changes, so repeated register reads of a thread while the target is
+    halted, for instance from a backtrace, cost no further target accesses.
+    """
+
+    def __init__(self) -> None:
+        self._run_token: Optional[int] = None
+        self._frames: Dict[int, StackedFrame] = {}
+
+    def read_frame(self, context: "MemoryInterface", addr: int, sizes: Sequence[int]) -> StackedFrame:
+        """@brief Return the frame starting at an address, reading it from the target if needed.
+
+        @param self
+        @param context Context used to read the frame.
+        @param addr Start address of the frame.
+        @param sizes Possible frame sizes in bytes. The largest is read first, so the frame can be
+            decoded before its layout is known. If that read fails, for instance because it crosses
+            the end of RAM, the next smaller size is tried. If all reads fail, the returned frame is
+            empty and each access goes to the target.
+        """
+        token = context.core.run_token
+        if token != self._run_token:
+            self._frames = {}
+            self._run_token = token
+
+        frame = self._frames.get(addr)
+        if frame is None:
+            words: Sequence[int] = []
+            for size in sorted(set(sizes), reverse=True):
+                try:
+                    words = context.read_memory_block32(addr, size // 4)
+                    break
+                except exceptions.TransferError:
+                    LOG.debug("TransferError while reading %d byte stack frame at 0x%08x", size, addr)
+            frame = StackedFrame(context, addr, words)
+            self._frames[addr] = frame
+        return frame
+
+def unstack_registers(context, frame: StackedFrame, reg_list: Sequence[int], sp: int, offsets: Dict[int, int],
+        in_exception: bool, hw_stacked: int, sw_stacked: int) -> List[int]:
+    """@brief Decode register values from a thread's stacked frame.
+
+    This implements the common layout used by Cortex-M RTOS ports: software stacked registers at
+    the saved stack pointer, followed by the hardware stacked exception frame. When the thread was
+    interrupted by the current exception, only the hardware frame is on the stack.
+
+    @param context Parent context used to read live registers.
+    @param frame Frame containing the stacked registers.
+    @param reg_list List of register indices.
+    @param sp Saved stack pointer of the thread, or PSP if in an exception.
+    @param offsets Map of register index to offset from _sp_ of the combined software and hardware frame.
+    @param in_exception Whether the thread is current and the core is handling an exception.
+    @param hw_stacked Size of the hardware stacked frame.
+    @param sw_stacked Size of the software stacked registers.
+    """
+    reg_vals = []
+    for reg in reg_list:
+        # Must handle stack pointer specially.
+        if reg == 13:
+            if in_exception:
+                reg_vals.append(sp + hw_stacked)
+            else:
+                reg_vals.append(sp + sw_stacked + hw_stacked)
+            continue
+
+        # Look up offset for this register on the stack.
+        spOffset = offsets.get(reg, None)
+        if spOffset is None:
+            reg_vals.append(context.read_core_register_raw(reg))
+            continue
+        if in_exception:
+            spOffset -= sw_stacked
+
+        try:
+            if spOffset >= 0:
+                reg_vals.append(frame.read32(sp + spOffset))
+            else:
+                # Not available - try live one
+                reg_vals.append(context.read_core_register_raw(reg))
+        except exceptions.TransferError:
+            reg_vals.append(0)
+
+    return reg_vals
+
 class HandlerModeThread(TargetThread):
     """@brief Class representing the handler mode."""
 
@@ -15,7 +15,8 @@
 # limitations under the License.
 
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK)
+from .common import (read_c_string, decode_c_string, HandlerModeThread, TargetMemorySnapshot,
+    ThreadStackCache, stacked_frame_size, unstack_registers, EXC_RETURN_EXT_FRAME_MASK)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -33,6 +34,19 @@ LIST_NODE_OBJECT_OFFSET = 12
 THREAD_STACK_POINTER_OFFSET = 0
 THREAD_PRIORITY_OFFSET = 44
 THREAD_NAME_OFFSET = 52
+THREAD_STATE_LIST_ITEM_OFFSET = 4
+
+## Default configMAX_TASK_NAME_LEN.
+THREAD_NAME_LENGTH = 16
+
+## Number of bytes at the start of a TCB read into a snapshot when the TCB size is not known from
+# the ELF file. This covers the stack pointer, list items, priority, and a name of the default
+# length. Longer names are read on demand.
+TCB_SNAPSHOT_SIZE = THREAD_NAME_OFFSET + THREAD_NAME_LENGTH
+
+## Largest TCB size accepted from the ELF file. A larger object that starts at a TCB, such as the
+# heap array holding dynamically allocated TCBs, is not a TCB.
+TCB_MAX_ELF_SIZE = 2048
 
 # Create a logger for this module.
 LOG = logging.getLogger(__name__)
@@ -157,10 +171,15 @@ class FreeRTOSThreadContext(DebugContext):
         super(FreeRTOSThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._stack_cache = ThreadStackCache()
+        if self._has_fpu:
+            self._frame_sizes = (stacked_frame_size(self.FPU_BASIC_REGISTER_OFFSETS),
+                    stacked_frame_size(self.FPU_EXTENDED_REGISTER_OFFSETS))
+        else:
+            self._frame_sizes = (stacked_frame_size(self.NOFPU_REGISTER_OFFSETS),)
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
-        reg_vals = []
 
         isCurrent = self._thread.is_current
         inException = isCurrent and self._parent.read_core_register('ipsr') > 0
@@ -179,6 +198,9 @@ class FreeRTOSThreadContext(DebugContext):
         else:
             sp = self._thread.get_stack_pointer()
 
+        # Read the whole stacked frame at once.
+        frame = self._stack_cache.read_frame(self._parent, sp, self._frame_sizes)
+
         # Determine which register offset table to use and the offsets past the saved state.
         hwStacked = 0x20
         swStacked = 0x20
@@ -191,7 +213,7 @@ class FreeRTOSThreadContext(DebugContext):
                 else:
                     # Read stacked exception return LR.
                     offset = self.FPU_BASIC_REGISTER_OFFSETS[-1]
-                    exceptionLR = self._parent.read32(sp + offset)
+                    exceptionLR = frame.read32(sp + offset)
 
                 # Check bit 4 of the saved exception LR to determine if FPU registers were stacked.
                 if (exceptionLR & EXC_RETURN_EXT_FRAME_MASK) != 0:
@@ -204,33 +226,7 @@ class FreeRTOSThreadContext(DebugContext):
             except exceptions.TransferError:
                 LOG.debug("Transfer error while reading thread's saved LR")
 
-        for reg in reg_list:
-            # Must handle stack pointer specially.
-            if reg == 13:
-                if inException:
-                    reg_vals.append(sp + hwStacked)
-                else:
-                    reg_vals.append(sp + swStacked + hwStacked)
-                continue
-
-            # Look up offset for this register on the stack.
-            spOffset = table.get(reg, None)
-            if spOffset is None:
-                reg_vals.append(self._parent.read_core_register_raw(reg))
-                continue
-            if inException:
-                spOffset -= swStacked
-
-            try:
-                if spOffset >= 0:
-                    reg_vals.append(self._parent.read32(sp + spOffset))
-                else:
-                    # Not available - try live one
-                    reg_vals.append(self._parent.read_core_register_raw(reg))
-            except exceptions.TransferError:
-                reg_vals.append(0)
-
-        return reg_vals
+        return unstack_registers(self._parent, frame, reg_list, sp, table, inException, hwStacked, swStacked)
 
 class FreeRTOSThread(TargetThread):
     """@brief A FreeRTOS task."""
@@ -249,21 +245,43 @@ class FreeRTOSThread(TargetThread):
             DELETED : "Deleted",
         }
 
-    def __init__(self, targetContext, provider, base):
+    def __init__(self, targetContext, provider, base, snapshot=None):
         super(FreeRTOSThread, self).__init__()
         self._target_context = targetContext
         self._provider = provider
         self._base = base
         self._state = FreeRTOSThread.READY
         self._thread_context = FreeRTOSThreadContext(self._target_context, self)
-
-        self._priority = self._target_context.read32(self._base + THREAD_PRIORITY_OFFSET)
-
-        self._name = read_c_string(self._target_context, self._base + THREAD_NAME_OFFSET)
+        self._stack_pointer = None
+        self._stack_pointer_token = None
+
+        if snapshot is not None:
+            self._priority = snapshot.read32(self._base + THREAD_PRIORITY_OFFSET)
+            self._name, done = decode_c_string(snapshot.read_memory_block8(
+                    self._base + THREAD_NAME_OFFSET, THREAD_NAME_LENGTH))
+            if not done:
+                self._name = read_c_string(self._target_context, self._base + THREAD_NAME_OFFSET)
+        else:
+            self._priority = self._target_context.read32(self._base + THREAD_PRIORITY_OFFSET)
+            self._name = read_c_string(self._target_context, self._base + THREAD_NAME_OFFSET)
         if len(self._name) == 0:
             self._name = "Unnamed"
 
+    def update_from_snapshot(self, snapshot, run_token):
+        """@brief Record the saved stack pointer from a snapshot taken while the target was halted.
+
+        The saved value is used by get_stack_pointer() until the target runs again.
+        """
+        try:
+            self._stack_pointer = snapshot.read32(self._base + THREAD_STACK_POINTER_OFFSET)
+            self._stack_pointer_token = run_token
+        except exceptions.TransferError:
+            self._stack_pointer_token = None
+
     def get_stack_pointer(self):
+        if self._stack_pointer_token == self._provider.run_token:
+            return self._stack_pointer
+
         # Get stack pointer saved in thread struct.
         try:
             return self._target_context.read32(self._base + THREAD_STACK_POINTER_OFFSET)
@@ -324,11 +342,21 @@ class FreeRTOSThreadProvider(ThreadProvider):
         "xSchedulerRunning",
         ]
 
+    ## Task list symbols other than pxReadyTasksLists. The last two are optional.
+    FREERTOS_LIST_SYMBOLS = [
+        "xDelayedTaskList1",
+        "xDelayedTaskList2",
+        "xPendingReadyList",
+        "xSuspendedTaskList",
+        "xTasksWaitingTermination",
+        ]
+
     def __init__(self, target):
         super(FreeRTOSThreadProvider, self).__init__(target)
         self._symbols = None
         self._total_priorities = 0
         self._threads = {}
+        self._tcb_size = None
 
     def init(self, symbolProvider):
         # Lookup required symbols.
@@ -381,20 +409,79 @@ class FreeRTOSThreadProvider(ThreadProvider):
 
     def invalidate(self):
         self._threads = {}
+        self._tcb_size = None
 
     def event_handler(self, notification):
         # Invalidate threads list if flash is reprogrammed.
         LOG.debug("FreeRTOS: invalidating threads list: %s" % (repr(notification)))
         self.invalidate();
 
+    @property
+    def run_token(self):
+        return self._target.run_token
+
+    def _get_tcb_size(self):
+        """@brief Number of bytes of each TCB to read into a snapshot.
+
+        If one of the known TCBs is a statically allocated object in the ELF file, the TCB size is
+        the size of its symbol, as returned by _get_elf_symbol_size(). Otherwise, for instance when
+        no ELF is available or all TCBs are on the heap, TCB_SNAPSHOT_SIZE is used.
+        """
+        if self._tcb_size is not None:
+            return self._tcb_size
+        if self._target.elf is None:
+            return TCB_SNAPSHOT_SIZE
+
+        decoder = self._target.elf.symbol_decoder
+        for threadBase in self._threads:
+            if threadBase == HandlerModeThread.UNIQUE_ID:
+                continue
+            symInfo = decoder.get_symbol_for_address(threadBase)
+            if (symInfo is None) or (symInfo.address != threadBase) \
+                    or not (THREAD_NAME_OFFSET < symInfo.size <= TCB_MAX_ELF_SIZE):
+                continue
+            self._tcb_size = self._get_elf_symbol_size(symInfo.name, threadBase, TCB_SNAPSHOT_SIZE)
+            LOG.debug("FreeRTOS: TCB size is %d", self._tcb_size)
+            return self._tcb_size
+        return TCB_SNAPSHOT_SIZE
+
+    def _take_snapshot(self):
+        """@brief Read the kernel globals, list heads, and known TCBs into a memory snapshot.
+
+        The globals and list heads are usually placed together by the linker, so they are read with
+        one or two block reads. TCBs of threads found by the previous build are read together when
+        they are close to each other. A list node that isn't in the snapshot is read along with the
+        rest of its TCB, since the walked lists link TCBs through their state list items.
+        """
+        tcb_size = self._get_tcb_size()
+        snapshot = TargetMemorySnapshot(self._target_context,
+                miss_before=THREAD_STATE_LIST_ITEM_OFFSET + LIST_NODE_OBJECT_OFFSET,
+                miss_after=tcb_size - THREAD_STATE_LIST_ITEM_OFFSET - LIST_NODE_OBJECT_OFFSET)
+
+        for name in ('uxCurrentNumberOfTasks', 'pxCurrentTCB', 'uxTopReadyPriority'):
+            snapshot.add_range(self._symbols[name], 4)
+        snapshot.add_range(self._symbols['pxReadyTasksLists'], self._total_priorities * LIST_SIZE)
+        for name in self.FREERTOS_LIST_SYMBOLS:
+            if name in self._symbols:
+                snapshot.add_range(self._symbols[name], LIST_SIZE)
+
+        for threadBase in self._threads:
+            if threadBase != HandlerModeThread.UNIQUE_ID:
+                snapshot.add_range(threadBase, tcb_size)
+
+        snapshot.fetch()
+        return snapshot
+
     def _build_thread_list(self):
         newThreads = {}
+        snapshot = self._take_snapshot()
+        runToken = self.run_token
 
         # Read the number of threads.
-        threadCount = self._target_context.read32(self._symbols['uxCurrentNumberOfTasks'])
+        threadCount = snapshot.read32(self._symbols['uxCurrentNumberOfTasks'])
 
         # Read the current thread.
-        currentThread = self._target_context.read32(self._symbols['pxCurrentTCB'])
+        currentThread = snapshot.read32(self._symbols['pxCurrentTCB'])
 
         # We should only be building the thread list if the scheduler is running, so a zero thread
         # count or a null current thread means something is bizarrely wrong.
@@ -403,7 +490,7 @@ class FreeRTOSThreadProvider(ThreadProvider):
             return
 
         # Read the top ready priority.
-        topPriority = self._target_context.read32(self._symbols['uxTopReadyPriority'])
+        topPriority = snapshot.read32(self._symbols['uxTopReadyPriority'])
 
         # Handle an uxTopReadyPriority value larger than the number of lists. This is most likely
         # caused by the configUSE_PORT_OPTIMISED_TASK_SELECTION option being enabled, which treats
@@ -426,7 +513,7 @@ class FreeRTOSThreadProvider(ThreadProvider):
             listsToRead.append((self._symbols['xTasksWaitingTermination'], FreeRTOSThread.DELETED))
 
         for listPtr, state in listsToRead:
-            for threadBase in TargetList(self._target_context, listPtr):
+            for threadBase in TargetList(snapshot, listPtr):
                 try:
                     # Don't try adding more threads than the number of threads that FreeRTOS says there are.
                     if len(newThreads) >= threadCount:
@@ -436,7 +523,8 @@ class FreeRTOSThreadProvider(ThreadProvider):
                     if threadBase in self._threads:
                         t = self._threads[threadBase]
                     else:
-                        t = FreeRTOSThread(self._target_context, self, threadBase)
+                        t = FreeRTOSThread(self._target_context, self, threadBase, snapshot)
+                    t.update_from_snapshot(snapshot, runToken)
 
                     # Set thread state.
                     if threadBase == currentThread:
@@ -451,6 +539,7 @@ class FreeRTOSThreadProvider(ThreadProvider):
 
         if len(newThreads) != threadCount:
             LOG.warning("FreeRTOS: thread count mismatch")
+        LOG.debug("FreeRTOS: built thread list with %d block reads", snapshot.read_count)
 
         # Create fake handler mode thread.
         if self._target_context.read_core_register('ipsr') > 0:
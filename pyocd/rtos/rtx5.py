@@ -14,7 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK)
+from .common import (read_c_string, HandlerModeThread, ThreadStackCache, stacked_frame_size, unstack_registers,
+    EXC_RETURN_EXT_FRAME_MASK)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -135,10 +136,15 @@ class RTXThreadContext(DebugContext):
         super(RTXThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._stack_cache = ThreadStackCache()
+        if self._has_fpu:
+            self._frame_sizes = (stacked_frame_size(self.NOFPU_REGISTER_OFFSETS),
+                    stacked_frame_size(self.FPU_REGISTER_OFFSETS))
+        else:
+            self._frame_sizes = (stacked_frame_size(self.NOFPU_REGISTER_OFFSETS),)
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
-        reg_vals = []
 
         isCurrent = self._thread.is_current
         inException = isCurrent and self._parent.read_core_register('ipsr') > 0
@@ -157,6 +163,9 @@ class RTXThreadContext(DebugContext):
         else:
             sp = self._thread.get_stack_pointer()
 
+        # Read the whole stacked frame at once.
+        frame = self._stack_cache.read_frame(self._parent, sp, self._frame_sizes)
+
         # Determine which register offset table to use and the offsets past the saved state.
         hwStacked = 0x20
         swStacked = 0x20
@@ -180,34 +189,7 @@ class RTXThreadContext(DebugContext):
             except exceptions.TransferError:
                 LOG.debug("Transfer error while reading thread's saved LR")
 
-        for reg in reg_list:
-
-            # Must handle stack pointer specially.
-            if reg == 13:
-                if inException:
-                    reg_vals.append(sp + hwStacked)
-                else:
-                    reg_vals.append(sp + swStacked + hwStacked)
-                continue
-
-            # Look up offset for this register on the stack.
-            spOffset = table.get(reg, None)
-            if spOffset is None:
-                reg_vals.append(self._parent.read_core_register_raw(reg))
-                continue
-            if inException:
-                spOffset -= swStacked
-
-            try:
-                if spOffset >= 0:
-                    reg_vals.append(self._parent.read32(sp + spOffset))
-                else:
-                    # Not available - try live one
-                    reg_vals.append(self._parent.read_core_register_raw(reg))
-            except exceptions.TransferError:
-                reg_vals.append(0)
-
-        return reg_vals
+        return unstack_registers(self._parent, frame, reg_list, sp, table, inException, hwStacked, swStacked)
 
 class RTXTargetThread(TargetThread):
     """@brief Represents an RTX5 thread on the target."""
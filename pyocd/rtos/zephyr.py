@@ -19,7 +19,7 @@
 import logging
 
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread)
+from .common import (read_c_string, HandlerModeThread, ThreadStackCache, stacked_frame_size)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -79,6 +79,7 @@ class ZephyrThreadContext(DebugContext):
         super(ZephyrThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._stack_cache = ThreadStackCache()
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
@@ -103,6 +104,13 @@ class ZephyrThreadContext(DebugContext):
             sp = self._thread.get_stack_pointer()
         exceptionFrame = 0x20
 
+        # Read the exception stack frame and the callee-saved registers each with one block read.
+        stackFrame = self._stack_cache.read_frame(self._parent, sp, (stacked_frame_size(self.STACK_FRAME_OFFSETS),))
+        calleeBase = self._thread._base + self._thread._offsets["t_stack_ptr"]
+        calleeFrameOffset = min(self.CALLEE_SAVED_OFFSETS.values())
+        calleeFrame = self._stack_cache.read_frame(self._parent, calleeBase + calleeFrameOffset,
+                (stacked_frame_size(self.CALLEE_SAVED_OFFSETS) - calleeFrameOffset,))
+
         for reg in reg_list:
 
             # If this is a stack pointer register, add an offset to account for the exception stack frame
@@ -116,8 +124,8 @@ class ZephyrThreadContext(DebugContext):
             calleeOffset = self.CALLEE_SAVED_OFFSETS.get(reg, None)
             if calleeOffset is not None:
                 try:
-                    addr = self._thread._base + self._thread._offsets["t_stack_ptr"] + calleeOffset
-                    val = self._parent.read32(addr)
+                    addr = calleeBase + calleeOffset
+                    val = calleeFrame.read32(addr)
                     reg_vals.append(val)
                     LOG.debug("Reading callee-saved register %d at 0x%08x = 0x%x", reg, addr, val)
                 except exceptions.TransferError:
@@ -129,7 +137,7 @@ class ZephyrThreadContext(DebugContext):
             if stackFrameOffset is not None:
                 try:
                     addr = sp + stackFrameOffset
-                    val = self._parent.read32(addr)
+                    val = stackFrame.read32(addr)
                     reg_vals.append(val)
                     LOG.debug("Reading stack frame register %d at 0x%08x = 0x%x", reg, addr, val)
                 except exceptions.TransferError:
@@ -0,0 +1,226 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import sys
+from time import (perf_counter, sleep)
+from typing import (List, TextIO)
+
+from pyocd.core import exceptions
+from pyocd.core.helpers import ConnectHelper
+from pyocd.core.session import Session
+from pyocd.core.target import Target
+from pyocd.debug.elf.elf import ELFBinaryFile
+from pyocd.subcommands.base import SubcommandBase
+from pyocd.trace.profile import (
+    DEFAULT_MAX_ENTRIES,
+    PCSamplingSink,
+    ProfileSymbolizer,
+    SampleProfile,
+    function_histogram,
+    line_histogram,
+    profile_swo_capture,
+    write_collapsed_stacks,
+    )
+from pyocd.trace.pcsr import PCSRSampler
+from pyocd.trace.swv import SWVReader
+from pyocd.utility.cmdline import (convert_session_options, int_base_0)
+
+LOG = logging.getLogger(__name__)
+
+class ProfileSubcommand(SubcommandBase):
+    """@brief `pyocd profile` subcommand."""
+
+    NAMES = ["profile"]
+    HELP = "Statistical PC sampling profiler."
+    EPILOG = "PC samples are collected from the DWT over SWO while the target runs, so the " \
+            "swv_system_clock option must be set. For targets without SWO, --pcsr reads samples from " \
+            "the DWT_PCSR register instead. Use --replay to build a profile from an SWO capture file " \
+            "recorded with the swv_capture_file option."
+
+    ## Output formats.
+    FORMATS = ("functions", "lines", "collapsed")
+
+    @classmethod
+    def get_args(cls) -> List[argparse.ArgumentParser]:
+        """@brief Add this subcommand to the subparsers object."""
+        profile_parser = argparse.ArgumentParser(cls.HELP, add_help=False)
+
+        profile_options = profile_parser.add_argument_group("profile options")
+        profile_options.add_argument("--elf", metavar="PATH",
+            help="ELF file used to resolve function names and source lines.")
+        profile_options.add_argument("-d", "--duration", type=float, default=5.0, metavar="SECONDS",
+            help="Length of time to collect samples. Default is 5 seconds.")
+        profile_options.add_argument("-i", "--interval", type=int_base_0, default=4096, metavar="CYCLES",
+            help="PC sample interval in processor cycles. Rounded to a supported interval, from 64 to "
+            "16384 cycles. Default is 4096. Not used with --pcsr.")
+        profile_options.add_argument("--pcsr", action="store_true",
+            help="Sample by polling the DWT_PCSR register through the debug port instead of using SWO.")
+        profile_options.add_argument("-e", "--exceptions", action="store_true",
+            help="Enable exception trace so samples are grouped under the active exception handlers "
+            "in collapsed stack output.")
+        profile_options.add_argument("--replay", metavar="PATH",
+            help="Build the profile from an SWO capture file instead of a connected target.")
+        profile_options.add_argument("--format", choices=cls.FORMATS, default="functions",
+            help="Output format. 'functions' and 'lines' are flat histograms, 'collapsed' is the "
+            "collapsed stack format used by flame graph tools. Default is functions.")
+        profile_options.add_argument("-o", "--output", metavar="PATH",
+            help="Write the profile to a file instead of stdout.")
+        profile_options.add_argument("-n", "--limit", type=int, default=None, metavar="N",
+            help="Only show the N entries with the most samples in histogram output.")
+        profile_options.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES, metavar="N",
+            help=f"Limit on the number of distinct addresses held in memory. Default is {DEFAULT_MAX_ENTRIES}.")
+
+        return [cls.CommonOptions.COMMON, cls.CommonOptions.CONNECT, profile_parser]
+
+    def invoke(self) -> int:
+        """@brief Handle 'profile' subcommand."""
+        profile = SampleProfile(self._args.max_entries)
+
+        if self._args.replay is not None:
+            profile_swo_capture(self._args.replay, profile)
+            symbolizer = (ProfileSymbolizer.from_elf(ELFBinaryFile(self._args.elf))
+                    if self._args.elf else ProfileSymbolizer())
+            return self._write_report(profile, symbolizer)
+
+        option_defaults = self._modified_option_defaults()
+        # Sampling doesn't need the target to be halted.
+        option_defaults['connect_mode'] = 'attach'
+
+        session = ConnectHelper.session_with_chosen_probe(
+                        project_dir=self._args.project_dir,
+                        config_file=self._args.config,
+                        user_script=self._args.script,
+                        no_config=self._args.no_config,
+                        pack=self._args.pack,
+                        unique_id=self._args.unique_id,
+                        target_override=self._args.target_override,
+                        frequency=self._args.frequency,
+                        blocking=(not self._args.no_wait),
+                        connect_mode=self._args.connect_mode,
+                        options=convert_session_options(self._args.options),
+                        option_defaults=option_defaults,
+                        )
+        if session is None:
+            LOG.error("No target device available")
+            return 1
+
+        with session:
+            if self._args.pcsr:
+                collected = self._collect_pcsr_samples(session, profile)
+            else:
+                collected = self._collect_samples(session, profile)
+            if not collected:
+                return 1
+
+            assert session.target
+            if self._args.elf:
+                session.target.elf = self._args.elf
+            elf = session.target.elf
+            symbolizer = ProfileSymbolizer.from_elf(elf) if elf else ProfileSymbolizer()
+            return self._write_report(profile, symbolizer)
+
+    def _collect_samples(self, session: Session, profile: SampleProfile) -> bool:
+        """@brief Run PC sampling over SWO for the requested duration."""
+        target = session.target
+        assert target
+        core = target.selected_core
+        dwt = getattr(core, 'dwt', None)
+        if dwt is None:
+            LOG.error("Core does not have a DWT")
+            return False
+
+        sys_clock = session.options.get('swv_system_clock')
+        if sys_clock is None:
+            LOG.error("The swv_system_clock option must be set for PC sampling")
+            return False
+
+        reader = SWVReader(session, core.core_number)
+        if not reader.init(int(sys_clock), session.options.get('swv_clock'), None, PCSamplingSink(profile)):
+            return False
+        try:
+            interval = dwt.enable_pc_sampling(self._args.interval, self._args.exceptions)
+            LOG.info("Sampling PC every %d cycles for %g seconds", interval, self._args.duration)
+            if target.get_state() == Target.State.HALTED:
+                target.resume()
+            try:
+                sleep(self._args.duration)
+            except KeyboardInterrupt:
+                pass
+        finally:
+            dwt.disable_pc_sampling()
+            reader.stop()
+        return True
+
+    def _collect_pcsr_samples(self, session: Session, profile: SampleProfile) -> bool:
+        """@brief Poll DWT_PCSR for the requested duration."""
+        target = session.target
+        assert target
+        try:
+            sampler = PCSRSampler.from_core(target.selected_core, profile)
+        except exceptions.TargetSupportError as err:
+            LOG.error("%s", err)
+            return False
+
+        if target.get_state() == Target.State.HALTED:
+            target.resume()
+        LOG.info("Sampling DWT_PCSR for %g seconds", self._args.duration)
+        start = perf_counter()
+        try:
+            reads = sampler.run(duration=self._args.duration)
+        except KeyboardInterrupt:
+            return True
+        elapsed = perf_counter() - start
+        LOG.info("%d samples in %.2f seconds (%d samples/s)", reads, elapsed, reads / elapsed)
+        if sampler.missed_count:
+            LOG.info("%d reads of DWT_PCSR returned no sample", sampler.missed_count)
+        return True
+
+    def _write_report(self, profile: SampleProfile, symbolizer: ProfileSymbolizer) -> int:
+        if profile.total_samples == 0:
+            LOG.error("No PC samples were received")
+            return 1
+        if profile.overflow_count:
+            LOG.warning("Trace overflowed %d times; increase the sample interval or SWO clock",
+                    profile.overflow_count)
+        if profile.granularity > 1:
+            LOG.warning("Samples were merged into %d byte address ranges to limit memory use",
+                    profile.granularity)
+
+        output: TextIO = open(self._args.output, 'w') if self._args.output else sys.stdout
+        try:
+            if self._args.format == "collapsed":
+                write_collapsed_stacks(profile, symbolizer, output)
+            else:
+                if self._args.format == "lines":
+                    entries = line_histogram(profile, symbolizer)
+                    title = "Location"
+                else:
+                    entries = function_histogram(profile, symbolizer)
+                    title = "Function"
+                pt = self._get_pretty_table(["Samples", "%", title])
+                pt.align["Samples"] = 'r'
+                pt.align["%"] = 'r'
+                total = profile.total_samples
+                for entry in entries[:self._args.limit]:
+                    pt.add_row([entry.count, "%.2f" % (entry.count * 100 / total), entry.name])
+                output.write(pt.get_string() + "\n")
+                output.write(f"{total} samples\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return 0
@@ -28,7 +28,7 @@ from typing import List
 
 from pyocd.core.helpers import ConnectHelper
 from pyocd.core.soc_target import SoCTarget
-from pyocd.debug.rtt import RTTControlBlock, RTTUpChannel, RTTDownChannel
+from pyocd.debug.rtt import RTTControlBlock, RTTUpChannel, RTTDownChannel, RTTPollScheduler
 from pyocd.subcommands.base import SubcommandBase
 from pyocd.utility.cmdline import convert_session_options, int_base_0
 from pyocd.utility.kbhit import KBHit
@@ -116,6 +116,9 @@ class RTTSubcommand(SubcommandBase):
                 # set up terminal input
                 kb = KBHit()
 
+                # The poll interval adapts to how quickly the target is writing data.
+                scheduler = RTTPollScheduler.from_session(session)
+
                 if self._args.log_file is None:
                     if len(control_block.down_channels) < 1:
                         LOG.error("No down channels.")
@@ -124,9 +127,9 @@ class RTTSubcommand(SubcommandBase):
                     down_name = down_chan.name if down_chan.name is not None else ""
                     LOG.info(f"Writing to down channel {self._args.down_channel_id} (\"{down_name}\")")
 
-                    self.viewer_loop(up_chan, down_chan, kb)
+                    self.viewer_loop(control_block, scheduler, down_chan, kb)
                 else:
-                    self.logger_loop(up_chan, kb)
+                    self.logger_loop(control_block, scheduler, kb)
 
         except KeyboardInterrupt:
             pass
@@ -139,7 +142,15 @@ class RTTSubcommand(SubcommandBase):
 
         return 0
 
-    def logger_loop(self, up_chan, kb):
+    def _poll_up_channel(self, control_block, scheduler) -> bytes:
+        """@brief Wait until the scheduler says a poll is due, then read the selected up channel."""
+        sleep(scheduler.time_until_poll)
+        up_id = self._args.up_channel_id
+        data = control_block.poll_all([up_id])[up_id]
+        scheduler.update([control_block.up_channels[up_id]], [data])
+        return data
+
+    def logger_loop(self, control_block, scheduler, kb):
 
         LOG.info("start logging ... Press any key to stop")
         total_size = 0
@@ -149,11 +160,8 @@ class RTTSubcommand(SubcommandBase):
         with open(self._args.log_file, 'wb') as log_file:
 
             while True:
-                # poll at most 1000 times per second to limit CPU use
-                sleep(0.001)
-
                 # read data from up buffer
-                data = up_chan.read()
+                data = self._poll_up_channel(control_block, scheduler)
                 log_file.write(data)
 
                 s = len(data)
@@ -169,17 +177,14 @@ class RTTSubcommand(SubcommandBase):
                 if kb.kbhit():
                     break
 
-    def viewer_loop(self, up_chan, down_chan, kb):
+    def viewer_loop(self, control_block, scheduler, down_chan, kb):
         # byte array to send via RTT
         cmd = bytes()
 
         while True:
-            # poll at most 1000 times per second to limit CPU use
-            sleep(0.001)
-
-            # read data from up buffer 0 (target -> host) and write to
+            # read data from up buffer (target -> host) and write to
             # stdout
-            up_data: bytes = up_chan.read()
+            up_data: bytes = self._poll_up_channel(control_block, scheduler)
             sys.stdout.buffer.write(up_data)
             sys.stdout.buffer.flush()
 
@@ -202,3 +207,7 @@ class RTTSubcommand(SubcommandBase):
             # write cmd buffer to down buffer 0 (host -> target)
             bytes_out = down_chan.write(cmd)
             cmd = cmd[bytes_out:]
+
+            # the target will likely respond, so poll quickly again
+            if bytes_out:
+                scheduler.reset()
@@ -22,7 +22,8 @@ from .builtin import BUILTIN_TARGETS
 ## @brief Dictionary of all targets.
 #
 # This table starts off with only the builtin targets. At runtime it may be extended with
-# additional targets from CMSIS DFPs or other sources.
+# additional targets from CMSIS DFPs or other sources. It is a TargetRegistry, so builtin target
+# modules are imported only when their entry is looked up.
 TARGET = BUILTIN_TARGETS.copy()
 
 ## @brief Legal characters in target type names.
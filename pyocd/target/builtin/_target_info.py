@@ -0,0 +1,178 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file is generated by scripts/generate_builtin_target_index.py. Do not edit.
+
+from ..registry import TargetInfo
+
+BUILTIN_TARGET_INFO = {
+    'mps3_an522': TargetInfo(vendor='Arm', part_number='AN522', part_families=[]),
+    'mps3_an540': TargetInfo(vendor='Arm', part_number='AN540', part_families=[]),
+    'cortex_m': TargetInfo(vendor='Generic', part_number='CoreSightTarget', part_families=[]),
+    'kinetis': TargetInfo(vendor='NXP', part_number='Kinetis', part_families=[]),
+    'ke15z7': TargetInfo(vendor='NXP', part_number='KE15Z7', part_families=[]),
+    'ke17z7': TargetInfo(vendor='NXP', part_number='KE17Z7', part_families=[]),
+    'ke18f16': TargetInfo(vendor='NXP', part_number='KE18F16', part_families=[]),
+    'kl02z': TargetInfo(vendor='NXP', part_number='KL02Z', part_families=[]),
+    'kl05z': TargetInfo(vendor='NXP', part_number='KL05Z', part_families=[]),
+    'kl25z': TargetInfo(vendor='NXP', part_number='KL25Z', part_families=[]),
+    'kl26z': TargetInfo(vendor='NXP', part_number='KL26Z', part_families=[]),
+    'kl27z4': TargetInfo(vendor='NXP', part_number='KL27Z4', part_families=[]),
+    'kl28z': TargetInfo(vendor='NXP', part_number='KL28x', part_families=[]),
+    'kl43z4': TargetInfo(vendor='NXP', part_number='KL43Z4', part_families=[]),
+    'kl46z': TargetInfo(vendor='NXP', part_number='KL46Z', part_families=[]),
+    'kl82z7': TargetInfo(vendor='NXP', part_number='KL82Z7', part_families=[]),
+    'kv10z7': TargetInfo(vendor='NXP', part_number='KV10Z7', part_families=[]),
+    'kv11z7': TargetInfo(vendor='NXP', part_number='KV11Z7', part_families=[]),
+    'kw01z4': TargetInfo(vendor='NXP', part_number='KW01Z4', part_families=[]),
+    'kw24d5': TargetInfo(vendor='NXP', part_number='KW24D5', part_families=[]),
+    'kw36z4': TargetInfo(vendor='NXP', part_number='KW36Z4', part_families=[]),
+    'kw40z4': TargetInfo(vendor='NXP', part_number='KW40Z4', part_families=[]),
+    'kw41z4': TargetInfo(vendor='NXP', part_number='KW41Z4', part_families=[]),
+    'k20d50m': TargetInfo(vendor='NXP', part_number='K20D50M', part_families=[]),
+    'k22fa12': TargetInfo(vendor='NXP', part_number='K22FA12', part_families=[]),
+    'k22f': TargetInfo(vendor='NXP', part_number='K22F', part_families=[]),
+    'k28f15': TargetInfo(vendor='NXP', part_number='K28F15', part_families=[]),
+    'k64f': TargetInfo(vendor='NXP', part_number='K64F', part_families=[]),
+    'k66f18': TargetInfo(vendor='NXP', part_number='K66F18', part_families=[]),
+    'k82f25615': TargetInfo(vendor='NXP', part_number='K82F25615', part_families=[]),
+    'k32w042s': TargetInfo(vendor='NXP', part_number='K32W042S', part_families=[]),
+    'k32l2b3': TargetInfo(vendor='NXP', part_number='K32L2B3', part_families=[]),
+    'lpc800': TargetInfo(vendor='NXP', part_number='LPC800', part_families=[]),
+    'lpc845': TargetInfo(vendor='NXP', part_number='LPC845', part_families=[]),
+    'lpc11u24': TargetInfo(vendor='NXP', part_number='LPC11U24', part_families=[]),
+    'lpc1768': TargetInfo(vendor='NXP', part_number='LPC1768', part_families=[]),
+    'lpc4330': TargetInfo(vendor='NXP', part_number='LPC4330', part_families=[]),
+    'max32600': TargetInfo(vendor='Maxim', part_number='MAX32600', part_families=[]),
+    'max32620': TargetInfo(vendor='Maxim', part_number='MAX32620', part_families=[]),
+    'max32625': TargetInfo(vendor='Maxim', part_number='MAX32625', part_families=[]),
+    'max32630': TargetInfo(vendor='Maxim', part_number='MAX32630', part_families=[]),
+    'max32660': TargetInfo(vendor='Maxim', part_number='MAX32660', part_families=[]),
+    'max32670': TargetInfo(vendor='Maxim', part_number='MAX32670', part_families=[]),
+    'mimxrt1010': TargetInfo(vendor='NXP', part_number='MIMXRT1011xxxxx', part_families=[]),
+    'mimxrt1015': TargetInfo(vendor='NXP', part_number='MIMXRT1015xxxxx', part_families=[]),
+    'mimxrt1020': TargetInfo(vendor='NXP', part_number='MIMXRT1021xxxxx', part_families=[]),
+    'mimxrt1024': TargetInfo(vendor='NXP', part_number='MIMXRT1024xxxxx', part_families=[]),
+    'mimxrt1050_quadspi': TargetInfo(vendor='NXP', part_number='MIMXRT1052xxxxB_quadspi', part_families=[]),
+    'mimxrt1050_hyperflash': TargetInfo(vendor='NXP', part_number='MIMXRT1052xxxxB_hyperflash', part_families=[]),
+    'mimxrt1050': TargetInfo(vendor='NXP', part_number='MIMXRT1052xxxxB_hyperflash', part_families=[]),
+    'mimxrt1060': TargetInfo(vendor='NXP', part_number='MIMXRT1062xxxxA', part_families=[]),
+    'mimxrt1064': TargetInfo(vendor='NXP', part_number='MIMXRT1064xxxxA', part_families=[]),
+    'mimxrt1170_cm7': TargetInfo(vendor='NXP', part_number='MIMXRT1176xxxxx_CM7', part_families=[]),
+    'mimxrt1170_cm4': TargetInfo(vendor='NXP', part_number='MIMXRT1176xxxxx_CM4', part_families=[]),
+    'nrf51': TargetInfo(vendor='Nordic Semiconductor', part_number='NRF51', part_families=[]),
+    'nrf51822': TargetInfo(vendor='Nordic Semiconductor', part_number='NRF51', part_families=[]),
+    'nrf52': TargetInfo(vendor='Nordic Semiconductor', part_number='NRF52832', part_families=[]),
+    'nrf52832': TargetInfo(vendor='Nordic Semiconductor', part_number='NRF52832', part_families=[]),
+    'nrf52833': TargetInfo(vendor='Nordic Semiconductor', part_number='NRF52833', part_families=[]),
+    'nrf52840': TargetInfo(vendor='Nordic Semiconductor', part_number='NRF52840', part_families=[]),
+    'stm32f103rc': TargetInfo(vendor='STMicroelectronics', part_number='STM32F103RC', part_families=[]),
+    'stm32f051': TargetInfo(vendor='STMicroelectronics', part_number='STM32F051', part_families=[]),
+    'stm32f412xe': TargetInfo(vendor='STMicroelectronics', part_number='STM32F412xE', part_families=[]),
+    'stm32f412xg': TargetInfo(vendor='STMicroelectronics', part_number='STM32F412xG', part_families=[]),
+    'stm32f429xg': TargetInfo(vendor='STMicroelectronics', part_number='STM32F429xG', part_families=[]),
+    'stm32f429xi': TargetInfo(vendor='STMicroelectronics', part_number='STM32F429xI', part_families=[]),
+    'stm32f439xg': TargetInfo(vendor='STMicroelectronics', part_number='STM32F439xG', part_families=[]),
+    'stm32f439xi': TargetInfo(vendor='STMicroelectronics', part_number='STM32F439xI', part_families=[]),
+    'stm32f767zi': TargetInfo(vendor='STMicroelectronics', part_number='STM32F767xx', part_families=[]),
+    'stm32l432kc': TargetInfo(vendor='STMicroelectronics', part_number='STM32L432xC', part_families=[]),
+    'stm32l475xc': TargetInfo(vendor='STMicroelectronics', part_number='STM32L475xC', part_families=[]),
+    'stm32l475xe': TargetInfo(vendor='STMicroelectronics', part_number='STM32L475xE', part_families=[]),
+    'stm32l475xg': TargetInfo(vendor='STMicroelectronics', part_number='STM32L475xG', part_families=[]),
+    'stm32l031x6': TargetInfo(vendor='STMicroelectronics', part_number='STM32L031x6', part_families=[]),
+    'w7500': TargetInfo(vendor='WIZnet', part_number='W7500', part_families=[]),
+    's5js100': TargetInfo(vendor='Samsung', part_number='S5JS100', part_families=[]),
+    'lpc11xx_32': TargetInfo(vendor='NXP', part_number='LPC11XX_32', part_families=[]),
+    'lpc824': TargetInfo(vendor='NXP', part_number='LPC824', part_families=[]),
+    'lpc54114': TargetInfo(vendor='NXP', part_number='LPC54114', part_families=[]),
+    'lpc54608': TargetInfo(vendor='NXP', part_number='LPC54608', part_families=[]),
+    'lpc4088': TargetInfo(vendor='NXP', part_number='LPC4088', part_families=[]),
+    'ncs36510': TargetInfo(vendor='ONSemiconductor', part_number='NCS36510', part_families=[]),
+    'lpc4088qsb': TargetInfo(vendor='NXP', part_number='LPC4088qsb', part_families=[]),
+    'lpc4088dm': TargetInfo(vendor='NXP', part_number='LPC4088dm', part_families=[]),
+    'rtl8195am': TargetInfo(vendor='Realtek Semiconductor', part_number='RTL8195AM', part_families=[]),
+    'cc3220sf': TargetInfo(vendor='Texas Instruments', part_number='CC3220SF', part_families=[]),
+    'cy8c6xxa': TargetInfo(vendor='Cypress', part_number='CY8C6xxA', part_families=[]),
+    'cy8c6xx7': TargetInfo(vendor='Cypress', part_number='CY8C6xx7', part_families=[]),
+    'cy8c6xx7_s25fs512s': TargetInfo(vendor='Cypress', part_number='CY8C6xx7_S25FS512S', part_families=[]),
+    'cy8c6xx7_nosmif': TargetInfo(vendor='Cypress', part_number='CY8C6xx7_nosmif', part_families=[]),
+    'cy8c6xx5': TargetInfo(vendor='Cypress', part_number='CY8C6xx5', part_families=[]),
+    'cy8c64_sysap': TargetInfo(vendor='Cypress', part_number='cy8c64_sysap', part_families=[]),
+    'cy8c64xx_cm0': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm0', part_families=[]),
+    'cy8c64xx_cm4': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm4', part_families=[]),
+    'cy8c64xx_cm0_s25hx512t': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm0_s25hx512t', part_families=[]),
+    'cy8c64xx_cm4_s25hx512t': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm4_s25hx512t', part_families=[]),
+    'cy8c64xx_cm0_nosmif': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm0_nosmif', part_families=[]),
+    'cy8c64xx_cm4_nosmif': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm4_nosmif', part_families=[]),
+    'cy8c64xa_cm0': TargetInfo(vendor='Cypress', part_number='cy8c64xA_cm0', part_families=[]),
+    'cy8c64xa_cm4': TargetInfo(vendor='Cypress', part_number='cy8c64xA_cm4', part_families=[]),
+    'cy8c64x5_cm0': TargetInfo(vendor='Cypress', part_number='cy8c64x5_cm0', part_families=[]),
+    'cy8c64x5_cm4': TargetInfo(vendor='Cypress', part_number='cy8c64x5_cm4', part_families=[]),
+    'musca_a1': TargetInfo(vendor='Arm', part_number='MuscaA1', part_families=[]),
+    'musca_b1': TargetInfo(vendor='Arm', part_number='MuscaB1', part_families=[]),
+    'musca_s1': TargetInfo(vendor='Arm', part_number='MuscaS1', part_families=[]),
+    'lpc5526': TargetInfo(vendor='NXP', part_number='LPC5526', part_families=[]),
+    'lpc55s69': TargetInfo(vendor='NXP', part_number='LPC55S69', part_families=[]),
+    'lpc55s16': TargetInfo(vendor='NXP', part_number='LPC55S16', part_families=[]),
+    'lpc55s36': TargetInfo(vendor='NXP', part_number='LPC55S36', part_families=[]),
+    'lpc55s28': TargetInfo(vendor='NXP', part_number='LPC55S28', part_families=[]),
+    'cy8c64xx_cm0_full_flash': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm0_full_flash', part_families=[]),
+    'cy8c64xx_cm4_full_flash': TargetInfo(vendor='Cypress', part_number='cy8c64xx_cm4_full_flash', part_families=[]),
+    'cy8c64xa_cm0_full_flash': TargetInfo(vendor='Cypress', part_number='cy8c64xA_cm0_full_flash', part_families=[]),
+    'cy8c64xa_cm4_full_flash': TargetInfo(vendor='Cypress', part_number='cy8c64xA_cm4_full_flash', part_families=[]),
+    'cy8c64x5_cm0_full_flash': TargetInfo(vendor='Cypress', part_number='cy8c64x5_cm0_full_flash', part_families=[]),
+    'cy8c64x5_cm4_full_flash': TargetInfo(vendor='Cypress', part_number='cy8c64x5_cm4_full_flash', part_families=[]),
+    'm252kg6ae': TargetInfo(vendor='Nuvoton', part_number='M252KG6AE', part_families=[]),
+    'm263kiaae': TargetInfo(vendor='Nuvoton', part_number='M263KIAAE', part_families=[]),
+    'm467hjhae': TargetInfo(vendor='Nuvoton', part_number='M467HJHAE', part_families=[]),
+    'm487jidae': TargetInfo(vendor='Nuvoton', part_number='M487JIDAE', part_families=[]),
+    'm2354kjfae': TargetInfo(vendor='Nuvoton', part_number='M2354KJFAE', part_families=[]),
+    'hc32f451xc': TargetInfo(vendor='HDSC', part_number='HC32F451xC', part_families=[]),
+    'hc32f451xe': TargetInfo(vendor='HDSC', part_number='HC32F451xE', part_families=[]),
+    'hc32f452xc': TargetInfo(vendor='HDSC', part_number='HC32F452xC', part_families=[]),
+    'hc32f452xe': TargetInfo(vendor='HDSC', part_number='HC32F452xE', part_families=[]),
+    'hc32f460xc': TargetInfo(vendor='HDSC', part_number='HC32F460xC', part_families=[]),
+    'hc32f460xe': TargetInfo(vendor='HDSC', part_number='HC32F460xE', part_families=[]),
+    'hc32f4a0xg': TargetInfo(vendor='HDSC', part_number='HC32F4A0xG', part_families=[]),
+    'hc32f4a0xi': TargetInfo(vendor='HDSC', part_number='HC32F4A0xI', part_families=[]),
+    'hc32m423xa': TargetInfo(vendor='HDSC', part_number='HC32M423xA', part_families=[]),
+    'hc32f120x6': TargetInfo(vendor='HDSC', part_number='HC32F120x6TA', part_families=[]),
+    'hc32f120x8': TargetInfo(vendor='HDSC', part_number='HC32F120x8TA', part_families=[]),
+    'hc32m120': TargetInfo(vendor='HDSC', part_number='HC32M120', part_families=[]),
+    'hc32m120x6': TargetInfo(vendor='HDSC', part_number='HC32M120', part_families=[]),
+    'hc32f160xa': TargetInfo(vendor='HDSC', part_number='HC32F160xA', part_families=[]),
+    'hc32f160xc': TargetInfo(vendor='HDSC', part_number='HC32F160xC', part_families=[]),
+    'hc32l110': TargetInfo(vendor='HDSC', part_number='HC32L110', part_families=[]),
+    'hc32f003': TargetInfo(vendor='HDSC', part_number='HC32F003', part_families=[]),
+    'hc32f005': TargetInfo(vendor='HDSC', part_number='HC32F005', part_families=[]),
+    'hc32l136': TargetInfo(vendor='HDSC', part_number='HC32L136', part_families=[]),
+    'hc32l130': TargetInfo(vendor='HDSC', part_number='HC32L130', part_families=[]),
+    'hc32f030': TargetInfo(vendor='HDSC', part_number='HC32F030', part_families=[]),
+    'hc32l196': TargetInfo(vendor='HDSC', part_number='HC32L196', part_families=[]),
+    'hc32l190': TargetInfo(vendor='HDSC', part_number='HC32L190', part_families=[]),
+    'hc32f196': TargetInfo(vendor='HDSC', part_number='HC32F196', part_families=[]),
+    'hc32f190': TargetInfo(vendor='HDSC', part_number='HC32F190', part_families=[]),
+    'hc32l072': TargetInfo(vendor='HDSC', part_number='HC32L072', part_families=[]),
+    'hc32l073': TargetInfo(vendor='HDSC', part_number='HC32L073', part_families=[]),
+    'hc32f072': TargetInfo(vendor='HDSC', part_number='HC32F072', part_families=[]),
+    'rp2040': TargetInfo(vendor='Raspberry Pi', part_number='RP2040Core0', part_families=[]),
+    'rp2040_core0': TargetInfo(vendor='Raspberry Pi', part_number='RP2040Core0', part_families=[]),
+    'rp2040_core1': TargetInfo(vendor='Raspberry Pi', part_number='RP2040Core1', part_families=[]),
+    'ytm32b1ld0': TargetInfo(vendor='Yuntu Microelectronics', part_number='YTM32B1LD0', part_families=[]),
+    'ytm32b1le0': TargetInfo(vendor='Yuntu Microelectronics', part_number='YTM32B1LE0', part_families=[]),
+    'ytm32b1me0': TargetInfo(vendor='YTMicro', part_number='YTM32B1ME0', part_families=[]),
+    'ytm32b1md1': TargetInfo(vendor='Yuntu Microelectronics', part_number='YTM32B1MD1', part_families=[]),
+}
@@ -21,6 +21,7 @@
 from dataclasses import (dataclass, field)
 from xml.etree.ElementTree import (ElementTree, Element)
 import zipfile
+import hashlib
 import logging
 import io
 import errno
@@ -42,6 +43,7 @@ from ...coresight.ap import (
     APv1Address,
     APv2Address,
 )
+from ...debug.sequences.code_cache import DebugSequenceCodeCache
 from ...debug.sequences.sequences import (
     Block,
     DebugSequence,
@@ -225,8 +227,15 @@ class CmsisPackDescription:
         """
         self._pack = pack
 
-        # Convert PDSC into an ElementTree.
-        self._pdsc = ElementTree(file=pdsc_file)
+        # Convert PDSC into an ElementTree, hashing the contents on the way. A path is accepted in
+        # place of a file object, as ElementTree allows.
+        if hasattr(pdsc_file, 'read'):
+            pdsc_data = pdsc_file.read()
+        else:
+            with open(pdsc_file, 'rb') as f:
+                pdsc_data = f.read()
+        self._content_hash = hashlib.sha256(pdsc_data).hexdigest()
+        self._pdsc = ElementTree(file=io.BytesIO(pdsc_data))
 
         self._state_stack: List[_DeviceInfo] = []
         self._devices: List["CmsisPackDevice"] = []
@@ -239,6 +248,11 @@ class CmsisPackDescription:
         for family in self._pdsc.iter('family'):
             self._parse_devices(family)
 
+    @property
+    def content_hash(self) -> str:
+        """@brief SHA-256 hash of the PDSC file contents, as a hex string."""
+        return self._content_hash
+
     @property
     def pack_name(self) -> Optional[str]:
         """@brief Name of the CMSIS-Pack.
@@ -685,6 +699,7 @@ class CmsisPackDevice:
         self._processed_algos: Set[Element] = set() # Algo elements we've converted to regions.
         self._sequences: Set[DebugSequence] = set()
         self._debugvars: Optional[Block] = None
+        self._sequence_code_cache: Optional[DebugSequenceCodeCache] = None
         self._valid_dps: List[int] = []
         self._apids: Dict[int, APAddressBase] = {}
         self._processors_map: Dict[str, ProcessorInfo] = {}
@@ -953,14 +968,15 @@ class CmsisPackDevice:
             if elem.text is not None:
                 # Create and attach a block node. No subelements are allowed.
                 is_atomic = _get_bool_attribute(elem, 'atomic', False)
-                node = Block(elem.text, is_atomic, info)
+                node = Block(elem.text, is_atomic, info, code_cache=self._sequence_code_cache)
                 parent.add_child(node)
         elif elem.tag == 'control':
             # The attribute name determines the control node's function.
             if 'if' in elem.attrib:
-                node = IfControl(elem.attrib['if'], info)
+                node = IfControl(elem.attrib['if'], info, code_cache=self._sequence_code_cache)
             elif 'while' in elem.attrib:
-                node = WhileControl(elem.attrib['while'], info, int(elem.attrib.get('timeout', "0")))
+                node = WhileControl(elem.attrib['while'], info, int(elem.attrib.get('timeout', "0")),
+                        code_cache=self._sequence_code_cache)
             else:
                 root_node = parent.find_root()
                 assert isinstance(root_node, DebugSequence)
@@ -1028,6 +1044,19 @@ class CmsisPackDevice:
         except (KeyError, IndexError):
             return None
 
+    @property
+    def sequence_code_cache(self) -> Optional[DebugSequenceCodeCache]:
+        """@brief Cache of compiled debug sequence code.
+
+        Must be set before the `sequences` or `debug_vars_sequence` properties are first accessed
+        in order to be used.
+        """
+        return self._sequence_code_cache
+
+    @sequence_code_cache.setter
+    def sequence_code_cache(self, cache: Optional[DebugSequenceCodeCache]) -> None:
+        self._sequence_code_cache = cache
+
     @property
     def sequences(self) -> Set[DebugSequence]:
         """@brief Dictionary of defined sequence elements.
@@ -1046,7 +1075,7 @@ class CmsisPackDevice:
         if (self._debugvars is None) and len(self._info.debugvars):
             elem = self._info.debugvars[0]
             assert elem.text is not None # Ensured by CmsisPackDescription._extract_debugvars.
-            self._debugvars = Block(elem.text, info="debugvars")
+            self._debugvars = Block(elem.text, info="debugvars", code_cache=self._sequence_code_cache)
         return self._debugvars
 
     @property
@@ -31,6 +31,7 @@ from ...core.target import Target
 from ...coresight.ap import APv1Address
 from ...coresight.coresight_target import CoreSightTarget
 from ...coresight.cortex_m import CortexM
+from ...debug.sequences.code_cache import DebugSequenceCodeCache
 from ...debug.sequences.delegates import DebugSequenceDelegate
 from ...debug.sequences.functions import DebugSequenceCommonFunctions
 from ...debug.sequences.sequences import (Block, DebugSequence, DebugSequenceExecutionContext)
@@ -145,6 +146,10 @@ class PackDebugSequenceDelegate(DebugSequenceDelegate):
         self._target = target
         self._session = target.session
         self._pack_device = device
+
+        # Attach the compiled code cache before the sequences are built from the pack.
+        if device.sequence_code_cache is None:
+            device.sequence_code_cache = DebugSequenceCodeCache.for_pack(self._session, device.pack_description)
         self._sequences: Set[DebugSequence] = device.sequences
         self._debugvars: Optional[Scope] = None
         self._functions = DebugSequenceCommonFunctions()
@@ -285,6 +290,10 @@ class PackDebugSequenceDelegate(DebugSequenceDelegate):
                 else:
                     LOG.error("Error while running debug sequence '%s': %s", name, err)
                 raise
+            finally:
+                # Save any code compiled while running the sequence.
+                if self._pack_device.sequence_code_cache is not None:
+                    self._pack_device.sequence_code_cache.save()
 
         return executed_scope
 
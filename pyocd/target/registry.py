@@ -0,0 +1,125 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from importlib import import_module
+from typing import (Dict, Iterator, List, Mapping, MutableMapping, NamedTuple, Optional, Set, Type,
+        TYPE_CHECKING, Union)
+
+if TYPE_CHECKING:
+    from ..core.soc_target import SoCTarget
+
+class TargetInfo(NamedTuple):
+    """@brief Descriptive attributes of a target class that can be used without importing it."""
+    vendor: str
+    part_number: str
+    part_families: List[str]
+
+    @classmethod
+    def from_class(cls, target_class: Type["SoCTarget"]) -> "TargetInfo":
+        """@brief Extract the info from a target class.
+
+        The attribute defaults mirror those applied by SoCTarget's constructor.
+        """
+        return cls(
+                target_class.VENDOR,
+                getattr(target_class, 'PART_NUMBER', target_class.__name__),
+                list(getattr(target_class, 'PART_FAMILIES', [])),
+                )
+
+class TargetRegistry(MutableMapping[str, Type["SoCTarget"]]):
+    """@brief Dictionary of target type names to target classes that imports target modules on demand.
+
+    Entries can be added either as a target class or as a reference string of the form
+    "module:ClassName". The module name may be relative to the _package_ passed to the
+    constructor. Reference entries are resolved the first time they are accessed by
+    `__getitem__()`, so only the modules for targets that are actually used get imported.
+    Iteration, `len()`, and membership tests never import anything.
+
+    An optional mapping of target name to TargetInfo can be provided for the reference entries. It
+    is used to describe those targets without importing them; see get_info().
+    """
+
+    def __init__(
+            self,
+            refs: Optional[Mapping[str, str]] = None,
+            package: Optional[str] = None,
+            info: Optional[Mapping[str, TargetInfo]] = None,
+            ) -> None:
+        """@brief Constructor.
+        @param self
+        @param refs Optional mapping of target type name to "module:ClassName" reference string.
+        @param package Package name used to resolve relative module names in references.
+        @param info Optional mapping of target type name to TargetInfo for entries of _refs_.
+        """
+        self._entries: Dict[str, Union[str, Type["SoCTarget"]]] = dict(refs or {})
+        self._package = package
+        self._info: Mapping[str, TargetInfo] = info or {}
+        # Names of the entries that were provided as references and not since replaced.
+        self._ref_names: Set[str] = set(self._entries)
+
+    def is_loaded(self, name: str) -> bool:
+        """@brief Whether the target class for the named entry has been imported."""
+        return not isinstance(self._entries[name], str)
+
+    def get_info(self, name: str) -> Optional[TargetInfo]:
+        """@brief Return the TargetInfo for a named target without importing it.
+
+        None is returned if no info is available, which is always the case for entries that
+        were added or replaced as target classes.
+        """
+        if name not in self._ref_names:
+            return None
+        return self._info.get(name)
+
+    def copy(self) -> "TargetRegistry":
+        """@brief Shallow copy that keeps unresolved entries unresolved."""
+        result = self.__class__(package=self._package, info=self._info)
+        result._entries = self._entries.copy()
+        result._ref_names = self._ref_names.copy()
+        return result
+
+    def _load(self, ref: str) -> Type["SoCTarget"]:
+        module_name, _, class_name = ref.partition(':')
+        module = import_module(module_name, self._package)
+        return getattr(module, class_name)
+
+    def __getitem__(self, name: str) -> Type["SoCTarget"]:
+        entry = self._entries[name]
+        if isinstance(entry, str):
+            entry = self._load(entry)
+            self._entries[name] = entry
+        return entry
+
+    def __setitem__(self, name: str, value: Type["SoCTarget"]) -> None:
+        self._entries[name] = value
+        self._ref_names.discard(name)
+
+    def __delitem__(self, name: str) -> None:
+        del self._entries[name]
+        self._ref_names.discard(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return "<%s@%x %d targets (%d loaded)>" % (self.__class__.__name__, id(self), len(self),
+                sum(1 for name in self._entries if self.is_loaded(name)))
@@ -157,29 +157,43 @@ class ListGenerator(object):
             if name_filter and name_filter not in name.lower():
                 continue
 
-            # Create session with a stub probe that allows us to instantiate the target. This will create
-            # Board and Target instances of its own, so set some options to control that.
-            s = Session(StubProbe(), no_config=True, target_override='cortex_m')
-            t = TARGET[name](s)
+            # Builtin targets are described by the builtin target index, so they don't have to be
+            # imported. Builtin SVDs are always loaded from a zip file, so never have an SVD path.
+            info = TARGET.get_info(name)
+            if info is not None:
+                vendor = info.vendor
+                part_families = info.part_families
+                part_number = info.part_number
+                source = 'builtin'
+                svd_location = None
+            else:
+                # Create session with a stub probe that allows us to instantiate the target. This will create
+                # Board and Target instances of its own, so set some options to control that.
+                s = Session(StubProbe(), no_config=True, target_override='cortex_m')
+                t = TARGET[name](s)
+                vendor = t.vendor
+                part_families = t.part_families
+                part_number = t.part_number
+                source = 'pack' if hasattr(t, '_pack_device') else 'builtin'
+                svd_location = t._svd_location
 
             # Filter by vendor.
-            if vendor_filter and vendor_filter not in t.vendor.lower():
+            if vendor_filter and vendor_filter not in vendor.lower():
                 continue
 
             # Filter by source.
-            source = 'pack' if hasattr(t, '_pack_device') else 'builtin'
             if source_filter and source_filter != source:
                 continue
 
             d = {
                 'name' : name,
-                'vendor' : t.vendor,
-                'part_families' : t.part_families,
-                'part_number' : t.part_number,
+                'vendor' : vendor,
+                'part_families' : part_families,
+                'part_number' : part_number,
                 'source': source,
                 }
-            if t._svd_location is not None:
-                svdPath = t._svd_location.filename
+            if svd_location is not None:
+                svdPath = svd_location.filename
                 if isinstance(svdPath, str) and os.path.exists(svdPath):
                     d['svd_path'] = svdPath
             targets.append(d)
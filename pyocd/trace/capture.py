@@ -0,0 +1,296 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import queue
+import struct
+import threading
+from time import perf_counter
+from typing import (Any, BinaryIO, Dict, Iterator, Optional, Tuple, TYPE_CHECKING, Union)
+
+from ..core import exceptions
+from .swo import SWOBatchParser
+
+if TYPE_CHECKING:
+    from ..core.core_target import CoreTarget
+    from .sink import TraceEventSink
+    from .swo import SWOParser
+
+LOG = logging.getLogger(__name__)
+
+## @brief Identifier at the start of every SWO capture file.
+CAPTURE_MAGIC = b"PYOCDSWO"
+
+## @brief Current capture file format version.
+CAPTURE_VERSION = 1
+
+# Magic, format version, and length of the JSON metadata that follows.
+_HEADER = struct.Struct('<8sHI')
+
+# Microseconds since the start of the capture and length of the data that follows.
+_CHUNK_HEADER = struct.Struct('<QI')
+
+class SWOCaptureWriter:
+    """@brief Records raw SWO data to a capture file.
+
+    A capture file consists of a header followed by a sequence of chunks, one for each call to
+    write(). The header holds a JSON object of metadata describing the probe, target and SWO
+    configuration. Each chunk records the time it was received, in microseconds from the creation
+    of the writer, along with the raw SWO bytes. Data is written exactly as it was read from the
+    probe, so no decoding cost is added to the reader thread.
+
+    The writer can be used as a context manager.
+    """
+
+    def __init__(self, file: Union[str, BinaryIO], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """@brief Constructor.
+        @param self
+        @param file Either a path or a binary file object opened for writing. If a path is
+            passed, the file is closed by close().
+        @param metadata Optional dict of JSON-serialisable values stored in the file header.
+        """
+        if isinstance(file, str):
+            self._file: BinaryIO = open(file, 'wb')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        self._start = perf_counter()
+        self._bytes_written = 0
+        encoded_metadata = json.dumps(metadata or {}).encode('utf-8')
+        self._file.write(_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(encoded_metadata)))
+        self._file.write(encoded_metadata)
+
+    @property
+    def bytes_written(self) -> int:
+        """@brief Number of bytes of SWO data recorded so far."""
+        return self._bytes_written
+
+    @property
+    def elapsed(self) -> float:
+        """@brief Seconds since the writer was created."""
+        return perf_counter() - self._start
+
+    def write(self, data: bytes, timestamp: Optional[float] = None) -> None:
+        """@brief Record a chunk of SWO data.
+        @param self
+        @param data Raw SWO bytes. Empty chunks are ignored.
+        @param timestamp Optional time the data was received, in seconds relative to the
+            creation of the writer. If not provided, the current time is used.
+        """
+        if not data:
+            return
+        if timestamp is None:
+            timestamp = self.elapsed
+        self._file.write(_CHUNK_HEADER.pack(int(timestamp * 1000000), len(data)))
+        self._file.write(data)
+        self._bytes_written += len(data)
+
+    def close(self) -> None:
+        """@brief Flush the capture and close the file if it was opened by the writer."""
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self) -> "SWOCaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+class SWOCaptureWriterThread(threading.Thread):
+    """@brief Records raw SWO data to a capture file from a background thread.
+
+    write() timestamps the data and puts it on a queue, without touching the file. The thread takes
+    chunks from the queue and writes them with an SWOCaptureWriter, so file I/O does not delay the
+    thread reading SWO data from the probe. The thread is started by the constructor. close() waits
+    for all queued chunks to be written before closing the capture.
+
+    If writing the file fails, the error is logged and the rest of the data is dropped.
+    """
+
+    def __init__(self, file: Union[str, BinaryIO], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """@brief Constructor.
+
+        Arguments are the same as for SWOCaptureWriter. The file header is written before the
+        constructor returns.
+        """
+        super().__init__()
+        self.name = "swo-capture-writer"
+        self._writer = SWOCaptureWriter(file, metadata)
+        self._queue: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue()
+        self.daemon = True
+        self.start()
+
+    @property
+    def bytes_written(self) -> int:
+        """@brief Number of bytes of SWO data written to the file so far."""
+        return self._writer.bytes_written
+
+    def write(self, data: bytes) -> None:
+        """@brief Queue a chunk of SWO data to be recorded, timestamped with the current time."""
+        if data:
+            self._queue.put((self._writer.elapsed, bytes(data)))
+
+    def close(self) -> None:
+        """@brief Write all queued data, stop the thread, and close the capture."""
+        self._queue.put(None)
+        self.join()
+        self._writer.close()
+
+    def __enter__(self) -> "SWOCaptureWriterThread":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def run(self) -> None:
+        failed = False
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if failed:
+                continue
+            timestamp, data = item
+            try:
+                self._writer.write(data, timestamp)
+            except OSError as err:
+                LOG.error("Error writing SWO capture file; recording stopped: %s", err)
+                failed = True
+
+class SWOCaptureReader:
+    """@brief Reads an SWO capture file written by SWOCaptureWriter.
+
+    No probe or target is required to read or replay a capture. If the capture ends part way
+    through a chunk, for instance because the recording process was killed, the incomplete chunk
+    is ignored.
+
+    The reader can be used as a context manager.
+    """
+
+    def __init__(self, file: Union[str, BinaryIO]) -> None:
+        """@brief Constructor.
+        @param self
+        @param file Either a path or a binary file object opened for reading.
+        @exception Error The file is not an SWO capture or has an unsupported version.
+        """
+        if isinstance(file, str):
+            self._file: BinaryIO = open(file, 'rb')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise exceptions.Error("not an SWO capture file")
+        magic, version, metadata_length = _HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC:
+            raise exceptions.Error("not an SWO capture file")
+        if version > CAPTURE_VERSION:
+            raise exceptions.Error(f"unsupported SWO capture file version {version}")
+        self._version = version
+        self._metadata: Dict[str, Any] = json.loads(self._file.read(metadata_length).decode('utf-8'))
+        self._data_offset = self._file.tell()
+
+    @property
+    def version(self) -> int:
+        """@brief Format version of the capture file."""
+        return self._version
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """@brief Dict of metadata recorded in the capture header."""
+        return self._metadata
+
+    def chunks(self) -> Iterator[Tuple[float, bytes]]:
+        """@brief Iterate over the recorded chunks.
+
+        Each iteration starts from the first chunk of the capture.
+
+        @return Iterator of (timestamp, data) tuples, where timestamp is in seconds from the start
+            of the capture.
+        """
+        self._file.seek(self._data_offset)
+        read = self._file.read
+        while True:
+            header = read(_CHUNK_HEADER.size)
+            if not header:
+                return
+            if len(header) < _CHUNK_HEADER.size:
+                LOG.warning("SWO capture ends with an incomplete chunk")
+                return
+            timestamp_us, length = _CHUNK_HEADER.unpack(header)
+            data = read(length)
+            if len(data) < length:
+                LOG.warning("SWO capture ends with an incomplete chunk")
+                return
+            yield timestamp_us / 1000000, data
+
+    def read_all(self) -> bytes:
+        """@brief Return all of the recorded SWO data as a single bytes object."""
+        return b''.join(data for _, data in self.chunks())
+
+    def replay(self, parser: "SWOParser") -> int:
+        """@brief Feed the recorded SWO data through a parser as fast as possible.
+
+        The chunks are passed to the parser in the same sizes they were read from the probe, so
+        parsing behaves as it did live. Recorded timing is not reproduced.
+
+        @param self
+        @param parser An SWOParser or SWOBatchParser instance, connected to its event sink.
+        @return Number of bytes of SWO data replayed.
+        """
+        count = 0
+        for _, data in self.chunks():
+            parser.parse(data)
+            count += len(data)
+        return count
+
+    def close(self) -> None:
+        """@brief Close the file if it was opened by the reader."""
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "SWOCaptureReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+def replay_swo_capture(
+            file: Union[str, BinaryIO],
+            sink: "TraceEventSink",
+            core: Optional["CoreTarget"] = None
+        ) -> SWOBatchParser:
+    """@brief Decode an SWO capture file into a trace event sink.
+
+    @param file Path or binary file object of the capture.
+    @param sink The TraceEventSink, which may be the head of a filter chain, to receive events.
+    @param core Optional core object used to look up exception names. Exception events will have
+        empty names if not provided.
+    Events still waiting for a timestamp at the end of the capture are flushed to the sink.
+
+    @return The parser used to decode the capture, from which statistics can be read.
+    """
+    parser = SWOBatchParser(core, sink)
+    with SWOCaptureReader(file) as reader:
+        reader.replay(parser)
+    parser.flush()
+    return parser
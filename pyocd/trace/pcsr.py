@@ -0,0 +1,127 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+from time import perf_counter
+from typing import (Any, Callable, Optional, Sequence)
+
+from ..core import exceptions
+from ..coresight.dwt import DWT
+from .profile import SampleProfile
+
+LOG = logging.getLogger(__name__)
+
+## @brief Default number of DWT_PCSR reads queued at a time.
+DEFAULT_BATCH_SIZE = 2048
+
+class PCSRSampler:
+    """@brief Statistical PC sampler that polls DWT_PCSR while the core runs.
+
+    DWT_PCSR returns a recently executed instruction address each time it is read, without
+    disturbing the core, so no SWO connection is needed. Reads are made in batches with the MEM-AP's
+    read_memory_repeat32() method. With a CMSIS-DAP probe, each batch fills every USB packet with
+    reads of the register, and the next batch is queued before the results of the current one are
+    processed. The sample rate is therefore limited by the SWD/JTAG clock rather than by USB round
+    trips.
+
+    Samples are added to a SampleProfile as each batch completes.
+    """
+
+    ## Value read from DWT_PCSR when no sample is available, for instance while the core is halted.
+    NO_SAMPLE = 0xffffffff
+
+    def __init__(self, ap: Any, pcsr_address: int, profile: Optional[SampleProfile] = None,
+            batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """@brief Constructor.
+        @param self
+        @param ap The MEM-AP through which DWT_PCSR is read.
+        @param pcsr_address Address of the DWT_PCSR register.
+        @param profile Optional profile to add the samples to. A new profile is created if not
+            provided.
+        @param batch_size Number of DWT_PCSR reads in each batch.
+        """
+        self._ap = ap
+        self._pcsr_address = pcsr_address
+        self._profile = profile if (profile is not None) else SampleProfile()
+        self._batch_size = batch_size
+        self._missed = 0
+
+    @classmethod
+    def from_core(cls, core: Any, profile: Optional[SampleProfile] = None,
+            batch_size: int = DEFAULT_BATCH_SIZE) -> "PCSRSampler":
+        """@brief Create a sampler for a Cortex-M core.
+        @exception TargetSupportError The core does not have a DWT.
+        """
+        dwt = getattr(core, 'dwt', None)
+        if dwt is None:
+            raise exceptions.TargetSupportError("core does not have a DWT")
+        return cls(core.ap, dwt.address + DWT.DWT_PCSR, profile, batch_size)
+
+    @property
+    def profile(self) -> SampleProfile:
+        return self._profile
+
+    @property
+    def missed_count(self) -> int:
+        """@brief Number of reads of DWT_PCSR that returned no sample."""
+        return self._missed
+
+    def _start_batch(self) -> Callable[[], Sequence[int]]:
+        return self._ap.read_memory_repeat32(self._pcsr_address, self._batch_size, now=False)
+
+    def _process_batch(self, values: Sequence[int]) -> None:
+        # Bit 0 isn't part of the instruction address.
+        samples = [v & ~1 for v in values if v != self.NO_SAMPLE]
+        self._missed += len(values) - len(samples)
+        self._profile.add_samples(samples)
+
+    def run(self, duration: Optional[float] = None, batches: Optional[int] = None,
+            stop_event: Optional[threading.Event] = None) -> int:
+        """@brief Collect samples until a limit is reached.
+
+        One batch is always queued ahead of the batch being processed. When sampling stops, the
+        batch still queued is completed and its samples are kept.
+
+        @param self
+        @param duration Optional maximum time in seconds to sample for.
+        @param batches Optional maximum number of batches to read.
+        @param stop_event Optional event that stops sampling when set.
+        @return Number of reads of DWT_PCSR performed.
+        """
+        start = perf_counter()
+        count = 0
+        pending = self._start_batch()
+        try:
+            while True:
+                count += 1
+                done = ((batches is not None and count >= batches)
+                        or (duration is not None and perf_counter() - start >= duration)
+                        or (stop_event is not None and stop_event.is_set()))
+                current = pending
+                pending = None
+                if not done:
+                    pending = self._start_batch()
+                self._process_batch(current())
+                if done:
+                    break
+        finally:
+            if pending is not None:
+                try:
+                    pending()
+                except exceptions.TransferError:
+                    pass
+        return count * self._batch_size
@@ -0,0 +1,308 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import (Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple,
+        TYPE_CHECKING, Union)
+
+from .capture import replay_swo_capture
+from .events import (TraceEvent, TraceExceptionEvent, TraceOverflow, TracePeriodicPC)
+from .sink import TraceEventSink
+
+if TYPE_CHECKING:
+    from ..core.core_target import CoreTarget
+    from ..debug.elf.elf import ELFBinaryFile
+
+## @brief Default limit on the number of distinct entries held by a SampleProfile.
+DEFAULT_MAX_ENTRIES = 65536
+
+## @brief Name reported for samples taken while the core was sleeping.
+SLEEP_NAME = "<sleep>"
+
+## @brief Names of the frames placed above the sampled function, outermost first.
+ContextType = Tuple[str, ...]
+
+class SampleProfile:
+    """@brief Histogram of sampled PC values with bounded memory use.
+
+    Samples are counted per (context, address) pair. The context is a tuple of frame names placed
+    above the sampled function in call-graph output, such as the active exception handlers. An
+    address of None counts samples taken while the core was sleeping.
+
+    If the number of distinct entries grows past _max_entries_, the address granularity is doubled
+    and the existing entries are merged, as many times as needed. Memory use is therefore bounded
+    no matter how long sampling runs. Function level results stay accurate unless the granularity
+    grows beyond the size of small functions; the current value is available from the
+    granularity property.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        self._counts: Dict[Tuple[ContextType, Optional[int]], int] = {}
+        self._shift = 0
+        self._total = 0
+        self._overflows = 0
+
+    @property
+    def granularity(self) -> int:
+        """@brief Size in bytes of the address ranges that samples are counted in."""
+        return 1 << self._shift
+
+    @property
+    def total_samples(self) -> int:
+        return self._total
+
+    @property
+    def overflow_count(self) -> int:
+        """@brief Number of times samples were lost because of a trace overflow."""
+        return self._overflows
+
+    def add(self, address: Optional[int], context: ContextType = (), count: int = 1) -> None:
+        """@brief Count a sample.
+        @param self
+        @param address The sampled PC, or None for a sleep sample.
+        @param context Tuple of frame names for call-graph output.
+        @param count Number of samples to add.
+        """
+        key = (context, (address >> self._shift) if (address is not None) else None)
+        counts = self._counts
+        counts[key] = counts.get(key, 0) + count
+        self._total += count
+        if len(counts) > self._max_entries:
+            self._coarsen()
+
+    def add_samples(self, addresses: Iterable[int], context: ContextType = ()) -> None:
+        """@brief Count a sequence of sampled PC values that share the same context."""
+        shift = self._shift
+        counts = self._counts
+        n = 0
+        for address in addresses:
+            key = (context, address >> shift)
+            counts[key] = counts.get(key, 0) + 1
+            n += 1
+        self._total += n
+        if len(counts) > self._max_entries:
+            self._coarsen()
+
+    def add_overflow(self) -> None:
+        self._overflows += 1
+
+    def entries(self) -> Iterator[Tuple[ContextType, Optional[int], int]]:
+        """@brief Iterate over the (context, address, count) entries of the profile.
+
+        The address is the start of the address range the samples were counted in.
+        """
+        shift = self._shift
+        for (context, bucket), count in self._counts.items():
+            yield context, ((bucket << shift) if (bucket is not None) else None), count
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._shift = 0
+        self._total = 0
+        self._overflows = 0
+
+    def _coarsen(self) -> None:
+        while len(self._counts) > self._max_entries:
+            self._shift += 1
+            merged: Dict[Tuple[ContextType, Optional[int]], int] = {}
+            for (context, bucket), count in self._counts.items():
+                key = (context, (bucket >> 1) if (bucket is not None) else None)
+                merged[key] = merged.get(key, 0) + count
+            self._counts = merged
+
+class PCSamplingSink(TraceEventSink):
+    """@brief Trace event sink that aggregates periodic PC samples into a SampleProfile.
+
+    When DWT exception trace is enabled, exception entry, exit and return events are followed so
+    that each sample's context is the stack of active exception handlers. After a trace overflow
+    the handler stack can't be known, so it is reset to thread mode.
+    """
+
+    def __init__(self, profile: Optional[SampleProfile] = None) -> None:
+        self._profile = profile if (profile is not None) else SampleProfile()
+        self._handlers: List[Tuple[int, str]] = []
+        self._context: ContextType = ()
+
+    @property
+    def profile(self) -> SampleProfile:
+        return self._profile
+
+    def receive(self, event: TraceEvent) -> None:
+        if isinstance(event, TracePeriodicPC):
+            # A PC of 0 is a sleep sample.
+            self._profile.add(event.pc or None, self._context)
+        elif isinstance(event, TraceExceptionEvent):
+            self._update_handlers(event)
+        elif isinstance(event, TraceOverflow):
+            self._profile.add_overflow()
+            self._handlers.clear()
+            self._context = ()
+
+    def _update_handlers(self, event: TraceExceptionEvent) -> None:
+        number = event.exception_number
+        handlers = self._handlers
+        if event.action == TraceExceptionEvent.ENTERED:
+            handlers.append((number, event.exception_name or f"exception {number}"))
+        elif event.action == TraceExceptionEvent.EXITED:
+            if handlers and handlers[-1][0] == number:
+                handlers.pop()
+        elif event.action == TraceExceptionEvent.RETURNED:
+            # Returning to exception 0 is a return to thread mode. A return to a handler whose entry
+            # wasn't seen leaves only that handler active.
+            if all(n != number for n, _ in handlers):
+                handlers[:] = [(number, event.exception_name or f"exception {number}")] if number else []
+            else:
+                while handlers[-1][0] != number:
+                    handlers.pop()
+        self._context = tuple(name for _, name in handlers)
+
+class ProfileSymbolizer:
+    """@brief Maps sampled addresses to function names and source lines.
+
+    Function names are taken from the DWARF debug info if available, otherwise from the ELF symbol
+    table. Addresses that can't be resolved are shown in hex. Results are cached, since profiles
+    hold many samples of relatively few addresses.
+    """
+
+    def __init__(self, symbol_decoder: Optional[Any] = None, address_decoder: Optional[Any] = None) -> None:
+        """@brief Constructor.
+        @param self
+        @param symbol_decoder Optional ElfSymbolDecoder.
+        @param address_decoder Optional DwarfAddressDecoder.
+        """
+        self._symbol_decoder = symbol_decoder
+        self._address_decoder = address_decoder
+        self._functions: Dict[Optional[int], str] = {None: SLEEP_NAME}
+        self._lines: Dict[Optional[int], Optional[str]] = {None: None}
+
+    @classmethod
+    def from_elf(cls, elf: "ELFBinaryFile") -> "ProfileSymbolizer":
+        return cls(elf.symbol_decoder, elf.address_decoder)
+
+    @staticmethod
+    def _to_str(value: Union[str, bytes]) -> str:
+        return value.decode('utf-8', errors='replace') if isinstance(value, bytes) else value
+
+    def function_name(self, address: Optional[int]) -> str:
+        try:
+            return self._functions[address]
+        except KeyError:
+            pass
+        assert address is not None
+        name = None
+        if self._address_decoder is not None:
+            info = self._address_decoder.get_function_for_address(address)
+            if info is not None:
+                name = self._to_str(info.name)
+        if name is None and self._symbol_decoder is not None:
+            # Thumb function symbols have bit 0 of their address set.
+            info = (self._symbol_decoder.get_symbol_for_address(address)
+                    or self._symbol_decoder.get_symbol_for_address(address | 1))
+            if info is not None:
+                name = info.name
+        if name is None:
+            name = "0x%08x" % address
+        self._functions[address] = name
+        return name
+
+    def source_line(self, address: Optional[int]) -> Optional[str]:
+        """@brief Return the "file:line" location of an address, or None if not known."""
+        try:
+            return self._lines[address]
+        except KeyError:
+            pass
+        assert address is not None
+        location = None
+        if self._address_decoder is not None:
+            info = self._address_decoder.get_line_for_address(address)
+            if info is not None:
+                location = "%s:%d" % (self._to_str(info.filename), info.line)
+        self._lines[address] = location
+        return location
+
+class ProfileEntry(NamedTuple):
+    """@brief One row of a profile report."""
+    name: str
+    count: int
+
+def _sorted_entries(counts: Dict[str, int]) -> List[ProfileEntry]:
+    return sorted((ProfileEntry(name, count) for name, count in counts.items()),
+            key=lambda e: (-e.count, e.name))
+
+def function_histogram(profile: SampleProfile, symbolizer: ProfileSymbolizer) -> List[ProfileEntry]:
+    """@brief Flat profile of sample counts per function, in descending order of count."""
+    counts: Dict[str, int] = {}
+    for _, address, count in profile.entries():
+        name = symbolizer.function_name(address)
+        counts[name] = counts.get(name, 0) + count
+    return _sorted_entries(counts)
+
+def line_histogram(profile: SampleProfile, symbolizer: ProfileSymbolizer) -> List[ProfileEntry]:
+    """@brief Flat profile of sample counts per source line, in descending order of count.
+
+    Entry names have the form "file:line (function)". Samples of addresses without line info are
+    counted under the address instead.
+    """
+    counts: Dict[str, int] = {}
+    for _, address, count in profile.entries():
+        function = symbolizer.function_name(address)
+        location = symbolizer.source_line(address)
+        if location is not None:
+            name = f"{location} ({function})"
+        elif address is not None and function != "0x%08x" % address:
+            name = "0x%08x (%s)" % (address, function)
+        else:
+            name = function
+        counts[name] = counts.get(name, 0) + count
+    return _sorted_entries(counts)
+
+def collapsed_stacks(profile: SampleProfile, symbolizer: ProfileSymbolizer) -> List[ProfileEntry]:
+    """@brief Call-graph profile with one entry per distinct stack of frame names.
+
+    Each stack is the sample's context followed by the sampled function, joined with ';'.
+    """
+    counts: Dict[str, int] = {}
+    for context, address, count in profile.entries():
+        name = ";".join(context + (symbolizer.function_name(address),))
+        counts[name] = counts.get(name, 0) + count
+    return _sorted_entries(counts)
+
+def write_collapsed_stacks(profile: SampleProfile, symbolizer: ProfileSymbolizer, output: TextIO) -> None:
+    """@brief Write the profile in the collapsed stack format used by flame graph tools.
+
+    Each line holds a stack of frame names separated by ';', a space, and the sample count. This is
+    the input format of flamegraph.pl and is read directly by tools such as speedscope and inferno.
+    """
+    for entry in collapsed_stacks(profile, symbolizer):
+        output.write(f"{entry.name} {entry.count}\n")
+
+def profile_swo_capture(
+            file: Union[str, BinaryIO],
+            profile: Optional[SampleProfile] = None,
+            core: Optional["CoreTarget"] = None
+        ) -> SampleProfile:
+    """@brief Build a profile from the PC samples in an SWO capture file.
+
+    @param file Path or binary file object of a capture written by SWOCaptureWriter.
+    @param profile Optional profile to add the samples to. A new profile is created if not provided.
+    @param core Optional core object used to look up exception names for call-graph contexts.
+    @return The profile.
+    """
+    sink = PCSamplingSink(profile)
+    replay_swo_capture(file, sink, core)
+    return sink.profile
@@ -16,14 +16,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from datetime import (datetime, timezone)
 import logging
 import threading
 from time import sleep
-from typing import (Optional, TextIO, TYPE_CHECKING)
+from typing import (Any, Dict, Optional, TextIO, TYPE_CHECKING)
 
-from .sink import TraceEventSink
+from .sink import (TraceEventSink, TraceEventTee)
 from .events import (TraceEvent, TraceITMEvent)
-from .swo import SWOParser
+from .swo import SWOBatchParser
+from .capture import SWOCaptureWriterThread
 from ..coresight.itm import ITM
 from ..coresight.tpiu import TPIU
 from ..core.target import Target
@@ -86,6 +88,7 @@ class SWVReader(threading.Thread):
         self._core_number = core_number
         self._shutdown_event = threading.Event()
         self._swo_clock = 0
+        self._sys_clock = 0
         self._lock = lock
 
         target = self._session.target
@@ -95,13 +98,15 @@ class SWVReader(threading.Thread):
 
         self._session.subscribe(self._reset_handler, Target.Event.POST_RESET, self._core)
 
-    def init(self, sys_clock: int, swo_clock: int, console: TextIO) -> bool:
+    def init(self, sys_clock: int, swo_clock: int, console: Optional[TextIO],
+            sink: Optional[TraceEventSink] = None) -> bool:
         """@brief Configures trace graph and starts thread.
 
         This method performs all steps required to start up SWV. It first calls the target's
         trace_start() method, which allows for target-specific trace initialization. Then it
         configures the TPIU and ITM modules. A simple trace data processing graph is created that
-        connects an SWVEventSink with a SWOParser. Finally, the reader thread is started.
+        connects an SWVEventSink with a SWOBatchParser. If an additional sink is provided, events are
+        sent to both sinks through a TraceEventTee. Finally, the reader thread is started.
 
         If the debug probe or target do not support SWO, a warning is printed and False returns,
         but nothing else is done (no exception raised).
@@ -109,11 +114,14 @@ class SWVReader(threading.Thread):
         @param self
         @param sys_clock System clock frequency in Hertz, from which the SWO clock is derived.
         @param swo_clock Desired SWO output frequency in Hertz.
-        @param console File-like object to which SWV data will be written.
+        @param console File-like object to which SWV data will be written. May be None if only
+            _sink_ should receive events.
+        @param sink Optional additional trace event sink or filter to receive all trace events.
 
         @return Boolean indicating whether the SWV reader was successfully started.
         """
         self._swo_clock = swo_clock
+        self._sys_clock = sys_clock
 
         assert self._session.probe
         if DebugProbe.Capability.SWO not in self._session.probe.capabilities:
@@ -141,8 +149,15 @@ class SWVReader(threading.Thread):
             LOG.warning("SWV not initalized: Failed to set SWO clock rate")
             return False
 
-        self._parser = SWOParser(self._core)
-        self._sink = SWVEventSink(console)
+        sinks = [s for s in (SWVEventSink(console) if console else None, sink) if s is not None]
+        if len(sinks) == 1:
+            self._sink: TraceEventSink = sinks[0]
+        else:
+            tee = TraceEventTee()
+            tee.connect(sinks)
+            self._sink = tee
+
+        self._parser = SWOBatchParser(self._core)
         self._parser.connect(self._sink)
 
         self.start()
@@ -175,7 +190,9 @@ class SWVReader(threading.Thread):
 
         Starts the probe receiving SWO data by calling DebugProbe.swo_start(). For as long as the
         thread runs, it reads SWO data from the probe and passes it to the SWO parser created in
-        init(). When the thread is signaled to stop, it calls DebugProbe.swo_stop() before exiting.
+        init(). If the swv_capture_file option is set, the raw data is also passed to a capture
+        writer thread that records it to that file.
+        When the thread is signaled to stop, it calls DebugProbe.swo_stop() before exiting.
         """
         assert self._session.probe
 
@@ -189,6 +206,9 @@ class SWVReader(threading.Thread):
                             is_read_only=True) \
                          if self._session.options.get('swv_raw_enable') else None
 
+        capture_path = self._session.options.get('swv_capture_file')
+        capture = SWOCaptureWriterThread(capture_path, self._get_capture_metadata()) if capture_path else None
+
         # Stop SWO first in case the probe already had it started. Ignore if this fails.
         try:
             self._session.probe.swo_stop()
@@ -199,6 +219,8 @@ class SWVReader(threading.Thread):
         while not self._shutdown_event.is_set():
             data = self._session.probe.swo_read()
             if data:
+                if capture:
+                    capture.write(data)
                 if swv_raw_server:
                     swv_raw_server.write(data)
                 self._parser.parse(data)
@@ -216,9 +238,31 @@ class SWVReader(threading.Thread):
         if swv_raw_server:
             swv_raw_server.stop()
 
+        if capture:
+            capture.close()
+            LOG.info("Recorded %d bytes of SWO data to %s", capture.bytes_written, capture_path)
+
         if self._lock:
             self._lock.release()
 
+    def _get_capture_metadata(self) -> Dict[str, Any]:
+        """@brief Build the header metadata for an SWO capture file."""
+        from .. import __version__
+        probe = self._session.probe
+        assert probe
+        return {
+            'pyocd_version': __version__,
+            'start_time': datetime.now(timezone.utc).isoformat(),
+            'probe': {
+                'unique_id': probe.unique_id,
+                'description': probe.description,
+                },
+            'target': self._target.part_number,
+            'core': self._core_number,
+            'swo_clock': self._swo_clock,
+            'system_clock': self._sys_clock,
+            }
+
     def _reset_handler(self, notification: "Notification") -> None:
         """@brief Reset notification handler.
 
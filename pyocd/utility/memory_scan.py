@@ -0,0 +1,289 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import struct
+from typing import (Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TYPE_CHECKING, Union)
+
+from ..core import exceptions
+from .mask import (align_down, align_up)
+
+if TYPE_CHECKING:
+    from ..core.memory_interface import MemoryInterface
+
+## @brief Default size of the memory reads performed while scanning.
+DEFAULT_CHUNK_SIZE = 32 * 1024
+
+class MemoryPattern:
+    """@brief Byte pattern with an optional mask, for searching memory.
+
+    A memory byte matches a pattern byte if the two are equal in all bits that are set in the
+    corresponding mask byte. If no mask is provided, all bits must match.
+    """
+
+    def __init__(self, data: bytes, mask: Optional[bytes] = None) -> None:
+        if not data:
+            raise ValueError("empty memory pattern")
+        if mask is not None:
+            if len(mask) != len(data):
+                raise ValueError("memory pattern mask length does not match the pattern length")
+            # A mask with all bits set is the same as no mask.
+            if all(m == 0xff for m in mask):
+                mask = None
+        self._data = bytes(data)
+        self._mask = bytes(mask) if (mask is not None) else None
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    @property
+    def mask(self) -> Optional[bytes]:
+        return self._mask
+
+    @property
+    def regex(self) -> bytes:
+        """@brief Source of a regular expression that matches the pattern.
+
+        Partially masked bytes become a character class of every value that matches.
+        """
+        if self._mask is None:
+            return re.escape(self._data)
+        parts = []
+        for value, mask in zip(self._data, self._mask):
+            if mask == 0xff:
+                parts.append(b'\\x%02x' % value)
+            elif mask == 0:
+                parts.append(b'.')
+            else:
+                value &= mask
+                parts.append(b'[' + b''.join(b'\\x%02x' % v for v in range(256) if (v & mask) == value) + b']')
+        return b''.join(parts)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MemoryPattern) and (self._data == other._data) and (self._mask == other._mask)
+
+    def __repr__(self) -> str:
+        desc = self._data.hex()
+        if self._mask is not None:
+            desc += "/" + self._mask.hex()
+        return "<%s@%x %s>" % (self.__class__.__name__, id(self), desc)
+
+## @brief Type of the pattern arguments accepted by search_memory().
+PatternsType = Union[bytes, MemoryPattern, Sequence[Union[bytes, MemoryPattern]]]
+
+class MemoryMatch(NamedTuple):
+    """@brief Address at which a pattern was found by search_memory()."""
+    address: int
+    ## Index of the pattern in the list of patterns passed to search_memory().
+    index: int
+    pattern: MemoryPattern
+
+class MemoryScanner:
+    """@brief Stream the contents of a memory range in chunks.
+
+    Iterating over a scanner yields (address, data) tuples for consecutive chunks of the range,
+    where _data_ is a bytes object. The aligned part of the range is read with 32-bit block
+    reads. The read of the following chunk is started with
+    MemoryInterface.read_memory_block32_deferred() before each chunk is yielded, so for memory
+    interfaces that support deferred reads the probe transfers for the next chunk overlap with the
+    processing of the current one.
+
+    If iteration is stopped early, the read for the next chunk is still completed so that any
+    error it causes isn't raised by an unrelated later access.
+    """
+
+    def __init__(self, memif: "MemoryInterface", addr: int, length: int,
+            chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self._memif = memif
+        self._addr = addr
+        self._length = length
+        self._chunk_size = max(4, align_down(chunk_size, 4))
+
+    def _start_read(self, addr: int, size: int) -> Callable[[], bytes]:
+        result = self._memif.read_memory_block32_deferred(addr, size // 4)
+        def read_cb() -> bytes:
+            data = result()
+            return struct.pack('<%dI' % len(data), *data)
+        return read_cb
+
+    def __iter__(self) -> Iterator[Tuple[int, bytes]]:
+        if self._length <= 0:
+            return
+        start = self._addr
+        end = start + self._length
+        body_start = align_up(start, 4)
+        body_end = align_down(end, 4)
+
+        # Ranges too small to contain a whole word are read in one go.
+        if body_end <= body_start:
+            yield start, bytes(self._memif.read_memory_block8(start, self._length))
+            return
+
+        chunks = [(a, min(self._chunk_size, body_end - a)) for a in range(body_start, body_end, self._chunk_size)]
+        head = bytes(self._memif.read_memory_block8(start, body_start - start)) if (body_start > start) else b''
+
+        pending: Optional[Callable[[], bytes]] = self._start_read(*chunks[0])
+        try:
+            for i in range(len(chunks)):
+                assert pending is not None
+                read_cb = pending
+                pending = None
+                if i + 1 < len(chunks):
+                    pending = self._start_read(*chunks[i + 1])
+                data = read_cb()
+
+                chunk_addr = chunks[i][0]
+                if i == 0 and head:
+                    data = head + data
+                    chunk_addr = start
+                if (i + 1 == len(chunks)) and (body_end < end):
+                    data += bytes(self._memif.read_memory_block8(body_end, end - body_end))
+                yield chunk_addr, data
+        finally:
+            if pending is not None:
+                try:
+                    pending()
+                except exceptions.TransferError:
+                    pass
+
+def _normalise_patterns(patterns: PatternsType) -> List[MemoryPattern]:
+    if isinstance(patterns, (bytes, bytearray, MemoryPattern)):
+        patterns = [patterns]
+    result = [(p if isinstance(p, MemoryPattern) else MemoryPattern(bytes(p))) for p in patterns]
+    if not result:
+        raise ValueError("no memory patterns provided")
+    return result
+
+def search_memory(memif: "MemoryInterface", addr: int, length: int, patterns: PatternsType,
+        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[MemoryMatch]:
+    """@brief Search a memory range for one or more patterns.
+
+    The range is streamed with a MemoryScanner. Each chunk is searched together with the last bytes
+    of the previous chunk, so matches that straddle chunk boundaries are found. All patterns are
+    combined into a single regular expression, so adding patterns doesn't add passes over the data.
+
+    @param memif The memory interface to read through.
+    @param addr Start address of the range to search.
+    @param length Length in bytes of the range to search. Only matches that lie entirely within the
+        range are reported.
+    @param patterns A pattern or sequence of patterns. Each pattern is either a bytes object or a
+        MemoryPattern, which may have a mask.
+    @param chunk_size Size of each memory read.
+    @return Iterator of MemoryMatch tuples, in address order. If multiple patterns match at the same
+        address, they are reported in order of their index. Overlapping matches are all reported.
+    """
+    pattern_list = _normalise_patterns(patterns)
+    max_len = max(len(p) for p in pattern_list)
+    overlap = max_len - 1
+
+    single_data: Optional[bytes] = None
+    if len(pattern_list) == 1 and pattern_list[0].mask is None:
+        single_data = pattern_list[0].data
+    else:
+        # The combined expression is a lookahead so overlapping matches are found.
+        combined = re.compile(b'(?=' + b'|'.join(b'(?:' + p.regex + b')' for p in pattern_list) + b')', re.DOTALL)
+        matchers = [re.compile(p.regex, re.DOTALL) for p in pattern_list]
+
+    def search_buffer(buf: bytes, base: int, limit: int) -> Iterator[MemoryMatch]:
+        # Only matches starting before _limit_ are reported.
+        if single_data is not None:
+            pos = buf.find(single_data)
+            while (pos != -1) and (pos < limit):
+                yield MemoryMatch(base + pos, 0, pattern_list[0])
+                pos = buf.find(single_data, pos + 1)
+        else:
+            for m in combined.finditer(buf):
+                pos = m.start()
+                if pos >= limit:
+                    break
+                for i, matcher in enumerate(matchers):
+                    if matcher.match(buf, pos):
+                        yield MemoryMatch(base + pos, i, pattern_list[i])
+
+    # Matches starting in the last _overlap_ bytes of a chunk may not be complete, so those bytes
+    # are carried over and searched again with the next chunk. This also keeps matches in address
+    # order when patterns of different lengths match at the same address.
+    carry = b''
+    base = addr
+    for chunk_addr, chunk in MemoryScanner(memif, addr, length, chunk_size):
+        buf = carry + chunk
+        base = chunk_addr - len(carry)
+        keep = min(overlap, len(buf))
+        yield from search_buffer(buf, base, len(buf) - keep)
+        carry = buf[len(buf) - keep:]
+        base += len(buf) - keep
+    yield from search_buffer(carry, base, len(carry))
+
+def _first_difference(data: bytes, expected: bytes, mask: Optional[bytes] = None) -> Optional[int]:
+    """@brief Return the offset of the first differing byte, or None if the data is the same."""
+    if mask is None and data == expected:
+        return None
+    diff = int.from_bytes(data, 'little') ^ int.from_bytes(expected, 'little')
+    if mask is not None:
+        diff &= int.from_bytes(mask, 'little')
+    if diff == 0:
+        return None
+    return ((diff & -diff).bit_length() - 1) // 8
+
+def compare_memory(memif: "MemoryInterface", addr: int, data: bytes,
+        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[int]:
+    """@brief Compare a memory range against expected data.
+
+    @param memif The memory interface to read through.
+    @param addr Start address of the range to compare.
+    @param data The expected memory contents. Its length determines the size of the range.
+    @param chunk_size Size of each memory read.
+    @return The offset of the first mismatched byte, or None if the memory matches.
+    """
+    offset = 0
+    for _, chunk in MemoryScanner(memif, addr, len(data), chunk_size):
+        diff = _first_difference(chunk, data[offset:offset + len(chunk)])
+        if diff is not None:
+            return offset + diff
+        offset += len(chunk)
+    return None
+
+def find_pattern_mismatch(memif: "MemoryInterface", addr: int, length: int, pattern: Union[bytes, MemoryPattern],
+        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[int]:
+    """@brief Find the first place a memory range is not filled with a repeating pattern.
+
+    @param memif The memory interface to read through.
+    @param addr Start address of the range to check. The pattern is repeated from this address.
+    @param length Length in bytes of the range to check. A partial repeat of the pattern at the end
+        of the range is compared up to the end of the range.
+    @param pattern The pattern, as either bytes or a MemoryPattern that may have a mask.
+    @param chunk_size Size of each memory read.
+    @return The address of the first repeat of the pattern that doesn't match memory, or None if
+        the whole range matches.
+    """
+    pattern, = _normalise_patterns(pattern)
+    plen = len(pattern)
+    offset = 0
+    for _, chunk in MemoryScanner(memif, addr, length, chunk_size):
+        phase = offset % plen
+        count = (phase + len(chunk)) // plen + 1
+        expected = (pattern.data * count)[phase:phase + len(chunk)]
+        mask = (pattern.mask * count)[phase:phase + len(chunk)] if (pattern.mask is not None) else None
+        diff = _first_difference(chunk, expected, mask)
+        if diff is not None:
+            diff_offset = offset + diff
+            return addr + diff_offset - (diff_offset % plen)
+        offset += len(chunk)
+    return None
@@ -17,11 +17,15 @@
 from abc import ABC, abstractmethod
 import selectors
 import socket
-from typing import Optional, Sequence
+from typing import (Optional, Sequence, TYPE_CHECKING)
 
 from ..core.soc_target import SoCTarget
+from ..core.target import Target
 from ..core import exceptions
-from ..debug.rtt import RTTControlBlock, RTTUpChannel, RTTDownChannel
+from ..debug.rtt import RTTControlBlock, RTTDownChannel, RTTPollScheduler
+
+if TYPE_CHECKING:
+    from ..utility.notification import Notification
 
 
 class RTTChanWorker(ABC):
@@ -134,8 +138,19 @@ class RTTChanFileWorker(RTTChanWorker):
 
 class RTTServer:
     """@brief Keeps track of polling for multiple active RTT channels and the
-              sources and sinks of data for each channel. """
+              sources and sinks of data for each channel.
+
+    The `scheduler` attribute is an RTTPollScheduler that adapts the poll
+    interval to the amount of data arriving on the up channels. Callers that
+    poll in a loop should use its `is_poll_due` and `time_until_poll`
+    properties to decide when to call poll().
+
+    While started, the server subscribes to `Target.Event.STATE_CHANGED`. When a core halts, locks
+    up, or is reset, the scheduler is reset so the data the target wrote before stopping is read
+    by the next poll rather than after the current poll interval.
+    """
     control_block: RTTControlBlock
+    scheduler: RTTPollScheduler
     workers: Optional[Sequence[Optional[RTTChanWorker]]]
     up_buffers: Optional[Sequence[bytes]]
     down_buffers: Optional[Sequence[bytes]]
@@ -153,6 +168,8 @@ class RTTServer:
         """
         self.control_block = RTTControlBlock.from_target(target, address = address,
                                     size = size, control_block_id = control_block_id)
+        self.scheduler = RTTPollScheduler.from_session(target.session)
+        self._session = target.session
 
         self.workers = None
         self.up_buffers = None
@@ -164,17 +181,21 @@ class RTTServer:
             # not yet started
             return
 
+        # Read all active up channels at once.
+        up_channels = self.control_block.up_channels
+        num_up_chans = len(up_channels)
+        active = [i for i, worker in enumerate(self.workers)
+                if (worker is not None) and (i < num_up_chans)]
+        up_data = self.control_block.poll_all(active)
+        self.scheduler.update([up_channels[i] for i in active], [up_data[i] for i in active])
+
         for i, worker in enumerate(self.workers):
             if worker is None:
                 continue
 
             # Read from up channel
-            try:
-                up_chan: RTTUpChannel = self.control_block.up_channels[i]
-            except IndexError:
-                pass
-            else:
-                self.up_buffers[i] += up_chan.read()
+            if i < num_up_chans:
+                self.up_buffers[i] += up_data[i]
 
             # Write to worker
             bytes_written = worker.write_up_data(self.up_buffers[i])
@@ -192,6 +213,10 @@ class RTTServer:
                 bytes_out: int = down_chan.write(self.down_buffers[i])
                 self.down_buffers[i] = self.down_buffers[i][bytes_out:]
 
+                # Expect a response from the target after sending it data.
+                if bytes_out:
+                    self.scheduler.reset()
+
     def start(self):
         """@brief Find and parse RTT control block. """
         self.control_block.start()
@@ -204,11 +229,15 @@ class RTTServer:
         self.up_buffers = [bytes()] * num_up_chans
         self.down_buffers = [bytes()] * num_down_chans
 
+        self._session.subscribe(self._state_changed_handler, Target.Event.STATE_CHANGED)
+
     def stop(self):
         """@brief Close all RTT workers. """
         if not self.running:
             return
 
+        self._session.unsubscribe(self._state_changed_handler, Target.Event.STATE_CHANGED)
+
         for i, worker in enumerate(self.workers):
             if worker is not None:
                 worker.close()
@@ -217,6 +246,10 @@ class RTTServer:
         self.up_buffers = None
         self.down_buffers = None
 
+    def _state_changed_handler(self, notification: "Notification") -> None:
+        if notification.data not in (Target.State.RUNNING, Target.State.SLEEPING):
+            self.scheduler.reset()
+
     @property
     def running(self):
         """@brief True if RTT is started. """
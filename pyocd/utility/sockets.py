@@ -141,3 +141,19 @@ class ClientSocket(object):
                 else:
                     break
             self._buffer += data
+
+    def read_exactly(self, length):
+        """@brief Read the given number of bytes, waiting as long as necessary.
+        @exception ConnectionError The connection was closed before all data was received.
+        """
+        while len(self._buffer) < length:
+            try:
+                data = self.read(max(self._packet_size, length - len(self._buffer)))
+            except socket.timeout:
+                continue
+            if not data:
+                raise ConnectionError("connection closed by remote")
+            self._buffer += data
+        data = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        return data
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""@brief Regenerate pyocd/target/builtin/_target_info.py.
+
+Imports every builtin target listed in BUILTIN_TARGET_CLASSES and writes out the vendor, part
+number, and part families of each, so `pyocd list --targets` can describe the builtin targets
+without importing them.
+"""
+
+from pathlib import Path
+
+from pyocd.target.builtin import (BUILTIN_TARGET_CLASSES, BUILTIN_TARGETS)
+from pyocd.target.registry import TargetInfo
+
+OUTPUT_PATH = Path(__file__).resolve().parent.parent / "pyocd" / "target" / "builtin" / "_target_info.py"
+
+HEADER = '''# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file is generated by scripts/generate_builtin_target_index.py. Do not edit.
+
+from ..registry import TargetInfo
+
+BUILTIN_TARGET_INFO = {
+'''
+
+def gen_index() -> str:
+    lines = [HEADER]
+    for name in BUILTIN_TARGET_CLASSES:
+        info = TargetInfo.from_class(BUILTIN_TARGETS[name])
+        lines.append(f"    {name!r}: {info!r},\n")
+    lines.append("}\n")
+    return "".join(lines)
+
+def main() -> None:
+    OUTPUT_PATH.write_text(gen_index())
+    print(f"Wrote {OUTPUT_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""@brief Host-side microbenchmark of the CMSIS-DAP transfer layer.
+
+A fake USB interface is used in place of a probe, so only the time spent by pyOCD building
+command packets and demultiplexing responses is measured.
+"""
+
+import argparse
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pyocd.probe.pydapaccess.dap_access_api import DAPAccessIntf
+from pyocd.probe.pydapaccess.dap_access_cmsis_dap import (_ReferenceCommand, _ReferenceTransfer)
+from unit.mockdap import (MockDAPInterface, make_mock_dap)
+
+REG = DAPAccessIntf.REG
+
+def bench_single_reads(dap, count):
+    """@brief Many small deferred reads in flight, as for RTT polling."""
+    cbs = [dap.read_reg(REG.AP_0xC, now=False) for _ in range(count)]
+    for cb in cbs:
+        cb()
+
+def bench_block_reads(dap, count):
+    """@brief Large block reads, as for flash verify."""
+    dap.reg_read_repeat(count, REG.AP_0xC)
+
+def bench_block_writes(dap, count):
+    """@brief Large block writes, as for flash programming."""
+    dap.reg_write_repeat(count, REG.AP_0xC, [0x12345678] * count)
+    dap.flush()
+
+BENCHMARKS = [
+    ("deferred single reads", bench_single_reads),
+    ("block reads", bench_block_reads),
+    ("block writes", bench_block_writes),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="CMSIS-DAP transfer layer benchmark")
+    parser.add_argument("-n", "--count", type=int, default=20000, help="Number of words per iteration.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of iterations.")
+    parser.add_argument("-s", "--packet-size", type=int, action="append",
+            help="Packet size to test. May be repeated. Default is 64 and 512.")
+    parser.add_argument("--reference", action="store_true",
+            help="Use the byte-wise reference packet encoder and decoder.")
+    args = parser.parse_args()
+
+    for packet_size in (args.packet_size or [64, 512]):
+        print(f"Packet size {packet_size}:")
+        for name, fn in BENCHMARKS:
+            dap = make_mock_dap(MockDAPInterface(packet_size=packet_size))
+            if args.reference:
+                dap._command_class = _ReferenceCommand
+                dap._transfer_class = _ReferenceTransfer
+                dap._init_deferred_buffers()
+            dap.set_deferred_transfer(True)
+            best = None
+            for _ in range(args.repeat):
+                start = perf_counter()
+                fn(dap, args.count)
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            assert best is not None
+            rate = args.count * 4 / best / 1024
+            print(f"  {name:<24} {best * 1000:10.2f} ms {rate:12.1f} KiB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""@brief Benchmark of pyOCD import and command startup time.
+
+Each case is run in a fresh Python interpreter, so module caching in this process doesn't affect
+the results. The time of an empty interpreter is also measured and reported as the baseline. With
+the --modules option, the modules with the largest cumulative import times are listed, as
+reported by Python's `-X importtime` option.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+CASES = [
+    ("python (baseline)", ["-c", "pass"]),
+    ("import pyocd", ["-c", "import pyocd"]),
+    ("pyocd --help", ["-m", "pyocd", "--help"]),
+    ("pyocd list --targets", ["-m", "pyocd", "list", "--targets"]),
+    ]
+
+def run(args, env):
+    start = perf_counter()
+    subprocess.run([sys.executable] + args, env=env, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return perf_counter() - start
+
+def print_top_modules(env, count):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import pyocd"], env=env,
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.strip()))
+    print(f"Top {count} modules by cumulative import time:")
+    for cumulative, name in sorted(modules, reverse=True)[:count]:
+        print(f"  {name:<48} {cumulative / 1000:10.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="pyOCD import time benchmark")
+    parser.add_argument("-r", "--repeat", type=int, default=10, help="Number of runs of each case.")
+    parser.add_argument("-m", "--modules", type=int, default=0, metavar="N",
+            help="Show the N modules with the largest cumulative import time.")
+    args = parser.parse_args()
+
+    # Make sure the pyocd package from this tree is used.
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(p for p in [ROOT_DIR, env.get("PYTHONPATH")] if p)
+
+    # Warm up the bytecode caches.
+    run(CASES[1][1], env)
+
+    for name, case_args in CASES:
+        times = [run(case_args, env) for _ in range(args.repeat)]
+        print(f"  {name:<24} min {min(times) * 1000:8.1f} ms   median {statistics.median(times) * 1000:8.1f} ms")
+
+    if args.modules:
+        print_top_modules(env, args.modules)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""@brief Host-side benchmark of the SWO parsers.
+
+Decodes a recorded SWO capture in chunks the size of a probe's SWO reads. The capture may either
+be a file written with the swv_capture_file option or a file of raw SWO bytes, such as saved from
+the SWV raw server. If no capture is given, a synthetic stream of ITM, PC
+sample, exception, and data trace packets is generated.
+"""
+
+import argparse
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pyocd.trace.capture import (CAPTURE_MAGIC, SWOCaptureReader)
+from pyocd.trace.sink import TraceEventSink
+from pyocd.trace.swo import (SWOBatchParser, SWOParser)
+from unit.test_swo import make_swo_stream
+
+class NullCore:
+    def exception_number_to_name(self, exc_num):
+        return None
+
+class NullSink(TraceEventSink):
+    def receive(self, event):
+        pass
+
+def bench_parse(cls, core, chunks):
+    parser = cls(core, NullSink())
+    for chunk in chunks:
+        parser.parse(chunk)
+
+def bench_decode(cls, core, chunks):
+    parser = cls(core)
+    for chunk in chunks:
+        parser.decode(chunk)
+
+BENCHMARKS = [
+    ("SWOParser.parse", SWOParser, bench_parse),
+    ("SWOBatchParser.parse", SWOBatchParser, bench_parse),
+    ("SWOBatchParser.decode", SWOBatchParser, bench_decode),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="SWO parser benchmark")
+    parser.add_argument("capture", nargs="?", help="SWO capture file.")
+    parser.add_argument("-n", "--count", type=int, default=200000,
+            help="Number of packets to generate if no capture file is given.")
+    parser.add_argument("-c", "--chunk-size", type=int, default=4096, help="Bytes per parse call.")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of iterations.")
+    parser.add_argument("--save", metavar="PATH", help="Write the generated stream to a capture file.")
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, "rb") as f:
+            if f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC:
+                f.seek(0)
+                data = SWOCaptureReader(f).read_all()
+            else:
+                f.seek(0)
+                data = f.read()
+    else:
+        data = make_swo_stream(args.count)
+        if args.save:
+            with open(args.save, "wb") as f:
+                f.write(data)
+
+    chunks = [data[i:i + args.chunk_size] for i in range(0, len(data), args.chunk_size)]
+    core = NullCore()
+
+    print(f"{len(data)} bytes in {len(chunks)} chunks:")
+    for name, cls, fn in BENCHMARKS:
+        best = None
+        for _ in range(args.repeat):
+            start = perf_counter()
+            fn(cls, core, chunks)
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        assert best is not None
+        rate = len(data) / best
+        # An NRZ SWO byte takes 10 bit times, so this is the sustainable SWO baud rate.
+        print(f"  {name:<24} {best * 1000:10.2f} ms {rate / 1024:10.1f} KiB/s {rate * 10 / 1e6:8.2f} MHz")
+
+if __name__ == "__main__":
+    main()
@@ -143,4 +143,7 @@ class MockCore(CoreSightCoreComponent, MemoryInterface):
     def write_memory_block32(self, addr, data):
         return self.write_memory_block8(addr, conversion.u32le_list_to_byte_list(data))
 
+    def flush(self):
+        pass
+
 
@@ -0,0 +1,130 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import struct
+from typing import (Callable, Deque, List, Optional, Tuple)
+
+from pyocd.probe.pydapaccess.interface.interface import Interface
+from pyocd.probe.pydapaccess.cmsis_dap_core import (Command, DAPTransferResponse)
+from pyocd.probe.pydapaccess.dap_access_cmsis_dap import DAPAccessCMSISDAP
+
+READ = 1 << 1
+
+class MockDAPInterface(Interface):
+    """@brief Fake CMSIS-DAP USB interface.
+
+    Responds to DAP_Transfer and DAP_TransferBlock commands without any hardware. Read values are
+    produced by the _read_value_fn_ callable, which is passed the transfer request byte. By default
+    a running counter is returned, so the order of read results can be verified. Written values are
+    appended to the `writes` list as (request, value) tuples.
+
+    Set `fault_after` to a number of transfers to have the interface respond with ACK_FAULT once
+    that many transfers have been performed.
+    """
+
+    def __init__(self, packet_size: int = 64, packet_count: int = 4,
+            read_value_fn: Optional[Callable[[int], int]] = None) -> None:
+        super().__init__()
+        self.packet_size = packet_size
+        self.packet_count = packet_count
+        self.serial_number = "mockdap"
+        self._counter = 0
+        self._read_value_fn = read_value_fn or self._next_counter
+        self._responses: Deque[bytes] = collections.deque()
+        self.writes: List[Tuple[int, int]] = []
+        self.fault_after: Optional[int] = None
+        self.transfer_count = 0
+        self.packets_written = 0
+
+    def _next_counter(self, request: int) -> int:
+        value = self._counter
+        self._counter = (self._counter + 1) & 0xffffffff
+        return value
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _do_transfer(self, request: int, value: Optional[int]) -> Tuple[bool, int]:
+        if self.fault_after is not None and self.transfer_count >= self.fault_after:
+            return False, 0
+        self.transfer_count += 1
+        if request & READ:
+            return True, self._read_value_fn(request)
+        self.writes.append((request, value))
+        return True, 0
+
+    def write(self, data) -> None:
+        data = bytes(data)
+        self.packets_written += 1
+        cmd = data[0]
+        if cmd == Command.DAP_TRANSFER:
+            count = data[2]
+            pos = 3
+            response = bytearray()
+            done = 0
+            ack = DAPTransferResponse.ACK_OK
+            for _ in range(count):
+                request = data[pos]
+                pos += 1
+                value = None
+                if not request & READ:
+                    value, = struct.unpack_from('<I', data, pos)
+                    pos += 4
+                ok, result = self._do_transfer(request, value)
+                if not ok:
+                    ack = DAPTransferResponse.ACK_FAULT
+                    break
+                done += 1
+                if request & READ:
+                    response += struct.pack('<I', result)
+            self._responses.append(bytes([cmd, done, ack]) + response)
+        elif cmd == Command.DAP_TRANSFER_BLOCK:
+            count, request = struct.unpack_from('<HB', data, 2)
+            pos = 5
+            response = bytearray()
+            done = 0
+            ack = DAPTransferResponse.ACK_OK
+            for _ in range(count):
+                value = None
+                if not request & READ:
+                    value, = struct.unpack_from('<I', data, pos)
+                    pos += 4
+                ok, result = self._do_transfer(request, value)
+                if not ok:
+                    ack = DAPTransferResponse.ACK_FAULT
+                    break
+                done += 1
+                if request & READ:
+                    response += struct.pack('<I', result)
+            self._responses.append(struct.pack('<BHB', cmd, done, ack) + response)
+        else:
+            raise ValueError("unsupported mock CMSIS-DAP command 0x%02x" % cmd)
+
+    def read(self):
+        # Pad to the packet size like a real HID probe.
+        response = self._responses.popleft()
+        return response + bytes(max(0, self.packet_size - len(response)))
+
+def make_mock_dap(interface: MockDAPInterface) -> DAPAccessCMSISDAP:
+    """@brief Create a DAPAccessCMSISDAP connected to a mock interface, ready for transfers."""
+    dap = DAPAccessCMSISDAP(None, interface=interface)
+    dap._packet_size = interface.packet_size
+    dap._init_deferred_buffers()
+    return dap
@@ -0,0 +1,139 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import random
+
+from pyocd.probe.pydapaccess.dap_access_api import DAPAccessIntf
+from pyocd.probe.pydapaccess.dap_access_cmsis_dap import (
+    READ,
+    WRITE,
+    AP_ACC,
+    _Command,
+    _ReferenceCommand,
+    _ReferenceTransfer,
+    )
+from .mockdap import (MockDAPInterface, make_mock_dap)
+
+REG = DAPAccessIntf.REG
+
+@pytest.fixture(scope='function', params=[64, 512])
+def iface(request):
+    return MockDAPInterface(packet_size=request.param)
+
+@pytest.fixture(scope='function')
+def dap(iface):
+    d = make_mock_dap(iface)
+    d.set_deferred_transfer(True)
+    return d
+
+class TestResponseDemux:
+    def test_single_read(self, dap):
+        assert dap.read_reg(REG.AP_0xC) == 0
+        assert dap.read_reg(REG.AP_0xC) == 1
+
+    def test_many_deferred_reads(self, dap):
+        cbs = [dap.read_reg(REG.AP_0xC, now=False) for _ in range(500)]
+        assert [cb() for cb in cbs] == list(range(500))
+
+    def test_block_read_spans_packets(self, dap, iface):
+        # Each block is larger than one packet, so its data is split across responses.
+        cb1 = dap.reg_read_repeat(300, REG.AP_0xC, now=False)
+        cb2 = dap.reg_read_repeat(7, REG.AP_0xC, now=False)
+        cb3 = dap.read_reg(REG.DP_0x4, now=False)
+        assert cb1() == list(range(300))
+        assert cb2() == list(range(300, 307))
+        assert cb3() == 307
+        assert iface.packets_written > 1
+
+    def test_mixed_reads_and_writes(self, dap, iface):
+        cb1 = dap.read_reg(REG.AP_0xC, now=False)
+        dap.write_reg(REG.AP_0x4, 0x20000000)
+        cb2 = dap.reg_read_repeat(4, REG.AP_0xC, now=False)
+        dap.reg_write_repeat(3, REG.AP_0xC, [0x11111111, 0x22222222, 0xffffffff])
+        cb3 = dap.read_reg(REG.DP_0x4, now=False)
+        dap.flush()
+        assert cb1() == 0
+        assert cb2() == [1, 2, 3, 4]
+        assert cb3() == 5
+        assert [v for _, v in iface.writes] == [0x20000000, 0x11111111, 0x22222222, 0xffffffff]
+
+    def test_large_values(self, iface):
+        iface._read_value_fn = lambda request: 0xdeadbeef
+        d = make_mock_dap(iface)
+        assert d.reg_read_repeat(3, REG.AP_0xC) == [0xdeadbeef] * 3
+
+    def test_fault_aborts_pending(self, dap, iface):
+        iface.fault_after = 2
+        cb1 = dap.read_reg(REG.AP_0xC, now=False)
+        cb2 = dap.read_reg(REG.AP_0xC, now=False)
+        cb3 = dap.read_reg(REG.AP_0xC, now=False)
+        with pytest.raises(DAPAccessIntf.TransferFaultError):
+            dap.flush()
+        with pytest.raises(DAPAccessIntf.TransferFaultError):
+            cb3()
+        # The transfer list was reset, so a new read works after the fault clears.
+        iface.fault_after = None
+        assert dap.read_reg(REG.AP_0xC) == 2
+
+def _fill_commands(size, ops):
+    """@brief Add the same operations to a bulk and a reference command."""
+    cmds = (_Command(size), _ReferenceCommand(size))
+    for cmd in cmds:
+        for count, request, data in ops:
+            n = cmd.get_request_space(count, request, 0)
+            if n == 0:
+                break
+            cmd.add(n, request, None if data is None else data[:n], 0)
+    return cmds
+
+class TestPacketCodec:
+    @pytest.mark.parametrize("size", [64, 512, 1024])
+    def test_transfer_block_write(self, size):
+        rng = random.Random(size)
+        data = [rng.getrandbits(32) for _ in range(300)]
+        request = WRITE | AP_ACC | 0xc
+        fast, ref = _fill_commands(size, [(40, request, data[:40]), (300, request, data[40:])])
+        assert fast.encode_data() == ref.encode_data()
+
+    @pytest.mark.parametrize("size", [64, 512])
+    def test_transfer_block_read(self, size):
+        fast, ref = _fill_commands(size, [(300, READ | AP_ACC | 0xc, None)])
+        assert fast.encode_data() == ref.encode_data()
+
+    @pytest.mark.parametrize("seed", range(8))
+    def test_transfer_mixed(self, seed):
+        rng = random.Random(seed)
+        ops = []
+        for _ in range(20):
+            count = rng.randint(1, 4)
+            if rng.random() < 0.5:
+                ops.append((count, READ | AP_ACC | 0xc, None))
+            else:
+                ops.append((count, WRITE | AP_ACC | 0x4, [rng.getrandbits(32) for _ in range(count)]))
+        fast, ref = _fill_commands(512, ops)
+        assert not fast._block_allowed
+        assert fast.encode_data() == ref.encode_data()
+
+    def test_reference_path(self, iface):
+        iface._read_value_fn = lambda request: 0x89abcdef
+        d = make_mock_dap(iface)
+        d._command_class = _ReferenceCommand
+        d._transfer_class = _ReferenceTransfer
+        d._init_deferred_buffers()
+        d.reg_write_repeat(3, REG.AP_0xC, [1, 2, 0xffffffff])
+        assert d.reg_read_repeat(200, REG.AP_0xC) == [0x89abcdef] * 200
+        assert [v for _, v in iface.writes] == [1, 2, 0xffffffff]
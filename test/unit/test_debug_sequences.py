@@ -23,18 +23,24 @@ from unittest import mock
 from lark.lexer import Token as LarkToken
 from lark.tree import Tree as LarkTree
 
+from pyocd.cache.persistent import PersistentCacheFile
 from pyocd.core import exceptions
+from pyocd.debug.sequences.code_cache import DebugSequenceCodeCache
 from pyocd.debug.sequences.scope import Scope
 from pyocd.debug.sequences.sequences import (
+    TRACE,
+    CompiledCode,
     DebugSequenceSemanticError,
     DebugSequenceExecutionContext,
     DebugSequence,
     Block,
     WhileControl,
     IfControl,
+    Interpreter,
     Parser,
     SemanticChecker,
     _ConstantFolder,
+    _PythonGenerator,
 )
 from pyocd.core.session import Session
 from pyocd.probe.debug_probe import DebugProbe
@@ -425,7 +431,7 @@ class TestDebugSequenceBlockExecute:
         ])
     def test_precedence(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
-        logging.info("Block: %s", s._ast.pretty())
+        logging.info("Block: %s", s._code.tree.pretty())
         s.execute(block_context)
         actual = block_context.current_scope.get("x")
         assert actual == result
@@ -435,7 +441,7 @@ class TestDebugSequenceBlockExecute:
         ])
     def test_longer_expr(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
-        logging.info("Block: %s", s._ast.pretty())
+        logging.info("Block: %s", s._code.tree.pretty())
         s.execute(block_context)
         actual = block_context.current_scope.get("x")
         assert actual == result
@@ -443,7 +449,7 @@ class TestDebugSequenceBlockExecute:
     def test_unary_op_assign(self, block_context):
         # Statement from Infineon.PSoC6_DFP
         s = Block("__Result = -1; // DAP is unavailable")
-        logging.info(f"Block: {s._ast.pretty()}")
+        logging.info(f"Block: {s._code.tree.pretty()}")
         s.execute(block_context)
         actual = block_context.current_scope.get("__Result")
         assert actual == 0xffffffffffffffff
@@ -455,7 +461,7 @@ class TestDebugSequenceBlockExecute:
         ])
     def test_ternary_expr(self, block_context, expr, result):
         s = Block(f"__var x = {expr};")
-        logging.info("Block: %s", s._ast.pretty())
+        logging.info("Block: %s", s._code.tree.pretty())
         s.execute(block_context)
         actual = block_context.current_scope.get("x")
         assert actual == result
@@ -711,3 +717,142 @@ class TestDebugSequences:
         seq.execute(context)
 
 
+
+class CountingFunctions(SequenceFunctionsDelegateForTesting):
+    """@brief Functions delegate that records calls."""
+    calls = []
+
+    def read32(self, addr: int):
+        self.calls.append(('read32', addr))
+        return addr + 1
+
+    def write32(self, addr: int, value: int):
+        self.calls.append(('write32', addr, value))
+
+class CountingDelegate(SequenceDelegateForTesting):
+    def get_sequence_functions(self):
+        return CountingFunctions()
+
+@pytest.fixture(scope='function')
+def counting_context(session):
+    CountingFunctions.calls = []
+    c = DebugSequenceExecutionContext(session, CountingDelegate(), pname=None)
+    seq = DebugSequence('test_sequence')
+    c._push(seq, seq._create_scope(c))
+    return c
+
+class TestCompiledCode:
+    @pytest.mark.parametrize("code", [
+            "__var x = 5; x += read32(2) * 3; x;",
+            "__var x = 0x10; x <<= 2; x >>= 1; x /= 0; x",
+            "__var x = 7 % 0; x |= 0x30; x ^= 1; (x > 3) + (x <= 3) + (x != 0) + (x == 0x31);",
+            "__var y = 3; -y; ~y; !y; +y",
+            "__var y = 2; y && 0 || y && 1",
+            "1 ? read32(1) : read32(2)",
+            "write32(0x100, rootvar); read32(rootvar) - 1",
+            "__var z; z",
+            "",
+        ])
+    def test_matches_interpreter(self, counting_context, code):
+        scope = counting_context.current_scope
+        compiled = CompiledCode(code).bind(scope, counting_context)()
+        compiled_calls = CountingFunctions.calls
+        CountingFunctions.calls = []
+        interpreted = Interpreter(Parser.parse(code), scope, counting_context).execute()
+        assert compiled == interpreted
+        assert compiled_calls == CountingFunctions.calls
+
+    def test_ternary_evaluates_both(self, counting_context):
+        code = CompiledCode("__var p = 0; p ? read32(1) : read32(2)")
+        assert code.bind(counting_context.current_scope, counting_context)() == 3
+        assert CountingFunctions.calls == [('read32', 1), ('read32', 2)]
+
+    def test_undefined_variable(self, counting_context):
+        fn = CompiledCode("__var x = missing;").bind(counting_context.current_scope, counting_context)
+        with pytest.raises(DebugSequenceSemanticError):
+            fn()
+
+    def test_semantic_error(self, counting_context):
+        with pytest.raises(DebugSequenceSemanticError):
+            CompiledCode("funkymonkey();").bind(counting_context.current_scope, counting_context)
+
+    def test_checked_once(self, counting_context):
+        code = CompiledCode("__var x = read32(4);")
+        with mock.patch.object(SemanticChecker, 'check') as check:
+            code.bind(counting_context.current_scope, counting_context)()
+            code.bind(counting_context.current_scope, counting_context)()
+        assert check.call_count == 1
+        assert counting_context.current_scope.get('x') == 5
+
+    def test_while_loop(self, counting_context):
+        seq = DebugSequence('test')
+        seq.add_child(Block("__var n = 0;"))
+        loop = WhileControl("n < 100")
+        loop.add_child(Block("n += 1; write32(n, n);"))
+        seq.add_child(loop)
+        scope = seq.execute(counting_context)
+        assert scope.get('n') == 100
+        assert len(CountingFunctions.calls) == 100
+
+    def test_trace_uses_interpreter(self, counting_context):
+        code = CompiledCode("read32(1);")
+        with mock.patch.object(TRACE, 'isEnabledFor', return_value=True):
+            fn = code.bind(counting_context.current_scope, counting_context)
+        assert isinstance(fn.__self__, Interpreter)
+        assert fn() == 2
+
+    def test_disk_cache(self, counting_context, tmp_path):
+        path = tmp_path / "pack.json"
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        block = Block("__var x = read32(10); x += 1;", code_cache=cache)
+        block.execute(counting_context)
+        cache.save()
+        assert path.exists()
+
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        with mock.patch.object(_PythonGenerator, 'generate') as generate, \
+                mock.patch.object(SemanticChecker, 'check') as check:
+            block = Block("__var x = read32(10); x += 1;", code_cache=cache)
+            block.execute(counting_context)
+        assert not generate.called
+        # Cached code is still checked against the context.
+        assert check.call_count == 1
+        assert counting_context.current_scope.get('x') == 12
+
+    def test_disk_cache_semantic_error(self, counting_context, tmp_path):
+        path = tmp_path / "pack.json"
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        cache.put("funkymonkey();", _PythonGenerator.VERSION, "def _sequence_code(scope, fns):\n    return 0\n")
+        with pytest.raises(DebugSequenceSemanticError):
+            Block("funkymonkey();", code_cache=cache).execute(counting_context)
+
+    def test_disk_cache_generator_version(self, counting_context, tmp_path):
+        path = tmp_path / "pack.json"
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        Block("read32(1);", code_cache=cache).execute(counting_context)
+        assert cache.get("read32(1);", _PythonGenerator.VERSION) is not None
+        assert cache.get("read32(1);", _PythonGenerator.VERSION + 1) is None
+
+    def test_disk_cache_source_hash(self, counting_context, tmp_path):
+        path = tmp_path / "pack.json"
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        Block("read32(1);", code_cache=cache).execute(counting_context)
+        cache.save()
+
+        # Modify the generated source stored in the file.
+        path.write_text(path.read_text().replace("fns.read32", "fns.read8"))
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        assert cache.get("read32(1);", _PythonGenerator.VERSION) is None
+
+    def test_disk_cache_other_functions(self, counting_context, block_context, tmp_path):
+        path = tmp_path / "pack.json"
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        Block("valid_fn_no_args();", code_cache=cache).execute(counting_context)
+        cache.save()
+
+        # Code checked against another functions class is checked again.
+        cache = DebugSequenceCodeCache(PersistentCacheFile(path, DebugSequenceCodeCache.VERSION))
+        block = Block("valid_fn_no_args();", code_cache=cache)
+        with mock.patch.object(SemanticChecker, 'check') as check:
+            block.execute(block_context)
+        assert check.call_count == 1
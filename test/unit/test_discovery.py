@@ -0,0 +1,101 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from .conftest import mock
+
+from pyocd.core import exceptions
+from pyocd.coresight.ap import APSEL_SHIFT
+from pyocd.coresight.discovery import ADIv5Discovery
+
+class MockDP:
+    """@brief DP with deferred AP IDR reads.
+
+    Records each batch of reads, where a batch is the reads queued before the first result is
+    requested.
+    """
+    def __init__(self, ap_idrs, fault_apsels=()):
+        self.ap_idrs = ap_idrs
+        self.fault_apsels = fault_apsels
+        self.valid_aps = None
+        self.discovery_cache = None
+        self.batches = []
+        self._pending = []
+
+    def _flush(self):
+        if self._pending:
+            self.batches.append(self._pending)
+            self._pending = []
+
+    def read_ap(self, addr, now=True):
+        apsel = addr >> APSEL_SHIFT
+        self._pending.append(apsel)
+
+        def read_cb():
+            self._flush()
+            if apsel in self.fault_apsels:
+                raise exceptions.TransferFaultError()
+            return self.ap_idrs.get(apsel, 0)
+        return read_cb() if now else read_cb
+
+def make_discovery(dp, **options):
+    opts = {'scan_all_aps': False, 'adi.v5.max_invalid_ap_count': 3}
+    opts.update(options)
+    target = mock.Mock()
+    target.dp = dp
+    target.session.options = opts
+    target.session.log_tracebacks = False
+    return ADIv5Discovery(target)
+
+def probed_apsels(dp):
+    return [apsel for batch in dp.batches for apsel in batch]
+
+class TestAPScan:
+    def test_batches(self):
+        dp = MockDP({0: 0x24770011, 1: 0x44770001, 2: 0x14770015})
+        make_discovery(dp)._find_aps()
+        assert dp.valid_aps == [0, 1, 2]
+        # Same APs as a serial scan: stop after three invalid APSELs.
+        assert probed_apsels(dp) == list(range(6))
+        assert dp.batches == [[0, 1, 2], [3, 4, 5]]
+
+    def test_gap(self):
+        dp = MockDP({0: 0x24770011, 2: 0x44770001})
+        make_discovery(dp)._find_aps()
+        assert dp.valid_aps == [0, 2]
+        assert probed_apsels(dp) == list(range(6))
+        assert dp.batches == [[0, 1, 2], [3, 4, 5]]
+
+    def test_partial_batch(self):
+        dp = MockDP({0: 0x24770011, 1: 0x44770001, 4: 0x14770015})
+        make_discovery(dp)._find_aps()
+        assert dp.valid_aps == [0, 1, 4]
+        assert dp.batches == [[0, 1, 2], [3, 4], [5, 6, 7]]
+
+    def test_scan_all(self):
+        dp = MockDP({0: 0x24770011, 10: 0x44770001})
+        make_discovery(dp, scan_all_aps=True)._find_aps()
+        assert dp.valid_aps == [0, 10]
+        assert len(dp.batches) == 1
+        assert probed_apsels(dp) == list(range(ADIv5Discovery.MAX_APSEL))
+
+    def test_fault(self):
+        dp = MockDP({0: 0x24770011, 2: 0x44770001}, fault_apsels=(1,))
+        make_discovery(dp)._find_aps()
+        assert dp.valid_aps == [0, 2]
+        # After the fault, the rest of the batch is probed individually.
+        assert dp.batches[:4] == [[0, 1, 2], [1], [2], [3, 4, 5]]
@@ -0,0 +1,181 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from .conftest import mock
+from .test_rom_table import (MockCoreSight, MockM4Components)
+
+from pyocd.cache.persistent import PersistentCacheFile
+from pyocd.coresight.ap import (APSEL_SHIFT, APv1Address)
+from pyocd.coresight.discovery_cache import CoreSightDiscoveryCache
+from pyocd.coresight.rom_table import (CoreSightComponentID, ROMTable)
+
+M4_AP_IDR = 0x24770011
+
+class MockDP:
+    """@brief Just enough of a DebugPort for the discovery cache."""
+    def __init__(self, ap_idrs):
+        self.ap_idrs = ap_idrs
+        self.discovery_cache = None
+        self.read_ap_count = 0
+
+    def read_ap(self, addr, now=True):
+        self.read_ap_count += 1
+        value = self.ap_idrs.get(addr >> APSEL_SHIFT, 0)
+        return value if now else (lambda: value)
+
+class MockAP(MockCoreSight):
+    """@brief Cortex-M4 ROM table behind a MEM-AP."""
+    def __init__(self, dp, apsel=0):
+        super().__init__([
+                MockM4Components.M4_ROM_TABLE,
+                MockM4Components.SCS,
+                MockM4Components.DWT,
+                MockM4Components.FPB,
+                MockM4Components.ITM,
+                MockM4Components.TPIU,
+                MockM4Components.ETM,
+            ])
+        self.dp = dp
+        self.address = APv1Address(apsel)
+        self.idr = M4_AP_IDR
+        self.rom_addr = MockM4Components.M4_ROM_TABLE_BASE
+
+    @property
+    def short_description(self):
+        return "MockAP"
+
+def walk_rom_table(ap):
+    cmpid = CoreSightComponentID(None, ap, ap.rom_addr)
+    cmpid.read_id_registers()
+    rom_table = ROMTable.create(ap, cmpid)
+    rom_table.init()
+    return rom_table
+
+@pytest.fixture(scope='function')
+def cache_path(tmp_path):
+    return tmp_path / "board.json"
+
+def make_cache(path, version="1.0"):
+    return CoreSightDiscoveryCache(PersistentCacheFile(path, CoreSightDiscoveryCache.VERSION), version)
+
+def populate(path):
+    """@brief Run discovery on a mock AP with an empty cache and save the results."""
+    dp = MockDP({0: M4_AP_IDR})
+    dp.discovery_cache = make_cache(path)
+    ap = MockAP(dp)
+    walk_rom_table(ap)
+    dp.discovery_cache.set_aps([ap])
+    dp.discovery_cache.save()
+
+class TestDiscoveryCache:
+    def test_empty(self, cache_path):
+        cache = make_cache(cache_path)
+        assert not cache.is_valid
+        assert cache.validate_aps(MockDP({0: M4_AP_IDR})) is None
+
+    def test_records_reads(self, cache_path):
+        populate(cache_path)
+        assert cache_path.exists()
+        assert make_cache(cache_path).is_valid
+
+    def test_cached_rom_table(self, cache_path):
+        populate(cache_path)
+        dp = MockDP({0: M4_AP_IDR})
+        dp.discovery_cache = make_cache(cache_path)
+        ap = MockAP(dp)
+        with mock.patch.object(ap, 'read_memory_block32', wraps=ap.read_memory_block32) as rd:
+            assert dp.discovery_cache.validate_rom_table(ap)
+            rom_table = walk_rom_table(ap)
+        # Only the root ROM table ID registers are read to validate the cache.
+        assert rd.call_count == 1
+        assert len(rom_table.components) == 6
+        tpiu = rom_table.components[4]
+        assert tpiu.component_class == 9
+        assert tpiu.devtype == 0x11
+        assert tpiu.devid == [0xca1, 0, 0]
+
+    def test_save_only_when_changed(self, cache_path):
+        populate(cache_path)
+        dp = MockDP({0: M4_AP_IDR})
+        cache = dp.discovery_cache = make_cache(cache_path)
+        ap = MockAP(dp)
+        assert cache.validate_rom_table(ap)
+        walk_rom_table(ap)
+        cache.set_aps([ap])
+        with mock.patch.object(cache._file, 'save') as save:
+            cache.save()
+        assert not save.called
+
+    def test_validate_aps(self, cache_path):
+        populate(cache_path)
+        dp = MockDP({0: M4_AP_IDR})
+        assert make_cache(cache_path).validate_aps(dp) == [0]
+        assert dp.read_ap_count == 1
+
+    def test_ap_mismatch(self, cache_path):
+        populate(cache_path)
+        cache = make_cache(cache_path)
+        assert cache.validate_aps(MockDP({0: 0x04770031})) is None
+        assert not cache.is_valid
+
+    def test_rom_table_mismatch(self, cache_path):
+        populate(cache_path)
+        dp = MockDP({0: M4_AP_IDR})
+        dp.discovery_cache = make_cache(cache_path)
+        ap = MockAP(dp)
+        ap.write_memory_block32(MockM4Components.M4_ROM_TABLE_BASE + CoreSightComponentID.IDR_READ_START, [0])
+        assert not dp.discovery_cache.validate_rom_table(ap)
+        assert not dp.discovery_cache.is_valid
+        # Reads now go to the target and are recorded again.
+        with mock.patch.object(ap, 'read_memory_block32', wraps=ap.read_memory_block32) as rd:
+            walk_rom_table(ap)
+        assert rd.call_count > 1
+        dp.discovery_cache.set_aps([ap])
+        dp.discovery_cache.save()
+        assert make_cache(cache_path).validate_rom_table(ap)
+
+    def test_rom_addr_mismatch(self, cache_path):
+        populate(cache_path)
+        dp = MockDP({0: M4_AP_IDR})
+        cache = make_cache(cache_path)
+        ap = MockAP(dp)
+        ap.rom_addr = 0xe0000000
+        assert not cache.validate_rom_table(ap)
+
+    def test_unvalidated_ap_not_cached(self, cache_path):
+        populate(cache_path)
+        dp = MockDP({0: M4_AP_IDR})
+        dp.discovery_cache = make_cache(cache_path)
+        ap = MockAP(dp)
+        addr = ap.rom_addr + CoreSightComponentID.IDR_READ_START
+        count = CoreSightComponentID.IDR_READ_COUNT
+        assert dp.discovery_cache.lookup_block32(ap, addr, count) is None
+        with mock.patch.object(ap, 'read_memory_block32', wraps=ap.read_memory_block32) as rd:
+            walk_rom_table(ap)
+        assert rd.call_count > 1
+
+    def test_malformed_aps(self, cache_path):
+        cache_path.write_text('{"version": %d, "data": {"pyocd_version": "1.0", "aps": {"0x0": 5}, "blocks": {}}}'
+                % CoreSightDiscoveryCache.VERSION)
+        cache = make_cache(cache_path)
+        assert not cache.is_valid
+        assert cache.validate_aps(MockDP({0: M4_AP_IDR})) is None
+
+    def test_version_mismatch(self, cache_path):
+        populate(cache_path)
+        assert not make_cache(cache_path, version="2.0").is_valid
@@ -0,0 +1,214 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from binascii import crc32
+from unittest import mock
+
+from pyocd.core.memory_map import FlashRegion
+from pyocd.core.target import Target
+from pyocd.flash.builder import FlashBuilder
+from pyocd.flash.fingerprint import FlashFingerprintCache
+from pyocd.flash.flash import Flash
+from pyocd.cache.persistent import PersistentCacheFile
+
+FLASH_SIZE = 0x8000
+PAGE_SIZE = 0x100
+SECTOR_SIZE = 0x400
+ANALYZER_ADDR = 0x20001000
+BUFFERS = [0x20002000, 0x20003000]
+
+class AnalyzerTarget:
+    """@brief Fake target that emulates the CRC analyzer over a flash image."""
+
+    def __init__(self):
+        self.flash = bytearray((i * 7) & 0xff for i in range(FLASH_SIZE))
+        self.ram = {}
+        self.regs = {}
+        self.running = False
+        self.calls = []
+        self.session = mock.Mock()
+        self.session.options.get.return_value = None
+
+    def write_memory_block32(self, addr, data):
+        for i, v in enumerate(data):
+            self.ram[addr + i * 4] = v
+
+    def read_memory_block32(self, addr, count):
+        return [self.ram[addr + i * 4] for i in range(count)]
+
+    def write_core_registers_raw(self, regs, values):
+        self.regs.update(zip(regs, values))
+
+    def resume(self):
+        assert self.regs['pc'] == ANALYZER_ADDR
+        buf, count = self.regs['r0'], self.regs['r1']
+        self.calls.append((buf, count))
+        self.running = True
+
+    def get_state(self):
+        # Complete the analyzer call.
+        if self.running:
+            buf, count = self.calls[-1]
+            for i in range(count):
+                cmd = self.ram[buf + i * 4]
+                size = 1 << (cmd & 0xffff)
+                addr = (cmd >> 16) * size
+                self.ram[buf + i * 4] = crc32(self.flash[addr:addr + size])
+            self.running = False
+        return Target.State.HALTED
+
+    def read_core_register(self, reg):
+        return 0
+
+    def halt(self):
+        pass
+
+    def reset_and_halt(self):
+        pass
+
+    def read_memory_block8(self, addr, size):
+        return list(self.flash[addr:addr + size])
+
+def make_flash(target, buffers):
+    algo = {
+        'load_address': 0x20000000,
+        'instructions': [0] * 4,
+        'pc_erase_sector': 0x20000001,
+        'pc_program_page': 0x20000005,
+        'begin_stack': 0x20004000,
+        'begin_data': buffers[0],
+        'page_buffers': buffers,
+        'static_base': 0x20000800,
+        'analyzer_supported': True,
+        'analyzer_address': ANALYZER_ADDR,
+        }
+    flash = Flash(target, algo)
+    flash.region = FlashRegion(start=0, length=FLASH_SIZE, blocksize=SECTOR_SIZE, page_size=PAGE_SIZE, flash=flash)
+    return flash
+
+@pytest.fixture(scope='function')
+def target():
+    return AnalyzerTarget()
+
+class TestComputeCrcs:
+    def sectors(self):
+        return [(addr, PAGE_SIZE) for addr in range(0, FLASH_SIZE, PAGE_SIZE)]
+
+    def expected(self, target):
+        return [crc32(target.flash[a:a + s]) for a, s in self.sectors()]
+
+    def test_single_call(self, target):
+        flash = make_flash(target, BUFFERS)
+        assert flash.compute_crcs(self.sectors()) == self.expected(target)
+        assert target.calls == [(BUFFERS[0], FLASH_SIZE // PAGE_SIZE)]
+
+    def test_large_image_single_call(self, target):
+        # 2 MB of 256 byte pages.
+        flash_size = 2 * 1024 * 1024
+        target.flash = bytearray((i * 7) & 0xff for i in range(flash_size))
+        flash = make_flash(target, BUFFERS)
+        flash.region = FlashRegion(start=0, length=flash_size, blocksize=SECTOR_SIZE, page_size=PAGE_SIZE,
+                flash=flash)
+        sectors = [(addr, PAGE_SIZE) for addr in range(0, flash_size, PAGE_SIZE)]
+        crcs = flash.compute_crcs(sectors)
+        assert len(target.calls) == 1
+        assert crcs[-1] == crc32(target.flash[-PAGE_SIZE:])
+
+    def test_no_region(self, target):
+        flash = Flash(target, make_flash(target, BUFFERS).flash_algo)
+        assert flash.region is None
+        assert flash.compute_crcs(self.sectors()) == self.expected(target)
+        assert target.calls == [(BUFFERS[0], 128)]
+
+    def test_empty(self, target):
+        assert make_flash(target, BUFFERS).compute_crcs([]) == []
+
+class TestScanGrouping:
+    def page(self, addr, cached=None):
+        return mock.Mock(addr=addr, size=PAGE_SIZE, cached_estimate_data=cached)
+
+    def test_group_contiguous(self):
+        pages = [self.page(0), self.page(0x100), self.page(0x300), self.page(0x400, cached=[0]),
+                 self.page(0x500)]
+        runs = FlashBuilder._group_contiguous_pages(pages)
+        assert [[p.addr for p in run] for run in runs] == [[0, 0x100], [0x300], [0x400], [0x500]]
+
+    def test_max_read_size(self):
+        count = FlashBuilder.SCAN_READ_SIZE // PAGE_SIZE
+        pages = [self.page(i * PAGE_SIZE) for i in range(count + 1)]
+        runs = FlashBuilder._group_contiguous_pages(pages)
+        assert [len(run) for run in runs] == [count, 1]
+
+class TestFingerprintCache:
+    @pytest.fixture(scope='function')
+    def cache(self, tmp_path):
+        return FlashFingerprintCache(PersistentCacheFile(tmp_path / "board.json", FlashFingerprintCache.VERSION))
+
+    @pytest.fixture(scope='function')
+    def flash(self, target):
+        return make_flash(target, BUFFERS)
+
+    def builder(self, flash, data):
+        builder = FlashBuilder(flash)
+        builder.add_data(0, data)
+        builder._build_sectors_and_pages(False)
+        return builder
+
+    def test_store(self, cache, flash):
+        assert cache.get_page_crcs(flash.region) == {}
+        cache.set_page_crcs(flash.region, {0x100: 1, 0: 2})
+        assert cache.get_page_crcs(flash.region) == {0: 2, 0x100: 1}
+        cache.invalidate(flash.region)
+        assert cache.get_page_crcs(flash.region) == {}
+
+    def test_corrupt_file(self, cache, flash):
+        cache._file.path.write_text("{not json")
+        assert cache.get_page_crcs(flash.region) == {}
+        cache.set_page_crcs(flash.region, {0: 2})
+        assert cache.get_page_crcs(flash.region) == {0: 2}
+
+    def test_unchanged_pages_trusted(self, cache, flash, target):
+        data = bytes(target.flash[:0x800])
+        cache.set_page_crcs(flash.region, {a: crc32(data[a:a + PAGE_SIZE]) for a in range(0, 0x800, PAGE_SIZE)})
+        new_data = bytearray(data)
+        new_data[0x300] ^= 0xff
+        builder = self.builder(flash, new_data)
+        builder._analyze_pages_with_fingerprints(cache)
+        assert [p.same for p in builder.page_list] == [True, True, True, False, True, True, True, True]
+        assert builder.perf.analyze_type == FlashBuilder.FLASH_ANALYSIS_FINGERPRINT
+        # Only the spot check ran on the target.
+        assert len(target.calls) == 1
+
+    def test_stale_cache_ignored(self, cache, flash, target):
+        data = bytes(target.flash[:0x400])
+        cache.set_page_crcs(flash.region, {a: crc32(data[a:a + PAGE_SIZE]) for a in range(0, 0x400, PAGE_SIZE)})
+        # Something else reprogrammed the flash.
+        target.flash[:0x400] = bytes(0x400)
+        builder = self.builder(flash, data)
+        builder._analyze_pages_with_fingerprints(cache)
+        assert all(p.same is None for p in builder.page_list)
+        assert cache.get_page_crcs(flash.region) == {}
+
+    def test_update(self, cache, flash, target):
+        cache.set_page_crcs(flash.region, {0: 1, 0x100: 2, 0x4000: 3})
+        builder = self.builder(flash, bytes(0x100))
+        prior = cache.get_page_crcs(flash.region)
+        for page in builder.page_list:
+            page.same = False
+        builder._update_fingerprints(cache, prior)
+        # The sector containing the programmed page was erased; other entries are kept.
+        assert cache.get_page_crcs(flash.region) == {0: crc32(bytes(0x100)), 0x4000: 3}
@@ -14,7 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from unittest import mock
+
+from pyocd.core.session import Session
+from pyocd.core.target import Target
+from pyocd.debug.state_monitor import TargetStateMonitor
 from pyocd.gdbserver.gdbserver import (
+    GDBServer,
     escape,
     unescape,
 )
@@ -65,3 +71,20 @@ class TestGdbServerEscaping:
     def test_unescape_combined(self):
         assert unescape(b"}\x03}\x04}]}\x0a") == list(b"#$}*")
         assert unescape(b"}]}]}]") == list(b"}}}")
+
+class TestGdbServerStateMonitor:
+    def test_first_resume_is_watched(self):
+        session = Session(None, gdbserver_port=0, semihost_console_type='console')
+        session._board = mock.Mock()
+        core = session.board.target
+        core.get_state.return_value = Target.State.HALTED
+        core.get_target_context.return_value.core.core_registers.iter_matching.return_value = []
+        with mock.patch.object(TargetStateMonitor, 'start'), \
+                mock.patch.object(GDBServer, '_init_remote_commands'):
+            server = GDBServer(session)
+        try:
+            # The core sends this notification when resumed.
+            session.notify(Target.Event.POST_RUN, core, Target.RunType.RESUME)
+            assert session.state_monitor.watched_cores == [core]
+        finally:
+            server.abstract_socket.cleanup()
@@ -16,8 +16,13 @@
 
 import pytest
 import logging
+from unittest import mock
 
 from pyocd.cache.memory import MemoryCache
+from pyocd.core.exceptions import TransferFaultError
+from pyocd.core.session import Session
+from pyocd.core.target import Target
+from pyocd.debug.cache import CachingDebugContext
 from pyocd.debug.context import DebugContext
 from pyocd.core import memory_map
 from pyocd.utility import conversion
@@ -27,6 +32,13 @@ from pyocd.utility import mask
 def memcache(mockcore):
     return MemoryCache(DebugContext(mockcore), mockcore)
 
+@pytest.fixture(scope='function')
+def wbcache(mockcore):
+    return MemoryCache(DebugContext(mockcore), mockcore, write_back=True)
+
+RAM = 0x20000000
+RAM2 = 0x20000400
+
 class TestMemoryCache:
     def test_1(self, mockcore, memcache):
         memcache.write_memory_block8(0, [0x10, 0x12, 0x14, 0x16])
@@ -181,6 +193,96 @@ class TestMemoryCache:
         assert block == data[0x7e:0x82]
 
 
+    def test_27_merge_adjacent_reads(self, memcache):
+        for offset in range(0, 64, 4):
+            memcache.read_memory_block8(RAM + offset, 4)
+        assert len(memcache._cache) == 1
+        memcache.read_memory_block8(RAM + 128, 4)
+        memcache.read_memory_block8(RAM + 64, 64)
+        assert len(memcache._cache) == 1
+        iv = next(iter(memcache._cache))
+        assert (iv.begin, iv.end) == (RAM, RAM + 132)
+
+class TestWriteBackMemoryCache:
+    def test_write_buffered(self, mockcore, wbcache):
+        wbcache.write_memory_block8(RAM, [1, 2, 3, 4])
+        assert wbcache.is_dirty
+        assert mockcore.ram[0:4] == bytearray(4)
+        assert wbcache.read_memory_block8(RAM, 6) == [1, 2, 3, 4, 0, 0]
+        wbcache.flush()
+        assert not wbcache.is_dirty
+        assert mockcore.ram[0:4] == bytearray([1, 2, 3, 4])
+
+    def test_write_through_flash(self, mockcore, wbcache):
+        wbcache.write_memory_block8(0, [1, 2, 3, 4])
+        assert not wbcache.is_dirty
+        assert mockcore.flash[0:4] == bytearray([1, 2, 3, 4])
+
+    def test_write_through_uncacheable(self, mockcore, wbcache):
+        wbcache.write_memory_block8(RAM2, [1, 2, 3, 4])
+        assert not wbcache.is_dirty
+        assert mockcore.ram2[0:4] == bytearray([1, 2, 3, 4])
+
+    def test_coalesced_flush(self, mockcore, wbcache):
+        for offset in range(0, 64, 4):
+            wbcache.write_memory(RAM + offset, 0x01020304 + offset)
+        assert len(wbcache._dirty) == 1
+        with mock.patch.object(mockcore, 'write_memory_block32', wraps=mockcore.write_memory_block32) as wr32:
+            wbcache.flush()
+        wr32.assert_called_once()
+        assert mockcore.read_memory(RAM + 60) == 0x01020304 + 60
+
+    def test_unaligned_flush(self, mockcore, wbcache):
+        # Surrounding bytes are not cached, so the unaligned range is written bytewise.
+        wbcache.write_memory_block8(RAM + 1, [0xaa, 0xbb])
+        with mock.patch.object(mockcore, 'write_memory_block8', wraps=mockcore.write_memory_block8) as wr8:
+            wbcache.flush()
+        wr8.assert_called_once_with(RAM + 1, bytearray([0xaa, 0xbb]))
+        assert mockcore.ram[0:4] == bytearray([0, 0xaa, 0xbb, 0])
+
+    def test_unaligned_flush_widened(self, mockcore, wbcache):
+        mockcore.ram[0:8] = bytearray(range(8))
+        wbcache.read_memory_block8(RAM, 8)
+        wbcache.write_memory_block8(RAM + 1, [0xaa, 0xbb])
+        with mock.patch.object(mockcore, 'write_memory_block32', wraps=mockcore.write_memory_block32) as wr32:
+            wbcache.flush()
+        wr32.assert_called_once_with(RAM, [0x03bbaa00])
+        assert mockcore.ram[0:8] == bytearray([0, 0xaa, 0xbb, 3, 4, 5, 6, 7])
+
+    def test_run_token_change_writes_back(self, mockcore, wbcache):
+        wbcache.write_memory_block8(RAM, [1, 2, 3, 4])
+        mockcore.run_token += 1
+        assert wbcache.read_memory_block8(RAM, 4) == [1, 2, 3, 4]
+        assert mockcore.ram[0:4] == bytearray([1, 2, 3, 4])
+        assert not wbcache.is_dirty
+
+    def test_invalidate_writes_back(self, mockcore, wbcache):
+        wbcache.write_memory_block8(RAM, [1, 2, 3, 4])
+        wbcache.invalidate()
+        assert mockcore.ram[0:4] == bytearray([1, 2, 3, 4])
+
+    def test_flush_fault_invalidates(self, mockcore, wbcache):
+        wbcache.write_memory_block8(RAM, [1, 2, 3, 4])
+        with mock.patch.object(mockcore, 'write_memory_block32', side_effect=TransferFaultError()):
+            with pytest.raises(TransferFaultError):
+                wbcache.flush()
+        assert not wbcache.is_dirty
+        assert len(wbcache._cache) == 0
+
+    def test_buffered_write_reads_state_once(self, mockcore, wbcache):
+        with mock.patch.object(mockcore, 'is_running', wraps=mockcore.is_running) as is_running:
+            wbcache.write_memory_block8(RAM, [1, 2, 3, 4])
+        assert is_running.call_count == 1
+        assert wbcache.is_dirty
+
+    @pytest.mark.parametrize("event", [Target.Event.PRE_RUN, Target.Event.PRE_FLASH_PROGRAM])
+    def test_context_flushes_on_event(self, mockcore, event):
+        mockcore.session = Session(None)
+        ctx = CachingDebugContext(DebugContext(mockcore), memory_write_back=True)
+        ctx.write_memory_block8(RAM, [1, 2, 3, 4])
+        assert mockcore.ram[0:4] == bytearray(4)
+        mockcore.session.notify(event, mockcore)
+        assert mockcore.ram[0:4] == bytearray([1, 2, 3, 4])
 
 # TODO test read32/16/8 with and without callbacks
 
@@ -0,0 +1,163 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import random
+import re
+
+from pyocd.core import exceptions
+from pyocd.core.memory_interface import MemoryInterface
+from pyocd.utility import conversion
+from pyocd.utility.memory_scan import (
+    MemoryPattern,
+    MemoryScanner,
+    compare_memory,
+    find_pattern_mismatch,
+    search_memory,
+    )
+
+BASE = 0x20000000
+
+class BufferMemory(MemoryInterface):
+    """@brief Memory interface over a bytearray that records the deferred block reads."""
+
+    def __init__(self, data, fault_addr=None):
+        self.data = bytearray(data)
+        self.fault_addr = fault_addr
+        self.log = []
+
+    def _check(self, addr, size):
+        if self.fault_addr is not None and addr <= self.fault_addr < addr + size:
+            raise exceptions.TransferFaultError(fault_address=self.fault_addr)
+
+    def read_memory_block8(self, addr, size):
+        self._check(addr, size)
+        return list(self.data[addr - BASE:addr - BASE + size])
+
+    def read_memory_block32(self, addr, size):
+        return conversion.byte_list_to_u32le_list(self.read_memory_block8(addr, size * 4))
+
+    def read_memory_block32_deferred(self, addr, size):
+        self.log.append(('start', addr))
+        def read_cb():
+            self.log.append(('finish', addr))
+            return self.read_memory_block32(addr, size)
+        return read_cb
+
+@pytest.fixture(scope='function')
+def memory():
+    rng = random.Random(1234)
+    return BufferMemory(bytes(rng.getrandbits(8) for _ in range(4096)))
+
+def naive_search(data, patterns):
+    """@brief Reference search returning (offset, index) for every match."""
+    results = []
+    for offset in range(len(data)):
+        for i, p in enumerate(patterns):
+            window = data[offset:offset + len(p)]
+            if len(window) == len(p) and re.fullmatch(p.regex, window, re.DOTALL):
+                results.append((offset, i))
+    return results
+
+class TestMemoryScanner:
+    @pytest.mark.parametrize(("start", "length"), [(0, 4096), (1, 4000), (3, 2), (2, 6), (5, 0)])
+    def test_contents(self, memory, start, length):
+        chunks = list(MemoryScanner(memory, BASE + start, length, chunk_size=256))
+        data = b''.join(c for _, c in chunks)
+        assert data == bytes(memory.data[start:start + length])
+        offset = start
+        for addr, chunk in chunks:
+            assert addr == BASE + offset
+            offset += len(chunk)
+
+    def test_prefetch(self, memory):
+        for addr, _ in MemoryScanner(memory, BASE, 1024, chunk_size=256):
+            # The next chunk's read has been started before this chunk is yielded.
+            if addr + 256 < BASE + 1024:
+                assert ('start', addr + 256) in memory.log
+        assert memory.log[:3] == [('start', BASE), ('start', BASE + 256), ('finish', BASE)]
+
+    def test_stop_completes_pending(self, memory):
+        memory.fault_addr = BASE + 300
+        for _ in MemoryScanner(memory, BASE, 1024, chunk_size=256):
+            break
+        assert memory.log == [('start', BASE), ('start', BASE + 256), ('finish', BASE), ('finish', BASE + 256)]
+
+    def test_fault(self, memory):
+        memory.fault_addr = BASE + 300
+        with pytest.raises(exceptions.TransferFaultError):
+            list(MemoryScanner(memory, BASE, 1024, chunk_size=256))
+
+class TestSearchMemory:
+    def test_straddles_chunks(self, memory):
+        memory.data[250:262] = b'signature!!!'
+        matches = list(search_memory(memory, BASE, 4096, b'signature!!!', chunk_size=256))
+        assert [m.address for m in matches] == [BASE + 250]
+
+    def test_overlapping_matches(self, memory):
+        memory.data[100:110] = b'\xaa' * 10
+        addrs = [m.address for m in search_memory(memory, BASE + 96, 32, b'\xaa\xaa\xaa', chunk_size=8)]
+        assert addrs == [BASE + 100 + i for i in range(8)]
+
+    def test_range_limits(self, memory):
+        memory.data[10:14] = b'abcd'
+        assert list(search_memory(memory, BASE + 11, 100, b'abcd')) == []
+        assert list(search_memory(memory, BASE, 13, b'abcd')) == []
+        assert [m.address for m in search_memory(memory, BASE + 10, 4, b'abcd')] == [BASE + 10]
+
+    @pytest.mark.parametrize("chunk_size", [4, 12, 64, 4096])
+    def test_multiple_masked_patterns(self, memory, chunk_size):
+        patterns = [
+            MemoryPattern(b'\x12\x34', b'\xff\xf0'),
+            MemoryPattern(b'\x00\x00\x56', b'\x00\x00\xff'),
+            MemoryPattern(bytes(memory.data[1000:1010])),
+            MemoryPattern(b'\x80', b'\x80'),
+            ]
+        matches = list(search_memory(memory, BASE + 1, 4000, patterns, chunk_size=chunk_size))
+        expected = naive_search(bytes(memory.data[1:4001]), patterns)
+        assert [(m.address - BASE - 1, m.index) for m in matches] == expected
+        assert all(m.pattern is patterns[m.index] for m in matches)
+
+    def test_same_address(self, memory):
+        memory.data[0:3] = b'abc'
+        matches = list(search_memory(memory, BASE, 16, [b'abc', b'ab']))
+        assert [(m.address, m.index) for m in matches] == [(BASE, 0), (BASE, 1)]
+
+    def test_memory_interface_api(self, memory):
+        memory.data[2000:2004] = b'\xde\xad\xbe\xef'
+        assert next(memory.search_memory(BASE, 4096, b'\xde\xad\xbe\xef')).address == BASE + 2000
+
+    def test_pattern_errors(self):
+        with pytest.raises(ValueError):
+            MemoryPattern(b'')
+        with pytest.raises(ValueError):
+            MemoryPattern(b'ab', b'\xff')
+        assert MemoryPattern(b'ab', b'\xff\xff').mask is None
+
+class TestCompare:
+    def test_compare(self, memory):
+        expected = bytes(memory.data[5:3005])
+        assert compare_memory(memory, BASE + 5, expected, chunk_size=256) is None
+        memory.data[1500] ^= 0x10
+        assert compare_memory(memory, BASE + 5, expected, chunk_size=256) == 1495
+
+    def test_pattern_mismatch(self, memory):
+        memory.data[0:1024] = b'\xaa\x55\xaa' * 341 + b'\xaa'
+        assert find_pattern_mismatch(memory, BASE, 1024, b'\xaa\x55\xaa', chunk_size=64) is None
+        memory.data[500] = 0
+        assert find_pattern_mismatch(memory, BASE, 1024, b'\xaa\x55\xaa', chunk_size=64) == BASE + 498
+        # Masked bits are ignored.
+        assert find_pattern_mismatch(memory, BASE + 498, 6, MemoryPattern(b'\xaa\x55\xaa', b'\xff\xff\x00')) is None
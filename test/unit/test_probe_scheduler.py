@@ -0,0 +1,194 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from time import (monotonic, sleep)
+
+import pytest
+
+from pyocd.coresight.dap import DP_SELECT
+from pyocd.probe.probe_scheduler import ProbeScheduler
+
+class MockProbe:
+    def __init__(self):
+        self.dp_writes = []
+        self.lock_count = 0
+
+    def write_dp(self, addr, data):
+        self.dp_writes.append((addr, data))
+
+    def lock(self):
+        self.lock_count += 1
+
+    def unlock(self):
+        self.lock_count -= 1
+
+@pytest.fixture
+def probe():
+    return MockProbe()
+
+@pytest.fixture
+def scheduler(probe):
+    return ProbeScheduler(probe)
+
+def wait_until(predicate, timeout=5.0):
+    end = monotonic() + timeout
+    while not predicate():
+        assert monotonic() < end, "timed out"
+        sleep(0.005)
+
+def run_transaction(scheduler, client, order, done=None):
+    """@brief Start a thread that performs one transaction and records the client's name."""
+    def worker():
+        with scheduler.transaction(client):
+            order.append(client.name)
+        if done is not None:
+            done.set()
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+def waiting_count(scheduler):
+    return scheduler.get_metrics()['waiting_clients']
+
+class TestProbeScheduler:
+    def test_round_robin(self, scheduler):
+        a = scheduler.add_client("a")
+        b = scheduler.add_client("b")
+        c = scheduler.add_client("c")
+        order = []
+        threads = []
+        with scheduler.transaction(a):
+            threads.append(run_transaction(scheduler, b, order))
+            wait_until(lambda: waiting_count(scheduler) == 1)
+            threads.append(run_transaction(scheduler, c, order))
+            wait_until(lambda: waiting_count(scheduler) == 2)
+            threads.append(run_transaction(scheduler, a, order))
+            wait_until(lambda: waiting_count(scheduler) == 3)
+        for thread in threads:
+            thread.join(5)
+        assert order == ["b", "c", "a"]
+
+    def test_lock_is_exclusive(self, scheduler, probe):
+        a = scheduler.add_client("a")
+        b = scheduler.add_client("b")
+        with scheduler.transaction(a):
+            scheduler.lock(a)
+        assert probe.lock_count == 1
+
+        order = []
+        b_done = threading.Event()
+        thread = run_transaction(scheduler, b, order, b_done)
+        wait_until(lambda: waiting_count(scheduler) == 1)
+        # The lock owner still gets its transactions while b waits.
+        with scheduler.transaction(a):
+            order.append("a")
+        assert not b_done.wait(0.05)
+
+        with scheduler.transaction(a):
+            scheduler.unlock(a)
+        thread.join(5)
+        assert order == ["a", "b"]
+        assert probe.lock_count == 0
+
+    def test_nested_lock(self, scheduler, probe):
+        a = scheduler.add_client("a")
+        with scheduler.transaction(a):
+            scheduler.lock(a)
+            scheduler.lock(a)
+            scheduler.unlock(a)
+        assert scheduler.get_metrics()['lock_owner'] == a.client_id
+        with scheduler.transaction(a):
+            scheduler.unlock(a)
+        assert scheduler.get_metrics()['lock_owner'] is None
+        assert probe.lock_count == 0
+
+    def test_remove_client_releases_lock(self, scheduler, probe):
+        a = scheduler.add_client("a")
+        b = scheduler.add_client("b")
+        with scheduler.transaction(a):
+            scheduler.lock(a)
+            scheduler.lock(a)
+        order = []
+        thread = run_transaction(scheduler, b, order)
+        wait_until(lambda: waiting_count(scheduler) == 1)
+        scheduler.remove_client(a)
+        thread.join(5)
+        assert order == ["b"]
+        assert probe.lock_count == 0
+        assert [c.name for c in scheduler.clients] == ["b"]
+
+    def test_select_restored(self, scheduler, probe):
+        a = scheduler.add_client("a")
+        b = scheduler.add_client("b")
+        with scheduler.transaction(a):
+            probe.write_dp(DP_SELECT, 0x01000000)
+            scheduler.dp_written(a, DP_SELECT, 0x01000000)
+        with scheduler.transaction(b):
+            probe.write_dp(DP_SELECT, 0x020000f0)
+            scheduler.dp_written(b, DP_SELECT, 0x020000f0)
+        probe.dp_writes.clear()
+        with scheduler.transaction(a):
+            pass
+        assert probe.dp_writes == [(DP_SELECT, 0x01000000)]
+        # No write is needed when SELECT already has the client's value.
+        with scheduler.transaction(a):
+            pass
+        assert probe.dp_writes == [(DP_SELECT, 0x01000000)]
+
+    def test_select1_restored(self, scheduler, probe):
+        a = scheduler.add_client("a")
+        b = scheduler.add_client("b")
+        with scheduler.transaction(a):
+            scheduler.dp_written(a, DP_SELECT, 0x5)
+            scheduler.dp_written(a, 0x4, 0x1234)
+            scheduler.dp_written(a, DP_SELECT, 0x00000010)
+        with scheduler.transaction(b):
+            scheduler.dp_written(b, DP_SELECT, 0x5)
+            scheduler.dp_written(b, 0x4, 0x5678)
+            scheduler.dp_written(b, DP_SELECT, 0x00000020)
+        probe.dp_writes.clear()
+        with scheduler.transaction(a):
+            pass
+        assert probe.dp_writes == [(DP_SELECT, 0x15), (0x4, 0x1234), (DP_SELECT, 0x10)]
+
+    def test_ctrl_stat_not_tracked(self, scheduler, probe):
+        a = scheduler.add_client("a")
+        b = scheduler.add_client("b")
+        with scheduler.transaction(a):
+            scheduler.dp_written(a, DP_SELECT, 0)
+            scheduler.dp_written(a, 0x4, 0x50000000)
+        with scheduler.transaction(b):
+            pass
+        with scheduler.transaction(a):
+            pass
+        assert probe.dp_writes == []
+
+    def test_metrics(self, scheduler):
+        a = scheduler.add_client("a")
+        with scheduler.transaction(a, 3):
+            sleep(0.01)
+            assert scheduler.get_metrics()['queue_depth'] == 3
+        a.bytes_received += 10
+        metrics = scheduler.get_metrics()
+        assert metrics['transactions'] == 1
+        assert metrics['queue_depth'] == 0
+        assert 0 < metrics['utilization'] <= 1
+        client_metrics, = metrics['clients']
+        assert client_metrics['name'] == "a"
+        assert client_metrics['requests'] == 3
+        assert client_metrics['bytes_received'] == 10
+        assert client_metrics['busy_time'] >= 0.01
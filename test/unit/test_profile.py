@@ -0,0 +1,302 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import itertools
+import pytest
+import random
+import threading
+from unittest import mock
+
+from pyocd.__main__ import PyOCDTool
+from pyocd.core import exceptions
+from pyocd.coresight.ap import (APv1Address, MEM_AP, CSW_SIZE32)
+from pyocd.coresight.dwt import DWT
+from pyocd.debug.elf.decoder import (FunctionInfo, LineInfo, SymbolInfo)
+from pyocd.probe.pydapaccess.dap_access_api import DAPAccessIntf
+from pyocd.trace.capture import SWOCaptureWriter
+from pyocd.trace.pcsr import PCSRSampler
+from pyocd.trace.profile import (
+    PCSamplingSink,
+    ProfileEntry,
+    ProfileSymbolizer,
+    SampleProfile,
+    collapsed_stacks,
+    function_histogram,
+    line_histogram,
+    profile_swo_capture,
+    )
+
+from .mockdap import (MockDAPInterface, make_mock_dap)
+from .test_swo import (SYNC, hw, local_ts, split)
+
+# Functions of the fake firmware: name -> (start, end). The DWARF info only covers 'main'.
+FUNCTIONS = {
+    'main': (0x1000, 0x1100),
+    'SysTick_Handler': (0x2000, 0x2040),
+    'memcpy': (0x3000, 0x3080),
+    }
+
+class FakeSymbolDecoder:
+    def get_symbol_for_address(self, addr):
+        # Thumb function symbols have bit 0 set.
+        for name, (start, end) in FUNCTIONS.items():
+            if start | 1 <= addr < end | 1:
+                return SymbolInfo(name, start | 1, end - start, 'STT_FUNC')
+        return None
+
+class FakeAddressDecoder:
+    def get_function_for_address(self, addr):
+        start, end = FUNCTIONS['main']
+        if start <= addr < end:
+            return FunctionInfo(b'main', None, start, end)
+        return None
+
+    def get_line_for_address(self, addr):
+        start, end = FUNCTIONS['main']
+        if start <= addr < end:
+            return LineInfo(None, b'main.c', b'', 10 + (addr - start) // 0x80)
+        return None
+
+def pc(addr):
+    return hw(2, addr, 4)
+
+def sleep_pc():
+    return hw(2, 0, 1)
+
+def exc(number, fn):
+    return hw(1, (fn << 12) | number)
+
+def make_profile_stream(count, seed=0):
+    """@brief SWO stream of PC samples from FUNCTIONS, with periodic timestamps."""
+    rng = random.Random(seed)
+    out = bytearray(SYNC)
+    expected = {'main': 0, 'memcpy': 0}
+    for n in range(count):
+        name = 'main' if rng.random() < 0.75 else 'memcpy'
+        start, end = FUNCTIONS[name]
+        out += pc(rng.randrange(start, end, 2))
+        expected[name] += 1
+        if n % 7 == 0:
+            out += local_ts(rng.randint(1, 1000))
+    return bytes(out), expected
+
+def write_capture(data, chunk_sizes=(61,)):
+    f = io.BytesIO()
+    writer = SWOCaptureWriter(f)
+    for chunk in split(data, list(chunk_sizes)):
+        writer.write(chunk)
+    writer.close()
+    f.seek(0)
+    return f
+
+@pytest.fixture(scope='function')
+def symbolizer():
+    return ProfileSymbolizer(FakeSymbolDecoder(), FakeAddressDecoder())
+
+class TestSampleProfile:
+    def test_counts(self):
+        profile = SampleProfile()
+        profile.add(0x1000)
+        profile.add(0x1000, count=2)
+        profile.add(None)
+        profile.add_samples([0x1000, 0x1002], context=('IRQ',))
+        assert profile.total_samples == 6
+        assert profile.granularity == 1
+        assert sorted(profile.entries(), key=repr) == sorted([
+                ((), 0x1000, 3), ((), None, 1), (('IRQ',), 0x1000, 1), (('IRQ',), 0x1002, 1)], key=repr)
+
+    def test_bounded(self):
+        profile = SampleProfile(max_entries=64)
+        rng = random.Random(1)
+        addrs = [rng.randrange(0x1000, 0x9000, 2) for _ in range(10000)]
+        profile.add_samples(addrs[:5000])
+        for addr in addrs[5000:]:
+            profile.add(addr)
+        entries = list(profile.entries())
+        assert len(entries) <= 64
+        assert profile.total_samples == sum(c for _, _, c in entries) == 10000
+        # Every sample is still counted in the range that contains it.
+        g = profile.granularity
+        assert g > 1
+        for _, addr, count in entries:
+            assert count == sum(1 for a in addrs if addr <= a < addr + g)
+
+class TestPCSamplingSink:
+    def test_replay_capture(self, symbolizer):
+        data, expected = make_profile_stream(5000)
+        profile = profile_swo_capture(write_capture(data))
+        # The final samples are flushed even though no timestamp follows them.
+        assert profile.total_samples == 5000
+        assert function_histogram(profile, symbolizer) == sorted(
+                [ProfileEntry(n, c) for n, c in expected.items()], key=lambda e: -e.count)
+
+    def test_chunking_is_irrelevant(self):
+        data, _ = make_profile_stream(2000, seed=3)
+        a = profile_swo_capture(write_capture(data, [1]))
+        b = profile_swo_capture(write_capture(data, [4096]))
+        assert sorted(a.entries(), key=repr) == sorted(b.entries(), key=repr)
+
+    def test_exception_context(self, symbolizer):
+        data = (SYNC + pc(0x1010)
+                + exc(15, 1) + pc(0x2004)           # SysTick preempts main.
+                + exc(16, 1) + pc(0x3000)           # IRQ0 preempts SysTick.
+                + exc(16, 2) + exc(15, 3) + pc(0x2008)
+                + exc(15, 2) + exc(0, 3) + sleep_pc()
+                + exc(17, 3) + pc(0x3004)           # Return to a handler entered before tracing.
+                + bytes([0x70]) + pc(0x1000))       # Overflow resets the context.
+        core = mock.Mock()
+        core.exception_number_to_name.side_effect = lambda n: {15: "SysTick"}.get(n)
+        profile = profile_swo_capture(write_capture(data), core=core)
+        assert profile.overflow_count == 1
+        assert sorted(collapsed_stacks(profile, symbolizer)) == sorted([
+                ProfileEntry("main", 2),
+                ProfileEntry("SysTick;SysTick_Handler", 2),
+                ProfileEntry("SysTick;exception 16;memcpy", 1),
+                ProfileEntry("<sleep>", 1),
+                ProfileEntry("exception 17;memcpy", 1),
+                ])
+
+class TestSymbolizer:
+    def test_names(self, symbolizer):
+        assert symbolizer.function_name(0x1000) == 'main'
+        assert symbolizer.function_name(0x2000) == 'SysTick_Handler'
+        assert symbolizer.function_name(0x203e) == 'SysTick_Handler'
+        assert symbolizer.function_name(0x5000) == '0x00005000'
+        assert symbolizer.function_name(None) == '<sleep>'
+        assert symbolizer.source_line(0x1082) == 'main.c:11'
+        assert symbolizer.source_line(0x2000) is None
+        assert ProfileSymbolizer().function_name(0x1000) == '0x00001000'
+
+    def test_line_histogram(self, symbolizer):
+        profile = SampleProfile()
+        profile.add_samples([0x1000, 0x1002, 0x1080, 0x3000, 0x5000])
+        assert line_histogram(profile, symbolizer) == [
+                ProfileEntry("main.c:10 (main)", 2),
+                ProfileEntry("0x00003000 (memcpy)", 1),
+                ProfileEntry("0x00005000", 1),
+                ProfileEntry("main.c:11 (main)", 1),
+                ]
+
+class TestDWTPCSampling:
+    @pytest.mark.parametrize(("interval", "ctrl", "actual"), [
+        (64, 0, 64),
+        (1000, 15 << 1, 1024),
+        (4096, (1 << 9) | (3 << 1), 4096),
+        (100000, (1 << 9) | (15 << 1), 16384),
+        ])
+    def test_enable(self, interval, ctrl, actual):
+        ap = mock.Mock()
+        ap.read32.return_value = DWT.DWT_CTRL_PCSAMPLENA_MASK | DWT.DWT_CTRL_CYCTAP_MASK | (7 << 1)
+        dwt = DWT(ap, addr=0xe0001000)
+        dwt.dwt_configured = True
+        assert dwt.enable_pc_sampling(interval, exception_trace=True) == actual
+        fields = (ctrl & DWT.DWT_CTRL_POSTRESET_MASK) << 4 | ctrl | DWT.DWT_CTRL_CYCCNTENA_MASK
+        assert ap.write32.call_args_list == [
+                mock.call(0xe0001000, fields),
+                mock.call(0xe0001000, fields | DWT.DWT_CTRL_PCSAMPLENA_MASK | DWT.DWT_CTRL_EXCTRCENA_MASK),
+                ]
+
+PCSR_ADDR = 0xe000101c
+
+def pc_stream(seed=0):
+    """@brief Endless synthetic DWT_PCSR values, with some reads returning no sample."""
+    rng = random.Random(seed)
+    while True:
+        r = rng.random()
+        if r < 0.1:
+            yield PCSRSampler.NO_SAMPLE
+        else:
+            start, end = FUNCTIONS['main' if r < 0.7 else 'memcpy']
+            yield rng.randrange(start, end, 2)
+
+class MockPCSRAP:
+    """@brief MEM-AP whose repeated reads return values from a synthetic PC stream."""
+    def __init__(self, stream):
+        self._stream = stream
+        self.log = []
+
+    def read_memory_repeat32(self, addr, count, now=True):
+        assert addr == PCSR_ADDR
+        values = [next(self._stream) for _ in range(count)]
+        self.log.append(('start', count))
+        def read_cb():
+            self.log.append(('finish', count))
+            return values
+        return read_cb() if now else read_cb
+
+class TestPCSRSampler:
+    def test_aggregation(self, symbolizer):
+        ap = MockPCSRAP(pc_stream())
+        sampler = PCSRSampler(ap, PCSR_ADDR, batch_size=500)
+        assert sampler.run(batches=10) == 5000
+        reference = list(itertools.islice(pc_stream(), 5000))
+        valid = [v for v in reference if v != PCSRSampler.NO_SAMPLE]
+        assert sampler.missed_count == 5000 - len(valid)
+        assert sampler.profile.total_samples == len(valid)
+        assert dict(function_histogram(sampler.profile, symbolizer)) == {
+                'main': sum(1 for v in valid if v < 0x2000),
+                'memcpy': sum(1 for v in valid if v >= 0x3000),
+                }
+
+    def test_pipelined(self):
+        ap = MockPCSRAP(pc_stream())
+        PCSRSampler(ap, PCSR_ADDR, batch_size=8).run(batches=3)
+        # The next batch is always queued before the current one is completed.
+        assert ap.log == [('start', 8), ('start', 8), ('finish', 8), ('start', 8), ('finish', 8), ('finish', 8)]
+
+    def test_stop_event(self):
+        event = threading.Event()
+        event.set()
+        sampler = PCSRSampler(MockPCSRAP(pc_stream()), PCSR_ADDR, batch_size=8)
+        assert sampler.run(stop_event=event) == 8
+
+    def test_from_core(self):
+        core = mock.Mock(dwt=mock.Mock(address=0xe0001000))
+        assert PCSRSampler.from_core(core)._pcsr_address == PCSR_ADDR
+        with pytest.raises(exceptions.TargetSupportError):
+            PCSRSampler.from_core(mock.Mock(dwt=None))
+
+    def test_mem_ap_repeat_read(self):
+        dp = mock.Mock()
+        dp.probe.get_memory_interface_for_ap.return_value = None
+        dp.read_ap_multiple.return_value = lambda: [0x1000] * 3
+        ap = MEM_AP(dp, APv1Address(0))
+        assert ap.read_memory_repeat32(PCSR_ADDR, 3) == [0x1000] * 3
+        # Address increment is disabled and TAR is written once for all of the reads.
+        assert dp.write_ap.call_args_list[-2:] == [mock.call(0x0, CSW_SIZE32), mock.call(0x4, PCSR_ADDR)]
+        dp.read_ap_multiple.assert_called_once_with(0xc, 3, now=False)
+
+    def test_dap_packets(self):
+        stream = pc_stream()
+        iface = MockDAPInterface(packet_size=512, read_value_fn=lambda request: next(stream))
+        dap = make_mock_dap(iface)
+        values = dap.reg_read_repeat(4000, DAPAccessIntf.REG.AP_0xC)
+        assert values == list(itertools.islice(pc_stream(), 4000))
+        # Each DAP_TransferBlock packet is filled with reads.
+        assert iface.packets_written == -(-4000 // ((512 - 4) // 4))
+
+class TestProfileSubcommand:
+    def test_replay_collapsed(self, tmp_path):
+        data, expected = make_profile_stream(500)
+        capture = tmp_path / "trace.swo"
+        capture.write_bytes(write_capture(data).getvalue())
+        output = tmp_path / "profile.folded"
+        assert PyOCDTool().run(["profile", "--replay", str(capture), "--format", "collapsed",
+                "-o", str(output)]) == 0
+        lines = output.read_text().splitlines()
+        assert len(lines) == len({addr for _, addr, _ in profile_swo_capture(str(capture)).entries()})
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == 500
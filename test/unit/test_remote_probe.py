@@ -0,0 +1,479 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import threading
+from time import (monotonic, sleep)
+
+from pyocd.core import exceptions
+from pyocd.core.memory_interface import MemoryInterface
+from pyocd.core.session import Session
+from pyocd.coresight.ap import APv1Address
+from pyocd.coresight.dap import DP_SELECT
+from pyocd.probe import remote_protocol as rp
+from pyocd.probe.debug_probe import DebugProbe
+from pyocd.probe.tcp_client_probe import TCPClientProbe
+from pyocd.probe.tcp_probe_server import (DebugProbeRequestHandler, DebugProbeServer)
+
+## Register address that faults when accessed.
+FAULT_ADDR = 0xfc
+
+## Memory address that faults when accessed.
+FAULT_MEM_ADDR = 0xe0000000
+
+class MockMemoryInterface(MemoryInterface):
+    def __init__(self, size=0x1000):
+        self.data = bytearray(size)
+
+    def _check(self, addr):
+        if addr >= FAULT_MEM_ADDR:
+            raise exceptions.TransferFaultError("mock fault", fault_address=addr)
+
+    def write_memory(self, addr, data, transfer_size=32, **attrs):
+        self._check(addr)
+        self.data[addr:addr + transfer_size // 8] = data.to_bytes(transfer_size // 8, 'little')
+
+    def read_memory(self, addr, transfer_size=32, now=True, **attrs):
+        def read_cb():
+            self._check(addr)
+            return int.from_bytes(self.data[addr:addr + transfer_size // 8], 'little')
+        return read_cb() if now else read_cb
+
+    def write_memory_block32(self, addr, data, **attrs):
+        for i, value in enumerate(data):
+            self.write_memory(addr + i * 4, value)
+
+    def read_memory_block32(self, addr, size, **attrs):
+        return [self.read_memory(addr + i * 4) for i in range(size)]
+
+    def write_memory_block8(self, addr, data, **attrs):
+        self._check(addr)
+        self.data[addr:addr + len(data)] = bytes(data)
+
+    def read_memory_block8(self, addr, size, **attrs):
+        self._check(addr)
+        return list(self.data[addr:addr + size])
+
+class MockProbe(DebugProbe):
+    """@brief Probe with DP and AP registers held in dicts.
+
+    Reads with now=False are only performed when their callback is called, and every access is
+    recorded so tests can check the order in which the server started and completed them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._is_open = False
+        self.reset()
+
+    def reset(self):
+        self.dp = {}
+        self.ap = {}
+        self.memif = MockMemoryInterface()
+        self.log = []
+        self.flush_count = 0
+        self._protocol = None
+
+    @property
+    def unique_id(self):
+        return "mock"
+
+    @property
+    def description(self):
+        return "mock probe"
+
+    @property
+    def is_open(self):
+        return self._is_open
+
+    def open(self):
+        self._is_open = True
+
+    def close(self):
+        self._is_open = False
+
+    def flush(self):
+        self.flush_count += 1
+
+    @property
+    def wire_protocol(self):
+        return self._protocol
+
+    def connect(self, protocol=None):
+        self._protocol = DebugProbe.Protocol.SWD
+
+    def set_clock(self, frequency):
+        raise exceptions.ProbeError("mock clock error")
+
+    def _read(self, regs, addr, now):
+        self.log.append(('start', addr))
+
+        def read_cb():
+            self.log.append(('finish', addr))
+            if addr == FAULT_ADDR:
+                raise exceptions.TransferFaultError("mock fault")
+            return regs.get(addr, 0)
+        return read_cb() if now else read_cb
+
+    def _write(self, regs, addr, data):
+        self.log.append(('write', addr))
+        if addr == FAULT_ADDR:
+            raise exceptions.TransferFaultError("mock fault")
+        regs[addr] = data
+
+    def read_dp(self, addr, now=True):
+        return self._read(self.dp, addr, now)
+
+    def write_dp(self, addr, data):
+        self._write(self.dp, addr, data)
+
+    def read_ap(self, addr, now=True):
+        return self._read(self.ap, addr, now)
+
+    def write_ap(self, addr, data):
+        self._write(self.ap, addr, data)
+
+    def read_ap_multiple(self, addr, count=1, now=True):
+        cbs = [self._read(self.ap, addr, False) for _ in range(count)]
+        def read_cb():
+            return [cb() for cb in cbs]
+        return read_cb() if now else read_cb
+
+    def write_ap_multiple(self, addr, values):
+        for value in values:
+            self._write(self.ap, addr, value)
+
+    def get_memory_interface_for_ap(self, ap_address):
+        return self.memif
+
+    def swo_read(self):
+        return bytearray(b'\x01\x02\x03')
+
+@pytest.fixture(scope='module')
+def shared_probe():
+    return MockProbe()
+
+@pytest.fixture(scope='module')
+def server(shared_probe):
+    # The server is shared by all tests in the module because stopping it takes a while.
+    session = Session(None)
+    srv = DebugProbeServer(session, shared_probe, port=0, serve_local_only=True)
+    srv.start()
+    yield srv
+    srv.stop()
+
+@pytest.fixture
+def probe(shared_probe):
+    shared_probe.reset()
+    return shared_probe
+
+@pytest.fixture
+def client(server, probe):
+    client = TCPClientProbe("localhost:%d" % server.port)
+    client.open()
+    yield client
+    client.close()
+
+def wait_for(predicate, timeout=5.0):
+    end = monotonic() + timeout
+    while not predicate():
+        assert monotonic() < end, "timed out"
+        sleep(0.01)
+
+class TestRemoteProtocol:
+    def test_frame_decoder_split(self):
+        data = rp.encode_request(1, rp.Op.READ_DP, rp.U32.pack(4)) + rp.encode_request(2, rp.Op.FLUSH)
+        decoder = rp.FrameDecoder()
+        frames = []
+        for i in range(len(data)):
+            frames += decoder.feed(data[i:i + 1])
+        assert frames == [rp.REQUEST_HEADER.pack(1, rp.Op.READ_DP) + rp.U32.pack(4),
+                rp.REQUEST_HEADER.pack(2, rp.Op.FLUSH)]
+
+    def test_frame_too_large(self):
+        with pytest.raises(ValueError):
+            rp.FrameDecoder().feed(rp.FRAME_HEADER.pack(rp.MAX_FRAME_SIZE + 1))
+
+    def test_batch_round_trip(self):
+        ops = [(rp.Op.WRITE_DP, rp.U32x2.pack(8, 1)), (rp.Op.FLUSH, b'')]
+        assert rp.decode_batch(rp.encode_batch(ops)) == ops
+        results = [b'', b'\x01\x02\x03\x04']
+        assert rp.decode_batch_results(rp.encode_batch_results(results)) == results
+
+class TestRemoteProbe:
+    def test_negotiates_binary(self, client):
+        assert client.protocol_version == rp.PROTOCOL_VERSION_BINARY
+
+    def test_fallback_to_json(self, server, probe, monkeypatch):
+        monkeypatch.setattr(DebugProbeRequestHandler, 'SUPPORTED_PROTOCOL_VERSIONS', (rp.PROTOCOL_VERSION_JSON,))
+        client = TCPClientProbe("localhost:%d" % server.port)
+        client.open()
+        try:
+            assert client.protocol_version == rp.PROTOCOL_VERSION_JSON
+            client.write_ap(4, 0x1234)
+            assert client.read_ap(4) == 0x1234
+        finally:
+            client.close()
+
+    def test_dp_ap(self, client, probe):
+        client.write_dp(8, 0xf0)
+        client.write_ap(0xc, 0x12345678)
+        client.write_ap_multiple(0x10, [1, 2, 3])
+        assert client.read_dp(8) == 0xf0
+        assert client.read_ap(0xc) == 0x12345678
+        assert client.read_ap_multiple(0x10, 2) == [3, 3]
+        assert probe.ap[0x10] == 3
+
+    def test_pipelined_reads(self, client, probe):
+        for i in range(16):
+            probe.ap[i * 4] = i
+        cbs = [client.read_ap(i * 4, now=False) for i in range(16)]
+        assert [cb() for cb in cbs] == list(range(16))
+
+    def test_many_outstanding_reads(self, client, probe):
+        probe.ap[4] = 0xa5
+        count = TCPClientProbe.MAX_IN_FLIGHT * 3
+        cbs = [client.read_ap(4, now=False) for _ in range(count)]
+        assert [cb() for cb in cbs] == [0xa5] * count
+
+    def test_in_flight_bytes_limited(self, client, probe, monkeypatch):
+        monkeypatch.setattr(client, 'MAX_IN_FLIGHT_BYTES', 1024)
+        probe.ap[0x10] = 7
+        max_bytes = 0
+        cbs = []
+        for _ in range(16):
+            cbs.append(client.read_ap_multiple(0x10, 64, now=False))
+            max_bytes = max(max_bytes, client._in_flight_bytes)
+        assert max_bytes <= 1024
+        assert [cb() for cb in cbs] == [[7] * 64] * 16
+        assert client._in_flight_bytes == 0
+
+    def test_request_larger_than_byte_limit(self, client, probe, monkeypatch):
+        monkeypatch.setattr(client, 'MAX_IN_FLIGHT_BYTES', 64)
+        probe.ap[4] = 3
+        cb = client.read_ap(4, now=False)
+        assert client.read_ap_multiple(4, 32) == [3] * 32
+        assert cb() == 3
+
+    def test_abandoned_reads_dropped(self, client, probe):
+        probe.ap[4] = 1
+        cbs = [client.read_ap(4, now=False) for _ in range(8)]
+        # Half the responses arrive before the callbacks are discarded.
+        with client._lock:
+            for _ in range(4):
+                client._read_response_frame_v2()
+        del cbs
+        assert client.read_ap(4) == 1
+        assert client._responses == {}
+        assert client._discarded_responses == set()
+
+    def test_server_queues_reads_before_completing(self, client, probe):
+        # Send all of the requests in a single write, so the server processes them together.
+        requests = b''.join(rp.encode_request(100 + i, rp.Op.READ_AP, rp.U32.pack(i * 4)) for i in range(4))
+        with client._lock:
+            client._socket.write(requests)
+            client._in_flight += 4
+            for i in range(4):
+                client._receive_response_v2(100 + i, 'read_ap')
+        assert probe.log == [('start', 0), ('start', 4), ('start', 8), ('start', 12),
+                ('finish', 0), ('finish', 4), ('finish', 8), ('finish', 12)]
+
+    def test_read_error(self, client):
+        with pytest.raises(exceptions.TransferFaultError):
+            client.read_ap(FAULT_ADDR)
+        cb = client.read_dp(FAULT_ADDR, now=False)
+        with pytest.raises(exceptions.TransferFaultError):
+            cb()
+
+    def test_deferred_write_error(self, client, probe):
+        client.write_ap(FAULT_ADDR, 1)
+        client.write_ap(8, 2)
+        with pytest.raises(exceptions.TransferFaultError):
+            client.read_ap(8)
+        # The error is only raised once, and the write after the faulting write was not performed.
+        assert client.read_ap(8) == 0
+
+    def test_flush_raises_write_error(self, client, probe):
+        client.write_dp(FAULT_ADDR, 1)
+        with pytest.raises(exceptions.TransferFaultError):
+            client.flush()
+        count = probe.flush_count
+        client.flush()
+        assert probe.flush_count > count
+
+    def test_memory(self, client, probe):
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        memif.write_memory(0x10, 0xdeadbeef)
+        memif.write_memory(0x14, 0xab, 8)
+        assert memif.read_memory(0x10) == 0xdeadbeef
+        assert memif.read_memory(0x14, 8, now=False)() == 0xab
+        memif.write_memory_block32(0x100, [0x01020304, 0xffffffff])
+        assert memif.read_memory_block32(0x100, 2) == [0x01020304, 0xffffffff]
+        memif.write_memory_block8(0x200, bytes(range(256)))
+        assert memif.read_memory_block8(0x200, 256) == list(range(256))
+        assert probe.memif.data[0x100:0x104] == b'\x04\x03\x02\x01'
+
+    def test_memory_fault(self, client):
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        with pytest.raises(exceptions.TransferFaultError):
+            memif.read_memory_block32(FAULT_MEM_ADDR, 4)
+        memif.write_memory(FAULT_MEM_ADDR, 0)
+        with pytest.raises(exceptions.TransferFaultError):
+            memif.read_memory(0)
+
+    def test_swo_read(self, client):
+        assert client.swo_read() == bytearray(b'\x01\x02\x03')
+
+    def test_json_requests(self, client):
+        client.connect()
+        assert client.wire_protocol == DebugProbe.Protocol.SWD
+
+    def test_json_request_error(self, client):
+        with pytest.raises(exceptions.Error):
+            client.set_clock(1000000)
+        # The connection is still usable.
+        client.write_dp(8, 3)
+        assert client.read_dp(8) == 3
+
+    def test_json_request_raises_write_error(self, client, probe):
+        client.write_dp(FAULT_ADDR, 1)
+        with pytest.raises(exceptions.TransferFaultError):
+            client.connect()
+        # The error is only raised once.
+        client.write_dp(8, 3)
+        assert client.read_dp(8) == 3
+
+    def test_batch_error_index(self, client, probe):
+        ops = [
+            (rp.Op.WRITE_AP, rp.U32x2.pack(4, 1)),
+            (rp.Op.READ_AP, rp.U32.pack(4)),
+            (rp.Op.READ_AP, rp.U32.pack(FAULT_ADDR)),
+            (rp.Op.WRITE_AP, rp.U32x2.pack(8, 1)),
+            ]
+        rid = client._send_request_v2(rp.Op.BATCH, rp.encode_batch(ops))
+        with client._lock:
+            while rid not in client._responses:
+                client._read_response_frame_v2()
+            status, payload = client._responses.pop(rid)
+        assert status == DebugProbeRequestHandler.StatusCode.TRANSFER_FAULT
+        assert rp.ERROR_INDEX.unpack_from(payload)[0] == 2
+
+    def test_batch_results(self, client, probe):
+        probe.ap[4] = 7
+        ops = [(rp.Op.READ_AP, rp.U32.pack(4)), (rp.Op.WRITE_AP, rp.U32x2.pack(8, 1))]
+        rid = client._send_request_v2(rp.Op.BATCH, rp.encode_batch(ops))
+        payload, exc = client._receive_response_v2(rid, 'batch')
+        assert exc is None
+        assert rp.decode_batch_results(payload) == [rp.U32.pack(7), b'']
+        assert probe.ap[8] == 1
+
+class TestWriteQueue:
+    def test_writes_sent_on_read(self, client, probe):
+        client.write_dp(8, 1)
+        client.write_ap(4, 2)
+        client.write_ap(8, 3)
+        # Nothing is sent until a read is made.
+        assert probe.log == []
+        assert client.read_ap(8) == 3
+        assert probe.log == [('write', 8), ('write', 4), ('write', 8), ('start', 8), ('finish', 8)]
+        assert probe.dp[8] == 1
+
+    def test_writes_sent_on_flush(self, client, probe):
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        memif.write_memory(0x20, 0x11223344)
+        memif.write_memory_block8(0x24, [1, 2, 3, 4])
+        assert probe.memif.data[0x20:0x28] == bytes(8)
+        client.flush()
+        assert probe.memif.data[0x20:0x28] == b'\x44\x33\x22\x11\x01\x02\x03\x04'
+
+    def test_writes_sent_on_json_request(self, client, probe):
+        client.write_ap(4, 5)
+        client.connect()
+        assert probe.ap[4] == 5
+
+    def test_queue_op_limit(self, client, probe, monkeypatch):
+        monkeypatch.setattr(client, 'WRITE_QUEUE_MAX_OPS', 4)
+        for i in range(5):
+            client.write_ap(4, i)
+        wait_for(lambda: len(probe.log) == 4)
+        assert probe.ap[4] == 3
+        client.flush()
+        assert probe.ap[4] == 4
+
+    def test_queue_byte_limit(self, client, probe, monkeypatch):
+        monkeypatch.setattr(client, 'WRITE_QUEUE_MAX_BYTES', 64)
+        client.write_ap_multiple(0x10, list(range(16)))
+        wait_for(lambda: len(probe.log) == 16)
+
+    def test_fault_index(self, client, probe):
+        client.write_ap(4, 1)
+        client.write_ap(FAULT_ADDR, 2)
+        client.write_ap(8, 3)
+        with pytest.raises(exceptions.TransferFaultError) as excinfo:
+            client.flush()
+        assert "write_ap (write 2 of 3 in batch)" in str(excinfo.value)
+        # Writes after the failed one are not performed.
+        assert probe.ap == {4: 1}
+
+    def test_memory_fault_address(self, client, probe):
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        memif.write_memory(0x10, 1)
+        memif.write_memory_block32(FAULT_MEM_ADDR + 0x100, [1, 2, 3])
+        with pytest.raises(exceptions.TransferFaultError) as excinfo:
+            memif.read_memory(0x10)
+        assert excinfo.value.fault_address == FAULT_MEM_ADDR + 0x100
+        assert excinfo.value.fault_length == 12
+        # The connection is still usable after the error.
+        assert memif.read_memory(0x10) == 1
+
+class TestMultipleClients:
+    @pytest.fixture
+    def other_client(self, server):
+        other = TCPClientProbe("localhost:%d" % server.port)
+        other.open()
+        yield other
+        other.close()
+
+    def test_select_restored(self, client, other_client, probe):
+        client.write_dp(DP_SELECT, 0x01000000)
+        client.flush()
+        other_client.write_dp(DP_SELECT, 0x02000000)
+        other_client.flush()
+        assert probe.dp[DP_SELECT] == 0x02000000
+        client.read_ap(0)
+        assert probe.dp[DP_SELECT] == 0x01000000
+        other_client.read_ap(0)
+        assert probe.dp[DP_SELECT] == 0x02000000
+
+    def test_lock_excludes_other_clients(self, client, other_client, probe):
+        client.lock()
+        results = []
+        thread = threading.Thread(target=lambda: results.append(other_client.read_dp(8)), daemon=True)
+        thread.start()
+        thread.join(0.1)
+        assert results == []
+        client.write_dp(8, 7)
+        client.unlock()
+        thread.join(5)
+        assert results == [7]
+
+    def test_server_metrics(self, client, other_client):
+        client.read_dp(0)
+        metrics = client.get_server_metrics()
+        assert metrics['transactions'] > 0
+        assert 0 <= metrics['utilization'] <= 1
+        assert len(metrics['clients']) >= 2
+        assert any(c['bytes_received'] > 0 and c['bytes_sent'] > 0 for c in metrics['clients'])
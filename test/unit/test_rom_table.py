@@ -21,6 +21,7 @@ from intervaltree import (Interval, IntervalTree)
 from .conftest import mock
 
 from pyocd.coresight.component import CoreSightCoreComponent
+from pyocd.core import exceptions
 from pyocd.core import memory_map
 from pyocd.coresight.rom_table import (
     CoreSightComponentID,
@@ -378,3 +379,40 @@ class TestRomTable:
         assert ahb.part == 0x9e3
         assert ahb.archid == 0xa17
 
+
+class TestPrefetch:
+    def test_prefetch_id_registers(self, m4_rom):
+        cmpids = [CoreSightComponentID(None, m4_rom, c._base) for c in (
+                    MockM4Components.SCS, MockM4Components.TPIU, MockM4Components.ETM)]
+        CoreSightComponentID.prefetch_id_registers(cmpids)
+        with mock.patch.object(m4_rom, 'read_memory_block32', wraps=m4_rom.read_memory_block32) as rd:
+            for cmpid in cmpids:
+                cmpid.read_id_registers()
+        assert rd.call_count == 0
+        assert cmpids[0].part == 0xc
+        assert cmpids[1].devtype == 0x11
+        assert cmpids[1].devid == [0xca1, 0, 0]
+        assert cmpids[2].devtype == 0x13
+
+    def test_prefetch_error(self, m4_rom):
+        cmpids = [CoreSightComponentID(None, m4_rom, c._base) for c in (
+                    MockM4Components.SCS, MockM4Components.DWT)]
+        with mock.patch.object(m4_rom, 'read_memory_block32', side_effect=exceptions.TransferFaultError()):
+            CoreSightComponentID.prefetch_id_registers(cmpids)
+        # The ID registers are read again when the prefetch failed.
+        for cmpid in cmpids:
+            cmpid.read_id_registers()
+        assert cmpids[1].part == 0x2
+
+    def test_rom_table_reads_batched(self, m4_rom):
+        cmpid = CoreSightComponentID(None, m4_rom, MockM4Components.M4_ROM_TABLE_BASE)
+        cmpid.read_id_registers()
+        rom_table = ROMTable.create(m4_rom, cmpid)
+        with mock.patch.object(m4_rom, 'read_memory_block32', wraps=m4_rom.read_memory_block32) as rd:
+            rom_table.init()
+        addrs = [c.args[0] for c in rd.call_args_list]
+        idr_addrs = [a for a in addrs if (a & 0xfff) == CoreSightComponentID.IDR_READ_START]
+        # All ID register blocks are read before any of the CoreSight class DEVARCH blocks.
+        first_devarch = min(i for i, a in enumerate(addrs) if (a & 0xfff) == CoreSightComponentID.DEVARCH)
+        assert all(addrs.index(a) < first_devarch for a in idr_addrs)
+        assert len(idr_addrs) == 6
@@ -0,0 +1,269 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from unittest import mock
+
+from pyocd.core import exceptions
+from pyocd.debug.context import DebugContext
+from pyocd.rtos.common import (decode_c_string, read_c_string, StackedFrame, TargetMemorySnapshot,
+    ThreadStackCache, unstack_registers)
+from pyocd.debug.elf.decoder import SymbolInfo
+from pyocd.rtos.freertos import (FreeRTOSThread, FreeRTOSThreadProvider, LIST_SIZE, TCB_SNAPSHOT_SIZE)
+
+RAM = 0x20000000
+
+# FreeRTOS kernel globals and lists, laid out as the linker would place them in tasks.c's .bss.
+FREERTOS_SYMBOLS = {
+    'uxCurrentNumberOfTasks': RAM + 0x00,
+    'pxCurrentTCB': RAM + 0x04,
+    'uxTopReadyPriority': RAM + 0x08,
+    'xSchedulerRunning': RAM + 0x0c,
+    'pxReadyTasksLists': RAM + 0x10,
+    'xDelayedTaskList1': RAM + 0x10 + 2 * LIST_SIZE,
+    'xDelayedTaskList2': RAM + 0x10 + 3 * LIST_SIZE,
+    'xPendingReadyList': RAM + 0x10 + 4 * LIST_SIZE,
+    'xSuspendedTaskList': RAM + 0x10 + 5 * LIST_SIZE,
+    }
+
+TCB_BASE = RAM + 0x100
+TCB_STRIDE = 0x80
+
+def tcb_addr(i):
+    return TCB_BASE + i * TCB_STRIDE
+
+def write_list(core, list_addr, tcbs):
+    """@brief Write a FreeRTOS list containing the given TCBs, in walk order."""
+    end = list_addr + 8
+    nodes = [tcb + 4 for tcb in tcbs]
+    core.write_memory_block32(list_addr, [len(nodes), end, 0xffffffff, 0, nodes[0] if nodes else end])
+    for i, node in enumerate(nodes):
+        nxt = nodes[i + 1] if i + 1 < len(nodes) else end
+        # xItemValue, pxNext, pxPrevious, pvOwner, pvContainer
+        core.write_memory_block32(node, [0, 0, nxt, node - 4, list_addr])
+
+def write_tcb(core, i, name, priority, sp):
+    core.write_memory_block32(tcb_addr(i), [sp])
+    core.write_memory_block32(tcb_addr(i) + 44, [priority])
+    core.write_memory_block8(tcb_addr(i) + 52, list(name.encode() + b'\0'))
+
+def setup_freertos(core):
+    """@brief Build a FreeRTOS kernel state with 4 tasks in the mock core's RAM."""
+    write_tcb(core, 0, "main", 1, 0x20000700)
+    write_tcb(core, 1, "idle", 0, 0x20000740)
+    write_tcb(core, 2, "sleeper", 1, 0x20000780)
+    write_tcb(core, 3, "suspended", 1, 0x200007c0)
+    write_list(core, FREERTOS_SYMBOLS['pxReadyTasksLists'], [tcb_addr(1)])
+    write_list(core, FREERTOS_SYMBOLS['pxReadyTasksLists'] + LIST_SIZE, [tcb_addr(0)])
+    write_list(core, FREERTOS_SYMBOLS['xDelayedTaskList1'], [tcb_addr(2)])
+    write_list(core, FREERTOS_SYMBOLS['xDelayedTaskList2'], [])
+    write_list(core, FREERTOS_SYMBOLS['xPendingReadyList'], [])
+    write_list(core, FREERTOS_SYMBOLS['xSuspendedTaskList'], [tcb_addr(3)])
+    core.write_memory_block32(RAM, [4, tcb_addr(0), 1, 1])
+
+@pytest.fixture(scope='function')
+def provider(mockcore):
+    setup_freertos(mockcore)
+    target = mock.Mock()
+    target.get_target_context.return_value = DebugContext(mockcore)
+    target.run_token = 1
+    target.elf = None
+    symbols = mock.Mock()
+    symbols.get_symbol_value.side_effect = lambda name: FREERTOS_SYMBOLS.get(name)
+    p = FreeRTOSThreadProvider(target)
+    assert p.init(symbols)
+    p.read_from_target = True
+    return p
+
+class TestCString:
+    def test_decode(self):
+        assert decode_c_string(b'abc\0def') == ("abc", True)
+        assert decode_c_string(b'abc') == ("abc", False)
+        assert decode_c_string(b'a\x80b\0') == ("a?b", True)
+        assert decode_c_string(b'ab' + bytes([0xff] * 5) + b'cd') == ("ab????", True)
+
+    def test_read(self, mockcore):
+        mockcore.write_memory_block8(RAM, list(b'a fairly long thread name\0'))
+        assert read_c_string(mockcore, RAM) == "a fairly long thread name"
+        assert read_c_string(mockcore, 0) == ""
+
+class TestMemorySnapshot:
+    def test_merged_ranges(self, mockcore):
+        mockcore.write_memory_block32(RAM, list(range(64)))
+        snap = TargetMemorySnapshot(mockcore)
+        snap.add_range(RAM + 0x10, 4)
+        snap.add_range(RAM, 8)
+        snap.add_range(RAM + 0xf0, 8)
+        with mock.patch.object(mockcore, 'read_memory_block8', wraps=mockcore.read_memory_block8) as rd:
+            snap.fetch()
+            assert snap.read32(RAM + 4) == 1
+            assert snap.read32(RAM + 0x10) == 4
+            assert snap.read32(RAM + 0xf4) == 61
+        assert rd.call_args_list == [mock.call(RAM, 0xf8)]
+
+    def test_miss_window(self, mockcore):
+        mockcore.write_memory_block32(RAM, list(range(64)))
+        snap = TargetMemorySnapshot(mockcore, miss_before=8, miss_after=8)
+        with mock.patch.object(mockcore, 'read_memory_block8', wraps=mockcore.read_memory_block8) as rd:
+            assert snap.read32(RAM + 0x20) == 8
+            assert snap.read32(RAM + 0x1c) == 7
+            assert snap.read32(RAM + 0x18) == 6
+        assert rd.call_args_list == [mock.call(RAM + 0x18, 16)]
+        assert snap.read_memory_block8(RAM + 0x18, 4) == [6, 0, 0, 0]
+
+    def test_fetch_error_splits(self, mockcore):
+        real_read = mockcore.read_memory_block8
+        def read(addr, size):
+            if addr <= RAM + 0x40 < addr + size:
+                raise exceptions.TransferFaultError()
+            return real_read(addr, size)
+        snap = TargetMemorySnapshot(mockcore)
+        snap.add_range(RAM, 4)
+        snap.add_range(RAM + 0x40, 4)
+        with mock.patch.object(mockcore, 'read_memory_block8', side_effect=read):
+            snap.fetch()
+            assert snap.contains(RAM)
+            assert not snap.contains(RAM + 0x40)
+            with pytest.raises(exceptions.TransferError):
+                snap.read32(RAM + 0x40)
+
+class TestFreeRTOSSnapshot:
+    def test_thread_list(self, provider):
+        threads = {t.name: t for t in provider.get_threads()}
+        assert sorted(threads) == ["idle", "main", "sleeper", "suspended"]
+        assert threads["main"].state == FreeRTOSThread.RUNNING
+        assert threads["idle"].state == FreeRTOSThread.READY
+        assert threads["sleeper"].state == FreeRTOSThread.BLOCKED
+        assert threads["suspended"].state == FreeRTOSThread.SUSPENDED
+        assert threads["main"].priority == 1
+        assert threads["idle"].unique_id == tcb_addr(1)
+
+    def test_stack_pointer(self, provider, mockcore):
+        t = provider.get_thread(tcb_addr(2))
+        assert t.get_stack_pointer() == 0x20000780
+        # Until the target runs, the snapshot value is used.
+        mockcore.write_memory_block32(tcb_addr(2), [0x20000790])
+        assert t.get_stack_pointer() == 0x20000780
+        provider._target.run_token = 2
+        assert t.get_stack_pointer() == 0x20000790
+
+    def test_long_name(self, provider, mockcore):
+        write_tcb(mockcore, 0, "a name longer than sixteen", 1, 0x20000700)
+        assert provider.get_thread(tcb_addr(0)).name == "a name longer than sixteen"
+
+    def test_rebuild_uses_one_read(self, provider, mockcore):
+        provider.get_threads()
+        # Move a task to the delayed list.
+        write_list(mockcore, FREERTOS_SYMBOLS['xSuspendedTaskList'], [])
+        write_list(mockcore, FREERTOS_SYMBOLS['xDelayedTaskList2'], [tcb_addr(3)])
+        provider._target.run_token = 2
+        with mock.patch.object(mockcore, 'read_memory_block8', wraps=mockcore.read_memory_block8) as rd, \
+                mock.patch.object(mockcore, 'read_memory', wraps=mockcore.read_memory) as rd32:
+            threads = provider.get_threads()
+        # One read of xSchedulerRunning by is_enabled, plus a single block read for the snapshot.
+        assert rd32.call_count == 1
+        assert rd.call_count == 2
+        assert provider.get_thread(tcb_addr(3)).state == FreeRTOSThread.BLOCKED
+        assert len(threads) == 4
+
+    def set_elf_symbols(self, provider, symbols):
+        """@brief Give the provider an ELF file containing the given symbols."""
+        elf = mock.Mock()
+        elf.symbol_decoder.get_symbol_for_address.side_effect = \
+                lambda addr: next((s for s in symbols if s.address <= addr < s.address + s.size), None)
+        elf.symbol_decoder.get_symbol_for_name.side_effect = \
+                lambda name: next((s for s in symbols if s.name == name), None)
+        provider._target.elf = elf
+
+    def test_tcb_size_from_elf(self, provider, mockcore):
+        self.set_elf_symbols(provider, [SymbolInfo("tcb%d" % i, tcb_addr(i), 0x60, 'STT_OBJECT') for i in range(4)])
+        assert provider._get_tcb_size() == TCB_SNAPSHOT_SIZE
+        provider.get_threads()
+        assert provider._get_tcb_size() == 0x60
+        provider._target.run_token = 2
+        with mock.patch.object(mockcore, 'read_memory_block8', wraps=mockcore.read_memory_block8) as rd:
+            provider.get_threads()
+        # The whole of the last TCB is read.
+        addr, size = rd.call_args_list[-1][0]
+        assert addr + size == tcb_addr(3) + 0x60
+
+    def test_tcb_size_heap(self, provider):
+        # The TCBs are allocated from a heap array, so there is no symbol for each TCB.
+        self.set_elf_symbols(provider, [SymbolInfo("ucHeap", tcb_addr(0), 0x1000, 'STT_OBJECT')])
+        provider.get_threads()
+        assert provider._get_tcb_size() == TCB_SNAPSHOT_SIZE
+
+# FreeRTOS basic frame with FPU: r4-r11, EXC_RETURN, then the hardware frame.
+FRAME_SP = 0x20000500
+FRAME = [4, 5, 6, 7, 8, 9, 10, 11, 0xfffffffd, 0, 1, 2, 3, 12, 14, 15, 16]
+REGS = ['r0', 'r1', 'r2', 'r3', 'r4', 'r5', 'r6', 'r7', 'r8', 'r9', 'r10', 'r11', 'r12', 'sp', 'lr', 'pc', 'xpsr']
+
+class TestStackCache:
+    def test_read_frame_cached(self, mockcore):
+        mockcore.write_memory_block32(FRAME_SP, FRAME)
+        context = DebugContext(mockcore)
+        cache = ThreadStackCache()
+        with mock.patch.object(mockcore, 'read_memory_block32', wraps=mockcore.read_memory_block32) as rd:
+            frame = cache.read_frame(context, FRAME_SP, (32, 68))
+            assert frame.size == 68
+            assert frame.read32(FRAME_SP + 32) == 0xfffffffd
+            assert cache.read_frame(context, FRAME_SP, (32, 68)) is frame
+            assert rd.call_args_list == [mock.call(FRAME_SP, 17)]
+            mockcore.run_token += 1
+            assert cache.read_frame(context, FRAME_SP, (32, 68)) is not frame
+            assert rd.call_count == 2
+
+    def test_read_frame_fallback(self, mockcore):
+        mockcore.write_memory_block32(FRAME_SP, FRAME)
+        context = DebugContext(mockcore)
+        real_read = mockcore.read_memory_block32
+        def read(addr, size):
+            if size > 8:
+                raise exceptions.TransferFaultError()
+            return real_read(addr, size)
+        cache = ThreadStackCache()
+        with mock.patch.object(mockcore, 'read_memory_block32', side_effect=read):
+            frame = cache.read_frame(context, FRAME_SP, (32, 68))
+        assert frame.size == 32
+        # Words past the frame are read from the target.
+        assert frame.read32(FRAME_SP + 40) == 1
+
+    def test_unstack(self, mockcore):
+        context = DebugContext(mockcore)
+        frame = StackedFrame(context, 0x1000, list(range(0x100, 0x110)))
+        offsets = {4: 0, 5: 4, 0: 32, 15: 56}
+        mockcore.regs[1] = 0x77
+        assert unstack_registers(context, frame, [4, 5, 0, 15, 13, 1], 0x1000, offsets, False, 0x20, 0x20) \
+                == [0x100, 0x101, 0x108, 0x10e, 0x1040, 0x77]
+        # In an exception only the hardware frame is stacked; r4 comes from the live register.
+        mockcore.regs[4] = 0x44
+        assert unstack_registers(context, frame, [4, 0, 13], 0x1000, offsets, True, 0x20, 0x20) \
+                == [0x44, 0x100, 0x1020]
+
+class TestFreeRTOSThreadContext:
+    def test_single_read(self, provider, mockcore):
+        write_tcb(mockcore, 1, "idle", 0, FRAME_SP)
+        mockcore.write_memory_block32(FRAME_SP, FRAME)
+        t = provider.get_thread(tcb_addr(1))
+        with mock.patch.object(mockcore, 'read_memory_block32', wraps=mockcore.read_memory_block32) as rd, \
+                mock.patch.object(mockcore, 'read_memory', wraps=mockcore.read_memory) as rd32:
+            values = t.context.read_core_registers_raw(REGS)
+            assert values == [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, FRAME_SP + 0x44, 14, 15, 16]
+            assert t.context.read_core_registers_raw(['pc']) == [15]
+            assert rd.call_count == 1
+            # The only word reads check whether the thread is current.
+            assert {c[0][0] for c in rd32.call_args_list} \
+                    == {FREERTOS_SYMBOLS['xSchedulerRunning'], FREERTOS_SYMBOLS['pxCurrentTCB']}
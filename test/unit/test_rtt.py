@@ -0,0 +1,268 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import pytest
+import struct
+from types import SimpleNamespace
+from unittest import mock
+
+from pyocd.debug.elf.elf import ELFBinaryFile
+from pyocd.debug.rtt import (GenericRTTControlBlock, RTTPollScheduler)
+
+from .mockcore import MockCore
+
+RAM = 0x20000000
+CB_ADDR = RAM + 0x10
+NUM_UP = 3
+NUM_DOWN = 1
+BUF_SIZE = 32
+UP_BUF_BASE = RAM + 0x200
+
+def up_desc_addr(i):
+    return CB_ADDR + 24 + i * 24
+
+def setup_rtt(core):
+    """@brief Build an RTT control block in the mock core's RAM."""
+    core.write_memory_block8(CB_ADDR, list(b'SEGGER RTT\0\0\0\0\0\0'))
+    core.write_memory_block32(CB_ADDR + 16, [NUM_UP, NUM_DOWN])
+    for i in range(NUM_UP + NUM_DOWN):
+        # sName, pBuffer, SizeOfBuffer, WrOff, RdOff, Flags
+        core.write_memory_block32(up_desc_addr(i), [0, UP_BUF_BASE + i * BUF_SIZE, BUF_SIZE, 0, 0, 0])
+
+def target_write(core, chan, data):
+    """@brief Emulate the target writing into an up buffer."""
+    wr_off, rd_off = core.read_memory_block32(up_desc_addr(chan) + 12, 2)
+    for b in data:
+        core.write_memory_block8(UP_BUF_BASE + chan * BUF_SIZE + wr_off, [b])
+        wr_off = (wr_off + 1) % BUF_SIZE
+    core.write_memory_block32(up_desc_addr(chan) + 12, [wr_off])
+
+def make_stripped_elf():
+    """@brief Build a 32-bit Arm ELF file whose only section is the section name table."""
+    shstrtab = b'\0.shstrtab\0'
+    shoff = 64
+    header = struct.pack('<4sBBBB8xHHIIIIIHHHHHH',
+            b'\x7fELF', 1, 1, 1, 0,      # ELFCLASS32, little endian, EV_CURRENT, SYSV ABI
+            2, 40, 1,                   # ET_EXEC, EM_ARM, EV_CURRENT
+            0, 0, shoff, 0x05000000,    # entry, phoff, shoff, flags
+            52, 0, 0, 40, 2, 1)         # ehsize, phentsize, phnum, shentsize, shnum, shstrndx
+    data = header + shstrtab
+    data += b'\0' * (shoff - len(data))
+    data += b'\0' * 40
+    # name, type=SHT_STRTAB, flags, addr, offset, size, link, info, addralign, entsize
+    data += struct.pack('<IIIIIIIIII', 1, 3, 0, 0, 52, len(shstrtab), 0, 0, 1, 0)
+    return ELFBinaryFile(io.BytesIO(data))
+
+@pytest.fixture(scope='function')
+def rtt_target(mockcore):
+    mockcore.session = mock.Mock(context_state=SimpleNamespace())
+    mockcore.elf = None
+    return mockcore
+
+@pytest.fixture(scope='function')
+def rtt(rtt_target):
+    mockcore = rtt_target
+    setup_rtt(mockcore)
+    cb = GenericRTTControlBlock(mockcore, address=RAM, size=0x100)
+    cb.start()
+    return cb
+
+class TestRTTPollAll:
+    def test_channels_found(self, rtt):
+        assert len(rtt.up_channels) == NUM_UP
+        assert len(rtt.down_channels) == NUM_DOWN
+
+    def test_empty(self, rtt):
+        assert rtt.poll_all() == [b''] * NUM_UP
+
+    def test_poll_all(self, mockcore, rtt):
+        target_write(mockcore, 0, b'hello')
+        target_write(mockcore, 2, b'world!')
+        assert rtt.poll_all() == [b'hello', b'', b'world!']
+        # RdOff updated.
+        assert mockcore.read_memory_block32(up_desc_addr(0) + 16, 1) == [5]
+        assert rtt.poll_all() == [b''] * NUM_UP
+
+    def test_wrapped(self, mockcore, rtt):
+        target_write(mockcore, 1, bytes(range(30)))
+        assert rtt.poll_all()[1] == bytes(range(30))
+        target_write(mockcore, 1, b'abcdefghij')
+        assert rtt.poll_all()[1] == b'abcdefghij'
+
+    def test_selected_channels(self, mockcore, rtt):
+        target_write(mockcore, 0, b'zero')
+        target_write(mockcore, 1, b'one')
+        assert rtt.poll_all([1]) == [b'', b'one', b'']
+        assert rtt.up_channels[0].bytes_available == 4
+        assert rtt.up_channels[0].read() == b'zero'
+
+    def test_single_descriptor_read(self, mockcore, rtt):
+        target_write(mockcore, 0, b'a')
+        target_write(mockcore, 1, b'b')
+        target_write(mockcore, 2, b'c')
+        with mock.patch.object(mockcore, 'write_memory', wraps=mockcore.write_memory) as wr, \
+                mock.patch.object(mockcore, 'read_memory_block32', wraps=mockcore.read_memory_block32) as rd:
+            assert rtt.poll_all() == [b'a', b'b', b'c']
+        # One descriptor read plus one data read per channel.
+        assert rd.call_count == 1 + NUM_UP
+        assert rd.call_args_list[0] == mock.call(up_desc_addr(0), NUM_UP * 6)
+        assert wr.call_count == NUM_UP
+
+    def test_data_reads_deferred(self, mockcore, rtt):
+        target_write(mockcore, 2, bytes(range(30)))
+        rtt.poll_all()
+        target_write(mockcore, 0, b'abc')
+        target_write(mockcore, 2, b'wrapped')
+        events = []
+        def read_deferred(addr, size):
+            events.append(('start', addr))
+            data = MockCore.read_memory_block32(mockcore, addr, size)
+            return lambda: events.append(('result', addr)) or data
+        with mock.patch.object(mockcore, 'read_memory_block32_deferred', side_effect=read_deferred):
+            assert rtt.poll_all() == [b'abc', b'', b'wrapped']
+        # Channel 2 wrapped, so it has two reads. All reads are started before any result is used.
+        assert [e[0] for e in events] == ['start'] * 3 + ['result'] * 3
+
+    @pytest.mark.parametrize(("base", "size"), [
+            (RAM + 0x3f0 - 30, 30),     # Unaligned end
+            (RAM + 0x3f0 - 29, 29),     # Unaligned start and end
+            (RAM + 0x400 - 30, 30),     # Unaligned start, ending at the end of the RAM region
+        ])
+    def test_reads_stay_in_buffer(self, mockcore, rtt, base, size):
+        mockcore.write_memory_block32(up_desc_addr(0) + 4, [base, size])
+        rtt.up_channels[0]._read_descriptor()
+        mockcore.ram[base - RAM - 4:base - RAM + size + 4] = b'\xee' * (size + 8)
+        mockcore.write_memory_block8(base, list(range(size)))
+
+        reads = []
+        def record(addr, length):
+            reads.append((addr, addr + length))
+        with mock.patch.object(mockcore, 'read_memory_block32',
+                    side_effect=lambda a, n: record(a, 4 * n) or MockCore.read_memory_block32(mockcore, a, n)), \
+                mock.patch.object(mockcore, 'read_memory_block8',
+                    side_effect=lambda a, n: record(a, n) or MockCore.read_memory_block8(mockcore, a, n)):
+            # Wrapped read covering the whole buffer apart from the byte before RdOff.
+            assert rtt.up_channels[0].read_data(3, 4) == bytes(range(4, size)) + bytes(range(3))
+            assert rtt.up_channels[0].read_data(size - 1, 1) == bytes(range(1, size - 1))
+        assert reads
+        assert all((base <= begin) and (end <= base + size) for begin, end in reads)
+
+class TestFindControlBlock:
+    def test_search(self, rtt_target):
+        setup_rtt(rtt_target)
+        cb = GenericRTTControlBlock(rtt_target, address=RAM, size=0x100)
+        assert cb._find_control_block() == CB_ADDR
+        assert rtt_target.session.context_state.rtt_control_block_addresses[b'SEGGER RTT\0\0\0\0\0\0'] == CB_ADDR
+
+    def test_cached_address(self, rtt_target):
+        setup_rtt(rtt_target)
+        GenericRTTControlBlock(rtt_target, address=RAM, size=0x100).start()
+        cb = GenericRTTControlBlock(rtt_target, address=RAM, size=0x100)
+        with mock.patch.object(rtt_target, 'search_memory') as search, \
+                mock.patch.object(rtt_target, 'read_memory_block32', wraps=rtt_target.read_memory_block32) as rd:
+            assert cb._find_control_block() == CB_ADDR
+        search.assert_not_called()
+        assert rd.call_args_list == [mock.call(CB_ADDR, 4)]
+
+    def test_stale_cached_address(self, rtt_target):
+        setup_rtt(rtt_target)
+        rtt_target.session.context_state.rtt_control_block_addresses = {b'SEGGER RTT\0\0\0\0\0\0': RAM + 0x80}
+        cb = GenericRTTControlBlock(rtt_target, address=RAM, size=0x100)
+        assert cb._find_control_block() == CB_ADDR
+
+    def test_elf_symbol(self, rtt_target):
+        setup_rtt(rtt_target)
+        rtt_target.elf = mock.Mock()
+        rtt_target.elf.symbol_decoder.get_symbol_for_name.return_value = mock.Mock(address=CB_ADDR)
+        cb = GenericRTTControlBlock(rtt_target, address=RAM, size=0x100)
+        with mock.patch.object(rtt_target, 'search_memory') as search:
+            assert cb._find_control_block() == CB_ADDR
+        search.assert_not_called()
+        rtt_target.elf.symbol_decoder.get_symbol_for_name.assert_called_with("_SEGGER_RTT")
+
+    def test_stripped_elf(self, rtt_target):
+        setup_rtt(rtt_target)
+        rtt_target.elf = make_stripped_elf()
+        assert not rtt_target.elf.has_symbol_table
+        cb = GenericRTTControlBlock(rtt_target, address=RAM, size=0x100)
+        assert cb._find_control_block() == CB_ADDR
+
+    def test_outside_requested_range(self, rtt_target):
+        setup_rtt(rtt_target)
+        rtt_target.elf = mock.Mock()
+        rtt_target.elf.symbol_decoder.get_symbol_for_name.return_value = mock.Mock(address=CB_ADDR)
+        cb = GenericRTTControlBlock(rtt_target, address=RAM + 0x100, size=0x100)
+        assert cb._find_control_block() is None
+
+    def test_not_found(self, rtt_target):
+        cb = GenericRTTControlBlock(rtt_target, address=RAM, size=0x100)
+        assert cb._find_control_block() is None
+        assert rtt_target.session.context_state.rtt_control_block_addresses == {}
+
+class TestRTTPollScheduler:
+    @pytest.fixture(scope='function')
+    def chan(self):
+        c = mock.Mock()
+        c.size = 1000
+        return c
+
+    def test_backoff_when_empty(self, chan):
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.1)
+        intervals = [sched.update([chan], [b'']) for _ in range(10)]
+        assert intervals[:3] == pytest.approx([0.002, 0.004, 0.008])
+        assert intervals[-1] == pytest.approx(0.1)
+
+    def test_speeds_up_when_filling(self, chan):
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.1)
+        for _ in range(10):
+            sched.update([chan], [b''])
+        # Buffer half full: interval is halved to aim for 25% fill.
+        assert sched.update([chan], [bytes(500)]) == pytest.approx(0.05)
+        # Nearly full: drops straight to the minimum.
+        assert sched.update([chan], [bytes(800)]) == pytest.approx(0.001)
+
+    def test_steady_at_target_fill(self, chan):
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.1)
+        sched.update([chan], [b''])
+        assert sched.update([chan], [bytes(250)]) == pytest.approx(0.002)
+
+    def test_fullest_channel_wins(self, chan):
+        small = mock.Mock()
+        small.size = 100
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.1)
+        sched.update([chan], [b''])
+        sched.update([chan], [b''])
+        assert sched.update([chan, small], [bytes(250), bytes(50)]) == pytest.approx(0.002)
+
+    def test_bandwidth_budget(self, chan):
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.1, max_bandwidth=10000)
+        # 900 bytes of data at 10 kB/s requires at least ~93 ms.
+        interval = sched.update([chan], [bytes(900)])
+        assert interval == pytest.approx((900 + RTTPollScheduler.CHANNEL_OVERHEAD) / 10000)
+        # Max latency takes precedence.
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.05, max_bandwidth=1000)
+        assert sched.update([chan], [bytes(900)]) == pytest.approx(0.05)
+
+    def test_reset(self, chan):
+        sched = RTTPollScheduler(min_interval=0.001, max_latency=0.1)
+        for _ in range(10):
+            sched.update([chan], [b''])
+        assert not sched.is_poll_due
+        sched.reset()
+        assert sched.is_poll_due
+        assert sched.time_until_poll == 0
+        assert sched.interval == 0.001
@@ -17,6 +17,7 @@
 # limitations under the License.
 
 from pathlib import Path
+import io
 import pytest
 import os
 import logging
@@ -24,11 +25,16 @@ import logging
 import six
 
 from pyocd.core.helpers import ConnectHelper
+from pyocd.core.session import Session
 from pyocd.core.target import Target
+from pyocd.coresight.cortex_m import CortexM
 from pyocd.debug import semihost
+from pyocd.debug.context import DebugContext
 from pyocd.utility.server import StreamServer
 from pyocd.utility.timeout import Timeout
 
+from .mockcore import MockCore
+
 @pytest.fixture(scope='module')
 def tgt(request):
     session = None
@@ -696,4 +702,358 @@ class TestSemihostIOHandlerBase:
         with pytest.raises(NotImplementedError):
             handler.__getattribute__(op)(*args)
 
+FLASH_BKPT = 0x100
+RAM_BKPT = 0x20000100
+STRING_ADDR = 0x20000200
+
+class SemihostMockCore(MockCore):
+    """@brief MockCore that records memory reads and supports deferred reads of DFSR."""
+
+    def __init__(self):
+        super().__init__()
+        self.session = Session(None)
+        self.dfsr = CortexM.DFSR_BKPT
+        self.breakpoints = set()
+        self.reads = []
+        self.resume_count = 0
+        self.merged_resume_count = 0
+
+    def read_memory(self, addr, transfer_size=32, now=True):
+        if addr == CortexM.DFSR:
+            result = self.dfsr
+        else:
+            result = super().read_memory(addr, transfer_size)
+        return result if now else (lambda: result)
+
+    def read_memory_block8(self, addr, size):
+        self.reads.append((addr, size))
+        return super().read_memory_block8(addr, size)
+
+    def find_breakpoint(self, addr):
+        return addr if (addr in self.breakpoints) else None
+
+    def resume(self):
+        self.resume_count += 1
+
+    def write_core_registers_raw_and_resume(self, reg_list, data_list):
+        self.write_core_registers_raw(reg_list, data_list)
+        self.merged_resume_count += 1
+
+class UnmergedSemihostMockCore(SemihostMockCore):
+    """@brief Mock of a core that cannot write registers and resume together."""
+    write_core_registers_raw_and_resume = None
+
+class SinkConsole(semihost.SemihostIOHandler):
+    """@brief Console handler that records written data."""
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+        self.reads = 0
+        self.cleanup_count = 0
+
+    def write(self, fd, ptr, length):
+        assert self.agent
+        return self.write_data(fd, self.agent.get_data(ptr, length))
+
+    def write_data(self, fd, data):
+        self.writes.append((fd, data))
+        return 0
+
+    def readc(self):
+        self.reads += 1
+        return ord('x')
+
+    def cleanup(self):
+        self.cleanup_count += 1
+
+@pytest.fixture
+def core():
+    c = SemihostMockCore()
+    c.write_memory(FLASH_BKPT, semihost.BKPT_INSTR, 16)
+    c.write_memory(RAM_BKPT, semihost.BKPT_INSTR, 16)
+    return c
+
+@pytest.fixture
+def console():
+    return RecordingSemihostIOHandler()
 
+@pytest.fixture
+def agent(core, console):
+    a = semihost.SemihostAgent(DebugContext(core), console=console)
+    yield a
+    a.cleanup()
+
+def make_request(core, pc, op, args):
+    core.write_core_registers_raw(['pc', 'r0', 'r1'], [pc, op, args])
+    core.reads.clear()
+
+class TestSemihostRequests:
+    def test_writec(self, core, console, agent):
+        core.write_memory_block8(STRING_ADDR, b'A')
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_WRITEC, STRING_ADDR)
+        assert agent.check_and_handle_semihost_request()
+        assert console.get_output_data(semihost.STDOUT_FD) == b'A'
+        assert core.read_core_registers_raw(['r0', 'pc']) == [0, FLASH_BKPT + 2]
+        assert core.resume_count == 0
+        assert core.merged_resume_count == 0
+
+    def test_resume(self, core, agent):
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert agent.check_and_handle_semihost_request(resume=True)
+        assert core.merged_resume_count == 1
+        assert core.resume_count == 0
+        assert core.read_core_registers_raw(['pc']) == [FLASH_BKPT + 2]
+
+    def test_resume_unmerged(self):
+        core = UnmergedSemihostMockCore()
+        core.write_memory(FLASH_BKPT, semihost.BKPT_INSTR, 16)
+        agent = semihost.SemihostAgent(DebugContext(core), console=RecordingSemihostIOHandler())
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert agent.check_and_handle_semihost_request(resume=True)
+        assert core.resume_count == 1
+        assert core.read_core_registers_raw(['pc']) == [FLASH_BKPT + 2]
+        agent.cleanup()
+
+    def test_not_bkpt_halt(self, core, agent):
+        core.dfsr = CortexM.DFSR_HALTED
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert not agent.check_and_handle_semihost_request(resume=True)
+        assert core.read_core_registers_raw(['pc']) == [FLASH_BKPT]
+        assert core.merged_resume_count == 0
+
+    def test_user_breakpoint(self, core, agent):
+        core.breakpoints.add(FLASH_BKPT)
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert not agent.check_and_handle_semihost_request()
+        assert core.read_core_registers_raw(['pc']) == [FLASH_BKPT]
+
+    def test_other_bkpt(self, core, agent):
+        make_request(core, FLASH_BKPT + 2, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert not agent.check_and_handle_semihost_request()
+        assert core.read_core_registers_raw(['pc']) == [FLASH_BKPT + 2]
+
+    def test_flash_bkpt_cached(self, core, agent):
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert agent.check_and_handle_semihost_request()
+        assert core.reads == [(FLASH_BKPT, 2)]
+
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert agent.check_and_handle_semihost_request()
+        assert core.reads == []
+
+    def test_ram_bkpt_not_cached(self, core, agent):
+        for _ in range(2):
+            make_request(core, RAM_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+            assert agent.check_and_handle_semihost_request()
+            assert core.reads == [(RAM_BKPT, 2)]
+
+        # Code in RAM replaced by a different bkpt.
+        core.write_memory(RAM_BKPT, 0xbe00, 16)
+        make_request(core, RAM_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert not agent.check_and_handle_semihost_request()
+
+    @pytest.mark.parametrize("event", [Target.Event.POST_RESET, Target.Event.POST_FLASH_PROGRAM])
+    def test_cache_invalidated(self, core, agent, event):
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert agent.check_and_handle_semihost_request()
+
+        core.write_memory(FLASH_BKPT, 0xbe00, 16)
+        core.session.notify(event, core)
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+        assert not agent.check_and_handle_semihost_request()
+
+    def test_write0_reads_string_once(self, core, console, agent):
+        core.write_memory_block8(STRING_ADDR, b'hello\0')
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_WRITE0, STRING_ADDR)
+        core.reads.clear()
+        assert agent.check_and_handle_semihost_request()
+        assert console.get_output_data(semihost.STDOUT_FD) == b'hello'
+        assert [r for r in core.reads if r[0] == STRING_ADDR] == [(STRING_ADDR, semihost.STRING_READ_SIZE)]
+
+class TestSemihostGetData:
+    def test_long_string(self, core, agent):
+        msg = bytes(0x41 + (i % 26) for i in range(300))
+        core.write_memory_block8(STRING_ADDR, msg + b'\0')
+        core.reads.clear()
+        assert agent.get_data(STRING_ADDR) == msg
+        assert core.reads == [
+                (STRING_ADDR, semihost.STRING_READ_SIZE),
+                (STRING_ADDR + semihost.STRING_READ_SIZE, semihost.STRING_READ_SIZE * 2),
+                ]
+
+    def test_reads_stop_at_region_end(self, core, agent):
+        # The string spans the boundary between the two RAM regions.
+        start = core.ram_region.end + 1 - 8
+        core.write_memory_block8(start, b'abcdefgh')
+        core.write_memory_block8(core.ram2_region.start, b'ijk\0')
+        core.reads.clear()
+        assert agent.get_data(start) == b'abcdefghijk'
+        assert core.reads == [
+                (start, 8),
+                (core.ram2_region.start, semihost.STRING_READ_SIZE * 2),
+                ]
+
+    def test_unmapped(self, core, agent):
+        # Unmapped memory reads as 0x55 in the mock, so the string is never terminated.
+        core.reads.clear()
+        data = agent.get_data(0x40000000)
+        assert len(data) == semihost.MAX_STRING_LENGTH
+        assert all(size == semihost.UNMAPPED_STRING_READ_SIZE for _, size in core.reads)
+
+    def test_max_length(self, core, agent):
+        core.write_memory_block8(core.ram_region.start, b'x' * 1024)
+        core.write_memory_block8(core.ram2_region.start, b'y' * 1024)
+        data = agent.get_data(core.ram_region.start)
+        assert data == b'x' * 1024 + b'y' * 1024
+        assert len(data) == semihost.MAX_STRING_LENGTH
+
+    def test_length(self, core, agent):
+        core.write_memory_block8(STRING_ADDR, b'abcdef')
+        assert agent.get_data(STRING_ADDR, 4) == b'abcd'
+
+class TestBufferedConsoleIOHandler:
+    @pytest.fixture
+    def sink(self):
+        return SinkConsole()
+
+    @pytest.fixture
+    def buffered(self, sink):
+        return semihost.BufferedConsoleIOHandler(sink, buffer_size=16, flush_interval=60)
+
+    @pytest.fixture
+    def buffered_agent(self, core, buffered):
+        a = semihost.SemihostAgent(DebugContext(core), console=buffered)
+        yield a
+        a.cleanup()
+
+    def writec(self, core, agent, c):
+        core.write_memory_block8(STRING_ADDR, c)
+        make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_WRITEC, STRING_ADDR)
+        assert agent.check_and_handle_semihost_request()
+
+    def test_agent_set_on_wrapped(self, sink, buffered, buffered_agent):
+        assert buffered.agent is buffered_agent
+        assert sink.agent is buffered_agent
+
+    def test_flush_on_newline(self, core, sink, buffered, buffered_agent):
+        for c in b'hi':
+            self.writec(core, buffered_agent, bytes([c]))
+        assert sink.writes == []
+        assert buffered.buffered_length == 2
+        self.writec(core, buffered_agent, b'\n')
+        assert sink.writes == [(semihost.STDOUT_FD, b'hi\n')]
+        assert buffered.buffered_length == 0
+        assert buffered.flush_count == 1
+
+    def test_flush_when_full(self, sink, buffered):
+        buffered.write_data(semihost.STDOUT_FD, b'a' * 15)
+        assert sink.writes == []
+        buffered.write_data(semihost.STDOUT_FD, b'b')
+        assert sink.writes == [(semihost.STDOUT_FD, b'a' * 15 + b'b')]
+
+    def test_flush_interval(self, sink):
+        buffered = semihost.BufferedConsoleIOHandler(sink, flush_interval=0)
+        assert buffered.time_until_flush == float('inf')
+        buffered.poll()
+        assert buffered.flush_count == 0
+        buffered.write_data(semihost.STDOUT_FD, b'abc')
+        assert buffered.time_until_flush == 0
+        assert buffered.is_flush_due
+        buffered.poll()
+        assert sink.writes == [(semihost.STDOUT_FD, b'abc')]
+        assert buffered.time_until_flush == float('inf')
+
+    def test_order_kept(self, sink, buffered):
+        buffered.write_data(semihost.STDOUT_FD, b'a')
+        buffered.write_data(semihost.STDOUT_FD, b'b')
+        buffered.write_data(semihost.STDERR_FD, b'c')
+        buffered.write_data(semihost.STDOUT_FD, b'd')
+        buffered.flush()
+        assert sink.writes == [
+                (semihost.STDOUT_FD, b'ab'),
+                (semihost.STDERR_FD, b'c'),
+                (semihost.STDOUT_FD, b'd'),
+                ]
+
+    def test_read_flushes(self, sink, buffered):
+        buffered.write_data(semihost.STDOUT_FD, b'> ')
+        assert buffered.readc() == ord('x')
+        assert sink.writes == [(semihost.STDOUT_FD, b'> ')]
+
+    def test_flush_on_other_halt(self, core, sink, buffered_agent):
+        self.writec(core, buffered_agent, b'a')
+        assert sink.writes == []
+        core.dfsr = CortexM.DFSR_HALTED
+        make_request(core, FLASH_BKPT, 0, 0)
+        assert not buffered_agent.check_and_handle_semihost_request()
+        assert sink.writes == [(semihost.STDOUT_FD, b'a')]
+
+    def test_agent_poll(self, sink, buffered_agent, buffered):
+        assert buffered_agent.time_until_console_flush == float('inf')
+        buffered.write_data(semihost.STDOUT_FD, b'a')
+        assert 0 < buffered_agent.time_until_console_flush <= 60
+        buffered_agent.poll_console()
+        assert sink.writes == []
+
+    def test_cleanup_flushes(self, core, sink, buffered):
+        agent = semihost.SemihostAgent(DebugContext(core), console=buffered)
+        buffered.write_data(semihost.STDOUT_FD, b'a')
+        agent.cleanup()
+        assert sink.writes == [(semihost.STDOUT_FD, b'a')]
+
+    def test_cleanup_once(self, sink, buffered):
+        buffered.cleanup()
+        buffered.cleanup()
+        assert sink.cleanup_count == 1
+
+    def test_wrapped_io_handler_cleaned_once(self, core, sink, buffered):
+        agent = semihost.SemihostAgent(DebugContext(core), io_handler=sink, console=buffered)
+        buffered.write_data(semihost.STDOUT_FD, b'a')
+        agent.cleanup()
+        assert sink.writes == [(semihost.STDOUT_FD, b'a')]
+        assert sink.cleanup_count == 1
+
+    def test_console_io_handler(self):
+        out = io.BytesIO()
+        console = semihost.ConsoleIOHandler(io.BytesIO(), out)
+        buffered = semihost.BufferedConsoleIOHandler(console)
+        buffered.write_data(semihost.STDOUT_FD, b'abc\n')
+        assert out.getvalue() == b'abc\n'
+
+class TestSemihostStatistics:
+    def test_disabled(self, agent):
+        assert agent.statistics is None
+
+    def test_requests(self, core, console):
+        core.session.options['semihost.statistics'] = True
+        agent = semihost.SemihostAgent(DebugContext(core), console=console)
+        try:
+            stats = agent.statistics
+            assert stats is not None
+            assert stats.format_summary() == "Semihosting: no requests"
+
+            core.write_memory_block8(STRING_ADDR, b'hello\0')
+            make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_WRITE0, STRING_ADDR)
+            assert agent.check_and_handle_semihost_request()
+            make_request(core, FLASH_BKPT, semihost.SemihostingRequests.SYS_CLOCK, 0)
+            assert agent.check_and_handle_semihost_request()
+            make_request(core, FLASH_BKPT, 0x99, 0)
+            assert agent.check_and_handle_semihost_request()
+
+            # Not a request, so not counted.
+            core.dfsr = 0
+            assert not agent.check_and_handle_semihost_request()
+
+            assert stats.total_requests == 3
+            assert stats.request_counts[semihost.SemihostingRequests.SYS_WRITE0] == 1
+            assert stats.console_requests == 1
+            assert stats.console_bytes == 5
+            assert stats.request_time >= stats.console_time > 0
+
+            summary = stats.format_summary()
+            assert "3 requests" in summary
+            assert "1 console output requests" in summary
+            assert "SYS_WRITE0=1" in summary
+            assert "0x99=1" in summary
+        finally:
+            agent.cleanup()
@@ -0,0 +1,218 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import threading
+from unittest import mock
+
+from pyocd.core import exceptions
+from pyocd.core.target import Target
+from pyocd.coresight.cortex_m import CortexM
+from pyocd.debug.state_monitor import TargetStateMonitor
+from pyocd.utility.notification import Notifier
+
+class MockSession(Notifier):
+    def __init__(self, min_interval=0.0005, max_interval=0.004):
+        super().__init__()
+        self.options = {
+            'state_monitor.min_poll_interval': min_interval,
+            'state_monitor.max_poll_interval': max_interval,
+            }
+        self.probe = mock.Mock()
+        self.changes = []
+        self.subscribe(lambda n: self.changes.append((n.source, n.data)), Target.Event.STATE_CHANGED)
+
+def make_core(state=Target.State.RUNNING):
+    core = mock.Mock()
+    core.get_state.return_value = state
+    return core
+
+def make_cortex_m(dhcsr):
+    """@brief Mock Cortex-M core whose deferred DHCSR reads return values from _dhcsr_."""
+    core = mock.Mock(spec=CortexM)
+    core.read_memory.side_effect = lambda addr, size, now: (lambda: dhcsr[0])
+    return core
+
+@pytest.fixture(scope='function')
+def session():
+    return MockSession()
+
+@pytest.fixture(scope='function')
+def monitor(session):
+    return TargetStateMonitor(session)
+
+class TestStatePolling:
+    def test_no_change(self, session, monitor):
+        core = make_core()
+        monitor.watch(core)
+        assert not monitor.poll()
+        assert session.changes == []
+        assert monitor.watched_cores == [core]
+
+    def test_halt_unwatches(self, session, monitor):
+        core = make_core()
+        monitor.watch(core)
+        core.get_state.return_value = Target.State.HALTED
+        assert monitor.poll()
+        assert session.changes == [(core, Target.State.HALTED)]
+        assert monitor.watched_cores == []
+
+    def test_halt_callback_rewatches(self, session, monitor):
+        # A handler that resumes the core, such as semihosting, watches it again.
+        core = make_core()
+        monitor.watch(core)
+        session.subscribe(lambda n: monitor.watch(n.source), Target.Event.STATE_CHANGED)
+        core.get_state.return_value = Target.State.HALTED
+        assert monitor.poll()
+        assert monitor.watched_cores == [core]
+        assert monitor.get_state(core) == Target.State.RUNNING
+
+    def test_rewatched_by_other_core_callback(self, session, monitor):
+        core1 = make_core()
+        core2 = make_core()
+        monitor.watch(core1)
+        monitor.watch(core2)
+        # Handling the halt of core1 resumes core2, so its halt read by the same poll is stale.
+        session.subscribe(lambda n: monitor.watch(core2) if n.source is core1 else None,
+                Target.Event.STATE_CHANGED)
+        core1.get_state.return_value = Target.State.HALTED
+        core2.get_state.return_value = Target.State.HALTED
+        assert monitor.poll()
+        assert session.changes == [(core1, Target.State.HALTED)]
+        assert monitor.watched_cores == [core2]
+        assert monitor.get_state(core2) == Target.State.RUNNING
+
+    def test_rewatched_while_reading(self, session, monitor):
+        core = make_core()
+        monitor.watch(core)
+        def get_state():
+            # The core is resumed by another thread after its state is read.
+            monitor.watch(core)
+            return Target.State.HALTED
+        core.get_state.side_effect = get_state
+        assert not monitor.poll()
+        assert session.changes == []
+        assert monitor.watched_cores == [core]
+
+    def test_lockup_stays_watched(self, session, monitor):
+        core = make_core()
+        monitor.watch(core)
+        core.get_state.return_value = Target.State.LOCKUP
+        assert monitor.poll()
+        assert not monitor.poll()
+        assert session.changes == [(core, Target.State.LOCKUP)]
+        assert monitor.get_state(core) == Target.State.LOCKUP
+
+    def test_sleep_not_reported(self, session, monitor):
+        core = make_core()
+        monitor.watch(core)
+        core.get_state.return_value = Target.State.SLEEPING
+        assert not monitor.poll()
+        assert session.changes == []
+        assert monitor.get_state(core) == Target.State.SLEEPING
+
+    def test_unknown_initial_state(self, session, monitor):
+        core = make_core()
+        monitor.watch(core, None)
+        assert monitor.poll()
+        assert session.changes == [(core, Target.State.RUNNING)]
+
+    def test_transfer_error_ignored(self, session, monitor):
+        core = make_core()
+        core.get_state.side_effect = exceptions.TransferError()
+        monitor.watch(core)
+        assert not monitor.poll()
+        assert monitor.watched_cores == [core]
+        assert session.probe.unlock.called
+
+    def test_deferred_dhcsr_reads(self, session, monitor):
+        dhcsr0 = [0]
+        dhcsr1 = [CortexM.S_HALT]
+        core0 = make_cortex_m(dhcsr0)
+        core1 = make_cortex_m(dhcsr1)
+        monitor.watch(core0)
+        monitor.watch(core1)
+        assert monitor.poll()
+        core0.read_memory.assert_called_once_with(CortexM.DHCSR, 32, now=False)
+        core1.read_memory.assert_called_once_with(CortexM.DHCSR, 32, now=False)
+        assert session.changes == [(core1, Target.State.HALTED)]
+        dhcsr0[0] = CortexM.S_LOCKUP
+        assert monitor.poll()
+        assert session.changes[-1] == (core0, Target.State.LOCKUP)
+
+    def test_reset_confirmed_by_get_state(self, session, monitor):
+        core = make_cortex_m([CortexM.S_RESET_ST])
+        core.get_state.return_value = Target.State.RESET
+        monitor.watch(core)
+        assert monitor.poll()
+        assert core.get_state.called
+        assert session.changes == [(core, Target.State.RESET)]
+
+class TestNotifications:
+    def test_resume_and_halt(self, session, monitor):
+        core = make_core()
+        session.notify(Target.Event.POST_RUN, core, Target.RunType.RESUME)
+        assert monitor.watched_cores == [core]
+        session.notify(Target.Event.POST_HALT, core, Target.HaltReason.USER)
+        assert monitor.watched_cores == []
+
+    def test_step_not_watched(self, session, monitor):
+        core = make_core()
+        session.notify(Target.Event.POST_RUN, core, Target.RunType.STEP)
+        assert monitor.watched_cores == []
+
+    def test_reset(self, session, monitor):
+        core = make_core()
+        session.notify(Target.Event.POST_RESET, core)
+        assert monitor.watched_cores == [core]
+        assert monitor.get_state(core) is None
+
+    def test_stop_unsubscribes(self, session, monitor):
+        monitor.stop()
+        session.notify(Target.Event.POST_RUN, make_core(), Target.RunType.RESUME)
+        assert monitor.watched_cores == []
+
+class TestMonitorThread:
+    def test_backoff(self, session, monitor):
+        monitor.watch(make_core())
+        assert monitor.interval == 0.0005
+        monitor.start()
+        try:
+            # Wait until the interval has backed off to the maximum.
+            for _ in range(1000):
+                if monitor.interval == 0.004:
+                    break
+                threading.Event().wait(0.001)
+            assert monitor.interval == 0.004
+            # Resuming a core resets the interval.
+            monitor.watch(make_core())
+            assert monitor.interval == 0.0005
+        finally:
+            monitor.stop()
+
+    def test_detects_halt(self, session, monitor):
+        core = make_core()
+        halted = threading.Event()
+        session.subscribe(lambda n: halted.set(), Target.Event.STATE_CHANGED)
+        monitor.start()
+        try:
+            monitor.watch(core)
+            core.get_state.return_value = Target.State.HALTED
+            assert halted.wait(5.0)
+            assert session.changes == [(core, Target.State.HALTED)]
+        finally:
+            monitor.stop()
+        assert not monitor.is_alive()
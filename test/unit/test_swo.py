@@ -0,0 +1,231 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import pytest
+import random
+from unittest import mock
+
+from pyocd.core import exceptions
+from pyocd.trace import events
+from pyocd.trace.capture import (SWOCaptureReader, SWOCaptureWriter, SWOCaptureWriterThread, replay_swo_capture)
+from pyocd.trace.sink import TraceEventSink
+from pyocd.trace.swo import (SWOBatchParser, SWOParser, SWORecordType)
+
+SYNC = bytes([0, 0, 0, 0, 0, 0x80])
+
+def itm(port, data, width=1):
+    ss = {1: 1, 2: 2, 4: 3}[width]
+    return bytes([((port & 0x1f) << 3) | ss]) + data.to_bytes(width, 'little')
+
+def hw(a, payload, width=2):
+    ss = {1: 1, 2: 2, 4: 3}[width]
+    return bytes([(a << 3) | 0x4 | ss]) + payload.to_bytes(width, 'little')
+
+def local_ts(value):
+    if value in (1, 2, 4, 5, 6):
+        return bytes([value << 4])
+    out = bytearray([0xc0])
+    groups = []
+    while True:
+        groups.insert(0, value & 0x7f)
+        value >>= 7
+        if not value:
+            break
+    for i, g in enumerate(groups):
+        out.append(g | (0x80 if i < len(groups) - 1 else 0))
+    return bytes(out)
+
+def make_swo_stream(count, seed=0):
+    """@brief Generate a representative SWO stream with ITM, PC sampling and exception trace."""
+    rng = random.Random(seed)
+    out = bytearray(SYNC)
+    text = b"Hello from the target! "
+    for n in range(count):
+        r = rng.random()
+        if r < 0.5:
+            out += itm(0, text[n % len(text)])
+        elif r < 0.7:
+            out += hw(2, rng.getrandbits(32) & ~1, 4)
+        elif r < 0.8:
+            out += hw(1, (rng.randint(1, 3) << 12) | rng.randint(0, 60))
+        elif r < 0.85:
+            out += itm(rng.randint(1, 31), rng.getrandbits(32), 4)
+        elif r < 0.9:
+            out += hw(0, rng.getrandbits(6), 1)
+        elif r < 0.95:
+            # Data trace PC and value pair on comparator 1.
+            out += bytes([0b01010111]) + rng.getrandbits(32).to_bytes(4, 'little')
+            out += bytes([0b10010110]) + rng.getrandbits(16).to_bytes(2, 'little')
+        else:
+            out += local_ts(rng.randint(1, 5000))
+    return bytes(out)
+
+class RecordingSink(TraceEventSink):
+    def __init__(self):
+        self.events = []
+
+    def receive(self, event):
+        self.events.append(event)
+
+@pytest.fixture(scope='function')
+def core():
+    c = mock.Mock()
+    c.exception_number_to_name.side_effect = lambda n: "exc%d" % n
+    return c
+
+def run_parser(cls, core, chunks):
+    sink = RecordingSink()
+    parser = cls(core, sink)
+    for chunk in chunks:
+        parser.parse(chunk)
+    # Flush out pending events.
+    parser.parse(local_ts(1))
+    return [(type(e), str(e)) for e in sink.events], parser
+
+def split(data, sizes):
+    chunks = []
+    i = 0
+    k = 0
+    while i < len(data):
+        n = sizes[k % len(sizes)]
+        chunks.append(data[i:i + n])
+        i += n
+        k += 1
+    return chunks
+
+class TestSWOBatchParser:
+    def test_itm(self, core):
+        sink = RecordingSink()
+        p = SWOBatchParser(core, sink)
+        p.parse(SYNC + itm(0, ord('A')) + itm(3, 0x1234, 2) + local_ts(2))
+        assert [(e.port, e.data, e.width, e.timestamp) for e in sink.events] == [
+                (0, 0x41, 1, 2), (3, 0x1234, 2, 2)]
+        assert p.bytes_parsed == len(SYNC) + 2 + 3 + 1
+
+    def test_decode_records(self, core):
+        p = SWOBatchParser(core)
+        data = (itm(0, 0x55) + local_ts(4) + hw(2, 0x08000100, 4) + hw(1, (1 << 12) | 15)
+                + bytes([0x70]))
+        assert p.decode(data) == [
+                (SWORecordType.ITM, 0, 1, 0x55, 0),
+                (SWORecordType.TIMESTAMP, 0, 0, 4, 4),
+                (SWORecordType.PERIODIC_PC, 0, 4, 0x08000100, 4),
+                (SWORecordType.EXCEPTION, 15, 2, events.TraceExceptionEvent.ENTERED, 4),
+                (SWORecordType.OVERFLOW, 0, 0, 0, 4),
+                ]
+        core.exception_number_to_name.assert_not_called()
+
+    def test_stimulus_page(self, core):
+        p = SWOBatchParser(core)
+        # Extension packet with SH=0 and EX=2 selects stimulus page 2.
+        records = p.decode(bytes([0x28]) + itm(5, 1) + SYNC + itm(5, 2))
+        assert [r[1] for r in records] == [69, 5]
+
+    def test_split_packets(self, core):
+        p = SWOBatchParser(core)
+        data = itm(7, 0xdeadbeef, 4) + local_ts(1000)
+        records = []
+        for b in data:
+            records += p.decode(bytes([b]))
+        assert records == SWOBatchParser(core).decode(data)
+
+    def test_long_sync(self, core):
+        p = SWOBatchParser(core)
+        for _ in range(100):
+            p.decode(bytes(64))
+        assert len(p._residual) <= 5
+        assert p.decode(bytes([0x80]) + itm(1, 9)) == [(SWORecordType.ITM, 1, 1, 9, 0)]
+
+    @pytest.mark.parametrize("sizes", [[1], [3, 7], [64], [1000000]])
+    def test_matches_reference(self, core, sizes):
+        data = make_swo_stream(2000, seed=len(sizes))
+        chunks = split(data, sizes)
+        expected, _ = run_parser(SWOParser, core, chunks)
+        actual, _ = run_parser(SWOBatchParser, core, chunks)
+        assert len(expected) > 1000
+        assert actual == expected
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_reference_random_bytes(self, core, seed):
+        rng = random.Random(seed)
+        data = bytes(rng.getrandbits(8) for _ in range(5000))
+        chunks = split(data, [rng.randint(1, 50) for _ in range(20)])
+        expected, ref = run_parser(SWOParser, core, chunks)
+        actual, batch = run_parser(SWOBatchParser, core, chunks)
+        assert actual == expected
+        assert batch.bytes_parsed == ref.bytes_parsed
+
+class TestSWOCapture:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "trace.swo")
+        chunks = [b"\x01A", b"\x01", b"B\x01C"]
+        with SWOCaptureWriter(path, {'swo_clock': 2000000}) as writer:
+            for i, chunk in enumerate(chunks):
+                writer.write(chunk, timestamp=i * 0.5)
+            writer.write(b"")
+            assert writer.bytes_written == 6
+        with SWOCaptureReader(path) as reader:
+            assert reader.metadata == {'swo_clock': 2000000}
+            assert list(reader.chunks()) == [(0.0, chunks[0]), (0.5, chunks[1]), (1.0, chunks[2])]
+            # Chunks can be iterated again.
+            assert reader.read_all() == b"".join(chunks)
+
+    def test_replay(self, core):
+        data = make_swo_stream(1000)
+        f = io.BytesIO()
+        writer = SWOCaptureWriter(f)
+        for chunk in split(data, [61]):
+            writer.write(chunk)
+        writer.close()
+        f.seek(0)
+        sink = RecordingSink()
+        parser = replay_swo_capture(f, sink, core)
+        assert parser.bytes_parsed == len(data)
+        expected_sink = RecordingSink()
+        expected_parser = SWOParser(core, expected_sink)
+        expected_parser.parse(data)
+        expected_parser.flush()
+        assert len(sink.events) > 0
+        assert [(type(e), str(e)) for e in sink.events] == \
+                [(type(e), str(e)) for e in expected_sink.events]
+
+    def test_truncated(self):
+        f = io.BytesIO()
+        writer = SWOCaptureWriter(f)
+        writer.write(b"abc")
+        writer.write(b"defg")
+        truncated = io.BytesIO(f.getvalue()[:-2])
+        assert SWOCaptureReader(truncated).read_all() == b"abc"
+
+    def test_writer_thread(self, tmp_path):
+        path = str(tmp_path / "trace.swo")
+        chunks = [bytes([i]) * (i + 1) for i in range(50)]
+        with SWOCaptureWriterThread(path, {'core': 0}) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        assert not writer.is_alive()
+        assert writer.bytes_written == sum(len(c) for c in chunks)
+        with SWOCaptureReader(path) as reader:
+            assert reader.metadata == {'core': 0}
+            recorded = list(reader.chunks())
+        assert [data for _, data in recorded] == chunks
+        timestamps = [t for t, _ in recorded]
+        assert timestamps == sorted(timestamps)
+
+    def test_not_capture(self):
+        with pytest.raises(exceptions.Error):
+            SWOCaptureReader(io.BytesIO(b"\x01A\x01B" * 10))
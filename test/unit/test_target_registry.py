@@ -0,0 +1,92 @@
+# pyOCD debugger
+# Copyright (c) 2023 Arm Limited
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import subprocess
+import sys
+
+from pyocd.target.builtin import (BUILTIN_TARGET_CLASSES, BUILTIN_TARGETS)
+from pyocd.target.builtin._target_info import BUILTIN_TARGET_INFO
+from pyocd.target.registry import (TargetInfo, TargetRegistry)
+
+PACKAGE, _, MODULE = __name__.rpartition('.')
+
+class FakeTarget:
+    VENDOR = "Acme"
+
+@pytest.fixture(scope='function')
+def registry():
+    return TargetRegistry(
+            {'first': __name__ + ':FakeTarget', 'second': '.' + MODULE + ':FakeTarget'},
+            package=PACKAGE,
+            info={'first': TargetInfo("Acme", "FIRST", ['Fam'])})
+
+class TestTargetRegistry:
+    def test_lazy_load(self, registry):
+        assert 'first' in registry
+        assert list(registry) == ['first', 'second']
+        assert len(registry) == 2
+        assert not registry.is_loaded('first')
+        assert registry['first'].VENDOR == "Acme"
+        assert registry.is_loaded('first')
+        assert not registry.is_loaded('second')
+        assert registry['second'] is registry['first']
+
+    def test_missing(self, registry):
+        assert 'third' not in registry
+        with pytest.raises(KeyError):
+            registry['third']
+        assert registry.get('third') is None
+
+    def test_info(self, registry):
+        assert registry.get_info('first') == TargetInfo("Acme", "FIRST", ['Fam'])
+        assert registry.get_info('second') is None
+        # Info stays valid once loaded, but not after the entry is replaced.
+        registry['first']
+        assert registry.get_info('first') is not None
+        registry['first'] = FakeTarget
+        assert registry.get_info('first') is None
+
+    def test_add_and_delete(self, registry):
+        registry['third'] = FakeTarget
+        assert registry.is_loaded('third')
+        assert list(registry) == ['first', 'second', 'third']
+        del registry['first']
+        assert 'first' not in registry
+        assert registry.get_info('first') is None
+
+    def test_copy(self, registry):
+        copy = registry.copy()
+        copy['third'] = FakeTarget
+        assert 'third' not in registry
+        assert not copy.is_loaded('first')
+        assert copy.get_info('first') == registry.get_info('first')
+
+class TestBuiltinTargets:
+    def test_index_is_current(self):
+        # If this fails, run scripts/generate_builtin_target_index.py.
+        assert list(BUILTIN_TARGET_INFO) == list(BUILTIN_TARGET_CLASSES)
+        for name in BUILTIN_TARGET_CLASSES:
+            assert BUILTIN_TARGET_INFO[name] == TargetInfo.from_class(BUILTIN_TARGETS[name]), name
+
+    def test_import_is_lazy(self):
+        # Run in a new interpreter, since other tests will have imported targets and the parser.
+        code = ("import sys, pyocd, pyocd.tools.lists\n"
+                "from pyocd.debug.sequences.sequences import Parser\n"
+                "pyocd.tools.lists.ListGenerator.list_targets()\n"
+                "print(sum(m.startswith('pyocd.target.builtin.target_') for m in sys.modules), Parser._parser)\n")
+        result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+        assert result.stdout.split() == ['0', 'None']